@@ -0,0 +1,119 @@
+"""
+Benchmark de la sincronització entre fils: polling (Lock + time.sleep, el model
+anterior de wait_for_speech_completion / wait_for_actions_completion) contra
+espera per condició (threading.Condition + notify_waiters, via wait_until).
+
+Mesura:
+- latència de traspàs: temps entre que un fil escriu l'estat i el fil que
+  l'espera se n'adona;
+- CPU en repòs: temps de CPU consumit pels fils que esperen quan no passa res.
+
+Ús:
+    python3 benchmarks/bench_handoff.py [--handoffs N] [--idle S] [--poll P] [--waiters W]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import notify_waiters  # noqa: E402
+
+
+def poll_wait(lock, predicate, poll, stop):
+    """Espera amb polling, com els bucles antics amb time.sleep."""
+    while not stop.is_set():
+        with lock:
+            if predicate():
+                return True
+        time.sleep(poll)
+    return False
+
+
+def cond_wait(lock, predicate, poll, stop):
+    """Espera per condició; `poll` no s'utilitza."""
+    with lock:
+        return lock.wait_for(lambda: predicate() or stop.is_set())
+
+
+def measure_handoffs(mode, handoffs, poll):
+    lock = threading.Condition() if mode == 'condition' else threading.Lock()
+    waiter = cond_wait if mode == 'condition' else poll_wait
+    state = {'seq': 0, 'set_at': 0.0}
+    latencies = []
+    stop = threading.Event()
+    ready = threading.Event()
+
+    def consumer():
+        seen = 0
+        while seen < handoffs:
+            ready.set()
+            if not waiter(lock, lambda: state['seq'] > seen, poll, stop):
+                return
+            woke = time.perf_counter()
+            with lock:
+                seen = state['seq']
+                latencies.append(woke - state['set_at'])
+
+    thread = threading.Thread(target=consumer)
+    thread.start()
+    for _ in range(handoffs):
+        ready.wait()
+        ready.clear()
+        # Retard variable perquè el traspàs no quedi alineat amb el període de polling
+        time.sleep(0.003 + (len(latencies) % 7) * 0.001)
+        with lock:
+            state['seq'] += 1
+            state['set_at'] = time.perf_counter()
+            notify_waiters(lock)
+    thread.join(5)
+    stop.set()
+    return latencies
+
+
+def measure_idle_cpu(mode, seconds, poll, waiters):
+    lock = threading.Condition() if mode == 'condition' else threading.Lock()
+    waiter = cond_wait if mode == 'condition' else poll_wait
+    stop = threading.Event()
+    threads = [threading.Thread(target=waiter, args=(lock, lambda: False, poll, stop))
+               for _ in range(waiters)]
+    cpu_start = time.process_time()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    cpu = time.process_time() - cpu_start
+    stop.set()
+    with lock:
+        notify_waiters(lock)
+    for thread in threads:
+        thread.join()
+    return cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--handoffs', type=int, default=200)
+    parser.add_argument('--idle', type=float, default=5.0, help='segons de repòs a mesurar')
+    parser.add_argument('--poll', type=float, default=0.01, help='període de polling (abans 10 ms)')
+    parser.add_argument('--waiters', type=int, default=3,
+                        help='fils esperant alhora (veu, accions i fil principal)')
+    args = parser.parse_args()
+
+    header = f"{'mode':<12}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'CPU repòs %':>14}"
+    print(header)
+    print('-' * len(header))
+    for mode in ('polling', 'condition'):
+        latencies = sorted(measure_handoffs(mode, args.handoffs, args.poll))
+        cpu = measure_idle_cpu(mode, args.idle, args.poll, args.waiters)
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+        print(f"{mode:<12}{statistics.median(latencies) * 1000:>10.3f}{p95 * 1000:>10.3f}"
+              f"{max(latencies) * 1000:>10.3f}{cpu / args.idle * 100:>14.2f}")
+    print(f'({args.handoffs} traspassos; CPU de {args.waiters} fils en repòs durant {args.idle} s, '
+          f'polling cada {args.poll * 1000:.0f} ms)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark del camí de la imatge en els torns amb visió: fitxer + pujada
+(capture_image → cv2.imwrite → open → client.files.create → petició amb file_id)
+contra codificació en memòria (encode_image → cv2.imencode → data URL dins la
+mateixa petició).
+
+Mesura local (sense xarxa):
+- temps de preparació de cada camí i mida del que s'envia, per a diverses
+  qualitats JPEG i amplades màximes.
+
+Amb --live també mesura la latència real del torn contra l'API (cal keys.py):
+- fitxer: upload_image + dialogue_with_img(file_id=...)
+- memòria: dialogue_with_img(image_bytes=...)
+
+Ús:
+    python3 benchmarks/bench_image.py [--image foto.jpg] [--repeat N] [--live N]
+"""
+import argparse
+import base64
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CONFIGS = [(95, None), (80, None), (80, 640), (70, 512)]  # (qualitat JPEG, amplada màxima)
+
+
+def synth_frame(width=1280, height=960, seed=0):
+    """Imatge semblant a una escena: degradats, formes i una mica de soroll."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    img = np.stack([x * 255 / width, y * 255 / height, (x + y) * 127 / (width + height)], axis=-1)
+    for _ in range(12):
+        cx, cy = rng.integers(0, width), rng.integers(0, height)
+        radius = int(rng.integers(20, height // 4))
+        color = [int(c) for c in rng.integers(0, 255, 3)]
+        cv2.circle(img, (int(cx), int(cy)), radius, color, -1)
+    img += rng.normal(0, 6, img.shape)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def file_path_cost(img, path):
+    """capture_image + la lectura que fa upload_image."""
+    cv2.imwrite(path, img)
+    with open(path, 'rb') as f:
+        return len(f.read())
+
+
+def inline_cost(img, quality, max_width):
+    """encode_image + la data URL de dialogue_with_img."""
+    height, width = img.shape[:2]
+    if max_width and width > max_width:
+        img = cv2.resize(img, (max_width, max(1, round(height * max_width / width))),
+                         interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode('.jpg', img, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+    if not ok:
+        raise RuntimeError('cv2.imencode ha fallat')
+    return buf.tobytes(), len(base64.b64encode(buf.tobytes()))
+
+
+def timeit(func, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        st = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - st)
+    return statistics.median(times), result
+
+
+def run_local(img, repeat):
+    header = f"{'camí':<22}{'ms (mediana)':>14}{'enviat KB':>12}"
+    print(header)
+    print('-' * len(header))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'img_input.jpg')
+        elapsed, size = timeit(lambda: file_path_cost(img, path), repeat)
+        print(f"{'fitxer (q95, original)':<22}{elapsed * 1000:>14.2f}{size / 1024:>12.1f}  + pujada a part")
+    for quality, max_width in CONFIGS:
+        elapsed, (_, b64_size) = timeit(lambda: inline_cost(img, quality, max_width), repeat)
+        label = f"memòria q{quality} {max_width or 'orig'}"
+        print(f"{label:<22}{elapsed * 1000:>14.2f}{b64_size / 1024:>12.1f}")
+    print(f'(imatge {img.shape[1]}x{img.shape[0]}, {repeat} repeticions; la mida en memòria és la base64)')
+
+
+def run_live(img, turns, quality, max_width):
+    from keys import OPENAI_API_KEY, OPENAI_PROMPT_ID  # pyright: ignore[reportMissingImports]
+    from openai_helper import OpenAiHelper
+
+    helper = OpenAiHelper(OPENAI_API_KEY, OPENAI_PROMPT_ID)
+    msg = 'Descriu breument què veus.'
+    results = {'fitxer': [], 'memòria': []}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'img_input.jpg')
+        for _ in range(turns):
+            # Alternar els camins perquè la variació de la xarxa els afecti igual
+            st = time.perf_counter()
+            cv2.imwrite(path, img)
+            helper.dialogue_with_img(msg, file_id=helper.upload_image(path))
+            results['fitxer'].append(time.perf_counter() - st)
+
+            st = time.perf_counter()
+            data, _ = inline_cost(img, quality, max_width)
+            helper.dialogue_with_img(msg, image_bytes=data)
+            results['memòria'].append(time.perf_counter() - st)
+
+    header = f"{'camí':<10}{'p50 s':>10}{'min s':>10}{'max s':>10}"
+    print(header)
+    print('-' * len(header))
+    for name, times in results.items():
+        print(f"{name:<10}{statistics.median(times):>10.3f}{min(times):>10.3f}{max(times):>10.3f}")
+    print(f'({turns} torns per camí; memòria amb q{quality}, amplada {max_width or "original"})')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', help='imatge de prova (per defecte, una escena sintètica 1280x960)')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--live', type=int, default=0, metavar='N',
+                        help='torns reals contra l\'API per camí (0 = només mesura local)')
+    parser.add_argument('--quality', type=int, default=80, help='qualitat JPEG del camí en memòria amb --live')
+    parser.add_argument('--max-width', type=int, default=640, help='amplada màxima del camí en memòria amb --live')
+    args = parser.parse_args()
+
+    img = cv2.imread(args.image) if args.image else synth_frame()
+    if img is None:
+        parser.error(f'no s\'ha pogut llegir {args.image}')
+    run_local(img, args.repeat)
+    if args.live:
+        print()
+        run_live(img, args.live, args.quality, args.max_width)
+
+
+if __name__ == '__main__':
+    main()
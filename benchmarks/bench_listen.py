@@ -0,0 +1,211 @@
+"""
+Benchmark de l'inici d'escolta de cada torn: obrir sr.Microphone i cridar
+recognizer.adjust_for_ambient_noise (el camí anterior de listen_voice) contra
+el micròfon persistent calibrat en segon pla (MicStream).
+
+Mesura el temps des que comença el torn fins que recognizer.listen llegeix el
+primer fragment, és a dir, fins que el robot ja pot sentir l'usuari. Sense
+maquinari es fa servir un micròfon simulat que lliura l'àudio al ritme real
+(CHUNK / SAMPLE_RATE segons per lectura) i un cost d'obertura configurable.
+
+També mesura la cua de la frase: l'àudio que cal llegir des que l'usuari
+deixa de parlar fins que la frase es tanca, amb recognizer.listen
+(pause_threshold) i amb el VAD local (vad.py), sobre una frase sintètica.
+
+Amb --live es fa servir el micròfon real (cal PyAudio).
+
+Ús:
+    python3 benchmarks/bench_listen.py [--turns N] [--open-ms MS] [--live]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import speech_recognition as sr
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mic_stream import MIC_CHUNK_SIZE, MicStream  # noqa: E402
+from vad import VoiceActivityDetector  # noqa: E402
+
+SAMPLE_RATE = 44100
+
+
+class SimulatedStream():
+    """Soroll de fons lliurat al ritme del micròfon."""
+
+    def __init__(self, chunk, rate, noise=80, seed=0):
+        self.chunk = chunk
+        self.period = chunk / rate
+        self.rng = np.random.default_rng(seed)
+        self.noise = noise
+        self.next_at = time.perf_counter()
+
+    def read(self, size):
+        self.next_at = max(self.next_at + self.period, time.perf_counter())
+        time.sleep(max(0.0, self.next_at - time.perf_counter()))
+        return self.rng.normal(0, self.noise, self.chunk).astype('<i2').tobytes()
+
+    def close(self):
+        pass
+
+
+class SimulatedMicrophone(sr.AudioSource):
+    def __init__(self, chunk_size=MIC_CHUNK_SIZE, open_s=0.0):
+        self.CHUNK = chunk_size
+        self.SAMPLE_RATE = SAMPLE_RATE
+        self.SAMPLE_WIDTH = 2
+        self.open_s = open_s
+        self.stream = None
+
+    def __enter__(self):
+        time.sleep(self.open_s)
+        self.stream = SimulatedStream(self.CHUNK, self.SAMPLE_RATE)
+        return self
+
+    def __exit__(self, *args):
+        self.stream = None
+
+
+class ReadyRecognizer(sr.Recognizer):
+    """listen() només llegeix el primer fragment i anota quan ha arribat."""
+
+    def listen(self, source, **kwargs):
+        source.stream.read(source.CHUNK)
+        self.ready_at = time.perf_counter()
+        return None
+
+
+def new_recognizer():
+    recognizer = ReadyRecognizer()
+    recognizer.dynamic_energy_adjustment_damping = 0.16
+    recognizer.dynamic_energy_ratio = 1.6
+    return recognizer
+
+
+def per_turn(microphone_factory, turns):
+    """Camí anterior: obrir el micròfon i calibrar a cada torn."""
+    recognizer = new_recognizer()
+    latencies = []
+    for _ in range(turns):
+        st = time.perf_counter()
+        with microphone_factory() as source:
+            recognizer.adjust_for_ambient_noise(source)
+            recognizer.listen(source)
+        latencies.append(recognizer.ready_at - st)
+    return latencies, recognizer.energy_threshold
+
+
+def persistent(microphone_factory, turns):
+    """MicStream: micròfon obert i calibrat abans del primer torn."""
+    recognizer = new_recognizer()
+    mic = MicStream(recognizer, microphone_factory)
+    mic.start()
+    latencies = []
+    try:
+        for _ in range(turns):
+            st = time.perf_counter()
+            mic.listen()
+            latencies.append(recognizer.ready_at - st)
+            # Entre torns el robot pensa i parla; el fil continua calibrant
+            time.sleep(0.2)
+    finally:
+        mic.close()
+    # El primer torn inclou el calibratge inicial (una sola vegada, a l'arrencada)
+    return latencies, recognizer.energy_threshold
+
+
+def scripted_chunks(noise, speech_s, chunk=MIC_CHUNK_SIZE, seed=1):
+    """Silenci, una frase de speech_s segons i 3 s de silenci, en fragments del micròfon."""
+    rng = np.random.default_rng(seed)
+    lead, tail = int(0.5 * SAMPLE_RATE), int(3.0 * SAMPLE_RATE)
+    speech = int(speech_s * SAMPLE_RATE)
+    signal = rng.normal(0, noise, lead + speech + tail)
+    t = np.arange(speech) / SAMPLE_RATE
+    signal[lead:lead + speech] += 3000 * np.sin(2 * np.pi * 220 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))
+    pcm = np.clip(signal, -32768, 32767).astype('<i2').tobytes()
+    chunks = [pcm[i:i + chunk * 2] for i in range(0, len(pcm), chunk * 2)]
+    return chunks, (lead + speech) / SAMPLE_RATE
+
+
+class ScriptedSource(sr.AudioSource):
+    def __init__(self, chunks):
+        self.CHUNK = MIC_CHUNK_SIZE
+        self.SAMPLE_RATE = SAMPLE_RATE
+        self.SAMPLE_WIDTH = 2
+        self.stream = self
+        self._chunks = iter(chunks)
+        self.read_s = 0.0
+
+    def read(self, size):
+        chunk = next(self._chunks, b'')
+        self.read_s += len(chunk) / 2 / SAMPLE_RATE
+        return chunk
+
+
+def phrase_tail(noise, speech_s):
+    """Segons d'àudio llegits després del final de la veu fins a tancar la frase."""
+    chunks, speech_end = scripted_chunks(noise, speech_s)
+    recognizer = sr.Recognizer()
+    recognizer.dynamic_energy_adjustment_damping = 0.16
+    recognizer.dynamic_energy_ratio = 1.6
+    source = ScriptedSource(chunks)
+    recognizer.adjust_for_ambient_noise(source, duration=0.4)
+    calibrated_at = source.read_s
+    sr.Recognizer.listen(recognizer, source)
+    listen_tail = source.read_s - speech_end
+
+    threshold = recognizer.energy_threshold
+    vad = VoiceActivityDetector(SAMPLE_RATE, lambda: threshold)
+    read_s = calibrated_at
+    for chunk in chunks[int(round(calibrated_at * SAMPLE_RATE / MIC_CHUNK_SIZE)):]:
+        read_s += len(chunk) / 2 / SAMPLE_RATE
+        vad.feed(chunk)
+        if vad.done:
+            break
+    return listen_tail, read_s - speech_end
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turns', type=int, default=5)
+    parser.add_argument('--open-ms', type=float, default=30.0,
+                        help="cost simulat d'obrir sr.Microphone (ms)")
+    parser.add_argument('--live', action='store_true', help='fer servir el micròfon real')
+    args = parser.parse_args()
+
+    if args.live:
+        def factory():
+            return sr.Microphone(chunk_size=MIC_CHUNK_SIZE)
+    else:
+        def factory():
+            return SimulatedMicrophone(open_s=args.open_ms / 1000)
+
+    header = f"{'camí':<14}{'1r torn ms':>12}{'p50 ms':>10}{'max ms':>10}{'llindar':>10}"
+    print(header)
+    print('-' * len(header))
+    results = {}
+    for name, run in (('per torn', per_turn), ('persistent', persistent)):
+        latencies, threshold = run(factory, args.turns)
+        rest = latencies[1:] or latencies
+        results[name] = statistics.median(rest)
+        print(f"{name:<14}{latencies[0] * 1000:>12.1f}{statistics.median(rest) * 1000:>10.1f}"
+              f"{max(rest) * 1000:>10.1f}{threshold:>10.0f}")
+    print(f"latència eliminada per torn: {(results['per torn'] - results['persistent']) * 1000:.0f} ms "
+          f"({args.turns} torns, {'micròfon real' if args.live else 'micròfon simulat'})")
+
+    print()
+    header = f"{'soroll RMS':<12}{'listen ms':>12}{'VAD ms':>10}"
+    print(header)
+    print('-' * len(header))
+    for noise in (30, 150, 400):
+        listen_tail, vad_tail = phrase_tail(noise, speech_s=1.5)
+        print(f"{noise:<12}{listen_tail * 1000:>12.0f}{vad_tail * 1000:>10.0f}")
+    print('(cua: àudio llegit des del final de la veu fins que es tanca la frase)')
+
+
+if __name__ == '__main__':
+    main()
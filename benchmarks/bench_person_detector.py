@@ -0,0 +1,164 @@
+"""
+Benchmark del detector de persones propi (person_detector.PersonDetector)
+contra la detecció al fotograma sencer a cada fotograma (el que fa Vilib
+amb face_detect_switch(True)).
+
+Els fotogrames són sintètics (soroll amb persones que caminen) o d'un vídeo
+(--video). Cada crida al detector passa la regió demanada per la cascada
+Haar real (el cost és el real) però en retorna les cares de la veritat del
+terreny, perquè la cascada no troba cares al soroll: així es mesura el cost
+de cada estratègia i si manté la persona, no la qualitat de la cascada.
+--miss fa perdre una fracció de les deteccions, com fa la cascada real.
+
+Per a cada estratègia:
+
+- ms de detector per fotograma i fracció del pressupost a --fps;
+- píxels processats per fotograma;
+- fotogrames amb la persona ben localitzada (centre a menys de mitja cara);
+- per a PersonDetector, deteccions completes, per regió, regions fallides i
+  full_every final.
+
+Ús:
+    python3 benchmarks/bench_person_detector.py [--frames 600] [--people 1] [--fps 30] [--miss 0.05]
+    python3 benchmarks/bench_person_detector.py --video passadis.mp4 --cascade haarcascade_frontalface_default.xml
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from person_detector import DETECTOR_MIN_FACE, HaarBackend, PersonDetector  # noqa: E402
+
+WIDTH, HEIGHT = 640, 480
+
+
+class OracleBackend():
+    """Passa la regió per la cascada (cost real) i retorna les cares de la veritat del terreny."""
+
+    def __init__(self, haar, miss, seed=0):
+        self.haar = haar
+        self.miss = miss
+        self.rng = random.Random(seed)
+        self.faces = []  # (x0, y0, w, h) del fotograma actual
+        self.pixels = 0
+
+    @property
+    def available(self):
+        return self.haar.available
+
+    def __call__(self, image, scale=1.0, min_size=DETECTOR_MIN_FACE, max_size=None):
+        self.haar(image, scale=scale, min_size=min_size, max_size=max_size)
+        height, width = image.shape[:2]
+        self.pixels += width * height * scale * scale
+        ox, oy = region_origin(image)
+        found = []
+        for x0, y0, w, h in self.faces:
+            inside = ox <= x0 and x0 + w <= ox + width and oy <= y0 and y0 + h <= oy + height
+            if inside and w >= min_size and (max_size is None or w <= max_size) and self.rng.random() >= self.miss:
+                found.append((x0 - ox, y0 - oy, w, h))
+        return found
+
+
+def region_origin(image):
+    """Posició (x, y) d'una vista de NumPy dins el fotograma del qual s'ha retallat."""
+    base = image.base if image.base is not None else image
+    offset = image.__array_interface__['data'][0] - base.__array_interface__['data'][0]
+    row, rest = divmod(offset, base.strides[0])
+    return rest // base.strides[1], row
+
+
+def synthetic_scene(people, frames, fps, seed=0):
+    """Llista de cares (x0, y0, w, h) per fotograma: persones que caminen d'un costat a l'altre."""
+    rng = random.Random(seed)
+    walkers = [(rng.uniform(100, 540), rng.uniform(150, 250), rng.uniform(0, 2 * math.pi), rng.uniform(60, 90))
+               for _ in range(people)]
+    scene = []
+    for i in range(frames):
+        t = i / fps
+        faces = []
+        for cx, cy, phase, size in walkers:
+            x = cx + 200 * math.sin(0.6 * t + phase)
+            x = min(max(x, size / 2), WIDTH - size / 2)
+            faces.append((x - size / 2, cy - size / 2, size, size))
+        scene.append(faces)
+    return scene
+
+
+def load_frames(args, numpy):
+    if not args.video:
+        rng = numpy.random.default_rng(0)
+        noise = [rng.integers(0, 256, (HEIGHT, WIDTH, 3), dtype=numpy.uint8) for _ in range(8)]
+        return [noise[i % len(noise)] for i in range(args.frames)]
+    import cv2
+    capture = cv2.VideoCapture(args.video)
+    frames = []
+    while len(frames) < args.frames:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        frames.append(cv2.resize(frame, (WIDTH, HEIGHT)))
+    capture.release()
+    if not frames:
+        raise SystemExit(f'no es pot llegir {args.video}')
+    return frames
+
+
+def located(params, faces):
+    """Cert si human_* és a menys de mitja cara d'alguna cara real."""
+    if not params.get('human_n'):
+        return False
+    return any(abs(params['human_x'] - (x0 + w / 2)) < w / 2 and abs(params['human_y'] - (y0 + h / 2)) < h / 2
+               for x0, y0, w, h in faces)
+
+
+def run(name, detect, backend, frames, scene, fps):
+    backend.pixels = 0
+    busy = 0.0
+    hits = 0
+    for i, (frame, faces) in enumerate(zip(frames, scene)):
+        backend.faces = faces
+        st = time.perf_counter()
+        params = detect(frame, i / fps)
+        busy += time.perf_counter() - st
+        hits += located(params, faces)
+    n = len(frames)
+    ms = 1000 * busy / n
+    print(f'{name:<18} {ms:7.2f} ms/fotograma ({100 * ms * fps / 1000:5.1f} % a {fps:g} fps), '
+          f'{backend.pixels / n / 1000:7.1f} kpx/fotograma, localitzada {100 * hits / n:5.1f} %')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--people', type=int, default=1)
+    parser.add_argument('--fps', type=float, default=30.0)
+    parser.add_argument('--miss', type=float, default=0.05, help='fracció de deteccions perdudes')
+    parser.add_argument('--video', help='vídeo per als fotogrames (per defecte soroll)')
+    parser.add_argument('--cascade', help='fitxer de la cascada Haar (per defecte el d\'OpenCV)')
+    args = parser.parse_args()
+
+    import numpy
+    haar = HaarBackend(args.cascade)
+    if not haar.available:
+        raise SystemExit('no es troba la cascada Haar: passa-la amb --cascade')
+    frames = load_frames(args, numpy)
+    scene = synthetic_scene(args.people, len(frames), args.fps)
+
+    backend = OracleBackend(haar, args.miss)
+    baseline = PersonDetector(backend, full_every=1, min_every=1, max_every=1, load_fn=None)
+    run('sencer cada cop', baseline.detect, backend, frames, scene, args.fps)
+
+    backend = OracleBackend(haar, args.miss)
+    detector = PersonDetector(backend)
+    run('PersonDetector', detector.detect, backend, frames, scene, args.fps)
+    stats = detector.stats
+    print(f"  completes: {stats['full']}, per regió: {stats['roi']}, regions fallides: {stats['roi_misses']}, "
+          f"sense processar: {stats['skipped']}, full_every final: {detector.full_every}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark del seguiment de diverses persones (person_tracker.PersonTracker)
+reproduint una seqüència de deteccions: sintètica (persones que caminen per
+davant la càmera, amb soroll, deteccions perdudes i mides semblants) o
+enregistrada amb --trace (JSONL, una línia per fotograma amb
+{"t": segons, "people": [[x, y, w, h], ...]}).
+
+Per a cada nombre de persones es mesura:
+
+- el cost de PersonTracker.update per fotograma i la fracció del pressupost
+  d'un fotograma a --fps (executat a la Raspberry Pi, és el cost real);
+- els salts de la càmera d'una persona a una altra amb la detecció de Vilib
+  tal qual (només la cara més gran), amb el tracker alimentat per aquesta
+  mateixa detecció i amb el tracker alimentat per totes les persones.
+
+Ús:
+    python3 benchmarks/bench_person_tracker.py [--people 1,2,4,8] [--frames 3000] [--fps 30]
+    python3 benchmarks/bench_person_tracker.py --trace deteccions.jsonl
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from person_tracker import PersonTracker  # noqa: E402
+
+JUMP_PX = 100  # canvi de posició seguida entre fotogrames que es compta com a salt
+
+
+def synthetic(people, frames, fps, seed=0):
+    """Llista de (t, capses): persones que caminen amunt i avall amb mides semblants."""
+    rng = random.Random(seed)
+    walkers = [(rng.uniform(80, 560), rng.uniform(20, 80), rng.uniform(0, 2 * math.pi), rng.uniform(55, 70))
+               for _ in range(people)]
+    out = []
+    for i in range(frames):
+        t = i / fps
+        boxes = []
+        for x0, speed, phase, size in walkers:
+            if rng.random() < 0.1:
+                continue  # detecció perduda
+            x = 320 + (x0 - 320) * math.cos(phase + t * speed / 200)
+            s = size + rng.gauss(0, 3)
+            boxes.append((x + rng.gauss(0, 4), 240 + rng.gauss(0, 4), s, s))
+        out.append((t, boxes))
+    return out
+
+
+def load_trace(path):
+    with open(path) as f:
+        return [(entry['t'], [tuple(box) for box in entry['people']]) for entry in map(json.loads, f) if entry]
+
+
+def largest(boxes):
+    """El que dona Vilib: només la cara més gran."""
+    return [max(boxes, key=lambda box: box[2] * box[3])] if boxes else []
+
+
+def jumps(positions):
+    """Salts entre posicions seguides consecutives (sense comptar els fotogrames sense ningú)."""
+    seen = [x for x in positions if x is not None]
+    return sum(1 for a, b in zip(seen, seen[1:]) if abs(a - b) > JUMP_PX)
+
+
+def followed(target):
+    return target.x if target is not None and target.visible else None
+
+
+def run(frames, fps):
+    tracker, single = PersonTracker(), PersonTracker()
+    cost, raw, tracked, tracked_single = 0.0, [], [], []
+    for t, boxes in frames:
+        vilib = largest(boxes)
+        raw.append(vilib[0][0] if vilib else None)
+        tracked_single.append(followed(single.update(vilib, t)))
+        st = time.perf_counter()
+        target = tracker.update(boxes, t)
+        cost += time.perf_counter() - st
+        tracked.append(followed(target))
+    per_frame = cost / len(frames)
+    return per_frame, 100 * per_frame * fps, jumps(raw), jumps(tracked_single), jumps(tracked)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--people', default='1,2,4,8')
+    parser.add_argument('--frames', type=int, default=3000)
+    parser.add_argument('--fps', type=float, default=30.0)
+    parser.add_argument('--trace', help='deteccions enregistrades (JSONL)')
+    args = parser.parse_args()
+
+    scenes = ([('traça', load_trace(args.trace))] if args.trace else
+              [(f'{n} persones', synthetic(n, args.frames, args.fps)) for n in map(int, args.people.split(','))])
+    header = (f"{'escena':<12}{'us/fotograma':>14}{'% fotograma':>13}"
+              f"{'salts Vilib':>13}{'tracker+Vilib':>15}{'tracker+totes':>15}")
+    print(f'pressupost: {1000 / args.fps:.1f} ms per fotograma ({args.fps:.0f} fps)')
+    print(header)
+    print('-' * len(header))
+    for name, frames in scenes:
+        per_frame, budget, raw_jumps, single_jumps, tracked_jumps = run(frames, args.fps)
+        print(f'{name:<12}{per_frame * 1e6:>14.1f}{budget:>13.3f}{raw_jumps:>13}{single_jumps:>15}{tracked_jumps:>15}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+Benchmark del conflicte entre el seguiment visual i una acció predefinida
+que mouen la mateixa càmera: sense arbitratge (Picarx tal qual, els dos fils
+escriuen) contra ServoOutput amb reserves (l'acció té PRIORITY_ACTION i el
+seguiment cedeix).
+
+El bucle de seguiment real (create_visual_tracking_handler) segueix una
+persona quieta a --person graus amb un Vilib simulat: la detecció depèn de
+l'angle de pan realment escrit. Al cap d'un segon s'executa --action (com
+ho fa gpt_car) i es mesura:
+
+- durant l'acció: escriptures al pan, quantes són del seguiment i canvis
+  de sentit del pan que no són de la coreografia (el servo anant i tornant
+  entre l'acció i el seguiment);
+- després: temps fins que la càmera torna a estar centrada en la persona.
+
+Ús:
+    python3 benchmarks/bench_servo_arbiter.py [--action "shake head"] [--person 15] [--fps 20]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preset_actions import actions_dict  # noqa: E402
+from servo_output import PRIORITY_ACTION, ServoOutput, servo_claim, servo_tick  # noqa: E402
+from visual_tracking import (  # noqa: E402
+    CAMERA_CENTER_X, CAMERA_CENTER_Y, CAMERA_FOV_H, CAMERA_WIDTH, create_visual_tracking_handler,
+)
+
+CENTERED_DEG = 3.0  # error de pan que es considera centrat
+
+
+class RecordingPicarx():
+    """Picarx sense maquinari que apunta les escriptures al pan: (instant, angle, fil)."""
+
+    def __init__(self):
+        self.pan = 0.0
+        self.pan_writes = []
+
+    def set_cam_pan_angle(self, angle):
+        self.pan = angle
+        self.pan_writes.append((time.monotonic(), angle, threading.current_thread().name))
+
+    def set_cam_tilt_angle(self, angle):
+        pass
+
+    def set_dir_servo_angle(self, angle):
+        pass
+
+    def set_motor_speed(self, motor, speed):
+        pass
+
+    def forward(self, speed):
+        pass
+
+    def backward(self, speed):
+        pass
+
+    def stop(self):
+        pass
+
+    def reset(self):
+        self.set_cam_pan_angle(0)
+
+
+class CameraVilib():
+    """Fotogrames a fps amb la persona on la veu la càmera segons el pan escrit."""
+
+    def __init__(self, car, person_deg):
+        self.car = car
+        self.person_deg = person_deg
+        self.img = None
+        self.detect_obj_parameter = {'human_n': 0}
+
+    def run(self, fps, stop):
+        while not stop.is_set():
+            offset = self.person_deg - self.car.pan
+            x = CAMERA_CENTER_X + offset * CAMERA_WIDTH / CAMERA_FOV_H
+            if 0 <= x <= CAMERA_WIDTH:
+                self.detect_obj_parameter = {'human_n': 1, 'human_x': int(x), 'human_y': CAMERA_CENTER_Y,
+                                             'human_w': 80, 'human_h': 80}
+            else:
+                self.detect_obj_parameter = {'human_n': 0}
+            self.img = object()
+            time.sleep(1 / fps)
+
+
+def reversals(angles):
+    """Canvis de sentit en una seqüència d'angles."""
+    count, last_sign = 0, 0
+    for a, b in zip(angles, angles[1:]):
+        sign = (b > a) - (b < a)
+        if sign and last_sign and sign != last_sign:
+            count += 1
+        if sign:
+            last_sign = sign
+    return count
+
+
+def run(action, person, fps, arbitrated):
+    raw = RecordingPicarx()
+    car = ServoOutput(raw) if arbitrated else raw
+    vilib = CameraVilib(raw, person)
+    handler, state, lock, _ = create_visual_tracking_handler(car, vilib, True, 20, multi_person=False,
+                                                             own_detector=False)
+    stop = threading.Event()
+    threads = [threading.Thread(target=vilib.run, args=(fps, stop), name='camera'),
+               threading.Thread(target=handler, name='seguiment')]
+    for thread in threads:
+        thread.start()
+    time.sleep(1.0)
+
+    # L'acció, com execute_actions_list de gpt_car
+    action_start = time.monotonic()
+    with servo_claim(car, 'accions', PRIORITY_ACTION):
+        with servo_tick(car):
+            actions_dict[action](car)
+    action_end = time.monotonic()
+
+    recentered = None
+    while time.monotonic() - action_end < 5.0:
+        if abs(raw.pan - person) < CENTERED_DEG:
+            recentered = time.monotonic() - action_end
+            break
+        time.sleep(0.01)
+    with lock:
+        state['stop_requested'] = True
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=2.0)
+
+    during = [(angle, name) for t, angle, name in raw.pan_writes if action_start <= t <= action_end]
+    from_tracking = sum(1 for _, name in during if name == 'seguiment')
+    action_only = [angle for angle, name in during if name != 'seguiment']
+    extra = reversals([angle for angle, _ in during]) - reversals(action_only)
+    return len(during), from_tracking, extra, recentered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--action', default='shake head', choices=sorted(actions_dict))
+    parser.add_argument('--person', type=float, default=15.0, help='angle de la persona (graus)')
+    parser.add_argument('--fps', type=float, default=20.0)
+    args = parser.parse_args()
+
+    for name, arbitrated in (('sense arbitratge', False), ('ServoOutput', True)):
+        writes, from_tracking, extra, recentered = run(args.action, args.person, args.fps, arbitrated)
+        after = f'{recentered:.2f} s' if recentered is not None else 'no'
+        print(f'{name:<17} durant l\'acció: {writes} escriptures al pan ({from_tracking} del seguiment, '
+              f'{extra} canvis de sentit de més); centrada després de l\'acció: {after}')
+
+
+if __name__ == '__main__':
+    main()
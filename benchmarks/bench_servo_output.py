@@ -0,0 +1,117 @@
+"""
+Benchmark del trànsit al bus I2C dels servos i motors: Picarx tal qual
+contra ServoOutput (servo_output.py), amb un Picarx simulat que compta les
+escriptures I2C de cada ordre (I2C_WRITES).
+
+- Seguiment: el bucle de seguiment (PID de bench_tracking_control, una
+  iteració cada TRACKING_LOOP_DELAY) escriu pan i tilt amb
+  aplicar_angles_camera a cada iteració, amb la persona quieta i caminant.
+- Accions: cada acció de preset_actions executada com ho fa gpt_car (amb
+  servo_tick per a ServoOutput), sense esperar les pauses.
+
+Ús:
+    python3 benchmarks/bench_servo_output.py [--seconds 30] [--speed 15] [--latency 0.1]
+"""
+import argparse
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import preset_actions  # noqa: E402
+from bench_tracking_control import simulate  # noqa: E402
+from servo_output import I2C_WRITES, ServoOutput, servo_tick  # noqa: E402
+from visual_tracking import PidCameraController, aplicar_angles_camera  # noqa: E402
+
+
+class CountingPicarx():
+    """Picarx sense maquinari que compta les escriptures I2C."""
+
+    def __init__(self):
+        self.i2c = 0
+
+    def set_cam_pan_angle(self, angle):
+        self.i2c += I2C_WRITES['servo']
+
+    set_cam_tilt_angle = set_dir_servo_angle = set_cam_pan_angle
+
+    def set_motor_speed(self, motor, speed):
+        self.i2c += I2C_WRITES['motor']
+
+    def forward(self, speed):
+        self.i2c += I2C_WRITES['forward']
+
+    def backward(self, speed):
+        self.i2c += I2C_WRITES['backward']
+
+    def stop(self):
+        self.i2c += I2C_WRITES['stop']
+
+    def reset(self):
+        self.set_cam_tilt_angle(0)
+        self.set_cam_pan_angle(0)
+        self.set_dir_servo_angle(0)
+        self.stop()
+
+
+class NoWait():
+    """Esdeveniment d'interrupció que no espera: les accions s'executen sense pauses."""
+
+    def wait(self, seconds):
+        return False
+
+
+def tracking(target, seconds, latency, wrap):
+    raw = CountingPicarx()
+    car = ServoOutput(raw) if wrap else raw
+    trace = simulate(PidCameraController(), target, seconds, latency, noise_px=3.0)
+    for _, _, pan in trace:
+        aplicar_angles_camera(car, pan, 20)
+    return raw.i2c, len(trace)
+
+
+def action(function, wrap):
+    raw = CountingPicarx()
+    car = ServoOutput(raw) if wrap else raw
+    with servo_tick(car):
+        function(car)
+    return raw.i2c
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=30.0)
+    parser.add_argument('--speed', type=float, default=15.0, help='velocitat de la persona que camina (graus/s)')
+    parser.add_argument('--latency', type=float, default=0.1)
+    args = parser.parse_args()
+
+    print('seguiment (escriptures I2C):')
+    scenarios = [('persona quieta', lambda t: 10.0), ('persona caminant', lambda t: min(args.speed * t, 60.0))]
+    for name, target in scenarios:
+        before, iterations = tracking(target, args.seconds, args.latency, wrap=False)
+        after, _ = tracking(target, args.seconds, args.latency, wrap=True)
+        print(f'  {name:<18} {iterations} iteracions: Picarx {before}, ServoOutput {after} '
+              f'({100 * (1 - after / before):.1f} % menys)')
+
+    print('accions (escriptures I2C):')
+    preset_actions.set_interrupt_event(NoWait())
+    try:
+        functions = {}
+        for name, function in preset_actions.actions_dict.items():
+            if function not in (preset_actions.seguir_persona, preset_actions.aturar_seguiment):
+                functions.setdefault(function, name)
+        total_before = total_after = 0
+        for function, name in functions.items():
+            before, after = action(function, wrap=False), action(function, wrap=True)
+            total_before += before
+            total_after += after
+            print(f'  {name:<18} Picarx {before:4d}, ServoOutput {after:4d}')
+        print(f'  {"total":<18} Picarx {total_before:4d}, ServoOutput {total_after:4d} '
+              f'({100 * (1 - total_after / total_before):.0f} % menys)')
+    finally:
+        preset_actions.set_interrupt_event(threading.Event())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark de la suavització de deteccions del seguiment visual: l'històric amb
+llistes i pop(0) + calcular_mitjana_ponderada per a x i per a y (com abans)
+contra DetectionSmoother (buffer circular amb sumes acumulades).
+
+Es comprova que les dues donen la mateixa posició i es mesura el temps per
+detecció per a diverses mides de finestra (pesos lineals com SMOOTHING_WEIGHTS
+i, amb --nonlinear, pesos geomètrics que fan servir el camí general).
+
+Ús:
+    python3 benchmarks/bench_smoothing.py [--detections 100000] [--sizes 5,10,30]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from visual_tracking import DetectionSmoother, calcular_mitjana_ponderada  # noqa: E402
+
+
+def legacy_factory(size, weights):
+    history = {'x': [], 'y': []}
+
+    def add(x, y):
+        history['x'].append(x)
+        history['y'].append(y)
+        if len(history['x']) > size:
+            history['x'].pop(0)
+            history['y'].pop(0)
+        return (calcular_mitjana_ponderada(history['x'], weights),
+                calcular_mitjana_ponderada(history['y'], weights))
+    return add
+
+
+def smoother_factory(size, weights):
+    return DetectionSmoother(size, weights).add
+
+
+def weights_for(size, nonlinear):
+    if nonlinear:
+        return [0.7 ** (size - 1 - k) for k in range(size)]
+    return [0.1 + 0.05 * k for k in range(size)]
+
+
+def timed(add, points):
+    st = time.perf_counter()
+    for x, y in points:
+        add(x, y)
+    return time.perf_counter() - st
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--detections', type=int, default=100000)
+    parser.add_argument('--sizes', default='5,10,30')
+    parser.add_argument('--nonlinear', action='store_true', help='pesos geomètrics en lloc de lineals')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    points = [(rng.uniform(0, 640), rng.uniform(0, 480)) for _ in range(args.detections)]
+    header = f"{'finestra':<10}{'llistes us':>12}{'buffer us':>12}{'x':>7}{'error max':>12}"
+    print(header)
+    print('-' * len(header))
+    for size in (int(s) for s in args.sizes.split(',')):
+        weights = weights_for(size, args.nonlinear)
+        legacy, smoother = legacy_factory(size, weights), smoother_factory(size, weights)
+        error = max(abs(a - b) for p in points[:5000] for a, b in zip(legacy(*p), smoother(*p)))
+        t_legacy = timed(legacy_factory(size, weights), points)
+        t_smoother = timed(smoother_factory(size, weights), points)
+        print(f'{size:<10}{1e6 * t_legacy / len(points):>12.2f}{1e6 * t_smoother / len(points):>12.2f}'
+              f'{t_legacy / t_smoother:>7.1f}{error:>12.1e}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+Benchmark dels motors d'STT (stt_backends.py) sobre frases catalanes gravades:
+whisper-1 al núvol (CloudStt), el model local (VoskStt), la combinació amb
+pas automàtic (FailoverStt) i el model local en streaming (StreamingTranscriber,
+l'àudio s'alimenta al ritme real en fragments del micròfon; la latència és
+l'espera des del final de l'àudio fins a la transcripció final).
+
+Per a cada motor mesura la latència (p50, p90, màxim) i la taxa d'error per
+paraula (WER) respecte de la transcripció de referència, normalitzant
+majúscules i puntuació.
+
+El directori de gravacions conté fitxers .wav i, per a cada un, un .txt amb
+el mateix nom i la transcripció correcta (una línia). Les frases es poden
+gravar amb el mateix robot (arecord -f S16_LE -r 16000 frase.wav).
+
+Ús:
+    python3 benchmarks/bench_stt.py DIR [--backends cloud,local,failover,streaming] [--model RUTA]
+"""
+import argparse
+import glob
+import os
+import re
+import statistics
+import sys
+import time
+
+import speech_recognition as sr
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mic_stream import MIC_CHUNK_SIZE  # noqa: E402
+from stt_backends import CloudStt, FailoverStt, StreamingTranscriber, VoskStt  # noqa: E402
+
+DEFAULT_MODEL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'models', 'vosk-model-small-ca-0.4')
+
+
+def normalize(text):
+    """Minúscules i sense puntuació; es conserven els accents i l'apòstrof intern (l'home, d'acord)."""
+    text = text.lower().replace('’', "'")
+    text = re.sub(r"[^\w\s'·-]", ' ', text)
+    return [w.strip("'-") for w in text.split() if w.strip("'-")]
+
+
+def word_errors(reference, hypothesis):
+    """Distància d'edició en paraules (substitucions + insercions + supressions)."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1]
+
+
+def load_utterances(directory):
+    utterances = []
+    for wav_path in sorted(glob.glob(os.path.join(directory, '*.wav'))):
+        txt_path = os.path.splitext(wav_path)[0] + '.txt'
+        if not os.path.exists(txt_path):
+            print(f'sense transcripció, s\'omet: {wav_path}')
+            continue
+        with sr.AudioFile(wav_path) as source:
+            audio = sr.Recognizer().record(source)
+        with open(txt_path, encoding='utf-8') as f:
+            utterances.append((os.path.basename(wav_path), audio, f.read().strip()))
+    return utterances
+
+
+class StreamingEngine():
+    """Alimenta la frase al ritme del micròfon i mesura només l'espera final."""
+
+    def __init__(self, local):
+        self.local = local
+
+    def stt(self, audio, language='ca'):
+        if not self.local.available:
+            return False
+        transcriber = StreamingTranscriber(self.local.open_stream(audio.sample_rate))
+        chunk_bytes = MIC_CHUNK_SIZE * audio.sample_width
+        period = MIC_CHUNK_SIZE / audio.sample_rate
+        for i in range(0, len(audio.frame_data), chunk_bytes):
+            transcriber.feed(audio.frame_data[i:i + chunk_bytes])
+            time.sleep(period)
+        text = transcriber.finish()
+        self.final_wait_s = transcriber.stats['final_wait_s']
+        return False if text is None else text
+
+
+def build_backends(names, model_path):
+    backends = {}
+    local = None
+    if {'local', 'failover', 'streaming'} & set(names):
+        local = VoskStt(model_path)
+        local.warm_up()
+    cloud = None
+    if {'cloud', 'failover'} & set(names):
+        from keys import OPENAI_API_KEY
+        from openai_helper import OpenAiHelper
+        cloud = CloudStt(OpenAiHelper(api_key=OPENAI_API_KEY))
+    for name in names:
+        if name == 'cloud':
+            backends[name] = FailoverStt(cloud)
+        elif name == 'local':
+            backends[name] = FailoverStt(local)
+        elif name == 'failover':
+            backends[name] = FailoverStt(cloud, local)
+        elif name == 'streaming':
+            backends[name] = StreamingEngine(local)
+        else:
+            raise SystemExit(f'motor desconegut: {name}')
+    return backends
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directory', help='directori amb parells .wav / .txt')
+    parser.add_argument('--backends', default='cloud,local,failover')
+    parser.add_argument('--model', default=DEFAULT_MODEL, help='directori del model Vosk')
+    parser.add_argument('--language', default='ca')
+    parser.add_argument('-v', '--verbose', action='store_true', help='mostrar cada transcripció')
+    args = parser.parse_args()
+
+    utterances = load_utterances(args.directory)
+    if not utterances:
+        raise SystemExit(f'cap parell .wav/.txt a {args.directory}')
+    backends = build_backends(args.backends.split(','), args.model)
+
+    header = f"{'motor':<10}{'frases':>8}{'errors':>8}{'p50 ms':>9}{'p90 ms':>9}{'max ms':>9}{'WER %':>8}"
+    rows = []
+    for name, engine in backends.items():
+        latencies, errors, words, failed = [], 0, 0, 0
+        for filename, audio, reference in utterances:
+            st = time.time()
+            text = engine.stt(audio, language=args.language)
+            if isinstance(engine, StreamingEngine) and text is not False:
+                latencies.append(engine.final_wait_s)
+            else:
+                latencies.append(time.time() - st)
+            ref_words = normalize(reference)
+            hyp_words = normalize(text) if text else []
+            failed += text is False
+            errors += word_errors(ref_words, hyp_words)
+            words += len(ref_words)
+            if args.verbose:
+                print(f'{name:<10}{filename}: {text!r} (ref: {reference!r})')
+        latencies.sort()
+        p90 = latencies[min(len(latencies) - 1, int(round(0.9 * (len(latencies) - 1))))]
+        rows.append(f"{name:<10}{len(latencies):>8}{failed:>8}{statistics.median(latencies) * 1000:>9.0f}"
+                    f"{p90 * 1000:>9.0f}{latencies[-1] * 1000:>9.0f}{100 * errors / max(words, 1):>8.1f}")
+    print(header)
+    print('-' * len(header))
+    print('\n'.join(rows))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark de l'àudio pujat a l'STT: WAV a la freqüència nativa del micròfon
+(el camí anterior de OpenAiHelper.stt) contra encode_stt_audio (WAV 16 kHz,
+FLAC o Opus segons la mida).
+
+Mesura local, per a frases sintètiques de diverses durades:
+- format triat, bytes pujats i temps de codificació;
+- temps de pujada estimat amb un enllaç de --kbps kbit/s (Wi-Fi feble).
+
+Amb --live també mesura la latència real de l'STT contra l'API (cal keys.py).
+
+Ús:
+    python3 benchmarks/bench_stt_audio.py [--kbps K] [--live]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import speech_recognition as sr
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stt_audio import encode_stt_audio  # noqa: E402
+
+NATIVE_RATE = 44100
+DURATIONS = (1.5, 4.0, 12.0)  # segons
+
+
+def synth_phrase(seconds, seed=0):
+    """Veu sintètica: harmònics modulats en síl·labes amb una mica de soroll."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * NATIVE_RATE)) / NATIVE_RATE
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / NATIVE_RATE
+    voice = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None)
+    signal = 6000 * voice * envelope + rng.normal(0, 60, t.size)
+    pcm = np.clip(signal, -32768, 32767).astype('<i2').tobytes()
+    return sr.AudioData(pcm, NATIVE_RATE, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--kbps', type=float, default=500.0, help="amplada de banda de pujada (kbit/s)")
+    parser.add_argument('--live', action='store_true', help="mesurar l'STT real contra l'API")
+    args = parser.parse_args()
+
+    helper = None
+    if args.live:
+        from keys import OPENAI_API_KEY
+        from openai_helper import OpenAiHelper
+        helper = OpenAiHelper(api_key=OPENAI_API_KEY)
+
+    header = (f"{'durada s':<10}{'camí':<12}{'format':<8}{'KB':>9}{'codif. ms':>11}"
+              f"{'pujada ms':>11}{'stt ms':>9}")
+    print(header)
+    print('-' * len(header))
+    for seconds in DURATIONS:
+        audio = synth_phrase(seconds)
+        _, _, stats = encode_stt_audio(audio)
+        rows = [
+            ('abans', 'wav', len(audio.get_wav_data()), 0.0),
+            ('ara', stats['format'], stats['upload_bytes'], stats['encode_s']),
+        ]
+        for name, fmt, size, encode_s in rows:
+            upload_ms = size * 8 / (args.kbps * 1000) * 1000
+            stt_ms = ''
+            if helper is not None:
+                helper.STT_COMPRESSION = name == 'ara'
+                st = time.time()
+                helper.stt(audio, language='ca')
+                stt_ms = f'{(time.time() - st) * 1000:.0f}'
+            print(f"{seconds:<10}{name:<12}{fmt:<8}{size / 1024:>9.1f}{encode_s * 1000:>11.1f}"
+                  f"{upload_ms:>11.0f}{stt_ms:>9}")
+    print(f'(pujada estimada a {args.kbps:.0f} kbit/s; flac/opusenc/ffmpeg han de ser al PATH)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark de resposta del control dels servos de la càmera amb una càmera
+simulada: el pas fix original (MAX_ANGLE_CHANGE_PER_ITERATION per iteració)
+contra el PID (PidCameraController).
+
+La persona és a un angle; la càmera apunta on l'ha deixat el control i la
+detecció arriba amb --latency segons de retard i soroll. Escenaris:
+
+- esglaó: la persona apareix --step graus al costat (temps d'assentament
+  dins CENTER_ZONE_TOLERANCE, sobrepassament i oscil·lació un cop centrada);
+- rampa: la persona camina a --speed graus/s (error mitjà un cop estable).
+
+Ús:
+    python3 benchmarks/bench_tracking_control.py [--step 25] [--speed 15] [--latency 0.1]
+                                                 [--kp 5 --ki 3 --kd 0.2]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from visual_tracking import (  # noqa: E402
+    CAMERA_CENTER_X, CAMERA_CENTER_Y, CAMERA_FOV_H, CAMERA_WIDTH, CENTER_ZONE_TOLERANCE,
+    PID_KD, PID_KI, PID_KP, TRACKING_LOOP_DELAY, PidCameraController, StepCameraController,
+)
+
+TOLERANCE_DEG = CENTER_ZONE_TOLERANCE * CAMERA_FOV_H / CAMERA_WIDTH
+
+
+def simulate(controller, target, seconds, latency, noise_px, seed=0):
+    """Retorna la llista de (t, angle persona, angle càmera) a cada iteració."""
+    rng = random.Random(seed)
+    delay = max(0, round(latency / TRACKING_LOOP_DELAY))
+    history = []  # angles de la càmera passats, per a la detecció amb retard
+    pan, trace = 0.0, []
+    for i in range(int(seconds / TRACKING_LOOP_DELAY)):
+        t = i * TRACKING_LOOP_DELAY
+        history.append(pan)
+        seen_at = max(0, i - delay)
+        offset = target(seen_at * TRACKING_LOOP_DELAY) - history[seen_at]
+        x = CAMERA_CENTER_X + offset * CAMERA_WIDTH / CAMERA_FOV_H + rng.gauss(0, noise_px)
+        x = min(max(x, 0), CAMERA_WIDTH)
+        pan, _ = controller.actualitzar(x, CAMERA_CENTER_Y, pan, 0, t)
+        trace.append((t, target(t), pan))
+    return trace
+
+
+def step_metrics(trace, step):
+    settle = None
+    for t, target, pan in trace:
+        if abs(target - pan) > TOLERANCE_DEG:
+            settle = None
+        elif settle is None:
+            settle = t
+    overshoot = max(0.0, max(pan for _, _, pan in trace) - step)
+    tail = [pan for t, _, pan in trace if settle is not None and t >= settle]
+    jitter = statistics.pstdev(tail) if len(tail) > 1 else 0.0
+    return settle, overshoot, jitter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--step', type=float, default=25.0, help="graus de l'esglaó")
+    parser.add_argument('--speed', type=float, default=15.0, help='graus/s de la rampa')
+    parser.add_argument('--latency', type=float, default=0.1, help='retard de la detecció (s)')
+    parser.add_argument('--noise', type=float, default=4.0, help='soroll de la detecció (px)')
+    parser.add_argument('--kp', type=float, default=PID_KP)
+    parser.add_argument('--ki', type=float, default=PID_KI)
+    parser.add_argument('--kd', type=float, default=PID_KD)
+    args = parser.parse_args()
+
+    controllers = {
+        'pas fix': StepCameraController,
+        'PID': lambda: PidCameraController(kp=args.kp, ki=args.ki, kd=args.kd),
+    }
+    print(f'tolerància: {TOLERANCE_DEG:.1f} graus; latència: {args.latency * 1000:.0f} ms; '
+          f'iteració: {TRACKING_LOOP_DELAY * 1000:.0f} ms')
+    header = f"{'control':<10}{'assentament s':>15}{'sobrepassa °':>14}{'oscil·la °':>12}{'rampa err °':>13}"
+    print(header)
+    print('-' * len(header))
+    for name, factory in controllers.items():
+        trace = simulate(factory(), lambda t: args.step, 4.0, args.latency, args.noise)
+        settle, overshoot, jitter = step_metrics(trace, args.step)
+        ramp = simulate(factory(), lambda t: min(args.speed * t, 30.0), 2.0, args.latency, args.noise)
+        ramp_error = statistics.mean(abs(target - pan) for t, target, pan in ramp if t >= 1.0)
+        settle = f'{settle:.2f}' if settle is not None else '-'
+        print(f'{name:<10}{settle:>15}{overshoot:>14.1f}{jitter:>12.2f}{ramp_error:>13.1f}')
+
+
+if __name__ == '__main__':
+    main()
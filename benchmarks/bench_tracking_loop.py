@@ -0,0 +1,107 @@
+"""
+Benchmark del bucle de seguiment amb un Vilib simulat que produeix
+fotogrames (i la seva detecció) a --fps: el bucle original, que dorm
+TRACKING_LOOP_DELAY i processa el que hi hagi, contra el bucle sincronitzat
+amb DetectionFeed, que es desperta amb cada fotograma nou.
+
+Per a cada bucle es compta quantes iteracions han tornat a processar una
+detecció ja vista (duplicats que inflen l'històric), quants fotogrames no
+s'han processat mai, la latència des que la detecció és a punt fins que
+s'enviaria als servos i el temps de CPU del fil.
+
+Ús:
+    python3 benchmarks/bench_tracking_loop.py [--fps 15] [--seconds 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from visual_tracking import TRACKING_LOOP_DELAY, DetectionFeed  # noqa: E402
+
+
+class FakeVilib():
+    """Escriu la detecció i després substitueix img, com Vilib."""
+
+    def __init__(self):
+        self.img = None
+        self.detect_obj_parameter = {'human_n': 0}
+        self.ready_at = {}  # número de fotograma -> instant en què és a punt
+
+    def run(self, fps, seconds, stop):
+        frame = 0
+        next_t = time.monotonic()
+        end = next_t + seconds
+        while time.monotonic() < end:
+            frame += 1
+            self.detect_obj_parameter = {'human_n': 1, 'human_x': 320, 'human_y': 240, 'frame': frame}
+            self.ready_at[frame] = time.monotonic()
+            self.img = object()
+            next_t += 1 / fps
+            time.sleep(max(0.0, next_t - time.monotonic()))
+        stop.set()
+
+
+def sleep_loop(vilib, stop, seen):
+    while not stop.is_set():
+        seen.append((vilib.detect_obj_parameter.get('frame'), time.monotonic()))
+        time.sleep(TRACKING_LOOP_DELAY)
+
+
+def feed_loop(vilib, stop, seen):
+    feed = DetectionFeed(vilib)
+    last_seq = 0
+    while not stop.is_set():
+        if feed.wait(last_seq):
+            last_seq = feed.seq
+            seen.append((feed.detect_obj_parameter.get('frame'), time.monotonic()))
+
+
+def measure(loop, fps, seconds):
+    vilib, stop, seen = FakeVilib(), threading.Event(), []
+    cpu = {}
+
+    def target():
+        st = time.thread_time()
+        loop(vilib, stop, seen)
+        cpu['s'] = time.thread_time() - st
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    vilib.run(fps, seconds, stop)
+    thread.join()
+    frames = [frame for frame, _ in seen if frame is not None]
+    latencies = [t - vilib.ready_at[frame] for frame, t in seen if frame is not None]
+    duplicates = len(frames) - len(set(frames))
+    missed = len(vilib.ready_at) - len(set(frames))
+    return {
+        'iterations': len(seen), 'duplicates': duplicates, 'missed': missed,
+        'latency_ms': 1000 * statistics.mean(latencies) if latencies else float('nan'),
+        'latency_p95_ms': 1000 * sorted(latencies)[int(0.95 * (len(latencies) - 1))] if latencies else float('nan'),
+        'cpu_ms_s': 1000 * cpu['s'] / seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fps', type=float, default=15.0)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    header = (f"{'bucle':<14}{'iteracions':>11}{'duplicats':>11}{'perduts':>9}"
+              f"{'latència ms':>13}{'p95 ms':>9}{'CPU ms/s':>10}")
+    print(f'{args.fps:.0f} fotogrames/s durant {args.seconds:.0f} s')
+    print(header)
+    print('-' * len(header))
+    for name, loop in (('sleep 50 ms', sleep_loop), ('DetectionFeed', feed_loop)):
+        r = measure(loop, args.fps, args.seconds)
+        print(f"{name:<14}{r['iterations']:>11}{r['duplicates']:>11}{r['missed']:>9}"
+              f"{r['latency_ms']:>13.1f}{r['latency_p95_ms']:>9.1f}{r['cpu_ms_s']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
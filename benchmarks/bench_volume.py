@@ -0,0 +1,135 @@
+"""
+Benchmark del guany de volum dels WAV de TTS: sox_volume (sox en subprocés)
+contra wav_volume (NumPy en memòria, memory-map) i pcm_volume (buffer en memòria).
+
+Genera WAV representatius (veu sintètica a 24 kHz, com els de l'endpoint de TTS)
+i mesura el temps de cada camí i la diferència màxima entre les sortides.
+
+Ús:
+    python3 benchmarks/bench_volume.py [--repeat N] [--volume V] [--wav fitxer.wav ...]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import pcm_volume, sox_volume, wav_volume  # noqa: E402
+
+
+SAMPLE_RATE = 24000
+DURATIONS = [2, 8, 20]  # segons: resposta curta, mitjana i llarga
+
+
+def synth_speech(duration, rate=SAMPLE_RATE, seed=0):
+    """Senyal semblant a veu: harmònics amb envolupant silàbica i soroll."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * rate)) / rate
+    f0 = 120 + 20 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None)
+    signal = voice * envelope + 0.02 * rng.standard_normal(t.size)
+    signal = signal / np.max(np.abs(signal)) * 9000
+    return signal.astype('<i2')
+
+
+def write_wav(path, samples, rate=SAMPLE_RATE):
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(samples.tobytes())
+
+
+def read_samples(path):
+    with wave.open(path, 'rb') as w:
+        return np.frombuffer(w.readframes(w.getnframes()), dtype='<i2')
+
+
+def timeit(func, repeat):
+    times = []
+    for _ in range(repeat):
+        st = time.perf_counter()
+        ok = func()
+        times.append(time.perf_counter() - st)
+        if ok is False:
+            return None
+    return statistics.median(times)
+
+
+def sox_available():
+    try:
+        import sox  # noqa: F401
+    except ImportError:
+        return False
+    return shutil.which('sox') is not None
+
+
+def bench_file(path, volume, repeat, tmp_dir):
+    out_sox = os.path.join(tmp_dir, 'out_sox.wav')
+    out_np = os.path.join(tmp_dir, 'out_np.wav')
+    in_place = os.path.join(tmp_dir, 'in_place.wav')
+    with wave.open(path, 'rb') as w:
+        pcm = w.readframes(w.getnframes())
+        duration = w.getnframes() / w.getframerate()
+
+    def run_in_place():
+        shutil.copyfile(path, in_place)
+        return wav_volume(in_place, in_place, volume)
+
+    results = {
+        'duration': duration,
+        'sox': timeit(lambda: sox_volume(path, out_sox, volume), repeat) if sox_available() else None,
+        'wav_volume': timeit(lambda: wav_volume(path, out_np, volume), repeat),
+        'wav_volume in situ': timeit(run_in_place, repeat),
+        'pcm_volume': timeit(lambda: pcm_volume(pcm, volume), repeat),
+        'max_diff': None,
+    }
+    if results['sox'] is not None:
+        a = read_samples(out_sox).astype(np.int32)
+        b = read_samples(out_np).astype(np.int32)
+        n = min(a.size, b.size)
+        results['max_diff'] = int(np.max(np.abs(a[:n] - b[:n]))) if n else 0
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--volume', type=float, default=3)
+    parser.add_argument('--wav', nargs='*', default=[], help='WAV reals a provar (p. ex. de tts/)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        files = list(args.wav)
+        for duration in DURATIONS:
+            path = os.path.join(tmp_dir, f'speech_{duration}s.wav')
+            write_wav(path, synth_speech(duration))
+            files.append(path)
+
+        if not sox_available():
+            print('sox no disponible: només es mesura el camí NumPy')
+        header = f"{'fitxer':<24}{'durada':>8}{'sox':>10}{'wav_vol':>10}{'in situ':>10}{'pcm_vol':>10}{'dif':>6}"
+        print(header)
+        print('-' * len(header))
+        for path in files:
+            r = bench_file(path, args.volume, args.repeat, tmp_dir)
+
+            def ms(value):
+                return '-' if value is None else f'{value * 1000:.1f}'
+            diff = '-' if r['max_diff'] is None else str(r['max_diff'])
+            print(f"{os.path.basename(path):<24}{r['duration']:>7.1f}s{ms(r['sox']):>10}"
+                  f"{ms(r['wav_volume']):>10}{ms(r['wav_volume in situ']):>10}{ms(r['pcm_volume']):>10}{diff:>6}")
+        print('(temps en ms, mediana de', args.repeat, 'repeticions; dif = diferència màxima de mostra sox vs NumPy)')
+
+
+if __name__ == '__main__':
+    main()
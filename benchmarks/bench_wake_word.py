@@ -0,0 +1,93 @@
+"""
+Benchmark de la porta de paraula clau (wake_word.WakeWordGate) sobre frases
+gravades, amb el mateix format que bench_stt.py (parells .wav / .txt).
+
+Una frase s'adreça al robot si la seva transcripció de referència conté
+alguna paraula clau. Per a cada frase s'alimenta la porta al ritme del
+micròfon i es compta:
+
+- acceptades i rebutjades, i els errors (frases per al robot rebutjades,
+  xerrameca acceptada que hauria anat a l'STT);
+- el temps de CPU per segon d'àudio del reconeixedor de paraules clau
+  (gramàtica), comparat amb la transcripció completa en streaming que
+  s'estalvia per a les frases rebutjades.
+
+Ús:
+    python3 benchmarks/bench_wake_word.py DIR [--model RUTA] [--keywords arnau,"hola robot"]
+                                             [--sensitivity 0.5]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_stt import DEFAULT_MODEL, load_utterances  # noqa: E402
+from mic_stream import MIC_CHUNK_SIZE  # noqa: E402
+from stt_backends import VoskStt  # noqa: E402
+from wake_word import WAKE_SENSITIVITY, WAKE_WORDS, WakeWordGate, normalize_words  # noqa: E402
+
+
+def addressed(reference, keywords):
+    words = normalize_words(reference)
+    return any(tuple(words[i:i + len(k)]) == k for k in keywords for i in range(len(words) - len(k) + 1))
+
+
+def cpu_per_audio_s(session, audio):
+    """Segons de CPU per segon d'àudio alimentant la sessió fragment a fragment."""
+    chunk_bytes = MIC_CHUNK_SIZE * audio.sample_width
+    st = time.process_time()
+    for i in range(0, len(audio.frame_data), chunk_bytes):
+        session.accept(audio.frame_data[i:i + chunk_bytes])
+    session.final()
+    return (time.process_time() - st) / (len(audio.frame_data) / audio.sample_width / audio.sample_rate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directory', help='directori amb parells .wav / .txt')
+    parser.add_argument('--model', default=DEFAULT_MODEL, help='directori del model Vosk')
+    parser.add_argument('--keywords', default=','.join(WAKE_WORDS))
+    parser.add_argument('--sensitivity', type=float, default=WAKE_SENSITIVITY)
+    parser.add_argument('-v', '--verbose', action='store_true', help='mostrar la decisió de cada frase')
+    args = parser.parse_args()
+
+    utterances = load_utterances(args.directory)
+    if not utterances:
+        raise SystemExit(f'cap parell .wav/.txt a {args.directory}')
+    local = VoskStt(args.model)
+    if not local.warm_up():
+        raise SystemExit(f'no es pot carregar el model {args.model}')
+    gate = WakeWordGate(local, keywords=args.keywords.split(','), sensitivity=args.sensitivity)
+
+    counts = {'tp': 0, 'fn': 0, 'fp': 0, 'tn': 0}
+    gate_cpu, full_cpu = [], []
+    for filename, audio, reference in utterances:
+        session = gate.open(audio.sample_rate)
+        if session is None:
+            raise SystemExit('la porta no pot escoltar (cap paraula clau al vocabulari?)')
+        chunk_bytes = MIC_CHUNK_SIZE * audio.sample_width
+        for i in range(0, len(audio.frame_data), chunk_bytes):
+            session.feed(audio.frame_data[i:i + chunk_bytes])
+        accepted, _ = gate.check(session)
+        gate.sleep()  # cada frase es jutja sola, sense finestra de continuació
+        expected = addressed(reference, gate.keywords)
+        counts[('t' if accepted == expected else 'f') + ('p' if accepted else 'n')] += 1
+        gate_cpu.append(cpu_per_audio_s(local.open_stream(audio.sample_rate, grammar=gate._grammar), audio))
+        full_cpu.append(cpu_per_audio_s(local.open_stream(audio.sample_rate), audio))
+        if args.verbose:
+            print(f"{filename}: {'acceptada' if accepted else 'rebutjada'} (ref: {reference!r})")
+
+    total = len(utterances)
+    rejected = counts['tn'] + counts['fn']
+    print(f"frases: {total}; per al robot: {counts['tp'] + counts['fn']}")
+    print(f"acceptades correctes: {counts['tp']}, rebutjades correctes: {counts['tn']}")
+    print(f"per al robot rebutjades: {counts['fn']}, xerrameca acceptada: {counts['fp']}")
+    print(f"STT estalviat: {rejected}/{total} frases ({100 * rejected / total:.0f} %)")
+    print(f"CPU per segon d'àudio: porta {1000 * sum(gate_cpu) / total:.0f} ms, "
+          f"transcripció completa {1000 * sum(full_cpu) / total:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
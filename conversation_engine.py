@@ -0,0 +1,224 @@
+"""
+Motor de conversa asíncron.
+
+El bucle clàssic de main() és estrictament seqüencial: escoltar → STT → GPT →
+TTS → accions → esperar la veu → esperar les accions → tornar a escoltar. El
+ConversationEngine executa les mateixes etapes com a tasques asyncio amb
+dependències explícites:
+
+- la captura i pujada de la imatge es fa mentre es transcriu l'àudio;
+- les accions es despatxen tan bon punt arriba el seu camp de la resposta (en
+  streaming, abans que el model acabi) i abans de generar la veu;
+- el micròfon es torna a armar quan acaba la veu, mentre les últimes accions
+  encara s'executen (les accions del torn següent esperen que acabin).
+
+Les etapes són funcions bloquejants (micròfon, API d'OpenAI, fils de veu i
+d'accions) que s'executen amb asyncio.to_thread; el motor només n'orquestra
+l'ordre i mesura la latència de cada torn.
+"""
+
+import asyncio
+import time
+
+from utils import gray_print, warn
+
+
+REQUIRED_STAGES = ('listen', 'transcribe', 'respond', 'act', 'wait_actions', 'speak', 'say')
+
+
+def new_turn_timings():
+    """Diccionari de temps (segons) d'un torn de conversa."""
+    return {
+        'listen': None,        # temps escoltant fins que l'usuari acaba de parlar
+        'stt': None,
+        'image': None,         # captura i pujada de la imatge (en paral·lel amb l'STT)
+        'llm': None,
+        'first_action': None,  # des del final de la frase de l'usuari fins a despatxar les accions
+        'tts': None,           # preparació de la veu
+        'response': None,      # des del final de la frase de l'usuari fins a passar la veu a l'altaveu
+        'speech': None,
+        'total': None,         # des del final de la frase de l'usuari fins que acaba la veu
+    }
+
+
+def format_turn_timings(timings):
+    """Formata els temps d'un torn en una línia de log."""
+    parts = []
+    for key, value in timings.items():
+        if value is not None:
+            parts.append(f'{key} {value:.3f}')
+    return 'turn: ' + ', '.join(parts) + ' s'
+
+
+class ConversationEngine():
+    """
+    Orquestrador asíncron dels torns de conversa.
+
+    Args:
+        stages: Diccionari d'etapes (callables bloquejants) {
+            'listen': () -> àudio o None,
+            'transcribe': (àudio) -> text o None,
+            'prepare_image': () -> referència d'imatge o None (opcional),
+            'think': () -> None (opcional) - el robot passa a "pensant",
+            'respond': (text, imatge, on_field) -> (actions, answer, sound_actions).
+                       Pot avançar camps amb on_field('actions', (actions, sound_actions))
+                       i on_field('answer', answer) abans d'acabar,
+            'act': (actions, sound_actions) -> None - despatxa les accions sense esperar-les,
+            'wait_actions': () -> None - espera que acabin les accions,
+            'speak': (answer) -> handle - prepara la veu,
+            'say': (handle) -> None - la reprodueix i espera que acabi,
+            'standby': () -> None (opcional) - el robot torna a repòs
+        }
+        on_turn: Callable(timings) cridat en acabar cada torn (opcional)
+    """
+
+    def __init__(self, stages, on_turn=None):
+        missing = [name for name in REQUIRED_STAGES if stages.get(name) is None]
+        if missing:
+            raise ValueError(f"Falten etapes del motor de conversa: {missing}")
+        self.stages = stages
+        self.on_turn = on_turn
+        self.turns = 0
+        self.last_timings = None
+        self._actions_task = None
+        self._robot_owner = 0  # últim torn que ha pres el control del robot (think/act)
+
+    async def _run_stage(self, timings, key, name, *args):
+        st = time.time()
+        try:
+            return await asyncio.to_thread(self.stages[name], *args)
+        finally:
+            if key is not None:
+                timings[key] = time.time() - st
+
+    def _call(self, name, *args):
+        stage = self.stages.get(name)
+        if stage is not None:
+            stage(*args)
+
+    async def _finish_actions(self, turn):
+        await asyncio.to_thread(self.stages['wait_actions'])
+        # Si cap torn nou ha agafat el robot mentrestant, torna a repòs
+        if self._robot_owner == turn:
+            self._call('standby')
+
+    async def _wait_previous_actions(self):
+        if self._actions_task is not None:
+            try:
+                await self._actions_task
+            except Exception as e:
+                warn(f'conversation engine: error esperant accions: {e}')
+            self._actions_task = None
+
+    async def _respond(self, timings, text, image_task, on_field):
+        image = None
+        if image_task is not None:
+            try:
+                image = await image_task
+            except Exception as e:
+                warn(f'conversation engine: imatge no disponible ({e}), continuant sense imatge')
+        return await self._run_stage(timings, 'llm', 'respond', text, image, on_field)
+
+    @staticmethod
+    def _early_fields():
+        """
+        Futurs per als camps avançats per 'respond' i el callback (cridat des
+        del fil de l'etapa) que els resol.
+        """
+        loop = asyncio.get_running_loop()
+        futures = {'actions': loop.create_future(), 'answer': loop.create_future()}
+
+        def resolve(future, value):
+            if not future.done():
+                future.set_result(value)
+
+        def on_field(name, value):
+            future = futures.get(name)
+            if future is not None:
+                loop.call_soon_threadsafe(resolve, future, value)
+        return futures, on_field
+
+    @staticmethod
+    async def _early_or_final(future, respond_task):
+        """Retorna el valor avançat del camp o None si 'respond' ha acabat sense avançar-lo."""
+        if not future.done():
+            await asyncio.wait({future, respond_task}, return_when=asyncio.FIRST_COMPLETED)
+        return future.result() if future.done() else None
+
+    async def run_turn(self):
+        """
+        Executa un torn complet.
+
+        Returns:
+            dict: Temps del torn, o None si no s'ha entès res
+        """
+        timings = new_turn_timings()
+        if self._actions_task is None:
+            self._call('standby')
+
+        audio = await self._run_stage(timings, 'listen', 'listen')
+        heard = time.time()
+        if audio is None:
+            return None
+
+        self.turns += 1
+        turn = self.turns
+        image_task = None
+        if self.stages.get('prepare_image') is not None:
+            image_task = asyncio.create_task(self._run_stage(timings, 'image', 'prepare_image'))
+
+        text = await self._run_stage(timings, 'stt', 'transcribe', audio)
+        if not text:
+            if image_task is not None:
+                # La imatge ja no cal; es recull el resultat perquè no quedi cap error pendent
+                image_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+            return None
+
+        # GPT comença ja; el robot només canvia d'estat quan acaben les accions anteriors
+        early, on_field = self._early_fields()
+        respond_task = asyncio.create_task(self._respond(timings, text, image_task, on_field))
+        await self._wait_previous_actions()
+        self._robot_owner = turn
+        self._call('think')
+
+        early_actions = await self._early_or_final(early['actions'], respond_task)
+        if early_actions is None:
+            actions, _, sound_actions = respond_task.result()
+        else:
+            actions, sound_actions = early_actions
+        self.stages['act'](actions, sound_actions)
+        timings['first_action'] = time.time() - heard
+        self._actions_task = asyncio.create_task(self._finish_actions(turn))
+
+        answer = await self._early_or_final(early['answer'], respond_task)
+        if answer is None:
+            answer = respond_task.result()[1]
+        handle = await self._run_stage(timings, 'tts', 'speak', answer)
+        timings['response'] = time.time() - heard
+        try:
+            await respond_task
+        except Exception as e:
+            # Els camps que calien ja han arribat: la veu es diu igualment
+            warn(f'conversation engine: error en acabar la resposta: {e}')
+        await self._run_stage(timings, 'speech', 'say', handle)
+        timings['total'] = time.time() - heard
+
+        self.last_timings = timings
+        gray_print(format_turn_timings(timings))
+        if self.on_turn is not None:
+            self.on_turn(timings)
+        return timings
+
+    async def run(self, max_turns=None):
+        """
+        Bucle de conversa. Un error en un torn no atura el motor.
+
+        Args:
+            max_turns: Nombre màxim de torns (None = indefinit)
+        """
+        while max_turns is None or self.turns < max_turns:
+            try:
+                await self.run_turn()
+            except Exception as e:
+                print(f'actions or TTS error: {e}')
+        await self._wait_previous_actions()
@@ -1,4 +1,5 @@
 # Standard library
+import asyncio
 import os
 import random
 import sys
@@ -19,11 +20,24 @@ from vilib import Vilib
 
 # Local
 import keys  # pyright: ignore[reportMissingImports]
+from conversation_engine import ConversationEngine
+from image_prep import (IMAGE_PROFILES, PERSON_FALLBACK_PROFILE, CapturedFrame, VisionStats, person_box,
+                        select_image_profile)
 from keys import OPENAI_API_KEY, OPENAI_PROMPT_ID
+from mic_stream import MIC_CHUNK_SIZE, MicStream
 from openai_helper import OpenAiHelper
-from preset_actions import actions_dict, sounds_dict
-from utils import cancel_redirect_error, gray_print, redirect_error_2_null, sox_volume, speak_block
-from visual_tracking import create_visual_tracking_handler
+from preset_actions import actions_dict, set_interrupt_event, sounds_dict
+from servo_output import PRIORITY_ACTION, PRIORITY_SYSTEM, ServoOutput, servo_claim, servo_tick
+from stt_audio import format_stt_stats
+from stt_backends import CloudStt, FailoverStt, StreamingTranscriber, VoskStt
+from tts_cache import TtsCache, cache_key
+from tts_janitor import TtsJanitor
+from tts_pipeline import SpeechPipeline
+from tts_stream import iter_pcm_gain, log_timings, playback_meter, stream_tts, wav_pcm_chunks
+from utils import (cancel_redirect_error, gray_print, notify_waiters, redirect_error_2_null, sox_volume,
+                   speak_block, wait_until, wav_volume)
+from visual_tracking import create_visual_tracking_handler, lock_on_speaker
+from wake_word import WakeWordGate
 
 # PipeWire a Bookworm emula PulseAudio - necessary per a que raspberry pi 4 to work with sound
 os.environ['SDL_AUDIODRIVER'] = 'pulse'
@@ -37,8 +51,32 @@ VOICE_INSTRUCTIONS = ""
 DEFAULT_HEAD_PAN = 0
 DEFAULT_HEAD_TILT = 20
 VOLUME_DB = 3
+TTS_STREAMING = True  # Reproduir la veu a mesura que arriba (fallback a fitxer si falla)
+TTS_SENTENCE_PIPELINE = True  # Sintetitzar per frases: la frase N+1 mentre sona la N
+TTS_CACHE_MAX_BYTES = 50 * 1024 * 1024  # Pressupost de disc de la memòria cau de TTS
+TTS_CACHE_MAX_ENTRIES = 500
+# Frases que es pre-renderitzen a l'arrencada (han de coincidir amb el text exacte de la resposta)
+TTS_CACHE_WARMUP_PHRASES = [
+    "Hola! Què puc fer per tu?",
+    "No t'he entès, m'ho pots repetir?",
+    "D'acord, ara mateix ho faig.",
+    "Perdona, ara no et veig bé.",
+]
 LED_DOUBLE_BLINK_INTERVAL = 0.8 # seconds
 LED_BLINK_INTERVAL = 0.1 # seconds
+CONVERSATION_ENGINE = True  # Torns amb etapes solapades (asyncio); False = bucle seqüencial clàssic
+IDLE_WAKEUP_INTERVAL = 1.0 # seconds; els fils es desperten per canvi d'estat, això és només una xarxa de seguretat
+MIC_PERSISTENT = True  # Micròfon obert i calibrat en segon pla; False = obrir-lo i calibrar-lo (1 s) a cada torn
+MIC_VAD = True  # Tancar la frase amb el VAD local (vad.py, VAD_*); False = recognizer.listen
+STT_LOCAL_MODEL = 'models/vosk-model-small-ca-0.4'  # Model Vosk per a l'STT sense xarxa (None = només whisper-1)
+STT_STREAMING = True  # Transcriure amb el model local mentre l'usuari parla (cal MIC_VAD); False = STT en acabar
+BARGE_IN = True  # Tallar la veu i aturar les accions quan l'usuari comença a parlar (cal MIC_PERSISTENT)
+WAKE_WORD = True  # Només les frases amb paraula clau (wake_word.WAKE_WORDS) van a l'STT (cal MIC_VAD i el model local)
+IMAGE_INLINE = True  # Codificar la imatge en memòria i enviar-la dins la petició; False = desar-la i pujar-la
+IMAGE_JPEG_QUALITY = 80
+IMAGE_MAX_WIDTH = 640  # px; les imatges més amples es redueixen abans de codificar (None = mida original)
+IMAGE_ADAPTIVE = True  # Triar mida/qualitat/retall per torn (image_prep); False = IMAGE_JPEG_QUALITY i IMAGE_MAX_WIDTH fixos
+IMAGE_STATS_LOG = None  # 'vision_stats.jsonl' per desar la mida i els temps de cada imatge (ajustar perfils); None = només al log
 
 input_mode = 'voice'
 with_img = True
@@ -70,6 +108,11 @@ os.chdir(current_path) # change working directory
 # Ensure required directories exist with proper permissions
 tts_dir = os.path.join(current_path, 'tts')
 os.makedirs(tts_dir, mode=0o755, exist_ok=True)
+# Retenció acotada de tts/: els fitxers en cua o sonant es fixen amb pin()
+tts_janitor = TtsJanitor(tts_dir)
+# La memòria cau de TTS va a part perquè la neteja de tts/ no hi toqui
+tts_cache_dir = os.path.join(current_path, 'tts_cache')
+vision_stats = VisionStats(os.path.join(current_path, IMAGE_STATS_LOG) if IMAGE_STATS_LOG else None)
 
 # openai init (Responses API)
 # =================================================================
@@ -77,6 +120,11 @@ openai_helper = OpenAiHelper(
     api_key=OPENAI_API_KEY,
     prompt_id=OPENAI_PROMPT_ID
 )
+# STT: whisper-1 amb pas automàtic al model local si falla o va tard (stt_backends)
+stt_local = VoskStt(os.path.join(current_path, STT_LOCAL_MODEL)) if STT_LOCAL_MODEL else None
+stt_engine = FailoverStt(CloudStt(openai_helper), stt_local)
+# Porta de paraula clau: el soroll i les converses dels altres no arriben a l'STT ni al model
+wake_gate = WakeWordGate(stt_local) if WAKE_WORD and stt_local is not None else None
 
 
 # Validar VOLUME_DB dins d'un rang raonable (0-10 per evitar distorsió)
@@ -86,7 +134,8 @@ if not isinstance(VOLUME_DB, (int, float)) or VOLUME_DB < 0 or VOLUME_DB > 10:
 
 # car init 
 try:
-    my_car = Picarx()
+    # Les ordres que no canvien res no arriben al bus I2C (servo_output)
+    my_car = ServoOutput(Picarx())
     time.sleep(1)
 except Exception as e:
     # Preservar la traça completa de l'excepció original
@@ -116,25 +165,137 @@ recognizer.dynamic_energy_ratio = 1.6
 
 # speak_hanlder
 speech_loaded = False
-speech_lock = threading.Lock()
+# Condition: qui escriu speech_loaded crida notify_waiters() i els fils que esperen es desperten
+speech_lock = threading.Condition()
 tts_file = None
+# Text pendent de dir en mode streaming (None = reproduir tts_file)
+tts_text = None
+# Temps per etapa de l'última reproducció en streaming
+last_speech_timings = {}
 # Ref compartida per sincronitzar speak_handler amb wait_for_speech_completion
 _speech_loaded_ref = None
+# Ref compartida amb el fitxer de veu generat per process_user_query (la crea main())
+_tts_file_ref = None
+
+def speak_streaming(answer, openai_helper_obj, music_obj, tts_config):
+    """
+    Diu una resposta en streaming i, si no ha pogut sonar res, fa fallback
+    al camí clàssic (generate_tts + speak_block).
+    
+    Returns:
+        dict: Temps per etapa de la reproducció en streaming
+    """
+    ok, timings = stream_tts(
+        answer, openai_helper_obj, tts_config['voice'], tts_config['volume_db'],
+        tts_config['instructions']
+    )
+    log_timings(timings)
+    if not ok and not timings['audio_started']:
+        gray_print('tts stream: fallback a fitxer')
+        tts_file_ref = {'tts_file': None}
+        if generate_tts(answer, openai_helper_obj, tts_config['dir_path'], tts_config['voice'],
+                        tts_config['volume_db'], tts_config['instructions'], tts_file_ref,
+                        tts_config.get('cache')):
+            janitor = tts_config.get('janitor')
+            if janitor is not None:
+                with janitor.pinned(tts_file_ref['tts_file']):
+                    speak_block(music_obj, tts_file_ref['tts_file'])
+            else:
+                speak_block(music_obj, tts_file_ref['tts_file'])
+    return timings
+
+
+tts_cache = TtsCache(tts_cache_dir, TTS_CACHE_MAX_BYTES, TTS_CACHE_MAX_ENTRIES)
+
+
+def tts_cache_key(text):
+    """Clau de memòria cau d'un text amb la configuració de veu actual."""
+    return cache_key(text, TTS_VOICE, VOICE_INSTRUCTIONS, VOLUME_DB, openai_helper.TTS_MODEL)
+
+
+def _stream_sentence(sentence):
+    chunks = openai_helper.text_to_speech_stream(
+        sentence, TTS_VOICE, response_format='pcm', instructions=VOICE_INSTRUCTIONS
+    )
+    return iter_pcm_gain(chunks, VOLUME_DB)
+
+
+def _stream_and_cache_sentence(sentence, key):
+    pcm = []
+    for data in _stream_sentence(sentence):
+        pcm.append(data)
+        yield data
+    # Només arriba aquí si la frase s'ha rebut sencera
+    tts_cache.put_pcm(key, sentence, b''.join(pcm))
+
+
+def synthesize_sentence(sentence):
+    """
+    Retorna els fragments PCM (amb el volum aplicat) d'una frase: de la memòria
+    cau si ja s'havia dit, o en streaming des d'OpenAI desant-la per a la propera vegada.
+    """
+    key = tts_cache_key(sentence)
+    cached = tts_cache.get(key)
+    if cached is not None:
+        return wav_pcm_chunks(cached)
+    return _stream_and_cache_sentence(sentence, key)
+
+
+def render_sentence_pcm(sentence):
+    """Sintetitza una frase sencera en memòria (per al warm-up de la memòria cau)."""
+    return b''.join(_stream_sentence(sentence))
+
+
+def synthesize_sentence_fallback(sentence):
+    """Fallback del pipeline: genera la frase a fitxer (camí clàssic) i en retorna el PCM."""
+    tts_file_ref = {'tts_file': None}
+    if not generate_tts(sentence, openai_helper, tts_dir, TTS_VOICE, VOLUME_DB,
+                        VOICE_INSTRUCTIONS, tts_file_ref, tts_cache):
+        return []
+    return _pinned_wav_chunks(tts_file_ref['tts_file'])
+
+
+def _pinned_wav_chunks(path):
+    # El fitxer no es pot esborrar mentre el pipeline encara el llegeix
+    with tts_janitor.pinned(path):
+        yield from wav_pcm_chunks(path)
+
+
+speech_pipeline = SpeechPipeline(synthesize_sentence, fallback=synthesize_sentence_fallback)
+
 
 def speak_hanlder():
-    global speech_loaded, tts_file
+    global speech_loaded, tts_file, tts_text, last_speech_timings
     while True:
+        if TTS_SENTENCE_PIPELINE:
+            # Dorm a la cua del pipeline; process_user_query la desperta amb wake()
+            # quan carrega una resposta pel camí clàssic
+            speech_pipeline.play_next_turn(timeout=IDLE_WAKEUP_INTERVAL)
+        else:
+            wait_until(speech_lock, lambda: speech_loaded, IDLE_WAKEUP_INTERVAL)
         with speech_lock:
             _isloaded = speech_loaded
+            _text = tts_text
         if _isloaded:
             # gray_print('speak start')
-            speak_block(music, tts_file)
+            if _text is not None:
+                last_speech_timings = speak_streaming(_text, openai_helper, music, {
+                    'dir_path': tts_dir,
+                    'voice': TTS_VOICE,
+                    'volume_db': VOLUME_DB,
+                    'instructions': VOICE_INSTRUCTIONS,
+                    'cache': tts_cache,
+                    'janitor': tts_janitor
+                })
+            else:
+                with tts_janitor.pinned(tts_file):
+                    speak_block(music, tts_file)
             # gray_print('speak done')
             with speech_lock:
                 speech_loaded = False
                 if _speech_loaded_ref is not None:
                     _speech_loaded_ref['speech_loaded'] = False
-        time.sleep(0.05)
+                notify_waiters(speech_lock)
 
 speak_thread = threading.Thread(target=speak_hanlder)
 speak_thread.daemon = True
@@ -146,11 +307,17 @@ last_action_status = 'standby'
 last_led_status = 'standby'
 
 actions_to_be_done = []
-action_lock = threading.Lock()
+# Condition: qui escriu action_status crida notify_waiters() i els fils que esperen es desperten
+action_lock = threading.Condition()
 # Referències compartides entre main() i action_handler(); el fil principal escriu 'actions'
 # i el fil d'accions escriu 'actions_done' quan acaba.
 action_status_ref = {'action_status': 'standby'}
 actions_to_be_done_ref = {'actions_to_be_done': []}
+# Barge-in: barge_in_event marca el torn com a interromput per l'usuari (es neteja quan
+# listen_voice() ja té la frase nova) i action_interrupt atura l'acció en curs a la pausa següent de preset_actions
+barge_in_event = threading.Event()
+action_interrupt = threading.Event()
+set_interrupt_event(action_interrupt)
 
 
 def update_led_status(new_status, last_status, last_led_time):
@@ -260,20 +427,33 @@ def execute_actions_list(actions_list, car, action_lock_ref, action_status_ref):
     """
     Executa una llista d'accions sobre el cotxe.
     Totes les accions (incloent "seguir persona" i "aturar seguiment") es deleguen a actions_dict.
+    Mentre s'executen, els servos i motors són de les accions: el seguiment
+    visual els cedeix i continua des de la posició on quedin (servo_output).
     """
-    for _action in actions_list:
-        try:
-            if _action in actions_dict:
-                actions_dict[_action](car)
-            else:
-                available = list(actions_dict.keys())
-                print(f'[debug] unknown action: {_action!r}; available: {available}')
-        except Exception as e:
-            print(f'action error: {e}')
-        time.sleep(0.5)
+    with servo_claim(car, 'accions', PRIORITY_ACTION):
+        for _action in actions_list:
+            if action_interrupt.is_set():
+                break
+            try:
+                if _action in actions_dict:
+                    # Les ordres entre dues pauses de l'acció s'escriuen juntes
+                    with servo_tick(car):
+                        actions_dict[_action](car)
+                else:
+                    available = list(actions_dict.keys())
+                    print(f'[debug] unknown action: {_action!r}; available: {available}')
+            except Exception as e:
+                if action_interrupt.is_set():
+                    # ActionInterrupted: l'acció s'ha aturat entre dues ordres; parar els motors
+                    gray_print(f'actions: {_action!r} interrupted by the user')
+                    car.stop()
+                    break
+                print(f'action error: {e}')
+            time.sleep(0.5)
     
     with action_lock_ref:
         action_status_ref['action_status'] = 'actions_done'
+        notify_waiters(action_lock_ref)
 
 
 def handle_action_state(state, last_action_status, last_action_time, action_interval, 
@@ -299,6 +479,24 @@ def handle_action_state(state, last_action_status, last_action_time, action_inte
     return (last_action_status, last_action_time, action_interval)
 
 
+def next_action_wakeup(state, last_led_time, last_action_time, action_interval, now=None):
+    """
+    Calcula quant pot dormir el fil d'accions fins al proper esdeveniment programat
+    (parpelleig del LED o interval d'espera). Un canvi d'estat el desperta abans.
+    
+    Returns:
+        float: Segons d'espera, entre 0 i IDLE_WAKEUP_INTERVAL
+    """
+    now = time.time() if now is None else now
+    if state == 'standby':
+        deadline = min(last_led_time + LED_DOUBLE_BLINK_INTERVAL, last_action_time + action_interval)
+    elif state == 'think':
+        deadline = last_led_time + LED_BLINK_INTERVAL
+    else:
+        return IDLE_WAKEUP_INTERVAL
+    return max(0.0, min(deadline - now, IDLE_WAKEUP_INTERVAL))
+
+
 def action_handler():
     global action_status, actions_to_be_done, led_status, last_action_status, last_led_status
     global action_status_ref, actions_to_be_done_ref
@@ -329,11 +527,80 @@ def action_handler():
             action_status = action_status_ref['action_status']
             actions_to_be_done = actions_to_be_done_ref['actions_to_be_done']
 
-        time.sleep(0.01)
+        # Dormir fins al proper esdeveniment programat o fins que un altre fil canviï l'estat
+        wait_until(
+            action_lock, lambda: action_status_ref['action_status'] != _state,
+            next_action_wakeup(_state, last_led_time, last_action_time, action_interval)
+        )
 
 action_thread = threading.Thread(target=action_handler)
 action_thread.daemon = True
 
+
+def robot_is_busy():
+    """
+    Cert mentre el robot parla pel pipeline de frases o executa accions: el barge-in està armat.
+
+    La veu dels fitxers WAV no passa pel playback_meter (sense referència d'eco
+    el robot s'interrompria a si mateix) ni es pot tallar: no arma el barge-in.
+    """
+    if speech_pipeline.playing:
+        return True
+    with speech_lock:
+        if speech_loaded:
+            return False
+    with action_lock:
+        return action_status_ref['action_status'] == 'actions'
+
+
+def handle_barge_in():
+    """
+    L'usuari ha començat a parlar mentre el robot parlava o actuava (fil del micròfon).
+
+    Talla la veu del pipeline i atura l'acció en curs al següent punt segur; el
+    torn actual acaba de seguida i el listen() següent rep la frase ja començada.
+    """
+    barge_in_event.set()
+    action_interrupt.set()
+    speech_pipeline.cancel()
+
+
+def robot_is_quiet():
+    """Cert si el robot no parla ni fa accions: el micròfon només sent l'ambient."""
+    with action_lock:
+        if action_status_ref['action_status'] not in ('standby', 'think'):
+            return False
+    with speech_lock:
+        if speech_loaded:
+            return False
+    return not speech_pipeline.playing
+
+
+def prewarm_llm_request(partial_text):
+    """Amb la transcripció parcial, obre la connexió amb l'API sense bloquejar l'STT."""
+    openai_helper.warm_up_connection(block=False)
+
+
+def open_stt_stream(sample_rate):
+    """
+    Transcriptor en streaming per a la frase que comença, o None si no n'hi ha.
+    
+    Returns:
+        StreamingTranscriber: Alimentat pel MicStream mentre l'usuari parla
+    """
+    if not STT_STREAMING or stt_local is None or not stt_local.available:
+        return None
+    return StreamingTranscriber(stt_local.open_stream(sample_rate), on_partial=prewarm_llm_request)
+
+
+# Micròfon persistent: s'obre a main() i es calibra contínuament entre torns
+mic_stream = MicStream(
+    recognizer, lambda: sr.Microphone(chunk_size=MIC_CHUNK_SIZE), should_calibrate=robot_is_quiet,
+    vad_options={} if MIC_VAD else None, transcriber_factory=open_stt_stream,
+    on_barge_in=handle_barge_in if BARGE_IN else None, barge_in_armed=robot_is_busy,
+    barge_in_options={'reference': playback_meter.level}, phrase_gate=wake_gate
+)
+
 # Visual tracking: inicialitzar el mòdul perquè start/stop estiguin disponibles des de preset_actions
 Vilib_module = Vilib if with_img and 'Vilib' in globals() else None
 create_visual_tracking_handler(my_car, Vilib_module, with_img, DEFAULT_HEAD_TILT)
@@ -355,6 +622,13 @@ def reset_camera_if_needed(car, with_img_flag):
         car.set_cam_tilt_angle(DEFAULT_HEAD_TILT)
 
 
+def set_action_status(action_lock_ref, action_status_ref, status):
+    """Canvia l'estat d'accions i desperta els fils que l'esperen."""
+    with action_lock_ref:
+        action_status_ref['action_status'] = status
+        notify_waiters(action_lock_ref)
+
+
 def get_voice_input(recognizer_obj, openai_helper_obj, language, action_lock_ref, action_status_ref, car, with_img_flag):
     """
     Obté input de veu mitjançant el micròfon i STT.
@@ -362,28 +636,79 @@ def get_voice_input(recognizer_obj, openai_helper_obj, language, action_lock_ref
     Returns:
         str: Text reconegut, o None si no s'ha pogut obtenir
     """
-    # No resetar càmera si el seguiment visual està actiu
-    # El seguiment visual controla els angles de la càmera contínuament
-    reset_camera_if_needed(car, with_img_flag)
+    audio = listen_voice(recognizer_obj, action_lock_ref, action_status_ref, car, with_img_flag)
+    return transcribe_voice(audio, openai_helper_obj, language)
+
+
+def listen_voice(recognizer_obj, action_lock_ref, action_status_ref, car, with_img_flag, rearm=True):
+    """
+    Escolta el micròfon fins que l'usuari acaba de parlar.
+    
+    Args:
+        rearm: Si és True, torna el robot a repòs (càmera i estat) abans d'escoltar.
+               El motor de conversa ho fa ell mateix quan acaben les accions.
+    
+    Returns:
+        sr.AudioData: Àudio capturat
+    """
+    if rearm:
+        # No resetar càmera si el seguiment visual està actiu
+        # El seguiment visual controla els angles de la càmera contínuament
+        reset_camera_if_needed(car, with_img_flag)
 
     # listen
     gray_print("listening ...")
 
-    with action_lock_ref:
-        action_status_ref['action_status'] = 'standby'
-
-    _stderr_back = redirect_error_2_null() # ignore error print to ignore ALSA errors
-    # If the chunk_size is set too small (default_size=1024), it may cause the program to freeze
-    with sr.Microphone(chunk_size=4096) as source:
-        cancel_redirect_error(_stderr_back) # restore error print
-        recognizer_obj.adjust_for_ambient_noise(source)
-        audio = recognizer_obj.listen(source)
+    if rearm:
+        set_action_status(action_lock_ref, action_status_ref, 'standby')
 
-    # stt
+    if MIC_PERSISTENT and mic_stream.running:
+        if wake_gate is not None:
+            # El robot acaba de respondre: la rèplica de l'usuari no necessita la paraula clau
+            wake_gate.turn_done()
+        # Ja calibrat en segon pla: s'escolta de seguida
+        audio = mic_stream.listen()
+    else:
+        _stderr_back = redirect_error_2_null() # ignore error print to ignore ALSA errors
+        # If the chunk_size is set too small (default_size=1024), it may cause the program to freeze
+        with sr.Microphone(chunk_size=MIC_CHUNK_SIZE) as source:
+            cancel_redirect_error(_stderr_back) # restore error print
+            recognizer_obj.adjust_for_ambient_noise(source)
+            audio = recognizer_obj.listen(source)
+
+    # Torn nou: el barge-in de l'anterior ja ha fet la seva feina. Es neteja quan listen() ja ha
+    # tornat, perquè un barge-in que salta mentre s'escolta (la cua de la veu anterior) anava
+    # dirigit al torn vell i no ha de tallar les accions ni la veu d'aquest
+    barge_in_event.clear()
+    # La càmera segueix qui acaba de parlar
+    lock_on_speaker()
+    return audio
+
+
+def transcribe_voice(audio, openai_helper_obj, language):
+    """
+    Transcriu l'àudio capturat (STT).
+    
+    Args:
+        openai_helper_obj: Qualsevol objecte amb stt(audio, language) i last_stt_stats
+                           (OpenAiHelper o FailoverStt)
+    
+    Returns:
+        str: Text reconegut, o None si no s'ha pogut obtenir
+    """
     gray_print('stt ...')
     st = time.time()
+    if STT_STREAMING:
+        # La frase ja s'ha anat transcrivint mentre l'usuari parlava
+        streamed = mic_stream.streamed_transcript(audio)
+        if streamed:
+            gray_print(f"stt streaming takes: {time.time() - st:.3f} s")
+            return streamed
     _result = openai_helper_obj.stt(audio, language=language)
     gray_print(f"stt takes: {time.time() - st:.3f} s")
+    stt_stats = getattr(openai_helper_obj, 'last_stt_stats', None)
+    if isinstance(stt_stats, dict):
+        gray_print(format_stt_stats(stt_stats))
 
     if not _result or _result == "":
         return None
@@ -440,30 +765,183 @@ def capture_image(current_path_val, vilib_module=None):
             return None
 
 
+def encode_frame(img, quality=IMAGE_JPEG_QUALITY, max_width=IMAGE_MAX_WIDTH, crop=None):
+    """
+    Retalla, redueix i codifica un fotograma en JPEG a memòria.
+    
+    Args:
+        img: Fotograma (array d'OpenCV)
+        quality: Qualitat JPEG (0-100)
+        max_width: Amplada màxima en píxels; None = mida original
+        crop: (x0, y0, x1, y1) a retallar abans de reduir, o None
+    
+    Returns:
+        tuple: (bytes JPEG, (amplada, alçada))
+    
+    Raises:
+        ValueError: Si cv2.imencode falla
+    """
+    if crop is not None:
+        x0, y0, x1, y1 = crop
+        img = img[y0:y1, x0:x1]
+    height, width = img.shape[:2]
+    if max_width and width > max_width:
+        height = max(1, round(height * max_width / width))
+        width = max_width
+        img = cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode('.jpg', img, [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)])
+    if not ok:
+        raise ValueError("cv2.imencode ha fallat")
+    return buf.tobytes(), (width, height)
+
+
+def encode_image(vilib_module=None, quality=IMAGE_JPEG_QUALITY, max_width=IMAGE_MAX_WIDTH):
+    """
+    Codifica la imatge actual de la càmera en JPEG a memòria, sense passar per disc.
+    
+    Args:
+        vilib_module: Mòdul Vilib (o None)
+        quality: Qualitat JPEG (0-100)
+        max_width: Amplada màxima en píxels; None = mida original
+    
+    Returns:
+        bytes: Imatge JPEG, o None si no s'ha pogut capturar
+    """
+    if vilib_module is None:
+        return None
+    img = getattr(vilib_module, 'img', None)
+    if img is None:
+        print('Warning: Vilib.img no disponible, continuant sense imatge')
+        return None
+    st = time.time()
+    try:
+        data, (width, height) = encode_frame(img, quality, max_width)
+    except Exception as e:
+        print(f'Warning: Could not encode image: {e}')
+        return None
+    gray_print(f'image: {width}x{height} q{quality}, {len(data) / 1024:.1f} KB in {time.time() - st:.3f} s')
+    return data
+
+
+def snapshot_image(vilib_module=None):
+    """
+    Agafa el fotograma actual i la detecció de persones del mateix moment, sense codificar.
+    
+    Returns:
+        CapturedFrame: o None si no hi ha imatge
+    """
+    if vilib_module is None:
+        return None
+    img = getattr(vilib_module, 'img', None)
+    if img is None:
+        print('Warning: Vilib.img no disponible, continuant sense imatge')
+        return None
+    # Vilib substitueix Vilib.img a cada fotograma: la referència ja és una instantània
+    return CapturedFrame(img, getattr(vilib_module, 'detect_obj_parameter', None))
+
+
+def encode_turn_image(frame, user_input):
+    """
+    Codifica el fotograma amb el perfil que demana la pregunta (image_prep).
+    
+    Returns:
+        tuple: (bytes JPEG, dades per a VisionStats.record), o (None, None) si falla
+    """
+    st = time.time()
+    profile_name = select_image_profile(user_input)
+    profile = IMAGE_PROFILES[profile_name]
+    crop = None
+    try:
+        if profile['crop_person']:
+            crop = person_box(frame.detection, frame.img.shape)
+            if crop is None:
+                profile_name = PERSON_FALLBACK_PROFILE
+                profile = IMAGE_PROFILES[profile_name]
+        data, size = encode_frame(frame.img, profile['quality'], profile['max_width'], crop)
+    except Exception as e:
+        print(f'Warning: Could not encode image: {e}')
+        return None, None
+    stats = {
+        'profile': profile_name,
+        'payload_bytes': len(data),
+        'size': size,
+        'quality': profile['quality'],
+        'cropped': crop is not None,
+        'encode_s': time.time() - st,
+    }
+    return data, stats
+
+
+def prepare_gpt_image(openai_helper_obj, current_path_val=None, vilib_module=None):
+    """
+    Prepara la imatge per a GPT (el motor de conversa ho fa durant l'STT).
+    
+    Amb IMAGE_INLINE la imatge viatja dins la petició: amb IMAGE_ADAPTIVE només
+    es pren el fotograma i es codifica quan ja hi ha el text (encode_turn_image);
+    altrament es codifica ara amb la qualitat fixa. Sense IMAGE_INLINE es desa a
+    disc i es puja amb l'API de fitxers.
+    
+    Returns:
+        CapturedFrame | bytes | str: fotograma, JPEG en memòria o id del fitxer
+        pujat, o None si no hi ha imatge
+    """
+    if IMAGE_INLINE:
+        if IMAGE_ADAPTIVE:
+            return snapshot_image(vilib_module)
+        return encode_image(vilib_module)
+    img_path = capture_image(current_path_val, vilib_module)
+    if not img_path:
+        return None
+    st = time.time()
+    file_id = openai_helper_obj.upload_image(img_path)
+    try:
+        payload_bytes = os.path.getsize(img_path)
+    except OSError:
+        payload_bytes = None
+    vision_stats.record('upload', payload_bytes, upload_s=time.time() - st)
+    return file_id
+
+
 def get_gpt_response(user_input, openai_helper_obj, with_img_flag, vilib_module=None, 
-                     current_path_val=None):
+                     current_path_val=None, image=None, on_field=None):
     """
     Obté la resposta de GPT per a l'input de l'usuari.
     
+    Args:
+        image: Imatge ja preparada (prepare_gpt_image): fotograma capturat, bytes
+               JPEG o id de fitxer pujat; si no n'hi ha i with_img_flag és cert,
+               es prepara ara
+        on_field: Callable(clau, valor) per rebre els camps del JSON a mesura que
+                  arriben (make_early_field_handler)
+    
     Returns:
         dict: Resposta de GPT
     """
     gray_print('thinking ...')
     st = time.time()
 
-    if with_img_flag:
-        img_path = capture_image(current_path_val, vilib_module)
-        
-        # Només usar imatge si s'ha pogut crear correctament
-        if img_path:
-            response = openai_helper_obj.dialogue_with_img(user_input, img_path)
-        else:
+    if image is None and with_img_flag:
+        image = prepare_gpt_image(openai_helper_obj, current_path_val, vilib_module)
+        if image is None:
             # Fallback a diàleg sense imatge si no es pot obtenir la imatge
             print('Warning: Continuant sense imatge degut a errors previs')
-            response = openai_helper_obj.dialogue(user_input)
+
+    image_stats = None
+    if isinstance(image, CapturedFrame):
+        image, image_stats = encode_turn_image(image, user_input)
+    elif isinstance(image, bytes):
+        image_stats = {'profile': 'fixed', 'payload_bytes': len(image), 'quality': IMAGE_JPEG_QUALITY}
+
+    request_st = time.time() if image_stats is not None else None
+    if isinstance(image, bytes):
+        response = openai_helper_obj.dialogue_with_img(user_input, image_bytes=image, on_field=on_field)
+    elif image is not None:
+        response = openai_helper_obj.dialogue_with_img(user_input, file_id=image, on_field=on_field)
     else:
-        response = openai_helper_obj.dialogue(user_input)
+        response = openai_helper_obj.dialogue(user_input, on_field=on_field)
 
+    if image_stats is not None:
+        vision_stats.record(request_s=time.time() - request_st, **image_stats)
     gray_print(f'chat takes: {time.time() - st:.3f} s')
     return response
 
@@ -489,7 +967,11 @@ def _separate_sound_actions(actions, answer, sound_effect_actions):
     """
     if not answer:
         return actions, []
-    
+    return _split_sound_actions(actions, sound_effect_actions)
+
+
+def _split_sound_actions(actions, sound_effect_actions):
+    """Divideix una llista d'accions en (accions, efectes de so)."""
     sound_actions = []
     filtered_actions = []
     
@@ -502,6 +984,25 @@ def _separate_sound_actions(actions, answer, sound_effect_actions):
     return filtered_actions, sound_actions
 
 
+def make_early_field_handler(sound_effect_actions, on_actions, on_answer):
+    """
+    Crea el callback on_field per a la resposta de GPT en streaming.
+    
+    Quan arriba el camp 'actions' es crida on_actions(actions, sound_actions) i
+    quan arriba 'answer', on_answer(answer), sense esperar la resta de la resposta.
+    Els efectes de so se separen sempre (la resposta encara pot no haver arribat).
+    
+    Returns:
+        callable: on_field(clau, valor)
+    """
+    def on_field(key, value):
+        if key == 'actions' and isinstance(value, list):
+            on_actions(*_split_sound_actions(list(value), sound_effect_actions))
+        elif key == 'answer' and isinstance(value, str):
+            on_answer(value)
+    return on_field
+
+
 def _parse_dict_response(response_dict, sound_effect_actions):
     """Processa una resposta que és un diccionari."""
     actions = _extract_actions_from_dict(response_dict)
@@ -536,10 +1037,13 @@ def parse_gpt_response(response, sound_effect_actions):
 
 
 def generate_tts(answer, openai_helper_obj, tts_dir_path, tts_voice, volume_db, 
-                 voice_instructions, tts_file_ref):
+                 voice_instructions, tts_file_ref, tts_cache_obj=None):
     """
     Genera TTS per a una resposta.
     
+    Args:
+        tts_cache_obj: TtsCache opcional; si la resposta ja hi és no es crida l'API
+    
     Returns:
         bool: True si s'ha generat correctament, False altrament
     """
@@ -547,6 +1051,15 @@ def generate_tts(answer, openai_helper_obj, tts_dir_path, tts_voice, volume_db,
         return False
     
     st = time.time()
+    _cache_key = None
+    if tts_cache_obj is not None:
+        _cache_key = cache_key(answer, tts_voice, voice_instructions, volume_db,
+                               openai_helper_obj.TTS_MODEL)
+        _cached = tts_cache_obj.get(_cache_key)
+        if _cached is not None:
+            tts_file_ref['tts_file'] = _cached
+            gray_print(f'tts cache hit: {time.time() - st:.3f} s')
+            return True
     _time = time.strftime("%y-%m-%d_%H-%M-%S", time.localtime())
     _tts_f = os.path.join(tts_dir_path, f"{_time}_raw.wav")
     _tts_status = openai_helper_obj.text_to_speech(
@@ -554,7 +1067,14 @@ def generate_tts(answer, openai_helper_obj, tts_dir_path, tts_voice, volume_db,
     )
     if _tts_status:
         tts_file_ref['tts_file'] = os.path.join(tts_dir_path, f"{_time}_{volume_db}dB.wav")
-        _tts_status = sox_volume(_tts_f, tts_file_ref['tts_file'], volume_db)
+        # Guany in situ sobre el WAV (sense sox): un sol fitxer escrit per torn
+        if wav_volume(_tts_f, _tts_f, volume_db):
+            os.replace(_tts_f, tts_file_ref['tts_file'])
+        else:
+            # Formats que wav_volume no suporta (p. ex. no 16 bits): camí amb sox
+            _tts_status = sox_volume(_tts_f, tts_file_ref['tts_file'], volume_db)
+        if _tts_status and _cache_key is not None:
+            tts_cache_obj.put_file(_cache_key, answer, tts_file_ref['tts_file'])
     gray_print(f'tts takes: {time.time() - st:.3f} s')
     return _tts_status
 
@@ -564,11 +1084,17 @@ def execute_actions_and_sounds(actions_list, sound_actions_list, music_obj,
     """
     Executa les accions i els efectes de so.
     """
+    if barge_in_event.is_set():
+        # L'usuari ja ha interromput aquest torn: el torn següent decideix què fer
+        gray_print(f'actions: {actions_list} skipped (barge-in)')
+        return
+    action_interrupt.clear()
     # ---- actions ----
     with action_lock_ref:
         actions_to_be_done_ref['actions_to_be_done'] = actions_list
         gray_print(f'actions: {actions_list}')
         action_status_ref['action_status'] = 'actions'
+        notify_waiters(action_lock_ref)
 
     # --- sound effects and voice ---
     for _sound in sound_actions_list:
@@ -580,24 +1106,16 @@ def execute_actions_and_sounds(actions_list, sound_actions_list, music_obj,
 
 def wait_for_speech_completion(speech_lock_ref, speech_loaded_ref):
     """
-    Espera que acabi la reproducció de veu.
+    Espera que acabi la reproducció de veu (speak_hanlder notifica el canvi).
     """
-    while True:
-        with speech_lock_ref:
-            if not speech_loaded_ref['speech_loaded']:
-                break
-        time.sleep(.01)
+    wait_until(speech_lock_ref, lambda: not speech_loaded_ref['speech_loaded'])
 
 
 def wait_for_actions_completion(action_lock_ref, action_status_ref):
     """
-    Espera que acabin les accions.
+    Espera que acabin les accions (el fil d'accions notifica el canvi).
     """
-    while True:
-        with action_lock_ref:
-            if action_status_ref['action_status'] != 'actions':
-                break
-        time.sleep(.01)
+    wait_until(action_lock_ref, lambda: action_status_ref['action_status'] != 'actions')
 
 
 def process_user_query(user_input, config, action_state, speech_state, tts_config):
@@ -615,29 +1133,54 @@ def process_user_query(user_input, config, action_state, speech_state, tts_confi
             'sound_effect_actions': list
         }
         action_state: Diccionari amb estat d'accions {
-            'lock': threading.Lock,
+            'lock': threading.Condition (o Lock),
             'status_ref': dict amb 'action_status',
             'actions_to_be_done_ref': dict amb 'actions_to_be_done'
         }
         speech_state: Diccionari amb estat de veu {
-            'lock': threading.Lock,
+            'lock': threading.Condition (o Lock),
             'loaded_ref': dict amb 'speech_loaded',
-            'tts_file_ref': dict amb 'tts_file'
+            'tts_file_ref': dict amb 'tts_file',
+            'pipeline': SpeechPipeline o None (opcional) - amb streaming, la resposta
+                        es diu per frases a través del pipeline,
+            'janitor': TtsJanitor o None (opcional) - el fitxer generat queda fixat
+                       fins que acaba de sonar
         }
         tts_config: Diccionari amb configuració TTS {
             'dir_path': str,
             'voice': str,
             'volume_db': int/float,
-            'instructions': str
+            'instructions': str,
+            'streaming': bool (opcional) - si és True, speak_hanlder sintetitza
+                         i reprodueix en streaming en lloc de generar el fitxer aquí
         }
     """
+    # Un torn nou d'usuari talla qualsevol resposta anterior que encara soni
+    pipeline = speech_state.get('pipeline')
+    if pipeline is not None:
+        pipeline.cancel()
+
     # chat-gpt
-    with action_state['lock']:
-        action_state['status_ref']['action_status'] = 'think'
+    set_action_status(action_state['lock'], action_state['status_ref'], 'think')
+
+    # Amb la resposta en streaming, accions i veu comencen quan arriba el seu camp
+    early = {'actions': False, 'speech': None}
+
+    def dispatch_actions(actions, sound_actions):
+        execute_actions_and_sounds(
+            actions, sound_actions, config['music'],
+            action_state['lock'], action_state['status_ref'],
+            action_state['actions_to_be_done_ref']
+        )
+        early['actions'] = True
+
+    def dispatch_answer(answer):
+        early['speech'] = prepare_speech(answer, config, speech_state, tts_config)
 
     response = get_gpt_response(
         user_input, config['openai_helper'], config['with_img'],
-        config.get('vilib_module'), config.get('current_path')
+        config.get('vilib_module'), config.get('current_path'),
+        on_field=make_early_field_handler(config['sound_effect_actions'], dispatch_actions, dispatch_answer)
     )
 
     # actions & TTS
@@ -645,33 +1188,24 @@ def process_user_query(user_input, config, action_state, speech_state, tts_confi
         response, config['sound_effect_actions']
     )
 
+    speech = early['speech']
     try:
         # ---- tts ----
-        tts_status = generate_tts(
-            answer, config['openai_helper'], tts_config['dir_path'],
-            tts_config['voice'], tts_config['volume_db'],
-            tts_config['instructions'], speech_state['tts_file_ref']
-        )
+        if speech is None:
+            speech = prepare_speech(answer, config, speech_state, tts_config)
 
         # ---- actions ----
-        execute_actions_and_sounds(
-            actions, sound_actions, config['music'],
-            action_state['lock'], action_state['status_ref'],
-            action_state['actions_to_be_done_ref']
-        )
+        if not early['actions']:
+            execute_actions_and_sounds(
+                actions, sound_actions, config['music'],
+                action_state['lock'], action_state['status_ref'],
+                action_state['actions_to_be_done_ref']
+            )
 
-        if tts_status:
-            with speech_state['lock']:
-                speech_state['loaded_ref']['speech_loaded'] = True
-            # Sincronitzar globals perquè speak_handler les llegeixi i reprodueixi
-            global speech_loaded, tts_file
-            speech_loaded = True
-            tts_file = speech_state['tts_file_ref']['tts_file']
+        play_speech(speech, speech_state)
 
         # ---- wait speak done ----
-        if tts_status:
-            wait_for_speech_completion(speech_state['lock'], speech_state['loaded_ref'])
-            gray_print("[debug] process: speech done, continuing")
+        wait_speech(speech, speech_state, tts_config)
 
         # ---- wait actions done ----
         wait_for_actions_completion(action_state['lock'], action_state['status_ref'])
@@ -682,6 +1216,204 @@ def process_user_query(user_input, config, action_state, speech_state, tts_confi
 
     except Exception as e:
         print(f'actions or TTS error: {e}')
+    finally:
+        release_speech(speech, speech_state)
+
+
+def prepare_speech(answer, config, speech_state, tts_config):
+    """
+    Prepara la veu d'una resposta: genera el fitxer (camí clàssic), marca la
+    resposta per dir-la en streaming o comença el torn del pipeline de frases.
+    
+    Returns:
+        dict: Estat de la veu per a play_speech/wait_speech/release_speech {
+            'answer': str,
+            'streaming': bool,
+            'turn': id del torn del pipeline o None,
+            'loaded': bool - cal passar-la a speak_hanlder,
+            'pinned_file': fitxer fixat al janitor o None
+        }
+    """
+    pipeline = speech_state.get('pipeline')
+    janitor = speech_state.get('janitor')
+    streaming = tts_config.get('streaming', False)
+    speech = {'answer': answer, 'streaming': streaming, 'turn': None, 'loaded': False, 'pinned_file': None}
+    if barge_in_event.is_set():
+        # L'usuari ha interromput el torn abans que la veu comencés: no es diu
+        gray_print('tts: skipped (barge-in)')
+        return speech
+    if streaming and pipeline is not None:
+        # Les frases es sintetitzen al fil productor i sonen al fil de veu
+        speech['turn'] = pipeline.start_turn(answer)
+    elif streaming:
+        # La síntesi es fa al fil de veu, fragment a fragment
+        speech['loaded'] = answer != ''
+    else:
+        speech['loaded'] = generate_tts(
+            answer, config['openai_helper'], tts_config['dir_path'],
+            tts_config['voice'], tts_config['volume_db'],
+            tts_config['instructions'], speech_state['tts_file_ref'], tts_config.get('cache')
+        )
+        if speech['loaded'] and janitor is not None:
+            speech['pinned_file'] = speech_state['tts_file_ref']['tts_file']
+            janitor.pin(speech['pinned_file'])
+    return speech
+
+
+def play_speech(speech, speech_state):
+    """Passa la veu preparada a speak_hanlder (el pipeline ja sona pel seu compte)."""
+    if not speech['loaded']:
+        return
+    global speech_loaded, tts_file, tts_text
+    with speech_state['lock']:
+        speech_state['loaded_ref']['speech_loaded'] = True
+        # Sincronitzar globals perquè speak_handler les llegeixi i reprodueixi
+        tts_file = speech_state['tts_file_ref']['tts_file']
+        tts_text = speech['answer'] if speech['streaming'] else None
+        speech_loaded = True
+        notify_waiters(speech_state['lock'])
+    pipeline = speech_state.get('pipeline')
+    if pipeline is not None:
+        pipeline.wake()
+
+
+def wait_speech(speech, speech_state, tts_config):
+    """Espera que la veu d'una resposta acabi de sonar."""
+    pipeline = speech_state.get('pipeline')
+    if speech['turn'] is not None:
+        pipeline.wait_turn(speech['turn'])
+        pipeline.log_stats()
+        if tts_config.get('cache') is not None:
+            _cache_info = tts_config['cache'].info()
+            gray_print(f"tts cache: {_cache_info['hits']} hits, {_cache_info['misses']} misses, "
+                       f"{_cache_info['entries']} entrades, {_cache_info['bytes'] / 1e6:.1f} MB")
+        gray_print("[debug] process: speech done, continuing")
+    elif speech['loaded']:
+        wait_for_speech_completion(speech_state['lock'], speech_state['loaded_ref'])
+        gray_print("[debug] process: speech done, continuing")
+
+
+def release_speech(speech, speech_state):
+    """Allibera el fitxer de veu fixat al janitor (si n'hi ha)."""
+    if speech is not None and speech['pinned_file'] is not None:
+        speech_state['janitor'].unpin(speech['pinned_file'])
+
+
+def build_turn_state(input_mode_val=None):
+    """
+    Agrupa l'estat compartit que necessiten process_user_query i el motor de conversa.
+    
+    Returns:
+        tuple: (config, action_state, speech_state, tts_config)
+    """
+    vilib_module = Vilib if with_img and 'Vilib' in globals() else None
+    config = {
+        'openai_helper': openai_helper,
+        'stt': stt_engine,
+        'with_img': with_img,
+        'vilib_module': vilib_module,
+        'current_path': current_path,
+        'music': music,
+        'sound_effect_actions': SOUND_EFFECT_ACTIONS
+    }
+    action_state = {
+        'lock': action_lock,
+        'status_ref': action_status_ref,
+        'actions_to_be_done_ref': actions_to_be_done_ref
+    }
+    speech_state = {
+        'lock': speech_lock,
+        'loaded_ref': _speech_loaded_ref,
+        'tts_file_ref': _tts_file_ref,
+        'pipeline': speech_pipeline if TTS_SENTENCE_PIPELINE else None,
+        'janitor': tts_janitor
+    }
+    tts_config = {
+        'dir_path': tts_dir,
+        'voice': TTS_VOICE,
+        'volume_db': VOLUME_DB,
+        'instructions': "",
+        'streaming': TTS_STREAMING,
+        'cache': tts_cache
+    }
+    return config, action_state, speech_state, tts_config
+
+
+def build_engine_stages(config, action_state, speech_state, tts_config, recognizer_obj, language, car):
+    """
+    Construeix les etapes del ConversationEngine a partir de les mateixes
+    funcions que fa servir process_user_query.
+    
+    Returns:
+        dict: Etapes per a ConversationEngine
+    """
+    lock = action_state['lock']
+    status_ref = action_state['status_ref']
+
+    def listen():
+        # El motor torna el robot a repòs quan acaben les accions, no en començar a escoltar
+        return listen_voice(recognizer_obj, lock, status_ref, car, config['with_img'], rearm=False)
+
+    def transcribe(audio):
+        return transcribe_voice(audio, config.get('stt', config['openai_helper']), language)
+
+    def prepare_image():
+        return prepare_gpt_image(config['openai_helper'], config.get('current_path'), config.get('vilib_module'))
+
+    def think():
+        pipeline = speech_state.get('pipeline')
+        if pipeline is not None:
+            pipeline.cancel()
+        set_action_status(lock, status_ref, 'think')
+
+    def respond(text, image, on_field):
+        response = get_gpt_response(
+            text, config['openai_helper'], config['with_img'],
+            config.get('vilib_module'), config.get('current_path'), image,
+            on_field=make_early_field_handler(
+                config['sound_effect_actions'],
+                lambda actions, sound_actions: on_field('actions', (actions, sound_actions)),
+                lambda answer: on_field('answer', answer)
+            )
+        )
+        return parse_gpt_response(response, config['sound_effect_actions'])
+
+    def act(actions, sound_actions):
+        execute_actions_and_sounds(
+            actions, sound_actions, config['music'], lock, status_ref,
+            action_state['actions_to_be_done_ref']
+        )
+
+    def wait_actions():
+        wait_for_actions_completion(lock, status_ref)
+        gray_print("[debug] engine: actions done")
+
+    def speak(answer):
+        return prepare_speech(answer, config, speech_state, tts_config)
+
+    def say(speech):
+        try:
+            play_speech(speech, speech_state)
+            wait_speech(speech, speech_state, tts_config)
+        finally:
+            release_speech(speech, speech_state)
+
+    def standby():
+        reset_camera_if_needed(car, config['with_img'])
+        set_action_status(lock, status_ref, 'standby')
+
+    return {
+        'listen': listen,
+        'transcribe': transcribe,
+        'prepare_image': prepare_image if config['with_img'] else None,
+        'think': think,
+        'respond': respond,
+        'act': act,
+        'wait_actions': wait_actions,
+        'speak': speak,
+        'say': say,
+        'standby': standby,
+    }
 
 
 # main
@@ -692,6 +1424,7 @@ def main():
     global action_status_ref, actions_to_be_done_ref
     global tts_file, tts_dir
     global input_mode
+    global _speech_loaded_ref, _tts_file_ref
 
     my_car.reset()
     my_car.set_cam_tilt_angle(DEFAULT_HEAD_TILT)
@@ -699,18 +1432,43 @@ def main():
     speak_thread.start()
     action_thread.start()
 
+    # Pre-renderitzar les frases habituals sense endarrerir el primer torn
+    warmup_thread = threading.Thread(
+        target=tts_cache.warm_up,
+        args=(TTS_CACHE_WARMUP_PHRASES, tts_cache_key, render_sentence_pcm)
+    )
+    warmup_thread.daemon = True
+    warmup_thread.start()
+    # Carregar el model d'STT local en segon pla: fins llavors només hi ha whisper-1
+    stt_warmup_thread = threading.Thread(target=stt_engine.warm_up)
+    stt_warmup_thread.daemon = True
+    stt_warmup_thread.start()
+    tts_janitor.start()
+    if MIC_PERSISTENT:
+        try:
+            mic_stream.start()
+        except Exception as e:
+            print(f'Warning: Could not open persistent microphone, calibrating every turn: {e}')
+
     # Sincronitzar refs compartides amb el fil d'accions
     action_status_ref['action_status'] = action_status
     actions_to_be_done_ref['actions_to_be_done'] = actions_to_be_done
-    speech_loaded_ref = {'speech_loaded': speech_loaded}
-    tts_file_ref = {'tts_file': tts_file}
-    global _speech_loaded_ref
-    _speech_loaded_ref = speech_loaded_ref
-    vilib_module = Vilib if with_img and 'Vilib' in globals() else None
+    _speech_loaded_ref = {'speech_loaded': speech_loaded}
+    _tts_file_ref = {'tts_file': tts_file}
+    config, action_state, speech_state, tts_config = build_turn_state()
+
+    if CONVERSATION_ENGINE:
+        # Etapes solapades: imatge durant l'STT, accions abans de la veu, micròfon
+        # rearmat mentre acaben les accions
+        engine = ConversationEngine(build_engine_stages(
+            config, action_state, speech_state, tts_config, recognizer, LANGUAGE, my_car
+        ))
+        asyncio.run(engine.run())
+        return
 
     while True:
         user_input, should_continue, input_mode_changed, new_input_mode = get_user_input(
-            input_mode, recognizer, openai_helper, LANGUAGE, action_lock, action_status_ref,
+            input_mode, recognizer, stt_engine, LANGUAGE, action_lock, action_status_ref,
             my_car, with_img
         )
         
@@ -720,32 +1478,6 @@ def main():
         if should_continue:
             continue
 
-        # Agrupar paràmetres en estructures de dades
-        config = {
-            'openai_helper': openai_helper,
-            'with_img': with_img,
-            'vilib_module': vilib_module,
-            'current_path': current_path,
-            'music': music,
-            'sound_effect_actions': SOUND_EFFECT_ACTIONS
-        }
-        action_state = {
-            'lock': action_lock,
-            'status_ref': action_status_ref,
-            'actions_to_be_done_ref': actions_to_be_done_ref
-        }
-        speech_state = {
-            'lock': speech_lock,
-            'loaded_ref': speech_loaded_ref,
-            'tts_file_ref': tts_file_ref
-        }
-        tts_config = {
-            'dir_path': tts_dir,
-            'voice': TTS_VOICE,
-            'volume_db': VOLUME_DB,
-            'instructions': ""
-        }
-        
         process_user_query(user_input, config, action_state, speech_state, tts_config)
         
         # Sincronitzar variables globals amb les referències
@@ -753,8 +1485,8 @@ def main():
             action_status = action_status_ref['action_status']
             actions_to_be_done = actions_to_be_done_ref['actions_to_be_done']
         with speech_lock:
-            speech_loaded = speech_loaded_ref['speech_loaded']
-        tts_file = tts_file_ref['tts_file']
+            speech_loaded = _speech_loaded_ref['speech_loaded']
+        tts_file = _tts_file_ref['tts_file']
 
 
 if __name__ == "__main__":
@@ -765,6 +1497,9 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"\033[31mERROR: {e}\033[m")
     finally:
+        mic_stream.close()
         if with_img:
             Vilib.camera_close()
-        my_car.reset()
+        # Per sobre de qualsevol reserva que hagi quedat (accions o seguiment)
+        with my_car.claim('sortida', PRIORITY_SYSTEM):
+            my_car.reset()
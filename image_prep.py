@@ -0,0 +1,205 @@
+"""
+Preprocessament de la imatge dels torns amb visió.
+
+Cada torn enviava el fotograma sencer de Vilib.img (640x480) amb la mateixa
+qualitat JPEG, tant si la pregunta era visual ("què veus?") com si no ("quina
+hora és?"). Aquí es decideix per torn què cal enviar:
+
+- per defecte una miniatura petita i de qualitat baixa;
+- el fotograma sencer quan la pregunta és sobre l'escena;
+- un retall al voltant de la persona detectada (Vilib.detect_obj_parameter)
+  quan la pregunta és sobre l'usuari (roba, objectes a la mà...).
+
+VisionStats registra la mida enviada i els temps de cada torn per poder
+ajustar els perfils (mida enviada contra qualitat de la resposta).
+
+Aquest mòdul no depèn d'OpenCV: la codificació la fa gpt_car.encode_frame.
+"""
+
+import json
+import os
+import re
+import time
+
+from utils import gray_print, warn
+
+
+# Perfils de codificació: amplada màxima (px, None = mida original), qualitat JPEG
+# i si s'ha de retallar al voltant de la persona detectada
+IMAGE_PROFILES = {
+    'thumbnail': {'max_width': 320, 'quality': 60, 'crop_person': False},
+    'scene': {'max_width': 640, 'quality': 85, 'crop_person': False},
+    'person': {'max_width': 480, 'quality': 85, 'crop_person': True},
+}
+DEFAULT_PROFILE = 'thumbnail'
+PERSON_FALLBACK_PROFILE = 'scene'  # si es demana 'person' però no hi ha ningú detectat
+
+# Paraules (minúscules) que indiquen que la pregunta necessita veure-hi bé
+SCENE_KEYWORDS = (
+    'veus', 'veure', 'mira', 'mirar', 'observa', 'descriu', 'descriure', 'què és', 'què hi ha',
+    'quin color', 'de quin color', 'colors', 'llegeix', 'llegir', 'quants', 'quantes',
+    'on és', 'on està', 'davant', 'darrere', 'aquest objecte', 'aquesta cosa',
+    'foto', 'imatge', 'sembla', 'reconeixes',
+)
+PERSON_KEYWORDS = (
+    'porto', 'duc', 'vaig vestit', 'vaig vestida', 'el meu', 'la meva', 'els meus', 'les meves',
+    'a la mà', 'a les mans', 'tinc a', 'samarreta', 'jersei', 'jaqueta', 'camisa', 'ulleres',
+    'barret', 'gorra', 'cabell', 'cara', 'com estic', 'com em veus', 'qui sóc', 'em reconeixes',
+)
+
+PERSON_CROP_MARGIN = 0.5  # fracció de l'amplada/alçada de la detecció afegida a cada costat
+PERSON_CROP_MAX_FRACTION = 0.6  # si el retall ocupa més d'això del fotograma, no val la pena
+STATS_LOG_MAX_BYTES = 1024 * 1024  # en passar d'aquí el JSONL es rota a <fitxer>.1 (se'n guarda un d'antic)
+
+
+def _keyword_pattern(keywords):
+    return re.compile(r'\b(?:' + '|'.join(re.escape(k) for k in keywords) + r')\b')
+
+
+_SCENE_RE = _keyword_pattern(SCENE_KEYWORDS)
+_PERSON_RE = _keyword_pattern(PERSON_KEYWORDS)
+
+
+def select_image_profile(text):
+    """
+    Tria el perfil d'imatge per a la pregunta de l'usuari.
+
+    Returns:
+        str: Clau d'IMAGE_PROFILES
+    """
+    if not text:
+        return DEFAULT_PROFILE
+    text = text.lower()
+    if _PERSON_RE.search(text):
+        return 'person'
+    if _SCENE_RE.search(text):
+        return 'scene'
+    return DEFAULT_PROFILE
+
+
+def person_box(detection, frame_shape, margin=PERSON_CROP_MARGIN, max_fraction=PERSON_CROP_MAX_FRACTION):
+    """
+    Rectangle de retall al voltant de la persona detectada per Vilib.
+
+    Args:
+        detection: Còpia de Vilib.detect_obj_parameter (human_n, human_x/y = centre,
+                   human_w/h = mida, en píxels del fotograma)
+        frame_shape: Forma del fotograma (alçada, amplada, ...)
+
+    Returns:
+        tuple: (x0, y0, x1, y1), o None si no hi ha persona o el retall no aporta res
+    """
+    if not isinstance(detection, dict) or detection.get('human_n', 0) < 1:
+        return None
+    width = detection.get('human_w', 0)
+    height = detection.get('human_h', 0)
+    if width <= 0 or height <= 0:
+        return None
+    frame_h, frame_w = frame_shape[:2]
+    cx = detection.get('human_x', frame_w / 2)
+    cy = detection.get('human_y', frame_h / 2)
+    half_w = width * (0.5 + margin)
+    half_h = height * (0.5 + margin)
+    x0 = max(0, int(cx - half_w))
+    y0 = max(0, int(cy - half_h))
+    x1 = min(frame_w, int(cx + half_w))
+    y1 = min(frame_h, int(cy + half_h))
+    if x1 <= x0 or y1 <= y0:
+        return None
+    if (x1 - x0) * (y1 - y0) > max_fraction * frame_w * frame_h:
+        return None
+    return (x0, y0, x1, y1)
+
+
+class CapturedFrame():
+    """
+    Fotograma capturat per a un torn, amb la detecció de persones del mateix moment.
+
+    El motor de conversa el captura durant l'STT; la codificació s'espera a
+    tenir el text per triar el perfil.
+    """
+
+    def __init__(self, img, detection=None, captured_at=None):
+        self.img = img
+        self.detection = dict(detection) if isinstance(detection, dict) else {}
+        self.captured_at = time.time() if captured_at is None else captured_at
+
+
+class VisionStats():
+    """
+    Registre de la mida i els temps de les imatges enviades, per perfil.
+
+    Args:
+        log_path: Fitxer JSONL on s'afegeix una línia per torn (None = només memòria)
+        max_bytes: Mida a partir de la qual el fitxer es rota a <log_path>.1
+    """
+
+    def __init__(self, log_path=None, max_bytes=STATS_LOG_MAX_BYTES):
+        self.log_path = log_path
+        self.max_bytes = max_bytes
+        self.totals = {}  # perfil -> {'turns', 'bytes', 'request_s'}
+
+    def record(self, profile, payload_bytes, size=None, quality=None, cropped=False,
+               encode_s=None, upload_s=None, request_s=None):
+        """
+        Registra un torn amb imatge.
+
+        Args:
+            profile: Perfil usat ('upload' per al camí de fitxer)
+            payload_bytes: Mida del JPEG enviat
+            size: (amplada, alçada) enviades
+            encode_s: Temps de retall + reducció + codificació
+            upload_s: Temps de pujada (camí de fitxer)
+            request_s: Temps de la petició amb la imatge (inclou l'enviament inline)
+        """
+        totals = self.totals.setdefault(profile, {'turns': 0, 'bytes': 0, 'request_s': 0.0})
+        totals['turns'] += 1
+        totals['bytes'] += payload_bytes or 0
+        totals['request_s'] += request_s or upload_s or 0.0
+
+        parts = [f'vision: {profile}']
+        if size is not None:
+            parts.append(f'{size[0]}x{size[1]}' + (f' q{quality}' if quality is not None else ''))
+        parts.append(f'{(payload_bytes or 0) / 1024:.1f} KB')
+        for label, value in (('encode', encode_s), ('upload', upload_s), ('request', request_s)):
+            if value is not None:
+                parts.append(f'{label} {value:.3f} s')
+        avg = self.summary()[profile]
+        parts.append(f"avg {avg['avg_bytes'] / 1024:.1f} KB / {avg['avg_request_s']:.3f} s")
+        gray_print(', '.join(parts))
+
+        if self.log_path:
+            entry = {
+                'time': round(time.time(), 3), 'profile': profile, 'bytes': payload_bytes,
+                'size': list(size) if size is not None else None, 'quality': quality,
+                'cropped': cropped, 'encode_s': encode_s, 'upload_s': upload_s, 'request_s': request_s,
+            }
+            try:
+                self._rotate_if_full()
+                with open(self.log_path, 'a') as f:
+                    f.write(json.dumps(entry) + '\n')
+            except OSError as e:
+                warn(f'vision stats: no s\'ha pogut escriure {self.log_path}: {e}')
+
+    def _rotate_if_full(self):
+        """Si el fitxer ha arribat a max_bytes, passa a <log_path>.1 (substituint l'anterior)."""
+        try:
+            if os.path.getsize(self.log_path) < self.max_bytes:
+                return
+        except FileNotFoundError:
+            return
+        os.replace(self.log_path, self.log_path + '.1')
+
+    def summary(self):
+        """
+        Returns:
+            dict: perfil -> {'turns', 'avg_bytes', 'avg_request_s'}
+        """
+        return {
+            profile: {
+                'turns': t['turns'],
+                'avg_bytes': t['bytes'] / t['turns'],
+                'avg_request_s': t['request_s'] / t['turns'],
+            }
+            for profile, t in self.totals.items()
+        }
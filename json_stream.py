@@ -0,0 +1,153 @@
+"""
+Parser incremental de JSON per a respostes en streaming.
+
+La resposta del model és un objecte JSON ({"actions": [...], "answer": "..."}).
+En lloc d'esperar el text complet i fer json.loads, JsonFieldStream rep els
+fragments a mesura que arriben i avisa de cada camp de primer nivell tan bon
+punt el seu valor és complet, de manera que les accions i la veu poden
+començar abans que el model acabi de generar.
+"""
+
+import json
+
+from utils import warn
+
+
+class JsonFieldStream():
+    """
+    Extreu els camps de primer nivell d'un objecte JSON rebut per fragments.
+
+    Si el text no comença amb un objecte JSON (p. ex. text lliure), no s'emet
+    cap camp i el text complet queda disponible a `text`.
+
+    Args:
+        on_field: Callable(clau, valor) cridat quan un camp és complet (opcional)
+    """
+
+    def __init__(self, on_field=None):
+        self.on_field = on_field
+        self.fields = {}
+        self._buf = ''
+        self._state = 'start'
+        self._escape = False
+        self._in_string = False
+        self._depth = 0
+        self._kind = None
+        self._key = None
+        self._token_start = 0
+
+    @property
+    def text(self):
+        """Text rebut fins ara."""
+        return self._buf
+
+    @property
+    def emitted(self):
+        """True si ja s'ha emès algun camp."""
+        return bool(self.fields)
+
+    @property
+    def done(self):
+        """True quan l'objecte JSON s'ha tancat."""
+        return self._state == 'done'
+
+    @property
+    def valid(self):
+        return self._state != 'invalid'
+
+    def feed(self, chunk):
+        """Afegeix un fragment de text i emet els camps que s'hagin completat."""
+        if not chunk:
+            return
+        start = len(self._buf)
+        self._buf += chunk
+        for i in range(start, len(self._buf)):
+            if self._state in ('done', 'invalid'):
+                return
+            self._step(self._buf[i], i)
+
+    def _step(self, c, i):
+        state = self._state
+        if state == 'start':
+            if c == '{':
+                self._state = 'key_wait'
+            elif not c.isspace():
+                self._state = 'invalid'
+        elif state == 'key_wait':
+            if c == '"':
+                self._state = 'key'
+                self._token_start = i
+            elif c == '}':
+                self._state = 'done'
+            elif c != ',' and not c.isspace():
+                self._state = 'invalid'
+        elif state == 'key':
+            if self._escape:
+                self._escape = False
+            elif c == '\\':
+                self._escape = True
+            elif c == '"':
+                self._key = json.loads(self._buf[self._token_start:i + 1])
+                self._state = 'colon'
+        elif state == 'colon':
+            if c == ':':
+                self._state = 'value_wait'
+            elif not c.isspace():
+                self._state = 'invalid'
+        elif state == 'value_wait':
+            if not c.isspace():
+                self._start_value(c, i)
+        elif state == 'value':
+            self._value_step(c, i)
+
+    def _start_value(self, c, i):
+        self._token_start = i
+        self._state = 'value'
+        self._depth = 0
+        self._in_string = False
+        if c == '"':
+            self._kind = 'string'
+            self._in_string = True
+        elif c in '[{':
+            self._kind = 'container'
+            self._depth = 1
+        else:
+            self._kind = 'scalar'
+
+    def _value_step(self, c, i):
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif c == '\\':
+                self._escape = True
+            elif c == '"':
+                self._in_string = False
+                if self._kind == 'string':
+                    self._emit(i + 1)
+        elif c == '"':
+            self._in_string = True
+        elif self._kind == 'container':
+            if c in '[{':
+                self._depth += 1
+            elif c in ']}':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(i + 1)
+        elif self._kind == 'scalar' and (c in ',}' or c.isspace()):
+            self._emit(i)
+            # El separador que tanca l'escalar també pot tancar l'objecte
+            self._step(c, i)
+
+    def _emit(self, end):
+        try:
+            value = json.loads(self._buf[self._token_start:end])
+        except ValueError:
+            self._state = 'invalid'
+            return
+        self._state = 'key_wait'
+        self.fields[self._key] = value
+        if self.on_field is not None:
+            try:
+                self.on_field(self._key, value)
+            except Exception as e:
+                warn(f'json stream: error processant el camp {self._key!r}: {e}')
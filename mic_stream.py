@@ -0,0 +1,425 @@
+"""
+Micròfon persistent amb calibratge del soroll de fons en segon pla.
+
+listen_voice obria sr.Microphone a cada torn i cridava
+recognizer.adjust_for_ambient_noise(source), que escolta un segon sencer
+abans que l'usuari pugui començar a parlar. El MicStream obre el micròfon
+una sola vegada i un fil el llegeix contínuament:
+
+- mentre s'escolta un torn, els fragments passen al Recognizer;
+- entre torns, els fragments de soroll de fons (per sota del llindar i amb el
+  robot en silenci) mantenen calibrat recognizer.energy_threshold amb la
+  mateixa mitjana ponderada asimètrica que speech_recognition.
+
+Així cada torn comença a escoltar immediatament. Amb vad_options, el final de
+la frase el decideix el VoiceActivityDetector (vad.py) en lloc de
+recognizer.listen, i amb transcriber_factory la frase es transcriu en
+streaming mentre l'usuari parla (streamed_transcript).
+
+Amb phrase_gate (wake_word.WakeWordGate), les frases que no s'adrecen al
+robot es descarten aquí mateix i listen() continua escoltant.
+
+Amb on_barge_in, mentre el robot parla o actua (barge_in_armed) un
+BargeInDetector vigila el micròfon: si l'usuari comença a parlar es crida
+on_barge_in i l'àudio (amb el que s'ha dit just abans) es guarda perquè el
+listen() següent el rebi sencer.
+"""
+
+import collections
+import threading
+
+from utils import cancel_redirect_error, gray_print, redirect_error_2_null, warn
+from vad import BargeInDetector, VoiceActivityDetector
+
+
+MIC_CHUNK_SIZE = 4096  # mostres per lectura; massa petit (1024) pot penjar el programa
+MIC_CALIBRATION_S = 1.0  # calibratge inicial en obrir el micròfon (com adjust_for_ambient_noise)
+MIC_MAX_BUFFER_S = 30.0  # àudio màxim pendent mentre s'escolta; es descarta el més antic
+MIC_BARGE_IN_PRE_ROLL_S = 0.8  # àudio d'abans de detectar el barge-in que es passa al torn següent
+
+
+_REJECTED = object()  # frase descartada per phrase_gate: listen() continua escoltant
+
+
+def _cancel(*streams):
+    for stream in streams:
+        if stream is not None:
+            stream.cancel()
+
+
+def chunk_energy(buffer, sample_width=2):
+    """
+    Energia RMS d'un fragment PCM de 16 bits (equivalent a audioop.rms).
+
+    Returns:
+        float: Energia del fragment (0 si és buit)
+    """
+    import numpy as np
+
+    if sample_width != 2:
+        raise ValueError(f"només es suporta PCM 16 bits (sample width {sample_width})")
+    samples = np.frombuffer(buffer, dtype='<i2', count=len(buffer) // 2)
+    if samples.size == 0:
+        return 0.0
+    return float(np.sqrt(np.mean(np.square(samples, dtype=np.float64))))
+
+
+def update_energy_threshold(recognizer, energy, seconds_per_buffer):
+    """Ajusta recognizer.energy_threshold amb un fragment de soroll de fons."""
+    damping = recognizer.dynamic_energy_adjustment_damping ** seconds_per_buffer
+    target_energy = energy * recognizer.dynamic_energy_ratio
+    recognizer.energy_threshold = recognizer.energy_threshold * damping + target_energy * (1 - damping)
+
+
+class _BufferedStream():
+    """Substitueix source.stream perquè recognizer.listen llegeixi dels fragments del MicStream."""
+
+    def __init__(self, mic_stream):
+        self._mic_stream = mic_stream
+
+    def read(self, size):
+        return self._mic_stream.read(size)
+
+    def close(self):
+        pass
+
+
+class MicStream():
+    """
+    Micròfon obert permanentment amb calibratge continu del Recognizer.
+
+    Args:
+        recognizer: sr.Recognizer a calibrar i amb què s'escolta
+        microphone_factory: Callable que retorna un sr.Microphone (o equivalent)
+        calibration_s: Segons de calibratge inicial
+        max_buffer_s: Segons màxims d'àudio pendent mentre s'escolta
+        should_calibrate: Callable() -> bool; False mentre el robot fa soroll
+                          (veu, accions) i no s'ha de calibrar
+        vad_options: Paràmetres del VoiceActivityDetector (dict, pot ser buit);
+                     None = escoltar amb recognizer.listen
+        audio_factory: Callable(bytes, sample_rate, sample_width) que construeix
+                       l'àudio del camí VAD; None = sr.AudioData
+        transcriber_factory: Callable(sample_rate) -> StreamingTranscriber (o None
+                             si no n'hi ha cap de disponible); només camí VAD
+        phrase_gate: Objecte amb open(sample_rate) -> sessió (o None) i
+                     check(sessió) -> (acceptada, motiu); només camí VAD
+        on_barge_in: Callable() quan l'usuari interromp el robot (des del fil del
+                     micròfon: ha de ser ràpid); None = sense barge-in
+        barge_in_armed: Callable() -> bool, cert mentre el robot parla o actua
+        barge_in_options: Paràmetres del BargeInDetector (p. ex. reference)
+    """
+
+    def __init__(self, recognizer, microphone_factory, calibration_s=MIC_CALIBRATION_S,
+                 max_buffer_s=MIC_MAX_BUFFER_S, should_calibrate=None, vad_options=None,
+                 audio_factory=None, transcriber_factory=None, on_barge_in=None, barge_in_armed=None,
+                 barge_in_options=None, phrase_gate=None):
+        self.recognizer = recognizer
+        self.microphone_factory = microphone_factory
+        self.calibration_s = calibration_s
+        self.max_buffer_s = max_buffer_s
+        self.should_calibrate = should_calibrate
+        self.vad_options = vad_options
+        self.audio_factory = audio_factory
+        self.transcriber_factory = transcriber_factory
+        self.phrase_gate = phrase_gate
+        self.on_barge_in = on_barge_in
+        self.barge_in_armed = barge_in_armed
+        self.barge_in_options = barge_in_options or {}
+        self._barge_in = None  # BargeInDetector, es crea en obrir el micròfon
+        self._barge_in_ring = None  # fragments recents per al pre-roll del barge-in
+        self._capturing = False  # barge-in detectat: s'acumula l'àudio fins al listen() següent
+        self.last_listen = None  # resum de l'última frase capturada pel camí VAD
+        self._cond = threading.Condition()
+        self._pending = collections.deque()
+        self._listening = False
+        self._running = False
+        self._stop = threading.Event()
+        self._thread = None
+        self._microphone = None
+        self._source = None
+        self._raw_stream = None
+        self._seconds_per_buffer = 0.0
+        self._calibrated_s = 0.0
+        self._streamed = None  # (àudio retornat, StreamingTranscriber) de l'última frase
+        self.stats = {
+            'chunks': 0,
+            'calibration_chunks': 0,
+            'dropped_chunks': 0,
+            'turns': 0,
+            'barge_ins': 0,
+            'gated_phrases': 0,
+        }
+
+    @property
+    def running(self):
+        """Cert mentre el fil de lectura està actiu."""
+        with self._cond:
+            return self._running
+
+    @property
+    def calibrated(self):
+        with self._cond:
+            return self._calibrated_s >= self.calibration_s
+
+    def start(self):
+        """Obre el micròfon i arrenca el fil de lectura (idempotent)."""
+        if self._thread is not None:
+            return
+        _stderr_back = redirect_error_2_null()  # ignorar els errors d'ALSA en obrir
+        try:
+            self._microphone = self.microphone_factory()
+            source = self._microphone.__enter__()
+        finally:
+            cancel_redirect_error(_stderr_back)
+        self._source = source
+        self._raw_stream = source.stream
+        source.stream = _BufferedStream(self)
+        self._seconds_per_buffer = float(source.CHUNK) / source.SAMPLE_RATE
+        if self.on_barge_in is not None:
+            self._barge_in = BargeInDetector(
+                source.SAMPLE_RATE, lambda: self.recognizer.energy_threshold, **self.barge_in_options
+            )
+            ring_chunks = int(MIC_BARGE_IN_PRE_ROLL_S / self._seconds_per_buffer) + 1
+            self._barge_in_ring = collections.deque(maxlen=ring_chunks)
+        with self._cond:
+            self._running = True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='mic-stream')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def close(self):
+        """Atura el fil i tanca el micròfon."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        if self._source is not None:
+            self._source.stream = self._raw_stream
+            try:
+                self._microphone.__exit__(None, None, None)
+            except Exception as e:
+                warn(f'mic stream: error tancant el micròfon: {e}')
+            self._source = None
+
+    def _run(self):
+        max_chunks = max(1, int(self.max_buffer_s / self._seconds_per_buffer))
+        try:
+            while not self._stop.is_set():
+                buffer = self._raw_stream.read(self._source.CHUNK)
+                if not buffer:
+                    warn('mic stream: el micròfon no retorna àudio')
+                    break
+                with self._cond:
+                    self.stats['chunks'] += 1
+                    if self._listening or self._capturing:
+                        self._pending.append(buffer)
+                        if len(self._pending) > max_chunks:
+                            self._pending.popleft()
+                            self.stats['dropped_chunks'] += 1
+                        self._cond.notify_all()
+                        continue
+                if self._barge_in is not None and self._watch_barge_in(buffer):
+                    continue
+                self._calibrate(buffer)
+        except Exception as e:
+            warn(f'mic stream: error llegint el micròfon: {e}')
+        finally:
+            with self._cond:
+                self._running = False
+                self._cond.notify_all()
+
+    def _watch_barge_in(self, buffer):
+        """
+        Vigila si l'usuari interromp el robot.
+
+        Returns:
+            bool: True si el fragment s'ha quedat per al torn següent
+        """
+        self._barge_in_ring.append(buffer)
+        if self.barge_in_armed is None or not self.barge_in_armed():
+            self._barge_in.reset()
+            return False
+        if not self._barge_in.feed(buffer):
+            return False
+        with self._cond:
+            self._capturing = True
+            self._pending.clear()
+            self._pending.extend(self._barge_in_ring)
+            self._cond.notify_all()
+        self._barge_in_ring.clear()
+        self._fire_barge_in()
+        return True
+
+    def _fire_barge_in(self):
+        self._barge_in.reset()
+        with self._cond:
+            self.stats['barge_ins'] += 1
+        gray_print('mic stream: barge-in, the user started talking')
+        try:
+            self.on_barge_in()
+        except Exception as e:
+            warn(f'mic stream: error en el barge-in: {e}')
+
+    def _calibrate(self, buffer):
+        energy = chunk_energy(buffer, self._source.SAMPLE_WIDTH)
+        if not self.calibrated:
+            # Calibratge inicial: tots els fragments, com adjust_for_ambient_noise
+            update_energy_threshold(self.recognizer, energy, self._seconds_per_buffer)
+            with self._cond:
+                self._calibrated_s += self._seconds_per_buffer
+                self.stats['calibration_chunks'] += 1
+                done = self._calibrated_s >= self.calibration_s
+                if done:
+                    self._cond.notify_all()
+            if done:
+                gray_print(f'mic stream: calibrated, energy_threshold {self.recognizer.energy_threshold:.0f}')
+            return
+        if self.should_calibrate is not None and not self.should_calibrate():
+            return
+        # Només soroll de fons: la veu de l'usuari no ha d'apujar el llindar
+        if energy > self.recognizer.energy_threshold:
+            return
+        update_energy_threshold(self.recognizer, energy, self._seconds_per_buffer)
+        with self._cond:
+            self.stats['calibration_chunks'] += 1
+
+    def read(self, size=None):
+        """
+        Següent fragment capturat mentre s'escolta (el llegeix recognizer.listen).
+
+        Returns:
+            bytes: Fragment PCM, o b'' si el micròfon s'ha aturat
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending or not self._running)
+            if self._pending:
+                return self._pending.popleft()
+            return b''
+
+    def listen(self, **kwargs):
+        """
+        Escolta una frase amb el Recognizer sobre el micròfon ja obert.
+
+        Els arguments es passen a recognizer.listen (timeout, phrase_time_limit...);
+        el camí VAD no en fa servir cap.
+
+        Returns:
+            sr.AudioData: Àudio capturat, o None si el micròfon s'ha aturat sense frase
+        """
+        with self._cond:
+            # El calibratge inicial dura MIC_CALIBRATION_S des de l'arrencada, no per torn
+            self._cond.wait_for(lambda: self._calibrated_s >= self.calibration_s or not self._running)
+            if not self._capturing:
+                self._pending.clear()
+            # Després d'un barge-in, la frase ja ha començat: es conserva l'àudio acumulat
+            self._capturing = False
+            self._listening = True
+            self.stats['turns'] += 1
+        try:
+            if self.vad_options is None:
+                return self.recognizer.listen(self._source, **kwargs)
+            while True:
+                audio = self._listen_vad()
+                if audio is not _REJECTED:
+                    return audio
+                with self._cond:
+                    self.stats['gated_phrases'] += 1
+        finally:
+            with self._cond:
+                self._listening = False
+                self._pending.clear()
+
+    def _open_stream(self, factory):
+        try:
+            return factory(self._source.SAMPLE_RATE)
+        except Exception as e:
+            warn(f'mic stream: no es pot escoltar la frase en streaming: {e}')
+            return None
+
+    def _listen_vad(self):
+        vad = VoiceActivityDetector(
+            self._source.SAMPLE_RATE, lambda: self.recognizer.energy_threshold, **self.vad_options
+        )
+        self._streamed = None
+        transcriber = gate_session = None
+        streams_open = False
+        streamed_frames = 0
+        discarded = 0
+        # El torn nou pot començar mentre acaben les accions de l'anterior: també s'interrompen
+        watch_barge_in = self._barge_in is not None and self.barge_in_armed is not None
+        if watch_barge_in:
+            self._barge_in.reset()
+        while not vad.done:
+            buffer = self.read()
+            if not buffer:
+                break
+            for energy in vad.feed(buffer):
+                # Mentre s'espera la veu, el soroll de fons continua calibrant el llindar
+                update_energy_threshold(self.recognizer, energy, vad.frame_s)
+            if watch_barge_in and self.barge_in_armed() and self._barge_in.feed(buffer):
+                watch_barge_in = False
+                self._fire_barge_in()
+            if self.transcriber_factory is None and self.phrase_gate is None:
+                continue
+            if vad.stats['discarded'] != discarded:
+                # El VAD ha descartat un cop curt: la frase torna a començar
+                discarded = vad.stats['discarded']
+                _cancel(transcriber, gate_session)
+                transcriber = gate_session = None
+                streams_open, streamed_frames = False, 0
+            if vad.speaking:
+                if not streams_open:
+                    streams_open = True
+                    if self.transcriber_factory is not None:
+                        transcriber = self._open_stream(self.transcriber_factory)
+                    if self.phrase_gate is not None:
+                        gate_session = self._open_stream(self.phrase_gate.open)
+                if transcriber is not None or gate_session is not None:
+                    # Només les trames noves de la frase (pre-roll inclòs la primera vegada)
+                    new_audio, streamed_frames = vad.phrase_audio(streamed_frames)
+                    for stream in (transcriber, gate_session):
+                        if stream is not None:
+                            stream.feed(new_audio)
+        self.last_listen = {
+            'speech_s': vad.speech_s,
+            'trailing_silence_s': vad.trailing_silence_s,
+            'fast_end': vad.stats['fast_end'],
+            'discarded': vad.stats['discarded'],
+        }
+        if not vad.speaking:
+            _cancel(transcriber, gate_session)
+            return None
+        gray_print(f"vad: speech {vad.speech_s:.2f} s, end after {vad.trailing_silence_s:.2f} s of silence"
+                   f"{' (fast)' if vad.stats['fast_end'] else ''}, {vad.stats['discarded']} discarded")
+        if self.phrase_gate is not None:
+            accepted, self.last_listen['gate'] = self.phrase_gate.check(gate_session)
+            if not accepted:
+                _cancel(transcriber)
+                return _REJECTED
+        audio_factory = self.audio_factory
+        if audio_factory is None:
+            import speech_recognition as sr
+            audio_factory = sr.AudioData
+        audio = audio_factory(vad.audio, self._source.SAMPLE_RATE, self._source.SAMPLE_WIDTH)
+        if transcriber is not None:
+            self._streamed = (audio, transcriber)
+        return audio
+
+    def streamed_transcript(self, audio):
+        """
+        Transcripció en streaming de la frase que ha retornat listen().
+
+        Returns:
+            str: Text final, o None si aquesta frase no s'ha transcrit en streaming
+                 (sense transcriptor, àudio d'una altra frase, error o temps esgotat)
+        """
+        streamed, self._streamed = self._streamed, None
+        if streamed is None or streamed[0] is not audio:
+            return None
+        transcriber = streamed[1]
+        text = transcriber.finish()
+        if text is not None and self.last_listen is not None:
+            self.last_listen['stream_final_s'] = transcriber.stats['final_wait_s']
+            self.last_listen['stream_partials'] = transcriber.stats['partials']
+        return text
@@ -2,10 +2,15 @@
 OpenAI API helper - Responses API (replaces deprecated Assistants API).
 """
 from openai import OpenAI
+import base64
+import threading
 import time
 import os
 import json
 
+from json_stream import JsonFieldStream
+from stt_audio import encode_stt_audio
+
 # utils
 # =================================================================
 def chat_print(label, message):
@@ -16,7 +21,12 @@ def chat_print(label, message):
 class OpenAiHelper():
     STT_OUT = "stt_output.wav"
     TTS_OUTPUT_FILE = 'tts_output.mp3'
+    TTS_MODEL = "gpt-4o-mini-tts"
+    TTS_STREAM_CHUNK_SIZE = 4096  # bytes per fragment en mode streaming
     TIMEOUT = 30  # seconds
+    RESPONSES_STREAMING = True  # Parsejar la resposta a mesura que arriba quan hi ha on_field
+    STT_COMPRESSION = True  # Remostrejar a 16 kHz i comprimir l'àudio abans de pujar-lo (stt_audio)
+    KEEPALIVE_IDLE = 5.0  # segons que el client HTTP (httpx) manté oberta una connexió inactiva
 
 
     def __init__(self, api_key, prompt_id=None, timeout=None):
@@ -26,23 +36,82 @@ class OpenAiHelper():
         self.client = OpenAI(api_key=api_key, timeout=timeout)
         self.prompt_id = prompt_id
         self._last_response_id = None
+        self.last_stt_stats = None  # mida pujada i temps de l'últim stt()
+        self._last_request = 0.0  # última petició a l'API (time.time())
+        self._warmed = False  # ja s'ha preescalfat des de l'última petició
+
+    def _stt_file(self, audio):
+        """Fitxer en memòria per a l'STT i les seves estadístiques."""
+        from io import BytesIO
+        if self.STT_COMPRESSION:
+            data, extension, stats = encode_stt_audio(audio)
+        else:
+            data, extension = audio.get_wav_data(), 'wav'
+            stats = {'format': 'wav', 'native_bytes': len(data), 'wav_bytes': len(data),
+                     'upload_bytes': len(data), 'encode_s': 0.0}
+        audio_file = BytesIO(data)
+        audio_file.name = os.path.splitext(self.STT_OUT)[0] + '.' + extension
+        return audio_file, stats
+
+    def _mark_request(self):
+        """Apunta que la connexió s'acaba de fer servir (el torn següent pot tornar a preescalfar)."""
+        self._last_request = time.time()
+        self._warmed = False
 
     def stt(self, audio, language='en'):
+        self.last_stt_stats = None
+        self._mark_request()
         try:
-            from io import BytesIO
-            wav_data = BytesIO(audio.get_wav_data())
-            wav_data.name = self.STT_OUT
+            audio_file, stats = self._stt_file(audio)
+            st = time.time()
             transcript = self.client.audio.transcriptions.create(
                 model="whisper-1",
-                file=wav_data,
+                file=audio_file,
                 language=language,
                 prompt="aquesta és una conversa entre jo i un robot"
             )
+            stats['stt_s'] = time.time() - st
+            self.last_stt_stats = stats
             return transcript.text
         except Exception as e:
             print(f"stt err:{e}")
             return False
 
+    def warm_up_connection(self, block=True):
+        """
+        Obre (o manté viva) la connexió HTTPS amb l'API abans de la petició del torn.
+
+        Es crida quan arriba una transcripció parcial: la petició al model
+        reutilitza la connexió del client i s'estalvia el DNS i l'encaixada TLS.
+
+        Cada preescalfament és una petició (models.retrieve) que no és gratis en
+        temps ni en quota, així que se'n fa com a molt un per torn (fins a la
+        petició següent) i només si la connexió fa més de KEEPALIVE_IDLE que
+        no s'usa; si no, encara és oberta i no cal.
+
+        Args:
+            block: False = fer la petició en un fil a part
+
+        Returns:
+            bool: False si no ha calgut preescalfar
+        """
+        if self._warmed or time.time() - self._last_request < self.KEEPALIVE_IDLE:
+            return False
+        self._warmed = True
+        if block:
+            self._warm_up_request()
+        else:
+            warm_thread = threading.Thread(target=self._warm_up_request)
+            warm_thread.daemon = True
+            warm_thread.start()
+        return True
+
+    def _warm_up_request(self):
+        try:
+            self.client.models.retrieve("whisper-1")
+        except Exception as e:
+            print(f"warm up err: {e}")
+
     def speech_recognition_stt(self, recognizer, audio):
         import speech_recognition as sr
         try:
@@ -60,8 +129,16 @@ class OpenAiHelper():
         except (TypeError, ValueError):
             return str(value)
 
-    def _call_responses_api(self, input_items):
-        """Crida la Responses API i retorna la resposta parsejada o None."""
+    def _call_responses_api(self, input_items, on_field=None):
+        """
+        Crida la Responses API i retorna la resposta parsejada o None.
+
+        Si es passa on_field i RESPONSES_STREAMING està actiu, la resposta es
+        rep en streaming i on_field(clau, valor) es crida per a cada camp de
+        primer nivell del JSON tan bon punt és complet. Si el streaming falla
+        abans d'emetre cap camp, es repeteix la crida bloquejant.
+        """
+        self._mark_request()
         kwargs = {
             "prompt": {"id" : self.prompt_id},
             "input": input_items,
@@ -70,12 +147,22 @@ class OpenAiHelper():
         if self._last_response_id:
             kwargs["previous_response_id"] = self._last_response_id
 
+        if on_field is not None and self.RESPONSES_STREAMING:
+            ok, result = self._call_responses_api_stream(kwargs, on_field)
+            if ok:
+                return result
+            print("Responses API stream: fallback a la crida bloquejant")
+
         try:
             response = self.client.responses.create(**kwargs)
         except Exception as e:
             print(f"Responses API err: {e}")
             return None
 
+        return self._handle_response(response)
+
+    def _handle_response(self, response, text=None):
+        """Comprova l'estat d'una resposta completa i en retorna el valor parsejat."""
         if response.status != "completed":
             print(f"Response status: {response.status}")
             if hasattr(response, 'last_error') and response.last_error is not None:
@@ -86,34 +173,89 @@ class OpenAiHelper():
             return None
 
         self._last_response_id = response.id
-        text = getattr(response, 'output_text', None) or ""
+        text = getattr(response, 'output_text', None) or text or ""
         if text:
             chat_print("response", text)
             return self._parse_response_value(text)
         return None
 
-    def dialogue(self, msg):
+    def _call_responses_api_stream(self, kwargs, on_field):
+        """
+        Crida la Responses API en streaming.
+
+        Returns:
+            tuple: (ok, resposta). ok és False si ha fallat abans d'emetre cap
+                   camp (es pot repetir la crida sense duplicar accions)
+        """
+        parser = JsonFieldStream(on_field)
+        final = None
+        try:
+            for event in self.client.responses.create(stream=True, **kwargs):
+                event_type = getattr(event, 'type', '')
+                if event_type == 'response.output_text.delta':
+                    parser.feed(event.delta)
+                elif event_type in ('response.completed', 'response.incomplete', 'response.failed'):
+                    final = event.response
+                elif event_type == 'error':
+                    raise RuntimeError(getattr(event, 'message', 'error'))
+        except Exception as e:
+            print(f"Responses API stream err: {e}")
+            if not parser.emitted:
+                return False, None
+            # Ja s'han despatxat camps: no es repeteix la crida, es retorna el que ha arribat
+            return True, dict(parser.fields)
+
+        if final is None:
+            print("Responses API stream err: resposta sense esdeveniment final")
+            if not parser.emitted:
+                return False, None
+            return True, dict(parser.fields)
+        return True, self._handle_response(final, parser.text)
+
+    def dialogue(self, msg, on_field=None):
         chat_print("user", msg)
         msg_with_lang = self._prepare_message_with_language(msg)
-        return self._call_responses_api(msg_with_lang)
+        return self._call_responses_api(msg_with_lang, on_field)
 
-    def dialogue_with_img(self, msg, img_path):
-        chat_print("user", msg)
+    def upload_image(self, img_path):
+        """Puja una imatge per a visió i en retorna l'id de fitxer."""
+        self._mark_request()
         with open(img_path, "rb") as f:
-            img_file = self.client.files.create(file=f, purpose="vision")
+            return self.client.files.create(file=f, purpose="vision").id
+
+    @staticmethod
+    def image_data_url(jpeg_bytes):
+        """Converteix una imatge JPEG en memòria en una data URL per enviar-la dins la petició."""
+        return "data:image/jpeg;base64," + base64.b64encode(jpeg_bytes).decode('ascii')
+
+    def dialogue_with_img(self, msg, img_path=None, file_id=None, on_field=None, image_bytes=None):
+        """
+        Diàleg amb imatge. Si ja s'ha pujat (upload_image, p. ex. mentre es feia
+        l'STT), es pot passar file_id i no es torna a pujar. Amb image_bytes
+        (JPEG codificat en memòria) la imatge va dins la mateixa petició, sense
+        passar per disc ni fer una pujada a part.
+        """
+        chat_print("user", msg)
+        if image_bytes is not None:
+            image_item = {"type": "input_image", "image_url": self.image_data_url(image_bytes)}
+        else:
+            if file_id is None:
+                file_id = self.upload_image(img_path)
+            image_item = {"type": "input_image", "file_id": file_id}
         msg_with_lang = self._prepare_message_with_language(msg)
         input_items = [
             {
                 "role": "user",
                 "content": [
                     {"type": "input_text", "text": msg_with_lang},
-                    {"type": "input_image", "file_id": img_file.id},
+                    image_item,
                 ],
             }
         ]
-        return self._call_responses_api(input_items)
+        return self._call_responses_api(input_items, on_field)
 
     def text_to_speech(self, text, output_file, voice='alloy', response_format="mp3", speed=1, instructions=''):
+        self._mark_request()
         try:
             dir_path = os.path.dirname(output_file)
             if not os.path.exists(dir_path):
@@ -122,7 +264,7 @@ class OpenAiHelper():
                 raise FileExistsError(f"'{dir_path}' is not a directory")
 
             with self.client.audio.speech.with_streaming_response.create(
-                model="gpt-4o-mini-tts",
+                model=self.TTS_MODEL,
                 voice=voice,
                 input=text,
                 response_format=response_format,
@@ -134,3 +276,30 @@ class OpenAiHelper():
         except Exception as e:
             print(f'tts err: {e}')
             return False
+
+    def text_to_speech_stream(self, text, voice='alloy', response_format="pcm", speed=1, instructions='',
+                              chunk_size=None):
+        """
+        Genera veu i retorna els fragments d'àudio a mesura que arriben de la xarxa.
+
+        A diferència de text_to_speech, no escriu res a disc. Amb response_format='pcm'
+        els fragments són PCM 16 bits mono a 24 kHz, llestos per enviar a l'altaveu.
+        Els errors es propaguen perquè qui consumeix pugui decidir si cal fallback.
+
+        Yields:
+            bytes: Fragments d'àudio en l'ordre de recepció
+        """
+        if chunk_size is None:
+            chunk_size = self.TTS_STREAM_CHUNK_SIZE
+        self._mark_request()
+        with self.client.audio.speech.with_streaming_response.create(
+            model=self.TTS_MODEL,
+            voice=voice,
+            input=text,
+            response_format=response_format,
+            speed=speed,
+            instructions=instructions,
+        ) as response:
+            for chunk in response.iter_bytes(chunk_size):
+                if chunk:
+                    yield chunk
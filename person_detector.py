@@ -0,0 +1,257 @@
+"""
+Detector de persones propi per al seguiment visual, més lleuger que el de Vilib.
+
+Vilib.face_detect_switch(True) passa el detector de cares (cascada Haar
+d'OpenCV) pel fotograma sencer a cada fotograma. PersonDetector fa servir
+la mateixa cascada però:
+
+- només cada full_every fotogrames busca al fotograma sencer (reduït a
+  DETECTOR_FULL_SCALE);
+- entre mig, busca cada persona ja trobada dins una regió petita al voltant
+  d'on es preveu que serà (posició + velocitat), reduïda perquè la cara
+  faci DETECTOR_ROI_FACE_PX i amb la mida de cara limitada a prop de
+  l'anterior;
+- si no la troba a la regió, el fotograma següent torna a ser complet;
+- sense ningú a la vista, els fotogrames entre deteccions completes no es
+  processen;
+- full_every s'adapta a la càrrega: creix si el detector gasta més de
+  DETECTOR_CPU_BUDGET del temps entre fotogrames o el sistema va carregat
+  (DETECTOR_MAX_SYSTEM_LOAD) i baixa quan hi ha marge.
+
+Retorna la detecció amb el format de Vilib.detect_obj_parameter (human_*
+de la persona més gran) més la llista 'people' de totes les persones.
+"""
+
+import os
+import time
+
+
+DETECTOR_FULL_EVERY = 5  # Fotogrames entre deteccions al fotograma sencer (valor inicial)
+DETECTOR_MIN_FULL_EVERY = 2  # Mínim de full_every quan hi ha CPU de sobres
+DETECTOR_MAX_FULL_EVERY = 15  # Màxim de full_every amb el sistema carregat
+DETECTOR_CPU_BUDGET = 0.25  # Fracció màxima del temps entre fotogrames que pot gastar el detector
+DETECTOR_MAX_SYSTEM_LOAD = 0.85  # Càrrega per nucli per sobre de la qual s'espaien les deteccions completes
+DETECTOR_FULL_SCALE = 0.5  # Reducció del fotograma per a la detecció completa
+DETECTOR_ROI_MARGIN = 0.75  # Marge de la regió de cerca per costat (fracció de la mida de la cara)
+DETECTOR_ROI_SIZE_RANGE = (0.6, 1.6)  # Mida mínima i màxima de la cara a la regió (respecte l'anterior)
+DETECTOR_MIN_FACE = 40  # Mida mínima de cara al fotograma sencer (píxels del fotograma original)
+DETECTOR_ROI_FACE_PX = 48  # Mida a què es redueix la cara a la regió (la cascada treballa amb 24 px)
+DETECTOR_LOAD_SMOOTHING = 0.2  # Pes de la mesura nova en la mitjana mòbil del temps del detector
+
+HAAR_CASCADE = 'haarcascade_frontalface_default.xml'
+HAAR_CASCADE_DIRS = [  # a més de cv2.data.haarcascades (no existeix a l'OpenCV d'apt)
+    '/usr/share/opencv4/haarcascades',
+    '/usr/share/opencv/haarcascades',
+]
+
+
+def find_cascade(name=HAAR_CASCADE):
+    """
+    Busca el fitxer de la cascada Haar.
+
+    Returns:
+        str: Ruta del fitxer, o None si no es troba
+    """
+    dirs = list(HAAR_CASCADE_DIRS)
+    try:
+        import cv2
+        data = getattr(cv2, 'data', None)
+        if data is not None:
+            dirs.insert(0, data.haarcascades)
+    except ImportError:
+        return None
+    for directory in dirs:
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def system_load():
+    """Càrrega mitjana de l'últim minut per nucli (0 si no es pot llegir)."""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return 0.0
+
+
+class HaarBackend():
+    """
+    Detector de cares d'OpenCV (cascada Haar, el mateix tipus que fa servir Vilib).
+
+    Es crida amb una imatge (o una regió) BGR o en grisos i retorna les cares
+    com a (x0, y0, w, h) en píxels de la imatge rebuda.
+
+    Args:
+        path: Fitxer de la cascada (None = find_cascade())
+    """
+
+    def __init__(self, path=None):
+        self.path = path if path is not None else find_cascade()
+        self._cascade = None
+
+    @property
+    def available(self):
+        """Cert si la cascada es pot carregar."""
+        if self._cascade is None and self.path:
+            try:
+                import cv2
+                cascade = cv2.CascadeClassifier(self.path)
+                if not cascade.empty():
+                    self._cascade = cascade
+            except Exception as e:
+                print(f'[Visual Tracking] No es pot carregar la cascada {self.path}: {e}')
+                self.path = None
+        return self._cascade is not None
+
+    def __call__(self, image, scale=1.0, min_size=DETECTOR_MIN_FACE, max_size=None):
+        import cv2
+        if not self.available:
+            return []
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        if scale != 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        min_px = max(int(min_size * scale), 12)
+        max_px = (int(max_size * scale),) * 2 if max_size else ()
+        faces = self._cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=4,
+                                               minSize=(min_px, min_px), maxSize=max_px)
+        return [(x / scale, y / scale, w / scale, h / scale) for x, y, w, h in faces]
+
+
+class PersonDetector():
+    """
+    Detecció completa cada full_every fotogrames i cerca per regió entre mig
+    (vegeu el docstring del mòdul).
+
+    Args:
+        backend: Detector (imatge, scale, min_size, max_size) -> [(x0, y0, w, h)]
+                 (None = HaarBackend)
+        full_every: Fotogrames entre deteccions completes (valor inicial)
+        min_every, max_every: Límits de l'adaptació de full_every
+        cpu_budget: Fracció del temps entre fotogrames que pot gastar el detector
+        max_system_load: Càrrega per nucli a partir de la qual s'espaien les completes
+        load_fn: Funció sense arguments que retorna la càrrega del sistema per nucli
+    """
+
+    def __init__(self, backend=None, full_every=DETECTOR_FULL_EVERY, min_every=DETECTOR_MIN_FULL_EVERY,
+                 max_every=DETECTOR_MAX_FULL_EVERY, cpu_budget=DETECTOR_CPU_BUDGET,
+                 max_system_load=DETECTOR_MAX_SYSTEM_LOAD, load_fn=system_load):
+        self.backend = backend if backend is not None else HaarBackend()
+        self.full_every = full_every
+        self.min_every = min_every
+        self.max_every = max_every
+        self.cpu_budget = cpu_budget
+        self.max_system_load = max_system_load
+        self.load_fn = load_fn
+        self.duty = 0.0  # mitjana mòbil de (temps del detector / temps entre fotogrames)
+        self._people = []  # [x, y, w, h, vx, vy] amb x, y al centre i velocitat en px/fotograma
+        self._since_full = None  # None = el fotograma següent ha de ser complet
+        self._last_t = None
+        self.stats = {'frames': 0, 'full': 0, 'roi': 0, 'roi_misses': 0, 'skipped': 0, 'busy_s': 0.0}
+
+    @property
+    def available(self):
+        return getattr(self.backend, 'available', True)
+
+    def detect(self, img, t=None):
+        """
+        Detecta les persones d'un fotograma.
+
+        Args:
+            img: Fotograma (array d'alçada x amplada [x canals])
+            t: Instant del fotograma (None = ara)
+
+        Returns:
+            dict: human_n, human_x, human_y, human_w, human_h (la persona més
+            gran) i people (llista de (x, y, w, h) amb x, y al centre)
+        """
+        t = time.time() if t is None else t
+        st = time.perf_counter()
+        self.stats['frames'] += 1
+        full = self._since_full is None or self._since_full + 1 >= self.full_every
+        if full:
+            self._people = self._match(self._full(img))
+            self._since_full = 0
+            self.stats['full'] += 1
+        elif not self._people:
+            # Ningú a la vista: fins a la propera detecció completa no hi ha on buscar
+            self._since_full += 1
+            self.stats['skipped'] += 1
+        else:
+            self._since_full += 1
+            self.stats['roi'] += 1
+            found = []
+            for person in self._people:
+                box = self._search_roi(img, person)
+                if box is None:
+                    # Perduda a la regió: el fotograma següent es busca a tot arreu
+                    self.stats['roi_misses'] += 1
+                    self._since_full = None
+                else:
+                    found.append(self._follow(person, box))
+            self._people = found
+        elapsed = time.perf_counter() - st
+        self.stats['busy_s'] += elapsed
+        self._adapt(elapsed, t, full)
+        return self._params()
+
+    def _full(self, img):
+        boxes = self.backend(img, scale=DETECTOR_FULL_SCALE, min_size=DETECTOR_MIN_FACE)
+        return [(x0 + w / 2, y0 + h / 2, w, h) for x0, y0, w, h in boxes]
+
+    def _search_roi(self, img, person):
+        x, y, w, h, vx, vy = person
+        x, y = x + vx, y + vy  # on serà ara
+        size = max(w, h)
+        margin = size * (0.5 + DETECTOR_ROI_MARGIN)
+        frame_h, frame_w = img.shape[:2]
+        x0, x1 = int(max(0, x - margin)), int(min(frame_w, x + margin))
+        y0, y1 = int(max(0, y - margin)), int(min(frame_h, y + margin))
+        if x1 - x0 < size * 0.5 or y1 - y0 < size * 0.5:
+            return None
+        low, high = DETECTOR_ROI_SIZE_RANGE
+        scale = min(1.0, DETECTOR_ROI_FACE_PX / size)
+        boxes = self.backend(img[y0:y1, x0:x1], scale=scale, min_size=size * low, max_size=size * high)
+        if not boxes:
+            return None
+        # La cara més propera a la posició prevista
+        bx0, by0, bw, bh = min(boxes, key=lambda b: (x0 + b[0] + b[2] / 2 - x) ** 2 + (y0 + b[1] + b[3] / 2 - y) ** 2)
+        return (x0 + bx0 + bw / 2, y0 + by0 + bh / 2, bw, bh)
+
+    @staticmethod
+    def _follow(person, box):
+        return [box[0], box[1], box[2], box[3], box[0] - person[0], box[1] - person[1]]
+
+    def _match(self, boxes):
+        """Conserva la velocitat de les persones que ja es seguien (la més propera de cada capsa)."""
+        people = []
+        for box in boxes:
+            near = [p for p in self._people if abs(p[0] - box[0]) < p[2] and abs(p[1] - box[1]) < p[3]]
+            if near:
+                # La posició anterior és del fotograma anterior (cerca per regió)
+                people.append(self._follow(min(near, key=lambda p: (p[0] - box[0]) ** 2 + (p[1] - box[1]) ** 2), box))
+            else:
+                people.append([box[0], box[1], box[2], box[3], 0.0, 0.0])
+        return people
+
+    def _adapt(self, elapsed, t, full):
+        if self._last_t is not None and t > self._last_t:
+            duty = elapsed / (t - self._last_t)
+            self.duty += DETECTOR_LOAD_SMOOTHING * (duty - self.duty)
+        self._last_t = t
+        if not full:
+            return
+        # El cost d'un fotograma complet es reparteix entre els full_every següents
+        load = self.load_fn() if self.load_fn is not None else 0.0
+        if self.duty > self.cpu_budget or load > self.max_system_load:
+            self.full_every = min(self.max_every, self.full_every + 1)
+        elif self.duty < self.cpu_budget / 2 and load < self.max_system_load * 0.8:
+            self.full_every = max(self.min_every, self.full_every - 1)
+
+    def _params(self):
+        people = [tuple(person[:4]) for person in self._people]
+        if not people:
+            return {'human_n': 0, 'people': []}
+        x, y, w, h = max(people, key=lambda box: box[2] * box[3])
+        return {'human_n': len(people), 'human_x': int(x), 'human_y': int(y),
+                'human_w': int(w), 'human_h': int(h), 'people': people}
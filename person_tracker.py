@@ -0,0 +1,211 @@
+"""
+Seguiment de diverses persones amb identificador persistent.
+
+Vilib només dona una detecció per fotograma (la cara més gran): amb dues
+persones davant la càmera, la detecció salta de l'una a l'altra i la càmera
+les persegueix alternativament. PersonTracker manté una pista per persona:
+
+- cada fotograma, les deteccions s'assignen a les pistes existents per
+  solapament (IoU) o, si no se solapen, per proximitat dels centres;
+- una pista sense detecció envelleix i desapareix després de
+  TRACK_MAX_MISSES fotogrames (la persona ha marxat);
+- el seguiment es fixa en una pista (la primera que s'ha seguit o la de qui
+  ha parlat, lock_largest) i no en canvia mentre la pista visqui.
+
+Les deteccions són capses (x, y, w, h) amb x, y el centre, en píxels del
+fotograma, com human_x / human_y / human_w / human_h de Vilib. Un detector
+que en vegi més d'una pot passar-les totes a detect_obj_parameter['people'].
+"""
+
+import threading
+
+
+TRACK_MIN_IOU = 0.2  # Solapament mínim per assignar una detecció a una pista
+TRACK_MAX_DISTANCE = 0.15  # Distància màxima entre centres sense solapament (fracció de l'amplada)
+TRACK_MAX_MISSES = 8  # Fotogrames sense detecció abans d'esborrar una pista
+TRACK_CONFIRM_HITS = 2  # Deteccions perquè una pista nova es pugui seguir (evita falsos positius)
+TRACK_DEFAULT_SIZE = 80  # Mida (px) de la capsa si la detecció no en porta
+
+
+def boxes_from_detection(params):
+    """
+    Capses de persona d'una detecció de Vilib.
+
+    Args:
+        params: detect_obj_parameter ('people' = llista de (x, y, w, h) o,
+                si no n'hi ha, human_n / human_x / human_y / human_w / human_h)
+
+    Returns:
+        Llista de tuples (x, y, w, h)
+    """
+    if not isinstance(params, dict):
+        return []
+    people = params.get('people')
+    if people is not None:
+        return [tuple(float(v) for v in box) for box in people]
+    if not params.get('human_n', 0):
+        return []
+    return [(float(params.get('human_x', 0)), float(params.get('human_y', 0)),
+             float(params.get('human_w') or TRACK_DEFAULT_SIZE), float(params.get('human_h') or TRACK_DEFAULT_SIZE))]
+
+
+def iou(a, b):
+    """Intersecció sobre unió de dues capses (x, y, w, h) amb x, y al centre."""
+    ax0, ax1 = a[0] - a[2] / 2, a[0] + a[2] / 2
+    ay0, ay1 = a[1] - a[3] / 2, a[1] + a[3] / 2
+    bx0, bx1 = b[0] - b[2] / 2, b[0] + b[2] / 2
+    by0, by1 = b[1] - b[3] / 2, b[1] + b[3] / 2
+    w = min(ax1, bx1) - max(ax0, bx0)
+    h = min(ay1, by1) - max(ay0, by0)
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+class Track():
+    """Una persona seguida: última capsa, deteccions, fotogrames sense detecció."""
+
+    __slots__ = ('id', 'x', 'y', 'w', 'h', 'hits', 'misses', 'last_seen')
+
+    def __init__(self, track_id, box, t):
+        self.id = track_id
+        self.x, self.y, self.w, self.h = box
+        self.hits = 1
+        self.misses = 0
+        self.last_seen = t
+
+    @property
+    def box(self):
+        return (self.x, self.y, self.w, self.h)
+
+    @property
+    def visible(self):
+        """Cert si s'ha vist al darrer fotograma."""
+        return self.misses == 0
+
+    def __repr__(self):
+        return f'Track({self.id}, x={self.x:.0f}, y={self.y:.0f}, hits={self.hits}, misses={self.misses})'
+
+
+class PersonTracker():
+    """
+    Pistes de persones i persona seguida (vegeu el docstring del mòdul).
+
+    Args:
+        frame_width: Amplada del fotograma (per a la distància màxima)
+        min_iou: Solapament mínim per assignar per IoU
+        max_distance: Distància màxima entre centres (fracció de frame_width)
+        max_misses: Fotogrames sense detecció abans d'esborrar una pista
+        confirm_hits: Deteccions perquè una pista es pugui seguir
+    """
+
+    def __init__(self, frame_width=640, min_iou=TRACK_MIN_IOU, max_distance=TRACK_MAX_DISTANCE,
+                 max_misses=TRACK_MAX_MISSES, confirm_hits=TRACK_CONFIRM_HITS):
+        self.max_distance_px = max_distance * frame_width
+        self.min_iou = min_iou
+        self.max_misses = max_misses
+        self.confirm_hits = confirm_hits
+        self.tracks = []
+        self.locked_id = None
+        self._next_id = 1
+        self._lock_largest = False
+        self._lock = threading.Lock()
+        self.stats = {'tracks': 0, 'lock_changes': 0}
+
+    def _match_cost(self, track, box):
+        """Cost d'assignar box a track (menor és millor), o None si no és compatible."""
+        overlap = iou(track.box, box)
+        if overlap >= self.min_iou:
+            return 1.0 - overlap
+        distance = ((track.x - box[0]) ** 2 + (track.y - box[1]) ** 2) ** 0.5
+        if distance <= self.max_distance_px:
+            return 1.0 + distance / self.max_distance_px
+        return None
+
+    def update(self, boxes, t=None):
+        """
+        Assigna les deteccions d'un fotograma a les pistes.
+
+        Args:
+            boxes: Llista de (x, y, w, h) del fotograma
+            t: Instant del fotograma
+
+        Returns:
+            Track seguida (pot no ser visible en aquest fotograma) o None
+        """
+        with self._lock:
+            # Assignació voraç pel cost més baix: amb poques persones és pràcticament òptima
+            pairs = []
+            for ti, track in enumerate(self.tracks):
+                for bi, box in enumerate(boxes):
+                    cost = self._match_cost(track, box)
+                    if cost is not None:
+                        pairs.append((cost, ti, bi))
+            pairs.sort()
+            used_tracks, used_boxes = set(), set()
+            for _, ti, bi in pairs:
+                if ti in used_tracks or bi in used_boxes:
+                    continue
+                used_tracks.add(ti)
+                used_boxes.add(bi)
+                track = self.tracks[ti]
+                track.x, track.y, track.w, track.h = boxes[bi]
+                track.hits += 1
+                track.misses = 0
+                track.last_seen = t
+            for ti, track in enumerate(self.tracks):
+                if ti not in used_tracks:
+                    track.misses += 1
+            self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+            for bi, box in enumerate(boxes):
+                if bi not in used_boxes:
+                    self.tracks.append(Track(self._next_id, box, t))
+                    self._next_id += 1
+                    self.stats['tracks'] += 1
+            self._select_target()
+            return self._target()
+
+    def _target(self):
+        for track in self.tracks:
+            if track.id == self.locked_id:
+                return track
+        return None
+
+    def _select_target(self):
+        candidates = [track for track in self.tracks if track.visible and track.hits >= self.confirm_hits]
+        if self._lock_largest and candidates:
+            self._lock_largest = False
+            self._set_lock(max(candidates, key=lambda track: track.w * track.h).id)
+        elif self._target() is None:
+            # La persona seguida ha marxat (o encara no n'hi havia): la que fa més temps que es veu
+            self._set_lock(min(candidates, key=lambda track: track.id).id if candidates else None)
+
+    def _set_lock(self, track_id):
+        if track_id != self.locked_id and track_id is not None:
+            self.stats['lock_changes'] += 1
+        self.locked_id = track_id
+
+    @property
+    def target(self):
+        """Pista seguida, o None."""
+        with self._lock:
+            return self._target()
+
+    def lock_largest(self):
+        """
+        Fixa el seguiment en la persona més gran (la més propera) al fotograma següent.
+
+        Es crida quan algú acaba de parlar al robot: sense saber d'on ve la veu,
+        la persona més propera a la càmera és la que més probablement li parla.
+        """
+        with self._lock:
+            self._lock_largest = True
+
+    def reset(self):
+        """Oblida totes les pistes."""
+        with self._lock:
+            self.tracks = []
+            self.locked_id = None
+            self._lock_largest = False
@@ -1,8 +1,37 @@
-from time import sleep
+import threading
 import random
 from math import sin, cos, pi
 
 import visual_tracking
+from servo_output import flush_tick
+
+# Barge-in: quan l'usuari parla, gpt_car activa aquest esdeveniment i l'acció
+# s'atura a la pausa següent (entre dues ordres als servos, mai a mig moviment)
+_interrupt = threading.Event()
+
+
+class ActionInterrupted(Exception):
+    """L'acció s'ha aturat en un punt segur perquè l'usuari ha començat a parlar."""
+
+
+def set_interrupt_event(event):
+    """Fa servir `event` (threading.Event) per interrompre les accions."""
+    global _interrupt
+    _interrupt = event
+
+
+def sleep(seconds):
+    """
+    Pausa d'una acció; si arriba una interrupció, llança ActionInterrupted.
+
+    Abans d'esperar escriu les ordres als servos agrupades des de la pausa
+    anterior (servo_output): de dues ordres seguides al mateix servo, només
+    l'última arriba al bus I2C.
+    """
+    flush_tick()
+    if _interrupt.wait(seconds):
+        raise ActionInterrupted()
+
 
 def wave_hands(car):
     car.reset()
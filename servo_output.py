@@ -0,0 +1,357 @@
+"""
+Capa de sortida dels servos i motors del Picar-X.
+
+Cada ordre a un servo o motor de Picarx és una escriptura I2C al
+controlador PWM del Robot HAT, encara que el valor no canviï.
+ServoOutput embolcalla Picarx:
+
+- recorda l'últim valor escrit a cada servo i descarta les ordres que no el
+  canvien (diferència menor que SERVO_MIN_STEP_DEG, per sota de la
+  resolució del PWM); el mateix per als motors;
+- dins un tick (with output.tick(): ...), les ordres es guarden i s'escriuen
+  juntes en acabar el tick o quan l'acció fa una pausa (flush_tick); de
+  diverses ordres al mateix servo només s'escriu l'última;
+- compta les ordres rebudes, les escrites, les descartades i les escriptures
+  I2C (stats, report).
+
+stop() és l'ordre de seguretat: no es descarta mai per repetida.
+
+A més, arbitra qui mou cada actuador (pan, tilt, direcció, motors). Un fil
+que vol els actuadors en fa una reserva amb prioritat (claim / acquire):
+les ordres d'un fil a un actuador que un altre fil té reservat amb més
+prioritat no s'escriuen. Així el seguiment visual (PRIORITY_TRACKING) cedeix
+la càmera mentre una acció (PRIORITY_ACTION) la mou, en lloc de barallar-s'hi
+servo a servo. Les reserves de les accions són arrendaments: caduquen si
+no s'escriu res en ARBITER_LEASE_S, de manera que un fil encallat no bloqueja
+el robot per sempre. Qui ha engegat els motors sempre els pot aturar.
+
+La resta d'atributs de Picarx (get_distance, dir_current_angle...) passen
+tal qual.
+"""
+
+import contextlib
+import threading
+import time
+
+
+SERVO_MIN_STEP_DEG = 0.5  # Canvi mínim d'angle que s'escriu (el PWM té ~0.44° de resolució)
+
+# Escriptures I2C de cada ordre (PWM del Robot HAT); stop() de Picarx escriu dues vegades cada motor
+I2C_WRITES = {'servo': 1, 'motor': 1, 'forward': 2, 'backward': 2, 'stop': 4}
+
+# Límits dels servos a Picarx (s'hi retallen els angles abans de comparar)
+SERVO_LIMITS = {
+    'set_cam_pan_angle': ('CAM_PAN_MIN', 'CAM_PAN_MAX'),
+    'set_cam_tilt_angle': ('CAM_TILT_MIN', 'CAM_TILT_MAX'),
+    'set_dir_servo_angle': ('DIR_MIN', 'DIR_MAX'),
+}
+
+ACTUATORS = ('pan', 'tilt', 'steering', 'motors')
+SERVO_ACTUATORS = {  # mètode del servo -> actuador (la resta d'ordres són dels motors)
+    'set_cam_pan_angle': 'pan',
+    'set_cam_tilt_angle': 'tilt',
+    'set_dir_servo_angle': 'steering',
+}
+
+PRIORITY_DEFAULT = 0  # Fils sense reserva
+PRIORITY_TRACKING = 10  # Seguiment visual
+PRIORITY_ACTION = 20  # Accions predefinides (preset_actions)
+PRIORITY_SYSTEM = 30  # Aturada del robot en sortir
+ARBITER_LEASE_S = 5.0  # Caducitat d'una reserva sense ordres (més que la pausa més llarga d'una acció, 2.7 s)
+
+_local = threading.local()  # tick obert a cada fil: output i ordres pendents
+
+
+def flush_tick():
+    """Escriu les ordres pendents del tick obert en aquest fil (si n'hi ha)."""
+    output = getattr(_local, 'output', None)
+    if output is not None:
+        output.flush()
+
+
+def servo_tick(car):
+    """output.tick() si car és un ServoOutput; si no, un context que no fa res."""
+    if isinstance(car, ServoOutput):
+        return car.tick()
+    return contextlib.nullcontext()
+
+
+def servo_claim(car, owner, priority, actuators=ACTUATORS, lease_s=ARBITER_LEASE_S):
+    """output.claim(...) si car és un ServoOutput; si no, un context que no fa res."""
+    if isinstance(car, ServoOutput):
+        return car.claim(owner, priority, actuators, lease_s)
+    return contextlib.nullcontext()
+
+
+class Claim():
+    """Reserva d'actuadors d'un fil: propietari, prioritat i caducitat."""
+
+    __slots__ = ('owner', 'priority', 'actuators', 'lease_s', 'expires')
+
+    def __init__(self, owner, priority, actuators=ACTUATORS, lease_s=ARBITER_LEASE_S):
+        self.owner = owner
+        self.priority = priority
+        self.actuators = frozenset(actuators)
+        self.lease_s = lease_s
+        self.expires = None
+        self.renew()
+
+    def renew(self, now=None):
+        if self.lease_s is not None:
+            self.expires = (time.monotonic() if now is None else now) + self.lease_s
+
+    def expired(self, now):
+        return self.expires is not None and now >= self.expires
+
+    def __repr__(self):
+        return f'Claim({self.owner!r}, priority={self.priority})'
+
+
+class ServoOutput():
+    """
+    Picarx amb memòria de l'últim valor escrit i agrupació per ticks
+    (vegeu el docstring del mòdul).
+
+    Args:
+        car: Instància de Picarx
+        min_step: Canvi mínim d'angle que s'escriu (graus)
+    """
+
+    def __init__(self, car, min_step=SERVO_MIN_STEP_DEG):
+        self.car = car
+        self.min_step = min_step
+        self._angles = {}  # mètode del servo -> últim angle escrit
+        self._motors = {}  # motor (1, 2) -> última velocitat escrita amb set_motor_speed
+        self._drive = None  # última ordre de tracció: (mètode, velocitat, angle de direcció)
+        self._motor_owner = None  # fil que ha engegat els motors (sempre els pot aturar)
+        self._claims = {}  # fil -> Claim
+        self._lock = threading.RLock()
+        self.stats = {'requested': 0, 'written': 0, 'dropped': 0, 'coalesced': 0, 'blocked': 0, 'i2c': 0}
+
+    def __getattr__(self, name):
+        if name == 'car':
+            raise AttributeError(name)
+        return getattr(self.car, name)
+
+    # Servos
+
+    def set_cam_pan_angle(self, angle):
+        self._command('set_cam_pan_angle', (angle,))
+
+    def set_cam_tilt_angle(self, angle):
+        self._command('set_cam_tilt_angle', (angle,))
+
+    def set_dir_servo_angle(self, angle):
+        self._command('set_dir_servo_angle', (angle,))
+
+    # Motors
+
+    def set_motor_speed(self, motor, speed):
+        self._command(f'motor{motor}', (motor, speed))
+
+    def forward(self, speed):
+        self._command('drive', ('forward', speed))
+
+    def backward(self, speed):
+        self._command('drive', ('backward', speed))
+
+    def stop(self):
+        self._command('drive', ('stop',))
+
+    def reset(self):
+        """Com Picarx.reset(): servos a 0 i motors aturats."""
+        self.set_cam_tilt_angle(0)
+        self.set_cam_pan_angle(0)
+        self.set_dir_servo_angle(0)
+        self.stop()
+
+    # Ticks
+
+    @contextlib.contextmanager
+    def tick(self):
+        """
+        Agrupa les ordres d'aquest fil fins al final del bloc (o fins a flush()).
+
+        Els ticks es poden niar; les ordres s'escriuen en tancar el més extern.
+        """
+        if getattr(_local, 'output', None) is self:
+            yield self
+            return
+        previous = getattr(_local, 'output', None), getattr(_local, 'pending', None)
+        _local.output, _local.pending = self, {}
+        try:
+            yield self
+        finally:
+            try:
+                self.flush()
+            finally:
+                _local.output, _local.pending = previous
+
+    def flush(self):
+        """Escriu les ordres pendents del tick d'aquest fil, en l'ordre de l'última de cada una."""
+        if getattr(_local, 'output', None) is not self:
+            return
+        pending, _local.pending = _local.pending, {}
+        for key, args in pending.items():
+            self._write(key, args)
+        with self._lock:
+            # Una pausa de l'acció (preset_actions.sleep) també renova la reserva
+            mine = self._claims.get(threading.get_ident())
+            if mine is not None:
+                mine.renew()
+
+    # Arbitratge
+
+    def acquire(self, owner, priority, actuators=ACTUATORS, lease_s=ARBITER_LEASE_S):
+        """
+        Reserva actuadors per a les ordres d'aquest fil.
+
+        Args:
+            owner: Nom del propietari (per als logs)
+            priority: Prioritat (PRIORITY_*); guanya la més alta
+            actuators: Actuadors reservats (ACTUATORS)
+            lease_s: Segons sense ordres abans que caduqui (None = no caduca)
+
+        Returns:
+            Reserva anterior del fil (per a release), o None
+        """
+        with self._lock:
+            ident = threading.get_ident()
+            previous = self._claims.get(ident)
+            self._claims[ident] = Claim(owner, priority, actuators, lease_s)
+            return previous
+
+    def release(self, previous=None):
+        """Allibera la reserva d'aquest fil (i recupera previous, si n'hi havia)."""
+        with self._lock:
+            ident = threading.get_ident()
+            if previous is None:
+                self._claims.pop(ident, None)
+            else:
+                previous.renew()
+                self._claims[ident] = previous
+
+    @contextlib.contextmanager
+    def claim(self, owner, priority, actuators=ACTUATORS, lease_s=ARBITER_LEASE_S):
+        """acquire() durant el bloc."""
+        previous = self.acquire(owner, priority, actuators, lease_s)
+        try:
+            yield self
+        finally:
+            self.release(previous)
+
+    def owns(self, *actuators):
+        """Cert si les ordres d'aquest fil als actuadors s'escriurien ara."""
+        with self._lock:
+            return all(self._allowed(actuator, renew=False) for actuator in actuators)
+
+    def angle(self, actuator, default=None):
+        """Últim angle escrit al servo de l'actuador ('pan', 'tilt', 'steering'), o default."""
+        for key, name in SERVO_ACTUATORS.items():
+            if name == actuator:
+                with self._lock:
+                    return self._angles.get(key, default)
+        raise ValueError(f'actuador sense angle: {actuator}')
+
+    def _allowed(self, actuator, renew=True):
+        now = time.monotonic()
+        for ident, claim in list(self._claims.items()):
+            if claim.expired(now):
+                print(f'[Servos] Reserva caducada: {claim.owner}')
+                del self._claims[ident]
+        ident = threading.get_ident()
+        mine = self._claims.get(ident)
+        priority = mine.priority if mine is not None and actuator in mine.actuators else PRIORITY_DEFAULT
+        for other, claim in self._claims.items():
+            if other != ident and actuator in claim.actuators and claim.priority > priority:
+                return False
+        if renew and mine is not None:
+            mine.renew(now)
+        return True
+
+    def invalidate(self):
+        """Oblida els valors escrits (s'ha mogut el robot sense passar per aquí)."""
+        with self._lock:
+            self._angles.clear()
+            self._motors.clear()
+            self._drive = None
+
+    def _command(self, key, args):
+        with self._lock:
+            self.stats['requested'] += 1
+        if getattr(_local, 'output', None) is self:
+            pending = _local.pending
+            if key in pending:
+                # La nova substitueix l'anterior i passa al final (l'estat final és el mateix)
+                del pending[key]
+                with self._lock:
+                    self.stats['coalesced'] += 1
+            pending[key] = args
+            return
+        self._write(key, args)
+
+    def _write(self, key, args):
+        with self._lock:
+            actuator = SERVO_ACTUATORS.get(key, 'motors')
+            stopping_own = args == ('stop',) and self._motor_owner == threading.get_ident()
+            if not self._allowed(actuator) and not stopping_own:
+                self.stats['blocked'] += 1
+                return
+            if key == 'drive':
+                self._write_drive(args)
+            elif key.startswith('motor'):
+                motor, speed = args
+                if self._motors.get(motor) == speed:
+                    self.stats['dropped'] += 1
+                    return
+                self.car.set_motor_speed(motor, speed)
+                self._motors[motor] = speed
+                self._drive = None
+                self._motor_owner = threading.get_ident()
+                self._count('motor')
+            else:
+                angle = self._clamp(key, args[0])
+                last = self._angles.get(key)
+                if last is not None and abs(angle - last) < self.min_step:
+                    self.stats['dropped'] += 1
+                    return
+                getattr(self.car, key)(angle)
+                self._angles[key] = angle
+                self._count('servo')
+
+    def _write_drive(self, args):
+        method = args[0]
+        if method == 'stop':
+            self.car.stop()
+            self._motors = {1: 0, 2: 0}
+            self._drive = ('stop',)
+            self._motor_owner = None
+            self._count('stop')
+            return
+        # Picarx reparteix la potència entre les rodes segons la direcció
+        state = (method, args[1], self._angles.get('set_dir_servo_angle'))
+        if state == self._drive:
+            self.stats['dropped'] += 1
+            return
+        getattr(self.car, method)(args[1])
+        self._motors.clear()
+        self._drive = state
+        self._motor_owner = threading.get_ident()
+        self._count(method)
+
+    def _clamp(self, key, angle):
+        low, high = (getattr(self.car, name, None) for name in SERVO_LIMITS[key])
+        if isinstance(low, (int, float)) and isinstance(high, (int, float)):
+            return min(max(angle, low), high)
+        return angle
+
+    def _count(self, kind):
+        self.stats['written'] += 1
+        self.stats['i2c'] += I2C_WRITES[kind]
+
+    def report(self):
+        """Línia de log amb les ordres rebudes, escrites i estalviades."""
+        s = self.stats
+        return (f"[Servos] {s['requested']} ordres, {s['written']} escrites "
+                f"({s['dropped']} sense canvi, {s['coalesced']} agrupades, {s['blocked']} d'actuadors reservats), "
+                f"{s['i2c']} escriptures I2C")
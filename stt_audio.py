@@ -0,0 +1,135 @@
+"""
+Codificació de l'àudio de l'usuari abans de pujar-lo a l'STT.
+
+OpenAiHelper.stt enviava audio.get_wav_data(): WAV sense comprimir a la
+freqüència nativa del micròfon (44,1 kHz → ~88 KB per segon de veu) per la
+Wi-Fi del robot. Whisper treballa internament a 16 kHz mono, de manera que:
+
+- l'àudio es remostreja a 16 kHz, 16 bits (~32 KB/s);
+- les frases curtes s'envien així, en WAV: comprimir-les no compensa el cost
+  del codificador;
+- les mitjanes es comprimeixen en FLAC (sense pèrdua, ~50-60 %);
+- les llargues en Opus (opusenc o ffmpeg), ~3 KB/s.
+
+Si el codificador no hi és o falla, es baixa al format següent (Opus → FLAC
+→ WAV). encode_stt_audio retorna també la mida i el temps de codificació per
+veure el guany torn a torn.
+"""
+
+import shutil
+import subprocess
+import time
+
+
+STT_SAMPLE_RATE = 16000
+STT_SAMPLE_WIDTH = 2
+STT_WAV_MAX_BYTES = 64 * 1024  # ~2 s de veu a 16 kHz: per sota s'envia WAV
+STT_OPUS_MIN_BYTES = 320 * 1024  # ~10 s de veu a 16 kHz: per sobre s'envia Opus
+STT_FLAC_LEVEL = 5  # --best (8) és massa lent a la Raspberry Pi per al guany que dona
+STT_OPUS_BITRATE = 24  # kbps, suficient per a veu
+STT_ENCODER_TIMEOUT = 10  # segons
+
+
+def choose_stt_format(wav_bytes, wav_max_bytes=STT_WAV_MAX_BYTES, opus_min_bytes=STT_OPUS_MIN_BYTES):
+    """
+    Format preferit segons la mida del WAV a 16 kHz.
+
+    Returns:
+        str: 'wav', 'flac' o 'opus'
+    """
+    if wav_bytes <= wav_max_bytes:
+        return 'wav'
+    if wav_bytes >= opus_min_bytes:
+        return 'opus'
+    return 'flac'
+
+
+def _run_encoder(cmd, wav_data):
+    result = subprocess.run(cmd, input=wav_data, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                            timeout=STT_ENCODER_TIMEOUT, check=True)
+    if not result.stdout:
+        raise RuntimeError(f"{cmd[0]} no ha generat dades")
+    return result.stdout
+
+
+def encode_flac(wav_data):
+    """Comprimeix un WAV en FLAC amb el binari flac."""
+    flac = shutil.which('flac')
+    if flac is None:
+        raise FileNotFoundError("flac no està instal·lat")
+    return _run_encoder([flac, '--stdout', '--totally-silent', f'-{STT_FLAC_LEVEL}', '-'], wav_data)
+
+
+def encode_opus(wav_data):
+    """Comprimeix un WAV en Ogg/Opus amb opusenc o, si no hi és, ffmpeg."""
+    opusenc = shutil.which('opusenc')
+    if opusenc is not None:
+        return _run_encoder([opusenc, '--quiet', '--speech', '--bitrate', str(STT_OPUS_BITRATE), '-', '-'],
+                            wav_data)
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is not None:
+        return _run_encoder([ffmpeg, '-nostdin', '-loglevel', 'error', '-f', 'wav', '-i', 'pipe:0',
+                             '-c:a', 'libopus', '-b:a', f'{STT_OPUS_BITRATE}k', '-application', 'voip',
+                             '-f', 'ogg', 'pipe:1'], wav_data)
+    raise FileNotFoundError("ni opusenc ni ffmpeg estan instal·lats")
+
+
+FALLBACK = {'opus': 'flac', 'flac': 'wav'}
+
+
+def encode_stt_audio(audio, wav_max_bytes=STT_WAV_MAX_BYTES, opus_min_bytes=STT_OPUS_MIN_BYTES):
+    """
+    Remostreja a 16 kHz i comprimeix l'àudio per a l'STT.
+
+    Args:
+        audio: sr.AudioData
+
+    Returns:
+        tuple: (bytes, extensió del fitxer, stats) amb stats = {
+            'format', 'native_bytes' (WAV original), 'wav_bytes' (WAV a 16 kHz),
+            'upload_bytes', 'encode_s'
+        }
+    """
+    st = time.time()
+    wav_data = audio.get_wav_data(convert_rate=STT_SAMPLE_RATE, convert_width=STT_SAMPLE_WIDTH)
+    stats = {
+        'format': 'wav',
+        'native_bytes': len(audio.frame_data) + 44,  # capçalera WAV
+        'wav_bytes': len(wav_data),
+        'upload_bytes': len(wav_data),
+        'encode_s': 0.0,
+    }
+    encoders = {'opus': ('ogg', encode_opus), 'flac': ('flac', encode_flac)}
+    data, extension = wav_data, 'wav'
+    fmt = choose_stt_format(len(wav_data), wav_max_bytes, opus_min_bytes)
+    while fmt != 'wav':
+        extension, encoder = encoders[fmt]
+        try:
+            data = encoder(wav_data)
+            break
+        except (OSError, subprocess.SubprocessError, RuntimeError) as e:
+            print(f'stt encode: {fmt} no disponible ({e}), provant {FALLBACK[fmt]}')
+            fmt = FALLBACK[fmt]
+            data, extension = wav_data, 'wav'
+    stats['format'] = fmt
+    stats['upload_bytes'] = len(data)
+    stats['encode_s'] = time.time() - st
+    return data, extension, stats
+
+
+def format_stt_stats(stats):
+    """Línia de log amb la mida pujada, el motor i els temps d'un torn d'STT."""
+    parts = []
+    if 'format' in stats:
+        parts.append(f"upload: {stats['format']} {stats['upload_bytes'] / 1024:.1f} KB "
+                     f"(wav 16 kHz {stats['wav_bytes'] / 1024:.1f} KB, "
+                     f"original {stats['native_bytes'] / 1024:.1f} KB), encode {stats['encode_s']:.3f} s")
+    if stats.get('backend'):
+        backend = f"backend {stats['backend']}"
+        if stats.get('failover'):
+            backend += f" (failover per {stats['failover']}: {stats.get('attempts')})"
+        parts.append(backend)
+    if stats.get('stt_s') is not None:
+        label = 'upload + stt' if 'format' in stats else 'stt'
+        parts.append(f"{label} {stats['stt_s']:.3f} s")
+    return 'stt ' + ', '.join(parts)
@@ -0,0 +1,395 @@
+"""
+Motors d'STT intercanviables amb pas automàtic al motor local.
+
+OpenAiHelper.stt depèn de la xarxa: si la Wi-Fi falla o va lenta, el torn es
+perd. FailoverStt combina el motor del núvol (CloudStt, whisper-1) amb un
+motor local només CPU (VoskStt, model carregat una vegada i mantingut calent):
+
+- primer es llança el motor preferit (el núvol);
+- si falla o no entén res (text buit), es passa de seguida al local;
+- si no ha respost en STT_BUDGET_S, es llança també el local i guanya el
+  primer que acabi bé;
+- després d'una fallada o d'un retard, el núvol queda en repòs
+  STT_COOLDOWN_S i el local passa a ser el preferit.
+
+FailoverStt té la mateixa interfície que OpenAiHelper (stt() i
+last_stt_stats), de manera que transcribe_voice no canvia.
+
+El motor local també pot transcriure en streaming mentre l'usuari parla
+(VoskStt.open_stream + StreamingTranscriber): quan el VAD tanca la frase
+només queda descodificar l'últim tros.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+
+from utils import gray_print, notify_waiters, wait_until, warn
+
+
+STT_BUDGET_S = 4.0  # segons abans de llançar també el motor de reserva
+STT_TIMEOUT_S = 20.0  # segons màxims d'un torn d'STT amb tots els motors
+STT_COOLDOWN_S = 30.0  # segons que un motor que ha fallat deixa de ser el preferit
+STT_LOCAL_SAMPLE_RATE = 16000
+STT_STREAM_FINAL_TIMEOUT_S = 2.0  # espera màxima de la transcripció final en streaming
+
+
+class SttError(Exception):
+    """Un motor d'STT no ha pogut transcriure l'àudio."""
+
+
+class CloudStt():
+    """STT al núvol amb OpenAiHelper.stt (whisper-1)."""
+
+    name = 'cloud'
+
+    def __init__(self, openai_helper):
+        self.openai_helper = openai_helper
+
+    @property
+    def available(self):
+        return True
+
+    def transcribe(self, audio, language):
+        """
+        Returns:
+            tuple: (text, stats) amb les estadístiques de pujada de l'helper
+
+        Raises:
+            SttError: Si l'helper no ha pogut transcriure (retorna False)
+        """
+        text = self.openai_helper.stt(audio, language=language)
+        if text is False or text is None:
+            raise SttError("whisper-1 no ha retornat cap transcripció")
+        stats = getattr(self.openai_helper, 'last_stt_stats', None)
+        return text, dict(stats) if isinstance(stats, dict) else {}
+
+
+class VoskStt():
+    """
+    STT local amb Vosk (Kaldi, només CPU).
+
+    El model es carrega una sola vegada amb warm_up() (en segon pla des de
+    main) i es reutilitza a cada torn; cada transcripció crea només un
+    KaldiRecognizer nou, que és barat. L'idioma el fixa el model.
+
+    Args:
+        model_path: Directori del model (p. ex. vosk-model-small-ca-0.4)
+    """
+
+    name = 'local'
+
+    def __init__(self, model_path):
+        self.model_path = model_path
+        self._model = None
+        self._load_lock = threading.Lock()
+        self.load_error = None
+
+    @property
+    def available(self):
+        return self._model is not None
+
+    def warm_up(self):
+        """Carrega el model i fa una transcripció buida perquè el primer torn no pagui l'arrencada."""
+        with self._load_lock:
+            if self._model is not None or self.load_error is not None:
+                return self.available
+            st = time.time()
+            try:
+                if not os.path.isdir(self.model_path):
+                    raise FileNotFoundError(f"no existeix el model {self.model_path}")
+                import vosk
+                vosk.SetLogLevel(-1)
+                model = vosk.Model(self.model_path)
+                recognizer = vosk.KaldiRecognizer(model, STT_LOCAL_SAMPLE_RATE)
+                recognizer.AcceptWaveform(b'\x00\x00' * (STT_LOCAL_SAMPLE_RATE // 10))
+                recognizer.FinalResult()
+            except Exception as e:
+                self.load_error = e
+                warn(f'stt local: no disponible ({e})')
+                return False
+            self._model = model
+            gray_print(f'stt local: model carregat en {time.time() - st:.1f} s')
+            return True
+
+    def transcribe(self, audio, language):
+        """
+        Returns:
+            tuple: (text, stats)
+
+        Raises:
+            SttError: Si el model no està carregat
+        """
+        if self._model is None:
+            raise SttError("el model local no està carregat")
+        import vosk
+        pcm = audio.get_raw_data(convert_rate=STT_LOCAL_SAMPLE_RATE, convert_width=2)
+        recognizer = vosk.KaldiRecognizer(self._model, STT_LOCAL_SAMPLE_RATE)
+        recognizer.AcceptWaveform(pcm)
+        text = json.loads(recognizer.FinalResult()).get('text', '')
+        return text, {'audio_s': len(pcm) / 2 / STT_LOCAL_SAMPLE_RATE}
+
+    def open_stream(self, sample_rate, grammar=None):
+        """
+        Sessió de reconeixement incremental per a PCM de 16 bits a sample_rate.
+
+        Args:
+            sample_rate: Freqüència de mostreig de l'àudio
+            grammar: Llista de frases possibles (p. ex. paraules clau i '[unk]');
+                     limita el descodificador, que és molt més lleuger, i la
+                     sessió anota la confiança de cada paraula (VoskStream.words)
+
+        Raises:
+            SttError: Si el model no està carregat
+        """
+        if self._model is None:
+            raise SttError("el model local no està carregat")
+        import vosk
+        if grammar is None:
+            return VoskStream(vosk.KaldiRecognizer(self._model, sample_rate))
+        recognizer = vosk.KaldiRecognizer(self._model, sample_rate, json.dumps(list(grammar), ensure_ascii=False))
+        recognizer.SetWords(True)
+        return VoskStream(recognizer)
+
+    def has_word(self, word):
+        """Cert si la paraula és al vocabulari del model (una gramàtica no pot fer servir les altres)."""
+        if self._model is None:
+            return False
+        return self._model.find_word(word) != -1
+
+
+class VoskStream():
+    """Una frase en streaming: accept() per cada fragment i final() en acabar."""
+
+    def __init__(self, recognizer):
+        self._recognizer = recognizer
+        self._segments = []  # trossos ja tancats pel descodificador (pauses internes)
+        self.words = []  # (paraula, confiança) dels trossos tancats, si el reconeixedor les dona
+
+    def _text(self, result, key='text'):
+        result = json.loads(result)
+        self.words.extend((word['word'], word.get('conf', 1.0)) for word in result.get('result', ()))
+        return result.get(key, '')
+
+    def accept(self, pcm):
+        """
+        Returns:
+            str: Transcripció parcial fins ara
+        """
+        if self._recognizer.AcceptWaveform(pcm):
+            segment = self._text(self._recognizer.Result())
+            if segment:
+                self._segments.append(segment)
+            partial = ''
+        else:
+            partial = self._text(self._recognizer.PartialResult(), 'partial')
+        return ' '.join(self._segments + ([partial] if partial else []))
+
+    def final(self):
+        segment = self._text(self._recognizer.FinalResult())
+        return ' '.join(self._segments + ([segment] if segment else []))
+
+
+class StreamingTranscriber():
+    """
+    Alimenta una sessió de streaming (VoskStream) des d'un fil propi.
+
+    feed() no bloqueja el fil que llegeix el micròfon; la sessió descodifica
+    mentre l'usuari parla i finish() només espera l'últim tros.
+
+    Args:
+        session: Objecte amb accept(pcm) -> parcial i final() -> text
+        on_partial: Callable(text) quan la transcripció parcial canvia (p. ex.
+                    per preescalfar la petició al model); s'executa al fil del
+                    transcriptor i ha de ser ràpid
+    """
+
+    def __init__(self, session, on_partial=None):
+        self.session = session
+        self.on_partial = on_partial
+        self.partial = ''
+        self.stats = {'chunks': 0, 'partials': 0, 'final_wait_s': None}
+        self._queue = queue.Queue()
+        self._done = threading.Event()
+        self._cancelled = False
+        self._text = None
+        self._thread = threading.Thread(target=self._run, name='stt-stream', daemon=True)
+        self._thread.start()
+
+    def feed(self, pcm):
+        if pcm:
+            self._queue.put(pcm)
+
+    def _run(self):
+        try:
+            while True:
+                pcm = self._queue.get()
+                if pcm is None:
+                    break
+                if self._cancelled:
+                    continue
+                partial = self.session.accept(pcm)
+                self.stats['chunks'] += 1
+                if partial and partial != self.partial:
+                    self.partial = partial
+                    self.stats['partials'] += 1
+                    if self.on_partial is not None:
+                        self.on_partial(partial)
+            if not self._cancelled:
+                self._text = self.session.final()
+        except Exception as e:
+            warn(f'stt stream: {e}')
+        finally:
+            self._done.set()
+
+    def finish(self, timeout=STT_STREAM_FINAL_TIMEOUT_S):
+        """
+        Tanca la frase i espera la transcripció final.
+
+        Returns:
+            str: Text final, o None si ha fallat o no ha acabat a temps
+        """
+        st = time.time()
+        self._queue.put(None)
+        if not self._done.wait(timeout):
+            warn(f'stt stream: la transcripció final no ha acabat en {timeout:.1f} s')
+            return None
+        self.stats['final_wait_s'] = time.time() - st
+        return self._text
+
+    def cancel(self):
+        """Descarta la frase (p. ex. el VAD l'ha descartada per massa curta)."""
+        self._cancelled = True
+        self._queue.put(None)
+
+
+class FailoverStt():
+    """
+    Transcripció amb un motor preferit i un de reserva (vegeu el docstring del mòdul).
+
+    Args:
+        primary: Motor preferit (CloudStt)
+        fallback: Motor de reserva (VoskStt) o None
+        budget_s: Segons d'espera del preferit abans de llançar també la reserva
+        timeout_s: Segons màxims del torn
+        cooldown_s: Segons que un motor que ha fallat o anat tard passa a reserva
+    """
+
+    def __init__(self, primary, fallback=None, budget_s=STT_BUDGET_S, timeout_s=STT_TIMEOUT_S,
+                 cooldown_s=STT_COOLDOWN_S):
+        self.primary = primary
+        self.fallback = fallback
+        self.budget_s = budget_s
+        self.timeout_s = timeout_s
+        self.cooldown_s = cooldown_s
+        self.last_stt_stats = None
+        self._demoted_until = {}  # nom del motor -> time.time() fins al qual no és el preferit
+
+    def warm_up(self):
+        """Prepara els motors que ho necessiten (càrrega del model local)."""
+        for backend in (self.primary, self.fallback):
+            warm_up = getattr(backend, 'warm_up', None)
+            if warm_up is not None:
+                warm_up()
+
+    def _order(self):
+        """Motors en ordre de preferència, sense els no disponibles."""
+        backends = [b for b in (self.primary, self.fallback) if b is not None and b.available]
+        if len(backends) == 2 and self._demoted_until.get(backends[0].name, 0) > time.time():
+            backends.reverse()
+        return backends
+
+    def _demote(self, backend):
+        self._demoted_until[backend.name] = time.time() + self.cooldown_s
+
+    def _launch(self, backend, audio, language, results, cond):
+        def run():
+            st = time.time()
+            try:
+                text, stats = backend.transcribe(audio, language)
+                outcome = (text, stats, None, time.time() - st)
+            except Exception as e:
+                outcome = (None, None, e, time.time() - st)
+            with cond:
+                results.append((backend, outcome))
+                notify_waiters(cond)
+
+        # Daemon: un motor que s'ha quedat penjat no ha de retenir la sortida del programa
+        thread = threading.Thread(target=run, name=f'stt-{backend.name}', daemon=True)
+        thread.start()
+
+    def stt(self, audio, language='en'):
+        """
+        Transcriu l'àudio amb el primer motor que respongui bé.
+
+        Returns:
+            str: Text reconegut ('' si tots els motors han respost sense entendre res),
+                 o False si cap motor ho ha aconseguit
+        """
+        self.last_stt_stats = None
+        backends = self._order()
+        if not backends:
+            print("stt err: cap motor disponible")
+            return False
+
+        st = time.time()
+        deadline = st + self.timeout_s
+        cond = threading.Condition()
+        results = []
+        launched = [backends[0]]
+        self._launch(backends[0], audio, language, results, cond)
+        failover = None
+
+        def succeeded():
+            # Un text buit (soroll, parla poc clara) no guanya: pot ser que l'altre motor l'entengui
+            return next(((b, o) for b, o in results if o[2] is None and (o[0] or '').strip()), None)
+
+        def only_empty():
+            return bool(results) and all(o[2] is None for _, o in results)
+
+        def finished():
+            return succeeded() is not None or len(results) == len(launched)
+
+        while True:
+            if len(launched) < len(backends):
+                # Encara hi ha reserva: esperar el pressupost o una fallada
+                wait_until(cond, finished, timeout=max(0.0, min(st + self.budget_s, deadline) - time.time()))
+            else:
+                wait_until(cond, finished, timeout=max(0.0, deadline - time.time()))
+            with cond:
+                winner = succeeded()
+                all_failed = len(results) == len(launched)
+                empty = all_failed and only_empty()
+            if winner is not None or len(launched) == len(backends) or time.time() >= deadline:
+                break
+            # El preferit ha fallat, no ha entès res o va tard: llançar la reserva sense aturar-lo
+            if empty:
+                # No és culpa del motor: no passa a reserva
+                failover = 'empty'
+            else:
+                failover = 'error' if all_failed else 'budget'
+                self._demote(launched[0])
+            launched.append(backends[1])
+            self._launch(backends[1], audio, language, results, cond)
+
+        with cond:
+            attempts = {b.name: (f'{o[3]:.3f} s' if o[2] is None else f'error: {o[2]}') for b, o in results}
+            if winner is None and len(results) == len(launched) and only_empty():
+                # Tots els motors han respost bé però sense text: no s'ha dit res entenedor
+                winner = results[0]
+        for backend in launched:
+            if backend.name not in attempts:
+                attempts[backend.name] = 'timeout'
+        if winner is None:
+            print(f"stt err: cap motor ha transcrit l'àudio ({attempts})")
+            if failover is None:
+                self._demote(launched[0])
+            return False
+
+        backend, (text, stats, _, _) = winner
+        stats = dict(stats or {})
+        stats.update(backend=backend.name, failover=failover, attempts=attempts, stt_s=time.time() - st)
+        self.last_stt_stats = stats
+        return text
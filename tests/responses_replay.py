@@ -0,0 +1,60 @@
+"""
+Doble de test que reprodueix fluxos de tokens enregistrats de la Responses API.
+
+Els fluxos són a fixtures/responses_streams.json (una llista de fragments de
+text per resposta). ReplayResponses substitueix client.responses i emet els
+mateixos esdeveniments que el SDK d'OpenAI amb stream=True.
+"""
+import json
+import os
+from types import SimpleNamespace
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'responses_streams.json')
+
+
+def load_recorded_stream(name):
+    """Retorna el flux enregistrat `name` (dict amb 'id' i 'deltas')."""
+    with open(FIXTURES, encoding='utf-8') as f:
+        return json.load(f)[name]
+
+
+class ReplayResponses():
+    """
+    Substitut de client.responses que reprodueix un flux enregistrat.
+
+    Args:
+        recorded: Flux de load_recorded_stream()
+        fail_after: Si no és None, llança una excepció després d'aquest nombre de fragments
+        status: Estat de la resposta final
+    """
+
+    def __init__(self, recorded, fail_after=None, status='completed'):
+        self.recorded = recorded
+        self.fail_after = fail_after
+        self.status = status
+        self.calls = []
+        self.sent = 0  # fragments lliurats fins ara (per saber quan s'ha emès cada camp)
+
+    @property
+    def text(self):
+        return ''.join(self.recorded['deltas'])
+
+    def _final_response(self):
+        return SimpleNamespace(id=self.recorded['id'], status=self.status,
+                               output_text=self.text, last_error=None)
+
+    def _events(self):
+        yield SimpleNamespace(type='response.created')
+        for index, delta in enumerate(self.recorded['deltas']):
+            if self.fail_after is not None and index >= self.fail_after:
+                raise ConnectionError("stream tallat")
+            self.sent = index + 1
+            yield SimpleNamespace(type='response.output_text.delta', delta=delta)
+        yield SimpleNamespace(type='response.output_text.done', text=self.text)
+        yield SimpleNamespace(type='response.completed', response=self._final_response())
+
+    def create(self, stream=False, **kwargs):
+        self.calls.append({'stream': stream, **kwargs})
+        if stream:
+            return self._events()
+        return self._final_response()
@@ -0,0 +1,218 @@
+"""
+Tests unitaris per a conversation_engine.py
+"""
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import asyncio
+import threading
+
+# Afegir el directori pare al path per poder importar els mòduls
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Altres tests reemplacen utils per un mock: carregar els mòduls reals
+if not isinstance(getattr(sys.modules.get('utils'), '__file__', None), str):
+    sys.modules.pop('utils', None)
+sys.modules.pop('conversation_engine', None)
+
+from conversation_engine import ConversationEngine, format_turn_timings, new_turn_timings
+
+
+class FakeStages():
+    """Etapes falses que registren l'ordre de les crides"""
+
+    def __init__(self, audios=('audio',), text='Hola', answer='Bon dia'):
+        self.log = []
+        self._lock = threading.Lock()
+        self._audios = list(audios)
+        self.text = text
+        self.answer = answer
+        self.actions_release = threading.Event()
+        self.actions_release.set()
+
+    def record(self, name):
+        with self._lock:
+            self.log.append(name)
+
+    def stages(self, with_image=False):
+        def listen():
+            self.record('listen')
+            return self._audios.pop(0) if self._audios else None
+
+        def transcribe(audio):
+            self.record('transcribe')
+            return self.text
+
+        def prepare_image():
+            self.record('prepare_image')
+            return 'file_1'
+
+        def respond(text, image, on_field):
+            self.record(f'respond:{image}')
+            return (['nod'], self.answer, [])
+
+        def wait_actions():
+            self.actions_release.wait(2)
+            self.record('actions_done')
+
+        return {
+            'listen': listen,
+            'transcribe': transcribe,
+            'prepare_image': prepare_image if with_image else None,
+            'think': lambda: self.record('think'),
+            'respond': respond,
+            'act': lambda actions, sounds: self.record('act'),
+            'wait_actions': wait_actions,
+            'speak': lambda answer: self.record('speak') or {'answer': answer},
+            'say': lambda speech: self.record('say'),
+            'standby': lambda: self.record('standby'),
+        }
+
+
+@patch('conversation_engine.gray_print')
+class TestConversationEngine(unittest.TestCase):
+    """Tests per a ConversationEngine"""
+
+    def test_falten_etapes(self, mock_gray):
+        with self.assertRaises(ValueError):
+            ConversationEngine({'listen': lambda: None})
+
+    def test_torn_complet(self, mock_gray):
+        """Les accions es despatxen abans de preparar la veu"""
+        fake = FakeStages()
+        engine = ConversationEngine(fake.stages())
+        timings = asyncio.run(engine.run_turn())
+
+        self.assertEqual(fake.log[:5], ['standby', 'listen', 'transcribe', 'think', 'respond:None'])
+        self.assertLess(fake.log.index('act'), fake.log.index('speak'))
+        self.assertLess(fake.log.index('speak'), fake.log.index('say'))
+        for key in ('stt', 'llm', 'first_action', 'response', 'total'):
+            self.assertIsNotNone(timings[key])
+        self.assertIs(engine.last_timings, timings)
+
+    def test_imatge_en_paral_lel_amb_l_stt(self, mock_gray):
+        """La imatge es prepara mentre es transcriu l'àudio"""
+        fake = FakeStages()
+        stages = fake.stages(with_image=True)
+        image_started = threading.Event()
+
+        def prepare_image():
+            image_started.set()
+            return 'file_1'
+
+        def transcribe(audio):
+            # Si les etapes fossin seqüencials, la imatge no començaria mai
+            self.assertTrue(image_started.wait(2))
+            return 'Què veus?'
+        stages['prepare_image'] = prepare_image
+        stages['transcribe'] = transcribe
+
+        asyncio.run(ConversationEngine(stages).run_turn())
+        self.assertIn('respond:file_1', fake.log)
+
+    def test_error_a_la_imatge_continua_sense_imatge(self, mock_gray):
+        fake = FakeStages()
+        stages = fake.stages(with_image=True)
+
+        def prepare_image():
+            raise RuntimeError("càmera")
+        stages['prepare_image'] = prepare_image
+        with patch('conversation_engine.warn'):
+            asyncio.run(ConversationEngine(stages).run_turn())
+        self.assertIn('respond:None', fake.log)
+
+    def test_microfon_rearmat_mentre_acaben_les_accions(self, mock_gray):
+        """El torn següent escolta abans que acabin les accions de l'anterior"""
+        fake = FakeStages(audios=('a1', 'a2'))
+        fake.actions_release.clear()
+        engine = ConversationEngine(fake.stages())
+        stages = engine.stages
+        listen = stages['listen']
+
+        def listen_and_release():
+            audio = listen()
+            if fake.log.count('listen') == 2:
+                # Segona escolta: les accions del primer torn encara no han acabat
+                self.assertNotIn('actions_done', fake.log)
+                fake.actions_release.set()
+            return audio
+        stages['listen'] = listen_and_release
+
+        asyncio.run(engine.run(max_turns=2))
+
+        second_listen = [i for i, name in enumerate(fake.log) if name == 'listen'][1]
+        first_done = fake.log.index('actions_done')
+        second_think = [i for i, name in enumerate(fake.log) if name == 'think'][1]
+        self.assertLess(second_listen, first_done)
+        # El torn nou només pren el robot quan acaben les accions anteriors
+        self.assertLess(first_done, second_think)
+
+    def test_standby_quan_acaben_les_accions(self, mock_gray):
+        fake = FakeStages(audios=('a1',))
+        engine = ConversationEngine(fake.stages())
+        asyncio.run(engine.run(max_turns=1))
+        self.assertIn('standby', fake.log[fake.log.index('actions_done'):])
+
+    def test_res_entes_no_compta_com_a_torn(self, mock_gray):
+        fake = FakeStages(text='')
+        engine = ConversationEngine(fake.stages(with_image=True))
+        self.assertIsNone(asyncio.run(engine.run_turn()))
+        self.assertNotIn('think', fake.log)
+
+    def test_error_en_un_torn_no_atura_el_motor(self, mock_gray):
+        fake = FakeStages(audios=('a1', 'a2'))
+        stages = fake.stages()
+        calls = []
+
+        def respond(text, image, on_field):
+            calls.append(text)
+            if len(calls) == 1:
+                raise RuntimeError("xarxa")
+            return ([], 'ok', [])
+        stages['respond'] = respond
+        engine = ConversationEngine(stages)
+        with patch('builtins.print') as mock_print:
+            asyncio.run(engine.run(max_turns=2))
+        mock_print.assert_any_call('actions or TTS error: xarxa')
+        self.assertEqual(len(calls), 2)
+
+    def test_accions_avancades_abans_que_acabi_la_resposta(self, mock_gray):
+        """Amb on_field, les accions es despatxen mentre 'respond' encara treballa"""
+        fake = FakeStages()
+        stages = fake.stages()
+        acted = threading.Event()
+        stages['act'] = lambda actions, sounds: (fake.record(f'act:{actions}'), acted.set())
+
+        def respond(text, image, on_field):
+            on_field('actions', (['wave'], []))
+            # El motor ha d'actuar sense esperar que acabi aquesta etapa
+            self.assertTrue(acted.wait(2))
+            on_field('answer', 'Hola')
+            fake.record('respond_done')
+            return (['wave'], 'Hola', [])
+        stages['respond'] = respond
+
+        asyncio.run(ConversationEngine(stages).run_turn())
+        self.assertLess(fake.log.index("act:['wave']"), fake.log.index('respond_done'))
+        self.assertEqual(fake.log.count("act:['wave']"), 1)
+
+    def test_on_turn(self, mock_gray):
+        seen = []
+        fake = FakeStages()
+        asyncio.run(ConversationEngine(fake.stages(), on_turn=seen.append).run_turn())
+        self.assertEqual(len(seen), 1)
+
+
+class TestFormatTurnTimings(unittest.TestCase):
+    """Tests per a format_turn_timings"""
+
+    def test_omet_els_temps_no_mesurats(self):
+        timings = new_turn_timings()
+        timings['stt'] = 0.5
+        timings['total'] = 2.25
+        self.assertEqual(format_turn_timings(timings), 'turn: stt 0.500, total 2.250 s')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,6 +6,7 @@ import unittest
 from unittest.mock import Mock, patch, MagicMock
 import sys
 import os
+import tempfile
 import time
 import threading
 
@@ -284,6 +285,22 @@ class TestExecuteActionsList(unittest.TestCase):
             self._run_execute(["nod"], car=car)
             gpt_car.actions_dict['nod'].assert_called_once_with(car)
 
+    @patch('gpt_car.time.sleep')
+    def test_les_accions_reserven_els_servos(self, mock_sleep):
+        """Mentre s'executen les accions, un altre fil (el seguiment) no mou la càmera"""
+        car = gpt_car.ServoOutput(Mock())
+        vist = {}
+
+        def accio(c):
+            fil = threading.Thread(target=lambda: vist.setdefault('owns', car.owns('pan', 'tilt')))
+            fil.start()
+            fil.join()
+
+        with patch.object(gpt_car, 'actions_dict', {'nod': accio}):
+            self._run_execute(["nod"], car=car)
+        self.assertFalse(vist['owns'])
+        self.assertTrue(car.owns('pan', 'tilt'))
+
     @patch('gpt_car.time.sleep')
     def test_accio_done_al_final(self, mock_sleep):
         """Després d'executar la llista, action_status es posa a 'actions_done'"""
@@ -316,6 +333,93 @@ class TestExecuteActionsList(unittest.TestCase):
             self._run_execute(["nod"], action_status_ref=action_status_ref)
         self.assertEqual(action_status_ref['action_status'], 'actions_done')
 
+    @patch('gpt_car.gray_print')
+    @patch('gpt_car.time.sleep')
+    def test_barge_in_atura_les_accions(self, mock_sleep, mock_gray):
+        """Si l'usuari interromp, l'acció en curs s'atura, els motors es paren i no en comença cap més"""
+        interrupt = threading.Event()
+
+        def interrupted(car):
+            interrupt.set()
+            raise RuntimeError('ActionInterrupted')
+
+        nod = MagicMock()
+        with patch.object(gpt_car, 'action_interrupt', interrupt), \
+                patch.object(gpt_car, 'actions_dict', {'wave hands': MagicMock(side_effect=interrupted), 'nod': nod}):
+            car, action_status_ref = self._run_execute(["wave hands", "nod"])
+        nod.assert_not_called()
+        car.stop.assert_called_once_with()
+        self.assertEqual(action_status_ref['action_status'], 'actions_done')
+
+
+class TestBargeIn(unittest.TestCase):
+    """Tests per a handle_barge_in() i el tall del torn"""
+
+    def setUp(self):
+        self.barge_in_event = threading.Event()
+        self.action_interrupt = threading.Event()
+        for name, value in (('barge_in_event', self.barge_in_event), ('action_interrupt', self.action_interrupt)):
+            patcher = patch.object(gpt_car, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_handle_barge_in(self):
+        with patch.object(gpt_car, 'speech_pipeline') as mock_pipeline:
+            gpt_car.handle_barge_in()
+        self.assertTrue(self.barge_in_event.is_set())
+        self.assertTrue(self.action_interrupt.is_set())
+        mock_pipeline.cancel.assert_called_once_with()
+
+    @patch('gpt_car.gray_print')
+    def test_no_executa_accions_d_un_torn_interromput(self, mock_gray):
+        self.barge_in_event.set()
+        action_status_ref = {'action_status': 'standby'}
+        actions_to_be_done_ref = {'actions_to_be_done': []}
+        gpt_car.execute_actions_and_sounds(['nod'], [], Mock(), threading.Condition(),
+                                           action_status_ref, actions_to_be_done_ref)
+        self.assertEqual(action_status_ref['action_status'], 'standby')
+        self.assertEqual(actions_to_be_done_ref['actions_to_be_done'], [])
+
+    @patch('gpt_car.gray_print')
+    def test_torn_nou_rearma_les_accions(self, mock_gray):
+        self.action_interrupt.set()
+        action_status_ref = {'action_status': 'standby'}
+        gpt_car.execute_actions_and_sounds(['nod'], [], Mock(), threading.Condition(),
+                                           action_status_ref, {'actions_to_be_done': []})
+        self.assertFalse(self.action_interrupt.is_set())
+        self.assertEqual(action_status_ref['action_status'], 'actions')
+
+    @patch('gpt_car.gray_print')
+    def test_no_prepara_la_veu_d_un_torn_interromput(self, mock_gray):
+        self.barge_in_event.set()
+        pipeline = Mock()
+        speech = gpt_car.prepare_speech('Hola!', {}, {'pipeline': pipeline}, {'streaming': True})
+        self.assertFalse(speech['loaded'])
+        pipeline.start_turn.assert_not_called()
+
+    @patch.object(gpt_car, 'MIC_PERSISTENT', True)
+    @patch.object(gpt_car, 'mic_stream')
+    @patch.object(gpt_car, 'speech_pipeline')
+    @patch('gpt_car.reset_camera_if_needed')
+    @patch('gpt_car.gray_print')
+    def test_barge_in_durant_listen_no_talla_el_torn_nou(self, mock_gray, mock_reset, mock_speech_pipeline,
+                                                        mock_stream):
+        """Un barge-in que salta mentre s'escolta era per al torn vell: el nou fa accions i parla"""
+        mock_stream.running = True
+        mock_stream.listen.side_effect = lambda: gpt_car.handle_barge_in() or 'audio'
+        gpt_car.listen_voice(Mock(), threading.Condition(), {'action_status': 'think'}, Mock(), False)
+        mock_speech_pipeline.cancel.assert_called_once_with()
+
+        action_status_ref = {'action_status': 'standby'}
+        gpt_car.execute_actions_and_sounds(['nod'], [], Mock(), threading.Condition(),
+                                           action_status_ref, {'actions_to_be_done': []})
+        self.assertEqual(action_status_ref['action_status'], 'actions')
+        self.assertFalse(self.action_interrupt.is_set())
+
+        pipeline = Mock()
+        gpt_car.prepare_speech('Hola!', {}, {'pipeline': pipeline}, {'streaming': True})
+        pipeline.start_turn.assert_called_once()
+
 
 class TestHandleActionState(unittest.TestCase):
     """Tests per a handle_action_state()"""
@@ -490,6 +594,19 @@ class TestWaitForSpeechCompletion(unittest.TestCase):
 
 class TestWaitForActionsCompletion(unittest.TestCase):
     """Tests per a wait_for_actions_completion()"""
+
+    def test_es_desperta_quan_el_fil_d_accions_notifica(self):
+        """Amb una Condition, el canvi a 'actions_done' desperta l'espera"""
+        action_lock_ref = threading.Condition()
+        action_status_ref = {'action_status': 'actions'}
+        worker = threading.Thread(
+            target=gpt_car.execute_actions_list,
+            args=([], Mock(), action_lock_ref, action_status_ref)
+        )
+        worker.start()
+        gpt_car.wait_for_actions_completion(action_lock_ref, action_status_ref)
+        worker.join()
+        self.assertEqual(action_status_ref['action_status'], 'actions_done')
     
     @patch('gpt_car.time.sleep')
     def test_wait_until_actions_complete(self, mock_sleep):
@@ -507,6 +624,54 @@ class TestCaptureImage(unittest.TestCase):
     pass
 
 
+@patch.object(gpt_car, 'gray_print')
+class TestEncodeImage(unittest.TestCase):
+    """Tests per a encode_image()"""
+
+    def _cv2(self):
+        import numpy as np
+        cv2 = Mock(IMWRITE_JPEG_QUALITY=1, INTER_AREA=3)
+        cv2.imencode.return_value = (True, np.frombuffer(b'\xff\xd8jpeg', dtype=np.uint8))
+        cv2.resize.side_effect = lambda img, size, interpolation=None: Mock(shape=(size[1], size[0], 3))
+        return cv2
+
+    def test_codifica_en_memoria_i_redueix(self, mock_gray):
+        cv2 = self._cv2()
+        vilib = Mock()
+        vilib.img = Mock(shape=(960, 1280, 3))
+        with patch.object(gpt_car, 'cv2', cv2):
+            data = gpt_car.encode_image(vilib, quality=70, max_width=640)
+
+        self.assertEqual(data, b'\xff\xd8jpeg')
+        self.assertEqual(cv2.resize.call_args[0][1], (640, 480))
+        self.assertEqual(cv2.imencode.call_args[0][0], '.jpg')
+        self.assertEqual(cv2.imencode.call_args[0][2][1], 70)
+        cv2.imwrite.assert_not_called()
+
+    def test_no_amplia_imatges_petites(self, mock_gray):
+        cv2 = self._cv2()
+        vilib = Mock()
+        vilib.img = Mock(shape=(240, 320, 3))
+        with patch.object(gpt_car, 'cv2', cv2):
+            self.assertIsNotNone(gpt_car.encode_image(vilib, max_width=640))
+        cv2.resize.assert_not_called()
+
+    def test_sense_imatge(self, mock_gray):
+        vilib = Mock()
+        vilib.img = None
+        with patch('builtins.print'):
+            self.assertIsNone(gpt_car.encode_image(vilib))
+        self.assertIsNone(gpt_car.encode_image(None))
+
+    def test_error_de_codificacio(self, mock_gray):
+        cv2 = self._cv2()
+        cv2.imencode.return_value = (False, None)
+        vilib = Mock()
+        vilib.img = Mock(shape=(480, 640, 3))
+        with patch.object(gpt_car, 'cv2', cv2), patch('builtins.print'):
+            self.assertIsNone(gpt_car.encode_image(vilib))
+
+
 class TestGetVoiceInput(unittest.TestCase):
     """Tests per a get_voice_input()"""
     
@@ -566,6 +731,91 @@ class TestGetVoiceInput(unittest.TestCase):
         self.assertIsNone(result)
 
 
+    @patch.object(gpt_car, 'MIC_PERSISTENT', True)
+    @patch.object(gpt_car, 'mic_stream')
+    @patch('gpt_car.reset_camera_if_needed')
+    @patch('gpt_car.gray_print')
+    @patch('gpt_car.sr.Microphone')
+    def test_listen_amb_micro_persistent(self, mock_mic, mock_gray, mock_reset, mock_stream):
+        """Amb el micròfon persistent no es reobre ni es calibra a cada torn"""
+        mock_stream.running = True
+        mock_stream.listen.return_value = 'audio'
+        mock_recognizer = Mock()
+
+        audio = gpt_car.listen_voice(mock_recognizer, threading.Condition(),
+                                     {'action_status': 'think'}, Mock(), False)
+
+        self.assertEqual(audio, 'audio')
+        mock_mic.assert_not_called()
+        mock_recognizer.adjust_for_ambient_noise.assert_not_called()
+
+    @patch.object(gpt_car, 'MIC_PERSISTENT', True)
+    @patch.object(gpt_car, 'mic_stream')
+    @patch.object(gpt_car, 'wake_gate')
+    @patch('gpt_car.reset_camera_if_needed')
+    @patch('gpt_car.gray_print')
+    def test_torn_nou_obre_la_finestra_de_continuacio(self, mock_gray, mock_reset, mock_gate, mock_stream):
+        """Després de respondre, la rèplica de l'usuari no necessita la paraula clau"""
+        mock_stream.running = True
+        gpt_car.listen_voice(Mock(), threading.Condition(), {'action_status': 'think'}, Mock(), False)
+        mock_gate.turn_done.assert_called_once_with()
+        mock_stream.listen.assert_called_once_with()
+
+    @patch.object(gpt_car, 'MIC_PERSISTENT', True)
+    @patch.object(gpt_car, 'mic_stream')
+    @patch.object(gpt_car, 'lock_on_speaker')
+    @patch('gpt_car.reset_camera_if_needed')
+    @patch('gpt_car.gray_print')
+    def test_la_camera_segueix_qui_ha_parlat(self, mock_gray, mock_reset, mock_lock, mock_stream):
+        """En acabar la frase, el seguiment visual es fixa en qui ha parlat"""
+        mock_stream.running = True
+        mock_stream.listen.side_effect = lambda: mock_lock.assert_not_called()
+        gpt_car.listen_voice(Mock(), threading.Condition(), {'action_status': 'think'}, Mock(), False)
+        mock_lock.assert_called_once_with()
+
+    @patch.object(gpt_car, 'MIC_PERSISTENT', True)
+    @patch.object(gpt_car, 'mic_stream')
+    @patch('gpt_car.reset_camera_if_needed')
+    @patch('gpt_car.gray_print')
+    @patch('gpt_car.redirect_error_2_null')
+    @patch('gpt_car.cancel_redirect_error')
+    @patch('gpt_car.sr.Microphone')
+    def test_listen_sense_micro_persistent_calibra(self, mock_mic, mock_cancel, mock_redirect,
+                                                   mock_gray, mock_reset, mock_stream):
+        """Si el micròfon persistent no està actiu, es torna al camí de cada torn"""
+        mock_stream.running = False
+        mock_recognizer = Mock()
+
+        gpt_car.listen_voice(mock_recognizer, threading.Condition(),
+                             {'action_status': 'think'}, Mock(), False)
+
+        mock_recognizer.adjust_for_ambient_noise.assert_called_once()
+        mock_stream.listen.assert_not_called()
+
+    @patch.object(gpt_car, 'STT_STREAMING', True)
+    @patch.object(gpt_car, 'mic_stream')
+    @patch('gpt_car.gray_print')
+    def test_transcripcio_en_streaming(self, mock_gray, mock_stream):
+        """Si la frase ja s'ha transcrit mentre l'usuari parlava, no es crida l'STT"""
+        mock_stream.streamed_transcript.return_value = 'gira a la dreta'
+        stt = Mock()
+
+        self.assertEqual(gpt_car.transcribe_voice('audio', stt, 'ca'), 'gira a la dreta')
+        mock_stream.streamed_transcript.assert_called_once_with('audio')
+        stt.stt.assert_not_called()
+
+    @patch.object(gpt_car, 'STT_STREAMING', True)
+    @patch.object(gpt_car, 'mic_stream')
+    @patch('gpt_car.gray_print')
+    def test_sense_transcripcio_en_streaming_crida_stt(self, mock_gray, mock_stream):
+        mock_stream.streamed_transcript.return_value = None
+        stt = Mock(last_stt_stats=None)
+        stt.stt.return_value = 'endavant'
+
+        self.assertEqual(gpt_car.transcribe_voice('audio', stt, 'ca'), 'endavant')
+        stt.stt.assert_called_once_with('audio', language='ca')
+
+
 class TestGetUserInput(unittest.TestCase):
     """Tests per a get_user_input()"""
     
@@ -587,15 +837,20 @@ class TestGetUserInput(unittest.TestCase):
 
 class TestGetGptResponse(unittest.TestCase):
     """Tests per a get_gpt_response()"""
+
+    def setUp(self):
+        patcher = patch.object(gpt_car, 'vision_stats')
+        self.stats = patcher.start()
+        self.addCleanup(patcher.stop)
     
-    @patch('gpt_car.capture_image')
-    @patch('gpt_car.gray_print')
-    @patch('gpt_car.time.time')
-    def test_get_gpt_response_with_img(self, mock_time, mock_gray, mock_capture):
-        """Test obtenir resposta GPT amb imatge"""
-        mock_time.side_effect = [100.0, 100.5]  # st, end
+    @patch.object(gpt_car, 'IMAGE_INLINE', False)
+    @patch.object(gpt_car, 'capture_image')
+    @patch.object(gpt_car, 'gray_print')
+    def test_get_gpt_response_with_img(self, mock_gray, mock_capture):
+        """Test obtenir resposta GPT amb imatge (pujada com a fitxer)"""
         mock_capture.return_value = '/path/to/image.jpg'
         mock_openai_helper = Mock()
+        mock_openai_helper.upload_image.return_value = 'file_2'
         mock_openai_helper.dialogue_with_img.return_value = {'answer': 'Hola', 'actions': []}
         mock_vilib = Mock()
         
@@ -604,7 +859,80 @@ class TestGetGptResponse(unittest.TestCase):
         )
         
         self.assertEqual(result, {'answer': 'Hola', 'actions': []})
-        mock_openai_helper.dialogue_with_img.assert_called_once()
+        mock_openai_helper.upload_image.assert_called_once_with('/path/to/image.jpg')
+        mock_openai_helper.dialogue_with_img.assert_called_once_with("Hola", file_id='file_2', on_field=None)
+        self.assertEqual(self.stats.record.call_args[0][0], 'upload')
+
+    @patch.object(gpt_car, 'IMAGE_INLINE', True)
+    @patch.object(gpt_car, 'IMAGE_ADAPTIVE', False)
+    @patch.object(gpt_car, 'capture_image')
+    @patch.object(gpt_car, 'encode_image')
+    @patch.object(gpt_car, 'gray_print')
+    def test_get_gpt_response_imatge_en_memoria(self, mock_gray, mock_encode, mock_capture):
+        """La imatge codificada en memòria va dins la petició, sense disc ni pujada"""
+        mock_encode.return_value = b'jpeg'
+        mock_openai_helper = Mock()
+        mock_openai_helper.dialogue_with_img.return_value = {'answer': 'Hola'}
+
+        gpt_car.get_gpt_response("Hola", mock_openai_helper, True, Mock(), '/path')
+
+        mock_capture.assert_not_called()
+        mock_openai_helper.upload_image.assert_not_called()
+        mock_openai_helper.dialogue_with_img.assert_called_once_with("Hola", image_bytes=b'jpeg', on_field=None)
+        self.assertEqual(self.stats.record.call_args[1]['payload_bytes'], 4)
+
+    @patch.object(gpt_car, 'IMAGE_INLINE', True)
+    @patch.object(gpt_car, 'IMAGE_ADAPTIVE', True)
+    @patch.object(gpt_car, 'encode_frame', return_value=(b'jpeg', (320, 240)))
+    @patch.object(gpt_car, 'gray_print')
+    def test_imatge_adaptativa_segons_la_pregunta(self, mock_gray, mock_encode):
+        """El fotograma es pren abans del text i es codifica amb el perfil de la pregunta"""
+        vilib = Mock()
+        vilib.img = Mock(shape=(480, 640, 3))
+        vilib.detect_obj_parameter = {'human_n': 0}
+        mock_openai_helper = Mock()
+
+        gpt_car.get_gpt_response("Quina hora és?", mock_openai_helper, True, vilib, '/path')
+        self.assertEqual(mock_encode.call_args[0][1:], (60, 320, None))
+
+        gpt_car.get_gpt_response("Què veus davant teu?", mock_openai_helper, True, vilib, '/path')
+        self.assertEqual(mock_encode.call_args[0][1:], (85, 640, None))
+
+        mock_openai_helper.dialogue_with_img.assert_called_with(
+            "Què veus davant teu?", image_bytes=b'jpeg', on_field=None)
+        stats = self.stats.record.call_args[1]
+        self.assertEqual((stats['profile'], stats['payload_bytes']), ('scene', 4))
+        self.assertIsNotNone(stats['request_s'])
+
+    @patch.object(gpt_car, 'encode_frame', return_value=(b'jpeg', (240, 240)))
+    def test_retalla_la_persona_si_es_pregunta_per_l_usuari(self, mock_encode):
+        frame = gpt_car.CapturedFrame(
+            Mock(shape=(480, 640, 3)),
+            {'human_n': 1, 'human_x': 320, 'human_y': 240, 'human_w': 100, 'human_h': 120}
+        )
+        data, stats = gpt_car.encode_turn_image(frame, "De quin color és la samarreta que porto?")
+        self.assertEqual(data, b'jpeg')
+        self.assertEqual(stats['profile'], 'person')
+        self.assertTrue(stats['cropped'])
+        self.assertEqual(mock_encode.call_args[0][3], (220, 120, 420, 360))
+
+    @patch.object(gpt_car, 'encode_frame', return_value=(b'jpeg', (640, 480)))
+    def test_sense_persona_envia_l_escena(self, mock_encode):
+        frame = gpt_car.CapturedFrame(Mock(shape=(480, 640, 3)), {'human_n': 0})
+        _, stats = gpt_car.encode_turn_image(frame, "Quina samarreta porto?")
+        self.assertEqual(stats['profile'], 'scene')
+        self.assertIsNone(mock_encode.call_args[0][3])
+
+    @patch.object(gpt_car, 'IMAGE_INLINE', True)
+    @patch.object(gpt_car, 'snapshot_image', return_value=None)
+    @patch.object(gpt_car, 'gray_print')
+    def test_get_gpt_response_sense_imatge_disponible(self, mock_gray, mock_snapshot):
+        mock_openai_helper = Mock()
+        with patch('builtins.print'):
+            gpt_car.get_gpt_response("Hola", mock_openai_helper, True, Mock(), '/path')
+        mock_openai_helper.dialogue_with_img.assert_not_called()
+        mock_openai_helper.dialogue.assert_called_once_with("Hola", on_field=None)
+        self.stats.record.assert_not_called()
     
     @patch('gpt_car.capture_image')
     @patch('gpt_car.gray_print')
@@ -621,7 +949,79 @@ class TestGetGptResponse(unittest.TestCase):
         
         self.assertEqual(result, {'answer': 'Hola', 'actions': []})
         mock_openai_helper.dialogue.assert_called_once()
-    
+
+    @patch.object(gpt_car, 'capture_image')
+    @patch.object(gpt_car, 'gray_print')
+    def test_get_gpt_response_amb_imatge_ja_pujada(self, mock_gray, mock_capture):
+        """Amb una imatge ja pujada no es torna a capturar ni a pujar"""
+        mock_openai_helper = Mock()
+        mock_openai_helper.dialogue_with_img.return_value = {'answer': 'Hola'}
+
+        result = gpt_car.get_gpt_response("Hola", mock_openai_helper, True, Mock(), '/path', 'file_1')
+
+        self.assertEqual(result, {'answer': 'Hola'})
+        mock_capture.assert_not_called()
+        mock_openai_helper.dialogue_with_img.assert_called_once_with("Hola", file_id='file_1', on_field=None)
+
+
+class TestBuildEngineStages(unittest.TestCase):
+    """Tests per a build_engine_stages()"""
+
+    def _stages(self, with_img=False, pipeline=None):
+        config = {
+            'openai_helper': Mock(), 'with_img': with_img, 'vilib_module': None,
+            'current_path': '/path', 'music': Mock(), 'sound_effect_actions': []
+        }
+        self.action_state = {
+            'lock': threading.Condition(),
+            'status_ref': {'action_status': 'actions_done'},
+            'actions_to_be_done_ref': {'actions_to_be_done': []}
+        }
+        self.speech_state = {
+            'lock': threading.Condition(),
+            'loaded_ref': {'speech_loaded': False},
+            'tts_file_ref': {'tts_file': None},
+            'pipeline': pipeline
+        }
+        tts_config = {'dir_path': '/tts', 'voice': 'echo', 'volume_db': 3, 'instructions': ''}
+        self.car = Mock()
+        return gpt_car.build_engine_stages(config, self.action_state, self.speech_state, tts_config,
+                                           Mock(), 'ca', self.car)
+
+    def test_imatge_nomes_si_n_hi_ha(self):
+        self.assertIsNone(self._stages(with_img=False)['prepare_image'])
+        self.assertIsNotNone(self._stages(with_img=True)['prepare_image'])
+
+    @patch.object(gpt_car, 'listen_voice')
+    def test_escoltar_no_torna_a_repos(self, mock_listen):
+        """El micròfon es rearma sense tocar l'estat de les accions en curs"""
+        self._stages()['listen']()
+        self.assertFalse(mock_listen.call_args[1]['rearm'])
+
+    def test_think_talla_la_veu_anterior(self):
+        pipeline = Mock()
+        self._stages(pipeline=pipeline)['think']()
+        pipeline.cancel.assert_called_once()
+        self.assertEqual(self.action_state['status_ref']['action_status'], 'think')
+
+    @patch.object(gpt_car, 'reset_camera_if_needed')
+    def test_standby(self, mock_reset):
+        self._stages()['standby']()
+        mock_reset.assert_called_once_with(self.car, False)
+        self.assertEqual(self.action_state['status_ref']['action_status'], 'standby')
+
+    @patch.object(gpt_car, 'wait_speech')
+    @patch.object(gpt_car, 'play_speech')
+    def test_say_allibera_el_fitxer_encara_que_falli(self, mock_play, mock_wait):
+        janitor = Mock()
+        stages = self._stages()
+        self.speech_state['janitor'] = janitor
+        mock_wait.side_effect = RuntimeError("altaveu")
+        speech = {'answer': 'Hola', 'streaming': False, 'turn': None, 'loaded': True,
+                  'pinned_file': '/tts/a.wav'}
+        with self.assertRaises(RuntimeError):
+            stages['say'](speech)
+        janitor.unpin.assert_called_once_with('/tts/a.wav')
 
 
 class TestGenerateTts(unittest.TestCase):
@@ -659,6 +1059,80 @@ class TestGenerateTts(unittest.TestCase):
         
         self.assertFalse(result)
 
+    @patch.object(gpt_car, 'gray_print')
+    @patch.object(gpt_car, 'sox_volume')
+    @patch.object(gpt_car, 'wav_volume')
+    @patch.object(gpt_car.os, 'replace')
+    @patch.object(gpt_car.time, 'strftime')
+    def test_generate_tts_guany_in_situ(self, mock_strftime, mock_replace, mock_wav_volume,
+                                       mock_sox, mock_gray):
+        """El guany s'aplica in situ i el fitxer es reanomena, sense sox"""
+        mock_strftime.return_value = "24-01-01_12-00-00"
+        mock_wav_volume.return_value = True
+        mock_openai_helper = Mock()
+        mock_openai_helper.text_to_speech.return_value = True
+        tts_file_ref = {'tts_file': None}
+
+        result = gpt_car.generate_tts(
+            "Hola", mock_openai_helper, '/tts', 'echo', 3, "", tts_file_ref
+        )
+
+        self.assertTrue(result)
+        raw = os.path.join('/tts', '24-01-01_12-00-00_raw.wav')
+        final = os.path.join('/tts', '24-01-01_12-00-00_3dB.wav')
+        mock_wav_volume.assert_called_once_with(raw, raw, 3)
+        mock_replace.assert_called_once_with(raw, final)
+        mock_sox.assert_not_called()
+        self.assertEqual(tts_file_ref['tts_file'], final)
+
+    @patch.object(gpt_car, 'gray_print')
+    @patch.object(gpt_car, 'sox_volume')
+    @patch.object(gpt_car, 'wav_volume')
+    @patch.object(gpt_car.time, 'strftime')
+    def test_generate_tts_fallback_a_sox(self, mock_strftime, mock_wav_volume, mock_sox, mock_gray):
+        """Si wav_volume no pot processar el fitxer, es fa servir sox_volume"""
+        mock_strftime.return_value = "24-01-01_12-00-00"
+        mock_wav_volume.return_value = False
+        mock_sox.return_value = True
+        mock_openai_helper = Mock()
+        mock_openai_helper.text_to_speech.return_value = True
+        tts_file_ref = {'tts_file': None}
+
+        result = gpt_car.generate_tts(
+            "Hola", mock_openai_helper, '/tts', 'echo', 3, "", tts_file_ref
+        )
+
+        self.assertTrue(result)
+        mock_sox.assert_called_once()
+
+    @patch.object(gpt_car, 'gray_print')
+    @patch.object(gpt_car, 'wav_volume', return_value=True)
+    def test_prepare_speech_usa_la_memoria_cau(self, mock_wav_volume, mock_gray):
+        """Sense streaming, una resposta repetida surt de la memòria cau sense cridar l'API"""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+
+        def text_to_speech(text, path, *args, **kwargs):
+            with open(path, 'wb') as f:
+                f.write(b'RIFF')
+            return True
+
+        mock_openai_helper = Mock()
+        mock_openai_helper.TTS_MODEL = 'tts'
+        mock_openai_helper.text_to_speech.side_effect = text_to_speech
+        tts_config = {'streaming': False, 'dir_path': tmp.name, 'voice': 'echo', 'volume_db': 3,
+                      'instructions': '', 'cache': gpt_car.TtsCache(os.path.join(tmp.name, 'cache'))}
+        speech_state = {'tts_file_ref': {'tts_file': None}}
+
+        for _ in range(2):
+            speech = gpt_car.prepare_speech('Hola!', {'openai_helper': mock_openai_helper},
+                                            speech_state, tts_config)
+            self.assertTrue(speech['loaded'])
+
+        mock_openai_helper.text_to_speech.assert_called_once()
+        self.assertEqual(tts_config['cache'].stats['hits'], 1)
+        self.assertTrue(speech_state['tts_file_ref']['tts_file'].startswith(os.path.join(tmp.name, 'cache')))
+
 
 class TestExecuteActionsAndSounds(unittest.TestCase):
     """Tests per a execute_actions_and_sounds()"""
@@ -804,6 +1278,141 @@ class TestProcessUserQuery(unittest.TestCase):
         self.assertEqual(speech_loaded_ref['speech_loaded'], False)
 
 
+class TestProcessUserQueryPipeline(unittest.TestCase):
+    """Tests per a process_user_query() amb el pipeline de frases"""
+
+    @patch.object(gpt_car, 'gray_print')
+    @patch.object(gpt_car, 'wait_for_actions_completion')
+    @patch.object(gpt_car, 'wait_for_speech_completion')
+    @patch.object(gpt_car, 'execute_actions_and_sounds')
+    @patch.object(gpt_car, 'generate_tts')
+    @patch.object(gpt_car, 'parse_gpt_response')
+    @patch.object(gpt_car, 'get_gpt_response')
+    def test_resposta_es_diu_pel_pipeline(self, mock_get_gpt, mock_parse, mock_tts, mock_execute,
+                                          mock_wait_speech, mock_wait_actions, mock_gray):
+        """Amb streaming i pipeline, no es genera fitxer i s'espera el torn del pipeline"""
+        mock_parse.return_value = (['nod'], 'Hola, com estàs?', [])
+        pipeline = Mock()
+        pipeline.start_turn.return_value = 7
+        speech_state = {
+            'lock': threading.Lock(),
+            'loaded_ref': {'speech_loaded': False},
+            'tts_file_ref': {'tts_file': None},
+            'pipeline': pipeline
+        }
+        config = {
+            'openai_helper': Mock(), 'with_img': False, 'vilib_module': None,
+            'current_path': '/path', 'music': Mock(), 'sound_effect_actions': []
+        }
+        action_state = {
+            'lock': threading.Lock(),
+            'status_ref': {'action_status': 'standby'},
+            'actions_to_be_done_ref': {'actions_to_be_done': []}
+        }
+        tts_config = {'dir_path': '/tts', 'voice': 'echo', 'volume_db': 3,
+                      'instructions': '', 'streaming': True}
+
+        with patch('builtins.print'):
+            gpt_car.process_user_query("Hola", config, action_state, speech_state, tts_config)
+
+        pipeline.cancel.assert_called_once()
+        pipeline.start_turn.assert_called_once_with('Hola, com estàs?')
+        pipeline.wait_turn.assert_called_once_with(7)
+        mock_tts.assert_not_called()
+        mock_wait_speech.assert_not_called()
+        self.assertFalse(speech_state['loaded_ref']['speech_loaded'])
+
+
+class TestProcessUserQueryJanitor(unittest.TestCase):
+    """Tests per a la fixació del fitxer de TTS durant process_user_query()"""
+
+    @patch.object(gpt_car, 'gray_print')
+    @patch.object(gpt_car, 'wait_for_actions_completion')
+    @patch.object(gpt_car, 'wait_for_speech_completion')
+    @patch.object(gpt_car, 'execute_actions_and_sounds')
+    @patch.object(gpt_car, 'generate_tts')
+    @patch.object(gpt_car, 'parse_gpt_response')
+    @patch.object(gpt_car, 'get_gpt_response')
+    def test_fitxer_fixat_fins_que_acaba_de_sonar(self, mock_get_gpt, mock_parse, mock_tts, mock_execute,
+                                                  mock_wait_speech, mock_wait_actions, mock_gray):
+        """El fitxer generat no es pot esborrar mentre s'espera que soni"""
+        mock_parse.return_value = ([], 'Hola', [])
+        tts_file_ref = {'tts_file': None}
+        janitor = Mock()
+
+        def fake_generate(*args):
+            tts_file_ref['tts_file'] = '/tts/resposta.wav'
+            return True
+        mock_tts.side_effect = fake_generate
+        mock_wait_speech.side_effect = lambda *args: janitor.unpin.assert_not_called()
+
+        speech_state = {
+            'lock': threading.Lock(),
+            'loaded_ref': {'speech_loaded': False},
+            'tts_file_ref': tts_file_ref,
+            'janitor': janitor
+        }
+        config = {
+            'openai_helper': Mock(), 'with_img': False, 'vilib_module': None,
+            'current_path': '/path', 'music': Mock(), 'sound_effect_actions': []
+        }
+        action_state = {
+            'lock': threading.Lock(),
+            'status_ref': {'action_status': 'standby'},
+            'actions_to_be_done_ref': {'actions_to_be_done': []}
+        }
+        tts_config = {'dir_path': '/tts', 'voice': 'echo', 'volume_db': 3, 'instructions': ''}
+
+        with patch('builtins.print'):
+            gpt_car.process_user_query("Hola", config, action_state, speech_state, tts_config)
+
+        janitor.pin.assert_called_once_with('/tts/resposta.wav')
+        mock_wait_speech.assert_called_once()
+        janitor.unpin.assert_called_once_with('/tts/resposta.wav')
+
+
+class TestProcessUserQueryEarlyDispatch(unittest.TestCase):
+    """Tests per al despatx avançat de camps de la resposta en streaming"""
+
+    @patch.object(gpt_car, 'release_speech')
+    @patch.object(gpt_car, 'wait_for_actions_completion')
+    @patch.object(gpt_car, 'wait_speech')
+    @patch.object(gpt_car, 'play_speech')
+    @patch.object(gpt_car, 'prepare_speech')
+    @patch.object(gpt_car, 'execute_actions_and_sounds')
+    @patch.object(gpt_car, 'get_gpt_response')
+    def test_accions_abans_que_acabi_la_resposta(self, mock_get_gpt, mock_execute, mock_prepare,
+                                                 mock_play, mock_wait_speech, mock_wait_actions,
+                                                 mock_release):
+        def fake_gpt(*args, on_field=None):
+            on_field('actions', ['nod', 'honking'])
+            # Les accions ja s'han despatxat abans que arribi la resposta sencera
+            mock_execute.assert_called_once()
+            on_field('answer', 'Hola')
+            return {'actions': ['nod', 'honking'], 'answer': 'Hola'}
+        mock_get_gpt.side_effect = fake_gpt
+        config = {
+            'openai_helper': Mock(), 'with_img': False, 'vilib_module': None,
+            'current_path': '/path', 'music': Mock(), 'sound_effect_actions': ['honking']
+        }
+        action_state = {
+            'lock': threading.Lock(),
+            'status_ref': {'action_status': 'standby'},
+            'actions_to_be_done_ref': {'actions_to_be_done': []}
+        }
+        speech_state = {'lock': threading.Lock(), 'loaded_ref': {'speech_loaded': False},
+                        'tts_file_ref': {'tts_file': None}}
+
+        with patch('builtins.print'):
+            gpt_car.process_user_query("Hola", config, action_state, speech_state, {})
+
+        mock_execute.assert_called_once()
+        self.assertEqual(mock_execute.call_args[0][:2], (['nod'], ['honking']))
+        mock_prepare.assert_called_once_with('Hola', config, speech_state, {})
+        mock_play.assert_called_once_with(mock_prepare.return_value, speech_state)
+        mock_release.assert_called_once()
+
+
 class TestHandleActionStateEdgeCases(unittest.TestCase):
     """Tests per a casos especials de handle_action_state()"""
     
@@ -865,6 +1474,78 @@ class TestSpeakHandler(unittest.TestCase):
             gpt_car.tts_file = original_tts_file
 
 
+class TestSpeakStreaming(unittest.TestCase):
+    """Tests per a speak_streaming()"""
+    # patch.object: altres tests poden reimportar gpt_car a sys.modules
+
+    def _tts_config(self):
+        return {'dir_path': '/tts', 'voice': 'echo', 'volume_db': 3, 'instructions': ''}
+
+    @patch.object(gpt_car, 'log_timings')
+    @patch.object(gpt_car, 'speak_block')
+    @patch.object(gpt_car, 'generate_tts')
+    @patch.object(gpt_car, 'stream_tts')
+    def test_streaming_ok_no_fa_fallback(self, mock_stream, mock_tts, mock_speak, mock_log):
+        """Si el streaming funciona no es genera cap fitxer"""
+        timings = {'audio_started': True, 'first_sound': 0.2}
+        mock_stream.return_value = (True, timings)
+
+        result = gpt_car.speak_streaming("Hola", Mock(), Mock(), self._tts_config())
+
+        self.assertEqual(result, timings)
+        mock_tts.assert_not_called()
+        mock_speak.assert_not_called()
+
+    @patch.object(gpt_car, 'gray_print')
+    @patch.object(gpt_car, 'log_timings')
+    @patch.object(gpt_car, 'speak_block')
+    @patch.object(gpt_car, 'generate_tts')
+    @patch.object(gpt_car, 'stream_tts')
+    def test_fallback_a_fitxer_si_no_ha_sonat(self, mock_stream, mock_tts, mock_speak,
+                                             mock_log, mock_gray):
+        """Si el streaming falla abans de sonar, es fa servir generate_tts + speak_block"""
+        mock_stream.return_value = (False, {'audio_started': False})
+
+        def fake_generate(answer, helper, dir_path, voice, volume, instr, ref, cache=None):
+            ref['tts_file'] = '/tts/x_3dB.wav'
+            return True
+        mock_tts.side_effect = fake_generate
+        music = Mock()
+
+        gpt_car.speak_streaming("Hola", Mock(), music, self._tts_config())
+
+        mock_tts.assert_called_once()
+        mock_speak.assert_called_once_with(music, '/tts/x_3dB.wav')
+
+    @patch.object(gpt_car, 'log_timings')
+    @patch.object(gpt_car, 'speak_block')
+    @patch.object(gpt_car, 'generate_tts')
+    @patch.object(gpt_car, 'stream_tts')
+    def test_sense_fallback_si_ja_havia_sonat(self, mock_stream, mock_tts, mock_speak, mock_log):
+        """Un tall a mig stream no repeteix la frase sencera"""
+        mock_stream.return_value = (False, {'audio_started': True})
+
+        gpt_car.speak_streaming("Hola", Mock(), Mock(), self._tts_config())
+
+        mock_tts.assert_not_called()
+        mock_speak.assert_not_called()
+
+
+class TestNextActionWakeup(unittest.TestCase):
+    """Tests per a next_action_wakeup()"""
+
+    def test_standby_fins_al_proper_parpelleig(self):
+        timeout = gpt_car.next_action_wakeup('standby', 100.0, 100.0, 5, now=100.3)
+        self.assertAlmostEqual(timeout, gpt_car.LED_DOUBLE_BLINK_INTERVAL - 0.3)
+
+    def test_esdeveniment_vencut_no_espera(self):
+        self.assertEqual(gpt_car.next_action_wakeup('think', 100.0, 100.0, 5, now=101.0), 0.0)
+
+    def test_sense_esdeveniments_espera_canvi_d_estat(self):
+        self.assertEqual(gpt_car.next_action_wakeup('actions_done', 0, 0, 5, now=100.0),
+                         gpt_car.IDLE_WAKEUP_INTERVAL)
+
+
 class TestActionHandler(unittest.TestCase):
     """Tests per a action_handler()"""
     
@@ -0,0 +1,136 @@
+"""
+Tests unitaris per a image_prep.py
+"""
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import json
+import tempfile
+
+# Afegir el directori pare al path per poder importar els mòduls
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Altres tests reemplacen utils per un mock: carregar els mòduls reals
+if not isinstance(getattr(sys.modules.get('utils'), '__file__', None), str):
+    sys.modules.pop('utils', None)
+sys.modules.pop('image_prep', None)
+
+from image_prep import CapturedFrame, VisionStats, person_box, select_image_profile
+
+FRAME = (480, 640, 3)
+
+
+class TestSelectImageProfile(unittest.TestCase):
+    """Tests per a select_image_profile()"""
+
+    def test_per_defecte_miniatura(self):
+        self.assertEqual(select_image_profile("Quina hora és?"), 'thumbnail')
+        self.assertEqual(select_image_profile(""), 'thumbnail')
+        self.assertEqual(select_image_profile(None), 'thumbnail')
+
+    def test_preguntes_sobre_l_escena(self):
+        self.assertEqual(select_image_profile("Què veus?"), 'scene')
+        self.assertEqual(select_image_profile("De quin color és la paret?"), 'scene')
+        self.assertEqual(select_image_profile("LLEGEIX el cartell"), 'scene')
+
+    def test_preguntes_sobre_l_usuari(self):
+        self.assertEqual(select_image_profile("Què porto a la mà?"), 'person')
+        self.assertEqual(select_image_profile("T'agrada la meva samarreta?"), 'person')
+
+    def test_paraules_senceres(self):
+        """'mira' no ha de coincidir dins d'una altra paraula"""
+        self.assertEqual(select_image_profile("Admiraves els castells?"), 'thumbnail')
+
+
+class TestPersonBox(unittest.TestCase):
+    """Tests per a person_box()"""
+
+    def test_retall_amb_marge(self):
+        detection = {'human_n': 1, 'human_x': 320, 'human_y': 240, 'human_w': 100, 'human_h': 120}
+        self.assertEqual(person_box(detection, FRAME), (220, 120, 420, 360))
+
+    def test_retall_limitat_al_fotograma(self):
+        detection = {'human_n': 1, 'human_x': 20, 'human_y': 30, 'human_w': 80, 'human_h': 80}
+        self.assertEqual(person_box(detection, FRAME), (0, 0, 100, 110))
+
+    def test_sense_persona(self):
+        self.assertIsNone(person_box({'human_n': 0}, FRAME))
+        self.assertIsNone(person_box({'human_n': 1, 'human_w': 0, 'human_h': 0}, FRAME))
+        self.assertIsNone(person_box(None, FRAME))
+
+    def test_persona_massa_gran(self):
+        """Si el retall és quasi tot el fotograma, s'envia el fotograma sencer"""
+        detection = {'human_n': 1, 'human_x': 320, 'human_y': 240, 'human_w': 400, 'human_h': 300}
+        self.assertIsNone(person_box(detection, FRAME))
+
+
+class TestCapturedFrame(unittest.TestCase):
+    """Tests per a CapturedFrame"""
+
+    def test_copia_la_deteccio(self):
+        detection = {'human_n': 1}
+        frame = CapturedFrame('img', detection, captured_at=5.0)
+        detection['human_n'] = 0
+        self.assertEqual(frame.detection, {'human_n': 1})
+        self.assertEqual(frame.captured_at, 5.0)
+        self.assertEqual(CapturedFrame('img', None).detection, {})
+
+
+class TestVisionStats(unittest.TestCase):
+    """Tests per a VisionStats"""
+
+    def setUp(self):
+        patcher = patch('image_prep.gray_print')
+        self.mock_gray = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_mitjanes_per_perfil(self):
+        stats = VisionStats()
+        stats.record('thumbnail', 2000, size=(320, 240), quality=60, request_s=1.0)
+        stats.record('thumbnail', 4000, size=(320, 240), quality=60, request_s=2.0)
+        stats.record('scene', 30000, size=(640, 480), quality=85, request_s=3.0)
+
+        summary = stats.summary()
+        self.assertEqual(summary['thumbnail'], {'turns': 2, 'avg_bytes': 3000, 'avg_request_s': 1.5})
+        self.assertEqual(summary['scene']['turns'], 1)
+        self.assertIn('320x240 q60', self.mock_gray.call_args_list[0][0][0])
+
+    def test_escriu_jsonl(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'vision_stats.jsonl')
+            stats = VisionStats(path)
+            stats.record('person', 12000, size=(200, 240), quality=85, cropped=True,
+                         encode_s=0.01, request_s=2.5)
+            stats.record('upload', None, upload_s=0.8)
+            with open(path) as f:
+                entries = [json.loads(line) for line in f]
+
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0]['profile'], 'person')
+        self.assertEqual(entries[0]['size'], [200, 240])
+        self.assertTrue(entries[0]['cropped'])
+        self.assertEqual(entries[1]['upload_s'], 0.8)
+
+    def test_rota_el_jsonl_quan_es_ple(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'vision_stats.jsonl')
+            stats = VisionStats(path, max_bytes=500)
+            for _ in range(10):
+                stats.record('thumbnail', 2000, size=(320, 240), quality=60, request_s=1.0)
+            sizes = [os.path.getsize(path), os.path.getsize(path + '.1')]
+            self.assertEqual(sorted(os.listdir(tmp)), ['vision_stats.jsonl', 'vision_stats.jsonl.1'])
+        for size in sizes:
+            self.assertLess(size, 500 + 300)
+        self.assertEqual(stats.summary()['thumbnail']['turns'], 10)
+
+    @patch('image_prep.warn')
+    def test_error_d_escriptura_no_atura_el_torn(self, mock_warn):
+        stats = VisionStats(os.path.join(tempfile.gettempdir(), 'no-existeix', 'stats.jsonl'))
+        stats.record('thumbnail', 1000, request_s=1.0)
+        mock_warn.assert_called_once()
+        self.assertEqual(stats.summary()['thumbnail']['turns'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
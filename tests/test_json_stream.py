@@ -0,0 +1,80 @@
+"""
+Tests unitaris per a json_stream.py
+"""
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import json
+
+# Afegir el directori pare al path per poder importar els mòduls
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Altres tests reemplacen utils per un mock: carregar els mòduls reals
+if not isinstance(getattr(sys.modules.get('utils'), '__file__', None), str):
+    sys.modules.pop('utils', None)
+sys.modules.pop('json_stream', None)
+
+import json_stream
+from json_stream import JsonFieldStream
+
+
+class TestJsonFieldStream(unittest.TestCase):
+    """Tests per a JsonFieldStream"""
+
+    def _feed_chars(self, text):
+        events = []
+        parser = JsonFieldStream(lambda k, v: events.append((k, v)))
+        for c in text:
+            parser.feed(c)
+        return parser, events
+
+    def test_camps_de_primer_nivell_caracter_a_caracter(self):
+        text = '{"actions": ["nod", {"x": [1, 2]}], "answer": "Hola, món!", "n": -1.5, "ok": true, "z": null}'
+        parser, events = self._feed_chars(text)
+        self.assertEqual(events, list(json.loads(text).items()))
+        self.assertTrue(parser.done)
+        self.assertEqual(parser.text, text)
+
+    def test_camp_s_emet_en_quant_es_complet(self):
+        events = []
+        parser = JsonFieldStream(lambda k, v: events.append(k))
+        parser.feed('{"actions": ["nod"]')
+        self.assertEqual(events, ['actions'])
+        parser.feed(', "answer": "Encara parlo')
+        self.assertEqual(events, ['actions'])
+        parser.feed('..."}')
+        self.assertEqual(events, ['actions', 'answer'])
+
+    def test_cometes_i_claus_dins_de_strings(self):
+        text = '{"answer": "Diu \\"}\\" i [no] \\\\", "actions": []}'
+        _, events = self._feed_chars(text)
+        self.assertEqual(events, list(json.loads(text).items()))
+
+    def test_escalar_al_final_de_l_objecte(self):
+        parser, events = self._feed_chars('{"a": 1,"b":2}')
+        self.assertEqual(events, [('a', 1), ('b', 2)])
+        self.assertTrue(parser.done)
+
+    def test_text_que_no_es_json(self):
+        parser, events = self._feed_chars('```json\n{"answer": "x"}```')
+        self.assertEqual(events, [])
+        self.assertFalse(parser.valid)
+        self.assertFalse(parser.emitted)
+
+    @patch.object(json_stream, 'warn')
+    def test_error_al_callback_no_atura_el_parser(self, mock_warn):
+        calls = []
+
+        def on_field(key, value):
+            calls.append(key)
+            raise RuntimeError("callback")
+        parser = JsonFieldStream(on_field)
+        parser.feed('{"a": 1, "b": 2}')
+        self.assertEqual(calls, ['a', 'b'])
+        self.assertEqual(parser.fields, {'a': 1, 'b': 2})
+        mock_warn.assert_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
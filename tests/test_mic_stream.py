@@ -0,0 +1,307 @@
+"""
+Tests unitaris per a mic_stream.py
+"""
+import unittest
+from unittest.mock import Mock, patch
+import sys
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+# Afegir el directori pare al path per poder importar els mòduls
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Altres tests reemplacen utils per un mock: carregar els mòduls reals
+if not isinstance(getattr(sys.modules.get('utils'), '__file__', None), str):
+    sys.modules.pop('utils', None)
+sys.modules.pop('mic_stream', None)
+
+from mic_stream import MicStream, chunk_energy, update_energy_threshold
+
+RATE = 16000
+CHUNK = 1600  # 0,1 s per fragment
+
+
+def tone(amplitude, samples=CHUNK):
+    """Fragment PCM de 16 bits amb energia RMS = amplitude (ona quadrada)."""
+    data = np.full(samples, amplitude, dtype='<i2')
+    data[1::2] = -amplitude
+    return data.tobytes()
+
+
+class FakeStream():
+    def __init__(self):
+        self.chunks = queue.Queue()
+        self.closed = False
+
+    def read(self, size):
+        return self.chunks.get(timeout=2)
+
+
+class FakeMicrophone():
+    def __init__(self):
+        self.stream = FakeStream()
+        self.SAMPLE_RATE = RATE
+        self.SAMPLE_WIDTH = 2
+        self.CHUNK = CHUNK
+        self.exited = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.exited = True
+
+
+class FakeRecognizer():
+    """Imita el càlcul de llindar de sr.Recognizer; listen llegeix n fragments."""
+
+    def __init__(self, chunks_per_phrase=3):
+        self.energy_threshold = 300
+        self.dynamic_energy_adjustment_damping = 0.15
+        self.dynamic_energy_ratio = 1.5
+        self.chunks_per_phrase = chunks_per_phrase
+
+    def listen(self, source):
+        return b''.join(source.stream.read(source.CHUNK) for _ in range(self.chunks_per_phrase))
+
+
+def wait_for(predicate, timeout=2):
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            raise AssertionError("timeout")
+        time.sleep(0.005)
+
+
+class TestEnergy(unittest.TestCase):
+    """Tests per a chunk_energy() i update_energy_threshold()"""
+
+    def test_energia_rms(self):
+        self.assertAlmostEqual(chunk_energy(tone(1000)), 1000)
+        self.assertEqual(chunk_energy(b''), 0.0)
+        with self.assertRaises(ValueError):
+            chunk_energy(b'\x00' * 6, sample_width=3)
+
+    def test_mitjana_ponderada(self):
+        recognizer = FakeRecognizer()
+        update_energy_threshold(recognizer, 100, 1.0)
+        # 300 * 0,15 + 150 * 0,85
+        self.assertAlmostEqual(recognizer.energy_threshold, 172.5)
+
+
+@patch('mic_stream.gray_print')
+class TestMicStream(unittest.TestCase):
+    """Tests per a MicStream"""
+
+    def _start(self, calibration_s=0.3, **kwargs):
+        self.microphone = FakeMicrophone()
+        self.stream = self.microphone.stream
+        self.recognizer = FakeRecognizer()
+        mic = MicStream(self.recognizer, lambda: self.microphone, calibration_s=calibration_s, **kwargs)
+        with patch('mic_stream.redirect_error_2_null'), patch('mic_stream.cancel_redirect_error'):
+            mic.start()
+        self.addCleanup(self._stop, mic)
+        return mic
+
+    def _stop(self, mic):
+        self.stream.chunks.put(b'')
+        with patch('mic_stream.warn'):
+            mic.close()
+
+    def _feed(self, mic, *chunks):
+        target = mic.stats['chunks'] + len(chunks)
+        for chunk in chunks:
+            self.stream.chunks.put(chunk)
+        wait_for(lambda: mic.stats['chunks'] >= target)
+        # l'últim fragment es comptabilitza abans de calibrar-lo
+        time.sleep(0.02)
+
+    def test_calibratge_inicial(self, mock_gray):
+        mic = self._start()
+        self.assertTrue(mic.running)
+        self.assertFalse(mic.calibrated)
+        self._feed(mic, tone(100), tone(100), tone(100))
+        self.assertTrue(mic.calibrated)
+        self.assertEqual(mic.stats['calibration_chunks'], 3)
+        # El llindar baixa cap a 100 * 1,5 des de 300
+        self.assertLess(self.recognizer.energy_threshold, 300)
+        self.assertGreater(self.recognizer.energy_threshold, 150)
+        mock_gray.assert_called_once()
+
+    def test_calibratge_de_fons_ignora_la_veu(self, mock_gray):
+        mic = self._start(calibration_s=0.1)
+        self._feed(mic, tone(100))
+        threshold = self.recognizer.energy_threshold
+        self._feed(mic, tone(5000))
+        self.assertEqual(self.recognizer.energy_threshold, threshold)
+        self._feed(mic, tone(50))
+        self.assertLess(self.recognizer.energy_threshold, threshold)
+
+    def test_no_calibra_si_el_robot_fa_soroll(self, mock_gray):
+        quiet = {'value': False}
+        mic = self._start(calibration_s=0.1, should_calibrate=lambda: quiet['value'])
+        self._feed(mic, tone(100))
+        threshold = self.recognizer.energy_threshold
+        self._feed(mic, tone(10))
+        self.assertEqual(self.recognizer.energy_threshold, threshold)
+        quiet['value'] = True
+        self._feed(mic, tone(10))
+        self.assertLess(self.recognizer.energy_threshold, threshold)
+
+    def test_listen_rep_els_fragments_nous(self, mock_gray):
+        mic = self._start(calibration_s=0.1)
+        self._feed(mic, tone(100), tone(101))  # abans d'escoltar: no formen part de la frase
+        result = {}
+        listener = threading.Thread(target=lambda: result.setdefault('audio', mic.listen()))
+        listener.start()
+        wait_for(lambda: mic.stats['turns'] == 1)
+        phrase = [tone(2000), tone(2001), tone(2002)]
+        for chunk in phrase:
+            self.stream.chunks.put(chunk)
+        listener.join(2)
+        self.assertEqual(result['audio'], b''.join(phrase))
+        # L'àudio del torn no calibra el llindar
+        self.assertEqual(mic.stats['calibration_chunks'], 2)
+
+    def test_listen_amb_vad(self, mock_gray):
+        """El VAD tanca la frase sense esperar el recognizer i conserva el pre-roll"""
+        mic = self._start(calibration_s=0.1, vad_options={'pre_roll_s': 0.3},
+                          audio_factory=lambda data, rate, width: (data, rate, width))
+        self._feed(mic, tone(100))
+        threshold = self.recognizer.energy_threshold
+        result = {}
+        listener = threading.Thread(target=lambda: result.setdefault('audio', mic.listen()))
+        listener.start()
+        wait_for(lambda: mic.stats['turns'] == 1)
+        for chunk in [tone(20)] * 4 + [tone(3000)] * 5 + [tone(20)] * 20:
+            self.stream.chunks.put(chunk)
+        listener.join(2)
+
+        data, rate, width = result['audio']
+        self.assertEqual((rate, width), (RATE, 2))
+        self.assertEqual(len(data) % (2 * 480), 0)
+        self.assertTrue(data.startswith(tone(20, 480)))
+        self.assertAlmostEqual(mic.last_listen['speech_s'], 0.5, delta=0.04)
+        self.assertTrue(mic.last_listen['fast_end'])
+        # El soroll d'abans de la veu ha continuat calibrant el llindar
+        self.assertLess(self.recognizer.energy_threshold, threshold)
+
+    def test_transcripcio_en_streaming(self, mock_gray):
+        """La frase s'alimenta al transcriptor mentre arriba, pre-roll inclòs"""
+        fed = []
+        transcriber = Mock()
+        transcriber.feed.side_effect = fed.append
+        transcriber.finish.return_value = 'hola'
+        transcriber.stats = {'final_wait_s': 0.01, 'partials': 2}
+        factory = Mock(return_value=transcriber)
+        mic = self._start(calibration_s=0.1, vad_options={'pre_roll_s': 0.3},
+                          audio_factory=lambda data, rate, width: data, transcriber_factory=factory)
+        self._feed(mic, tone(100))
+        result = {}
+        listener = threading.Thread(target=lambda: result.setdefault('audio', mic.listen()))
+        listener.start()
+        wait_for(lambda: mic.stats['turns'] == 1)
+        for chunk in [tone(20)] * 4 + [tone(3000)] * 5 + [tone(20)] * 20:
+            self.stream.chunks.put(chunk)
+        listener.join(2)
+
+        factory.assert_called_once_with(RATE)
+        self.assertGreater(transcriber.feed.call_count, 1)
+        self.assertEqual(b''.join(fed), result['audio'])
+        self.assertEqual(mic.streamed_transcript(result['audio']), 'hola')
+
+    def test_porta_de_paraula_clau(self, mock_gray):
+        """Les frases rebutjades es descarten i listen() continua fins a una d'acceptada"""
+        sessions = []
+
+        def open_session(rate):
+            session = Mock()
+            session.fed = []
+            session.feed.side_effect = session.fed.append
+            sessions.append(session)
+            return session
+
+        gate = Mock()
+        gate.open.side_effect = open_session
+        gate.check.side_effect = [(False, 'rejected'), (True, 'keyword')]
+        transcriber = Mock()
+        mic = self._start(calibration_s=0.1, vad_options={'pre_roll_s': 0.3},
+                          audio_factory=lambda data, rate, width: data, phrase_gate=gate,
+                          transcriber_factory=Mock(return_value=transcriber))
+        self._feed(mic, tone(100))
+        result = {}
+        listener = threading.Thread(target=lambda: result.setdefault('audio', mic.listen()))
+        listener.start()
+        wait_for(lambda: mic.stats['turns'] == 1)
+        phrase = [tone(20)] * 4 + [tone(3000)] * 5 + [tone(20)] * 20
+        for chunk in phrase * 2:
+            self.stream.chunks.put(chunk)
+        listener.join(2)
+
+        self.assertEqual(len(sessions), 2)
+        self.assertEqual(gate.check.call_args_list[0][0][0], sessions[0])
+        # La frase rebutjada no arriba a l'STT
+        transcriber.cancel.assert_called_once_with()
+        self.assertEqual(b''.join(sessions[1].fed), result['audio'])
+        self.assertEqual(mic.stats['gated_phrases'], 1)
+        self.assertEqual(mic.stats['turns'], 1)
+        self.assertEqual(mic.last_listen['gate'], 'keyword')
+
+    def test_streamed_transcript(self, mock_gray):
+        mic = self._start(calibration_s=0.1)
+        transcriber = Mock(stats={'final_wait_s': 0.05, 'partials': 3})
+        transcriber.finish.return_value = 'endavant'
+        mic.last_listen = {}
+        audio = object()
+        mic._streamed = (object(), transcriber)
+        # Àudio d'una altra frase: no es fa servir
+        self.assertIsNone(mic.streamed_transcript(audio))
+        mic._streamed = (audio, transcriber)
+        self.assertEqual(mic.streamed_transcript(audio), 'endavant')
+        self.assertEqual(mic.last_listen['stream_final_s'], 0.05)
+        # Només una vegada per frase
+        self.assertIsNone(mic.streamed_transcript(audio))
+
+    def test_barge_in_guarda_la_frase(self, mock_gray):
+        """La veu mentre el robot parla crida on_barge_in i el listen() següent la rep sencera"""
+        on_barge_in = Mock()
+        mic = self._start(calibration_s=0.1, on_barge_in=on_barge_in, barge_in_armed=lambda: True)
+        chunks = [tone(100), tone(101), tone(102)] + [tone(3000), tone(1000)] * 2
+        self.recognizer.chunks_per_phrase = len(chunks) + 1
+        self._feed(mic, *chunks)
+        on_barge_in.assert_called_once_with()
+        self.assertEqual(mic.stats['barge_ins'], 1)
+        # Després del barge-in l'àudio ja no calibra: és la frase de l'usuari
+        self._feed(mic, tone(3001))
+        self.assertEqual(mic.stats['calibration_chunks'], 3)
+        self.assertEqual(mic.listen(), b''.join(chunks + [tone(3001)]))
+
+    def test_barge_in_desarmat(self, mock_gray):
+        on_barge_in = Mock()
+        mic = self._start(calibration_s=0.1, on_barge_in=on_barge_in, barge_in_armed=lambda: False)
+        self._feed(mic, tone(100), *[tone(3000)] * 5)
+        on_barge_in.assert_not_called()
+        self.assertEqual(mic.stats['barge_ins'], 0)
+
+    def test_micro_aturat(self, mock_gray):
+        mic = self._start(calibration_s=0.1)
+        self._feed(mic, tone(100))
+        with patch('mic_stream.warn'):
+            self.stream.chunks.put(b'')
+            wait_for(lambda: not mic.running)
+        self.assertEqual(mic.read(CHUNK), b'')
+
+    def test_close_restaura_el_micro(self, mock_gray):
+        mic = self._start()
+        self.assertIsNot(self.microphone.stream, self.stream)
+        self._stop(mic)
+        self.assertIs(self.microphone.stream, self.stream)
+        self.assertTrue(self.microphone.exited)
+
+
+if __name__ == '__main__':
+    unittest.main()
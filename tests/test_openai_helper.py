@@ -17,8 +17,13 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # Carregar el mòdul real (altres tests el reemplacen per un mock)
 if 'openai_helper' in sys.modules:
     del sys.modules['openai_helper']
+if not isinstance(getattr(sys.modules.get('utils'), '__file__', None), str):
+    sys.modules.pop('utils', None)
+sys.modules.pop('json_stream', None)
+sys.modules.pop('stt_audio', None)
 
 from openai_helper import OpenAiHelper, chat_print
+from tests.responses_replay import ReplayResponses, load_recorded_stream
 
 
 class TestChatPrint(unittest.TestCase):
@@ -33,6 +38,84 @@ class TestChatPrint(unittest.TestCase):
         self.assertIn("user", call_args)
         self.assertIn("Hola robot", call_args)
 
+class TestOpenAiHelperStt(unittest.TestCase):
+    """Tests per a stt()"""
+
+    def _audio(self, seconds):
+        audio = Mock()
+        audio.frame_data = b'\x00' * int(44100 * 2 * seconds)
+        audio.get_wav_data.return_value = b'RIFF' + b'\x00' * int(16000 * 2 * seconds)
+        return audio
+
+    @patch('openai_helper.OpenAI')
+    def test_frase_curta_en_wav_a_16k(self, mock_openai_class):
+        h = OpenAiHelper(api_key="key")
+        h.client.audio.transcriptions.create.return_value = Mock(text="Hola")
+        audio = self._audio(1)
+
+        self.assertEqual(h.stt(audio, language='ca'), "Hola")
+
+        audio.get_wav_data.assert_called_once_with(convert_rate=16000, convert_width=2)
+        sent = h.client.audio.transcriptions.create.call_args[1]['file']
+        self.assertEqual(sent.name, 'stt_output.wav')
+        self.assertEqual(h.last_stt_stats['format'], 'wav')
+        self.assertIsNotNone(h.last_stt_stats['stt_s'])
+
+    @patch('shutil.which', return_value='/usr/bin/flac')
+    @patch('subprocess.run', return_value=Mock(stdout=b'fLaC'))
+    @patch('openai_helper.OpenAI')
+    def test_frase_mitjana_en_flac(self, mock_openai_class, mock_run, mock_which):
+        h = OpenAiHelper(api_key="key")
+        h.client.audio.transcriptions.create.return_value = Mock(text="Hola")
+
+        h.stt(self._audio(4), language='ca')
+
+        sent = h.client.audio.transcriptions.create.call_args[1]['file']
+        self.assertEqual(sent.name, 'stt_output.flac')
+        self.assertEqual(sent.read(), b'fLaC')
+        self.assertEqual(h.last_stt_stats['upload_bytes'], 4)
+
+    @patch('openai_helper.OpenAI')
+    def test_sense_compressio(self, mock_openai_class):
+        h = OpenAiHelper(api_key="key")
+        h.STT_COMPRESSION = False
+        audio = self._audio(4)
+        h.stt(audio)
+        audio.get_wav_data.assert_called_once_with()
+
+    @patch('openai_helper.OpenAI')
+    def test_error_d_stt(self, mock_openai_class):
+        h = OpenAiHelper(api_key="key")
+        h.client.audio.transcriptions.create.side_effect = RuntimeError("xarxa")
+        with patch('builtins.print'):
+            self.assertFalse(h.stt(self._audio(1)))
+        self.assertIsNone(h.last_stt_stats)
+
+    @patch('openai_helper.OpenAI')
+    def test_preescalfar_connexio_una_vegada(self, mock_openai_class):
+        h = OpenAiHelper(api_key="key")
+        self.assertTrue(h.warm_up_connection())
+        self.assertFalse(h.warm_up_connection())
+        h.client.models.retrieve.assert_called_once()
+
+    @patch('openai_helper.OpenAI')
+    def test_preescalfar_un_cop_per_torn_i_nomes_si_inactiva(self, mock_openai_class):
+        h = OpenAiHelper(api_key="key")
+        with patch('openai_helper.time.time', return_value=100.0):
+            h.stt(self._audio(1))
+            # La connexió de l'STT encara és oberta
+            self.assertFalse(h.warm_up_connection())
+        with patch('openai_helper.time.time', return_value=100.0 + h.KEEPALIVE_IDLE + 1):
+            self.assertTrue(h.warm_up_connection())
+        # Una frase llarga: les parcials següents no tornen a fer cap petició
+        with patch('openai_helper.time.time', return_value=100.0 + 10 * h.KEEPALIVE_IDLE):
+            self.assertFalse(h.warm_up_connection())
+            h.dialogue("hola")
+        with patch('openai_helper.time.time', return_value=100.0 + 20 * h.KEEPALIVE_IDLE):
+            self.assertTrue(h.warm_up_connection())
+        self.assertEqual(h.client.models.retrieve.call_count, 2)
+
+
 class TestOpenAiHelperParseResponse(unittest.TestCase):
     """Tests per a _parse_response_value"""
 
@@ -184,6 +267,103 @@ class TestOpenAiHelperDialogue(unittest.TestCase):
         self.assertEqual(content[1]["file_id"], "file_abc")
         self.assertEqual(result, {"answer": "ok", "actions": []})
 
+    @patch('openai_helper.OpenAI')
+    def test_dialogue_with_img_amb_fitxer_ja_pujat(self, mock_openai_class):
+        """Amb file_id no es torna a pujar la imatge"""
+        mock_client = MagicMock()
+        mock_openai_class.return_value = mock_client
+        h = OpenAiHelper(api_key="key")
+        h._call_responses_api = Mock(return_value={"answer": "ok"})
+        with patch('openai_helper.chat_print'):
+            h.dialogue_with_img("Què veus?", file_id="file_xyz")
+        mock_client.files.create.assert_not_called()
+        content = h._call_responses_api.call_args[0][0][0]["content"]
+        self.assertEqual(content[1]["file_id"], "file_xyz")
+
+    @patch('openai_helper.OpenAI')
+    def test_dialogue_with_img_en_memoria(self, mock_openai_class):
+        """Amb image_bytes la imatge va dins la petició, sense disc ni pujada"""
+        mock_client = MagicMock()
+        mock_openai_class.return_value = mock_client
+        h = OpenAiHelper(api_key="key")
+        h._call_responses_api = Mock(return_value={"answer": "ok"})
+        with patch('builtins.open') as mock_open, patch('openai_helper.chat_print'):
+            h.dialogue_with_img("Què veus?", image_bytes=b'\xff\xd8jpeg')
+        mock_open.assert_not_called()
+        mock_client.files.create.assert_not_called()
+        content = h._call_responses_api.call_args[0][0][0]["content"]
+        self.assertEqual(content[1], {"type": "input_image", "image_url": "data:image/jpeg;base64,/9hqcGVn"})
+
+
+class TestOpenAiHelperResponsesStream(unittest.TestCase):
+    """Tests per a la Responses API en streaming (fluxos enregistrats)"""
+
+    def _helper(self, replay):
+        with patch('openai_helper.OpenAI'):
+            h = OpenAiHelper(api_key="key", prompt_id="pmpt_1")
+        h.client = MagicMock()
+        h.client.responses = replay
+        return h
+
+    def test_accions_abans_que_acabi_la_resposta(self):
+        replay = ReplayResponses(load_recorded_stream('actions_then_answer'))
+        h = self._helper(replay)
+        fields = []
+        with patch('openai_helper.chat_print'):
+            result = h.dialogue("Hola", on_field=lambda k, v: fields.append((k, v, replay.sent)))
+
+        total = len(replay.recorded['deltas'])
+        self.assertEqual([f[0] for f in fields], ['actions', 'answer'])
+        self.assertEqual(fields[0][1], ['nod', 'honking'])
+        # El camp actions s'emet quan encara falten la majoria de fragments
+        self.assertLess(fields[0][2], total // 2)
+        self.assertEqual(result, json.loads(replay.text))
+        self.assertTrue(replay.calls[0]['stream'])
+        self.assertEqual(h._last_response_id, 'resp_replay_1')
+
+    def test_escapes_dins_del_text(self):
+        replay = ReplayResponses(load_recorded_stream('answer_with_escapes'))
+        h = self._helper(replay)
+        fields = {}
+        with patch('openai_helper.chat_print'):
+            h.dialogue("Hola", on_field=fields.__setitem__)
+        self.assertEqual(fields, {'answer': 'Diu "hola" {i} adéu\n', 'actions': ['think']})
+
+    def test_text_lliure_no_emet_camps(self):
+        replay = ReplayResponses(load_recorded_stream('plain_text'))
+        h = self._helper(replay)
+        fields = []
+        with patch('openai_helper.chat_print'):
+            result = h.dialogue("Hola", on_field=lambda k, v: fields.append(k))
+        self.assertEqual(fields, [])
+        self.assertEqual(result, "Ho sento, no t'he entès.")
+
+    @patch('builtins.print')
+    def test_fallback_bloquejant_si_falla_abans_de_cap_camp(self, mock_print):
+        replay = ReplayResponses(load_recorded_stream('actions_then_answer'), fail_after=2)
+        h = self._helper(replay)
+        with patch('openai_helper.chat_print'):
+            result = h.dialogue("Hola", on_field=lambda k, v: None)
+        self.assertEqual([c['stream'] for c in replay.calls], [True, False])
+        self.assertEqual(result['actions'], ['nod', 'honking'])
+
+    @patch('builtins.print')
+    def test_sense_repeticio_si_ja_s_han_emes_camps(self, mock_print):
+        """Si les accions ja s'han despatxat, no es repeteix la crida"""
+        replay = ReplayResponses(load_recorded_stream('actions_then_answer'), fail_after=15)
+        h = self._helper(replay)
+        with patch('openai_helper.chat_print'):
+            result = h.dialogue("Hola", on_field=lambda k, v: None)
+        self.assertEqual(len(replay.calls), 1)
+        self.assertEqual(result, {'actions': ['nod', 'honking']})
+
+    def test_sense_on_field_crida_bloquejant(self):
+        replay = ReplayResponses(load_recorded_stream('actions_then_answer'))
+        h = self._helper(replay)
+        with patch('openai_helper.chat_print'):
+            h.dialogue("Hola")
+        self.assertFalse(replay.calls[0]['stream'])
+
 
 class TestOpenAiHelperTTS(unittest.TestCase):
     """Tests per a text_to_speech"""
@@ -222,6 +402,25 @@ class TestOpenAiHelperTTS(unittest.TestCase):
                     result = h.text_to_speech("Hola", "/out/speech.mp3")
         self.assertFalse(result)
 
+    @patch('openai_helper.OpenAI')
+    def test_text_to_speech_stream_yields_chunks(self, mock_openai_class):
+        """text_to_speech_stream retorna els fragments en ordre i demana PCM"""
+        mock_client = MagicMock()
+        mock_openai_class.return_value = mock_client
+        mock_stream = MagicMock()
+        mock_stream.iter_bytes.return_value = iter([b'ab', b'', b'cd'])
+        mock_cm = MagicMock()
+        mock_cm.__enter__ = Mock(return_value=mock_stream)
+        mock_cm.__exit__ = Mock(return_value=False)
+        mock_client.audio.speech.with_streaming_response.create.return_value = mock_cm
+
+        h = OpenAiHelper(api_key="key")
+        chunks = list(h.text_to_speech_stream("Hola", "echo"))
+        self.assertEqual(chunks, [b'ab', b'cd'])
+        call_kwargs = mock_client.audio.speech.with_streaming_response.create.call_args[1]
+        self.assertEqual(call_kwargs["response_format"], "pcm")
+        mock_stream.iter_bytes.assert_called_once_with(OpenAiHelper.TTS_STREAM_CHUNK_SIZE)
+
 
 if __name__ == '__main__':
     unittest.main()
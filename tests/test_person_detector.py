@@ -0,0 +1,136 @@
+"""
+Tests unitaris per a person_detector.py
+"""
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# Afegir el directori pare al path per poder importar els mòduls
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+sys.modules.pop('person_detector', None)
+
+from person_detector import HaarBackend, PersonDetector
+
+
+class FakeFrame():
+    """Fotograma sense píxels: recorda on és cada retall dins el fotograma sencer."""
+
+    def __init__(self, width=640, height=480, x0=0, y0=0):
+        self.shape = (height, width, 3)
+        self.x0, self.y0 = x0, y0
+
+    def __getitem__(self, key):
+        rows, cols = key
+        return FakeFrame(cols.stop - cols.start, rows.stop - rows.start, self.x0 + cols.start, self.y0 + rows.start)
+
+
+class FakeBackend():
+    """Retorna les cares de l'escena (x0, y0, w, h) que cauen senceres dins la imatge rebuda."""
+
+    def __init__(self):
+        self.faces = []
+        self.calls = []  # (amplada, alçada, scale) de cada crida
+
+    def __call__(self, image, scale=1.0, min_size=0, max_size=None):
+        height, width = image.shape[:2]
+        self.calls.append((width, height, scale))
+        found = []
+        for x0, y0, w, h in self.faces:
+            if (image.x0 <= x0 and x0 + w <= image.x0 + width and image.y0 <= y0 and y0 + h <= image.y0 + height
+                    and w >= min_size and (max_size is None or w <= max_size)):
+                found.append((x0 - image.x0, y0 - image.y0, w, h))
+        return found
+
+
+def detector_amb(full_every=4, load=0.0, **kwargs):
+    backend = FakeBackend()
+    detector = PersonDetector(backend, full_every=full_every, min_every=2, max_every=8,
+                              load_fn=lambda: load, **kwargs)
+    return detector, backend
+
+
+class TestPersonDetector(unittest.TestCase):
+    """Tests per a PersonDetector"""
+
+    def test_complet_cada_n_i_regions_entre_mig(self):
+        detector, backend = detector_amb(cpu_budget=1e9)
+        backend.faces = [(300, 200, 60, 60)]
+        detector.min_every = 4  # sense adaptació
+        for i in range(8):
+            params = detector.detect(FakeFrame(), t=i * 0.1)
+            self.assertEqual((params['human_n'], params['human_x'], params['human_y']), (1, 330, 230))
+        self.assertEqual(detector.stats['full'], 2)
+        self.assertEqual(detector.stats['roi'], 6)
+        # Les regions són molt més petites que el fotograma
+        regions = [width * height * scale ** 2 for width, height, scale in backend.calls if width < 640]
+        self.assertEqual(len(regions), 6)
+        for pixels in regions:
+            self.assertLess(pixels, 640 * 480 * 0.5 ** 2 / 4)
+
+    def test_segueix_la_cara_que_es_mou(self):
+        detector, backend = detector_amb(full_every=8)
+        for i in range(8):
+            backend.faces = [(200 + 15 * i, 200, 60, 60)]
+            params = detector.detect(FakeFrame(), t=i * 0.1)
+            self.assertEqual(params['human_x'], 230 + 15 * i)
+        self.assertEqual(detector.stats['roi_misses'], 0)
+
+    def test_perduda_a_la_regio_torna_a_complet(self):
+        detector, backend = detector_amb(full_every=8)
+        backend.faces = [(300, 200, 60, 60)]
+        detector.detect(FakeFrame(), t=0.0)
+        backend.faces = [(20, 20, 60, 60)]  # salt fora de la regió
+        self.assertEqual(detector.detect(FakeFrame(), t=0.1)['human_n'], 0)
+        self.assertEqual(detector.stats['roi_misses'], 1)
+        params = detector.detect(FakeFrame(), t=0.2)
+        self.assertEqual((params['human_n'], params['human_x']), (1, 50))
+        self.assertEqual(detector.stats['full'], 2)
+
+    def test_sense_ningu_no_processa_fins_al_proper_complet(self):
+        detector, backend = detector_amb(full_every=4)
+        detector.min_every = 4
+        for i in range(8):
+            self.assertEqual(detector.detect(FakeFrame(), t=i * 0.1), {'human_n': 0, 'people': []})
+        self.assertEqual(detector.stats['full'], 2)
+        self.assertEqual(detector.stats['skipped'], 6)
+        self.assertEqual(len(backend.calls), 2)
+
+    def test_diverses_persones(self):
+        detector, backend = detector_amb()
+        backend.faces = [(100, 200, 40, 40), (400, 150, 80, 80)]
+        params = detector.detect(FakeFrame(), t=0.0)
+        self.assertEqual(params['human_n'], 2)
+        self.assertEqual(len(params['people']), 2)
+        # human_* és la persona més gran, com Vilib
+        self.assertEqual((params['human_x'], params['human_y'], params['human_w']), (440, 190, 80))
+        params = detector.detect(FakeFrame(), t=0.1)
+        self.assertEqual(detector.stats['roi'], 1)
+        self.assertEqual(sorted(params['people']), [(120.0, 220.0, 40, 40), (440.0, 190.0, 80, 80)])
+
+    def test_adapta_full_every_a_la_carrega(self):
+        with patch('person_detector.time.perf_counter', side_effect=[i * 0.05 for i in range(40)]):
+            # 50 ms de detector cada 100 ms: massa per al pressupost
+            detector, _ = detector_amb(full_every=2)
+            for i in range(20):
+                detector.detect(FakeFrame(), t=i * 0.1)
+        self.assertGreater(detector.full_every, 2)
+        # Sistema carregat
+        detector, _ = detector_amb(full_every=3, load=1.0)
+        detector.detect(FakeFrame(), t=0.0)
+        self.assertEqual(detector.full_every, 4)
+        # Amb marge, baixa fins al mínim
+        detector, _ = detector_amb(full_every=6)
+        for i in range(40):
+            detector.detect(FakeFrame(), t=i * 0.1)
+        self.assertEqual(detector.full_every, 2)
+
+    def test_backend_sense_cascada(self):
+        backend = HaarBackend(path='')
+        self.assertFalse(backend.available)
+        self.assertFalse(PersonDetector(backend).available)
+
+
+if __name__ == '__main__':
+    unittest.main()
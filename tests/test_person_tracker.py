@@ -0,0 +1,106 @@
+"""
+Tests unitaris per a person_tracker.py
+"""
+import unittest
+import sys
+import os
+
+# Afegir el directori pare al path per poder importar els mòduls
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+sys.modules.pop('person_tracker', None)
+
+from person_tracker import PersonTracker, boxes_from_detection, iou
+
+
+class TestBoxes(unittest.TestCase):
+    """Tests per a boxes_from_detection() i iou()"""
+
+    def test_deteccio_de_vilib(self):
+        self.assertEqual(boxes_from_detection({'human_n': 0}), [])
+        self.assertEqual(boxes_from_detection({'human_n': 1, 'human_x': 100, 'human_y': 120,
+                                               'human_w': 40, 'human_h': 50}), [(100.0, 120.0, 40.0, 50.0)])
+        # Sense mida: capsa per defecte
+        self.assertEqual(len(boxes_from_detection({'human_n': 1, 'human_x': 1, 'human_y': 2})[0]), 4)
+        self.assertEqual(boxes_from_detection(None), [])
+
+    def test_diverses_persones(self):
+        params = {'human_n': 1, 'human_x': 5, 'people': [(100, 100, 40, 40), (400, 100, 60, 60)]}
+        self.assertEqual(len(boxes_from_detection(params)), 2)
+
+    def test_iou(self):
+        self.assertAlmostEqual(iou((100, 100, 40, 40), (100, 100, 40, 40)), 1.0)
+        self.assertAlmostEqual(iou((100, 100, 40, 40), (120, 100, 40, 40)), 1 / 3)
+        self.assertEqual(iou((100, 100, 40, 40), (300, 100, 40, 40)), 0.0)
+
+
+class TestPersonTracker(unittest.TestCase):
+    """Tests per a PersonTracker"""
+
+    A = (150, 240, 60, 60)
+    B = (480, 240, 80, 80)
+
+    def test_ids_persistents(self):
+        tracker = PersonTracker()
+        for i in range(5):
+            tracker.update([(150 + 5 * i, 240, 60, 60), (480 - 5 * i, 240, 80, 80)], i)
+        self.assertEqual(sorted(track.id for track in tracker.tracks), [1, 2])
+        self.assertEqual(tracker.tracks[0].hits, 5)
+
+    def test_no_salta_entre_persones(self):
+        """Vilib dona alternativament la cara de cadascú: el seguiment es queda amb la primera"""
+        tracker = PersonTracker()
+        targets = []
+        for i in range(12):
+            target = tracker.update([self.A if i % 3 != 2 else self.B], i)
+            targets.append(target.id if target is not None else None)
+        self.assertEqual({t for t in targets if t is not None}, {1})
+        self.assertEqual(tracker.stats['lock_changes'], 1)
+        # Mentre Vilib dona B, la pista seguida no és visible
+        self.assertFalse(tracker.update([self.B], 12).visible)
+
+    def test_pista_nova_s_ha_de_confirmar(self):
+        tracker = PersonTracker(confirm_hits=2)
+        self.assertIsNone(tracker.update([self.A], 0))
+        self.assertEqual(tracker.update([self.A], 1).id, 1)
+
+    def test_la_pista_caduca_i_se_segueix_una_altra(self):
+        tracker = PersonTracker(max_misses=3)
+        tracker.update([self.A], 0)
+        tracker.update([self.A, self.B], 1)
+        tracker.update([self.A, self.B], 2)
+        self.assertEqual(tracker.target.id, 1)
+        for i in range(3):
+            self.assertEqual(tracker.update([self.B], 3 + i).id, 1)
+        self.assertEqual(tracker.update([self.B], 6).id, 2)
+        self.assertEqual([track.id for track in tracker.tracks], [2])
+
+    def test_assignacio_per_distancia_sense_solapament(self):
+        tracker = PersonTracker(frame_width=640)
+        tracker.update([(100, 240, 20, 20)], 0)
+        tracker.update([(150, 240, 20, 20)], 1)  # 50 px < 0,15 * 640
+        self.assertEqual(len(tracker.tracks), 1)
+        tracker.update([(400, 240, 20, 20)], 2)
+        self.assertEqual(len(tracker.tracks), 2)
+
+    def test_lock_largest(self):
+        tracker = PersonTracker()
+        for i in range(3):
+            tracker.update([self.A, self.B], i)
+        self.assertEqual(tracker.target.id, 1)
+        tracker.lock_largest()
+        self.assertEqual(tracker.update([self.A, self.B], 3).id, 2)
+        # La fixació es manté
+        self.assertEqual(tracker.update([self.A, self.B], 4).id, 2)
+
+    def test_reset(self):
+        tracker = PersonTracker()
+        tracker.update([self.A], 0)
+        tracker.update([self.A], 1)
+        tracker.reset()
+        self.assertIsNone(tracker.target)
+        self.assertEqual(tracker.tracks, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,7 @@ import unittest
 from unittest.mock import Mock, patch, MagicMock
 import sys
 import os
+import threading
 import importlib.util
 
 # Afegir el directori pare al path per poder importar els mòduls
@@ -31,7 +32,9 @@ from preset_actions import (
     honking, start_engine, advance_20cm, donar_la_volta,
     ballar_sardana, sardana,
     seguir_persona, aturar_seguiment,
+    ActionInterrupted, set_interrupt_event, sleep,
 )
+from servo_output import ServoOutput, servo_tick
 
 
 class TestPresetActions(unittest.TestCase):
@@ -104,5 +107,42 @@ class TestPresetActions(unittest.TestCase):
         # sense fitxer sounds/sardana.wav no crida sound_play_threading; en test normalment no existeix
 
 
+
+class TestInterruptAction(unittest.TestCase):
+    """Tests per a la interrupció de les accions (barge-in)"""
+
+    def setUp(self):
+        self.event = threading.Event()
+        set_interrupt_event(self.event)
+        self.addCleanup(set_interrupt_event, threading.Event())
+
+    def test_sleep_normal(self):
+        sleep(0.01)
+
+    def test_sleep_interromput(self):
+        self.event.set()
+        with self.assertRaises(ActionInterrupted):
+            sleep(10)
+
+    def test_accio_s_atura_a_la_pausa(self):
+        car = Mock()
+        threading.Timer(0.05, self.event.set).start()
+        with self.assertRaises(ActionInterrupted):
+            nod(car)
+        self.assertLess(car.set_cam_tilt_angle.call_count, 7)
+
+    def test_les_ordres_s_escriuen_a_cada_pausa(self):
+        """Amb ServoOutput, de les ordres entre dues pauses només arriba l'última de cada servo"""
+        car = Mock()
+        output = ServoOutput(car)
+        set_interrupt_event(Mock(wait=Mock(return_value=False)))
+        with servo_tick(output):
+            shake_head(output)
+        # shake_head fa pan 0 i pan 60 seguits: el 0 no s'escriu
+        self.assertEqual([c.args[0] for c in car.set_cam_pan_angle.call_args_list],
+                         [60, -50, 40, -30, 20, -10, 10, -5, 0])
+        self.assertEqual(output.stats['coalesced'], 1)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,222 @@
+"""
+Tests unitaris per a servo_output.py
+"""
+import unittest
+from unittest.mock import Mock, call, patch
+import sys
+import os
+import threading
+
+# Afegir el directori pare al path per poder importar els mòduls
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+sys.modules.pop('servo_output', None)
+
+from servo_output import (ServoOutput, flush_tick, servo_tick, servo_claim,
+                          PRIORITY_ACTION, PRIORITY_TRACKING, ARBITER_LEASE_S)
+
+
+def picarx():
+    car = Mock(spec=['set_cam_pan_angle', 'set_cam_tilt_angle', 'set_dir_servo_angle', 'set_motor_speed',
+                     'forward', 'backward', 'stop', 'get_distance'])
+    car.CAM_PAN_MIN, car.CAM_PAN_MAX = -90, 90
+    return car
+
+
+class TestServoOutput(unittest.TestCase):
+    """Tests per a ServoOutput"""
+
+    def test_descarta_ordres_sense_canvi(self):
+        car = picarx()
+        output = ServoOutput(car)
+        for angle in (10, 10, 10.2, 11, 11):
+            output.set_cam_pan_angle(angle)
+        self.assertEqual(car.set_cam_pan_angle.call_args_list, [call(10), call(11)])
+        self.assertEqual(output.stats['requested'], 5)
+        self.assertEqual(output.stats['dropped'], 3)
+        self.assertEqual(output.stats['i2c'], 2)
+
+    def test_deriva_lenta_s_acaba_escrivint(self):
+        """Es compara amb l'últim angle escrit, no amb l'últim demanat"""
+        car = picarx()
+        output = ServoOutput(car)
+        for i in range(5):
+            output.set_cam_tilt_angle(i * 0.2)
+        escrits = [c.args[0] for c in car.set_cam_tilt_angle.call_args_list]
+        self.assertEqual(len(escrits), 2)
+        self.assertAlmostEqual(escrits[1], 0.6)
+
+    def test_angles_fora_de_limits(self):
+        car = picarx()
+        output = ServoOutput(car)
+        output.set_cam_pan_angle(120)
+        output.set_cam_pan_angle(100)
+        car.set_cam_pan_angle.assert_called_once_with(90)
+
+    def test_motors(self):
+        car = picarx()
+        output = ServoOutput(car)
+        output.forward(30)
+        output.forward(30)
+        output.set_dir_servo_angle(20)
+        output.forward(30)  # la direcció canvia el repartiment entre rodes: s'escriu
+        self.assertEqual(car.forward.call_count, 2)
+        output.set_motor_speed(1, 20)
+        output.set_motor_speed(1, 20)
+        car.set_motor_speed.assert_called_once_with(1, 20)
+        # stop() no es descarta mai
+        output.stop()
+        output.stop()
+        self.assertEqual(car.stop.call_count, 2)
+
+    def test_tick_agrupa_les_ordres(self):
+        car = picarx()
+        output = ServoOutput(car)
+        with output.tick():
+            output.reset()
+            output.set_cam_tilt_angle(20)
+            output.set_cam_pan_angle(60)
+            car.set_cam_pan_angle.assert_not_called()
+        self.assertEqual(car.method_calls, [call.set_dir_servo_angle(0), call.stop(),
+                                            call.set_cam_tilt_angle(20), call.set_cam_pan_angle(60)])
+        self.assertEqual(output.stats['coalesced'], 2)
+
+    def test_flush_tick_a_les_pauses(self):
+        car = picarx()
+        output = ServoOutput(car)
+        with servo_tick(output):
+            output.set_cam_pan_angle(10)
+            flush_tick()
+            car.set_cam_pan_angle.assert_called_once_with(10)
+            with output.tick():  # niat
+                output.set_cam_pan_angle(20)
+            car.set_cam_pan_angle.assert_called_once_with(10)
+        self.assertEqual(car.set_cam_pan_angle.call_count, 2)
+        flush_tick()  # sense tick obert no fa res
+
+    def test_el_tick_es_per_fil(self):
+        car = picarx()
+        output = ServoOutput(car)
+        with output.tick():
+            fil = threading.Thread(target=output.set_cam_tilt_angle, args=(15,))
+            fil.start()
+            fil.join()
+            # L'ordre del fil de seguiment no espera el tick de l'acció
+            car.set_cam_tilt_angle.assert_called_once_with(15)
+
+    def test_altres_atributs_passen(self):
+        car = picarx()
+        car.get_distance.return_value = 42
+        output = ServoOutput(car)
+        self.assertEqual(output.get_distance(), 42)
+        self.assertIn('escriptures I2C', output.report())
+
+    def test_servo_tick_sense_servo_output(self):
+        car = Mock()
+        with servo_tick(car):
+            car.set_cam_pan_angle(10)
+        car.set_cam_pan_angle.assert_called_once_with(10)
+
+
+
+def en_un_altre_fil(funcio, *args):
+    fil = threading.Thread(target=funcio, args=args)
+    fil.start()
+    fil.join()
+
+
+class TestArbitratge(unittest.TestCase):
+    """Tests per a les reserves d'actuadors de ServoOutput"""
+
+    def setUp(self):
+        self.car = picarx()
+        self.output = ServoOutput(self.car)
+
+    def test_l_accio_guanya_al_seguiment(self):
+        output = self.output
+        seguiment = threading.Event()
+        accio_feta = threading.Event()
+        acabar = threading.Event()
+        resultat = {}
+
+        def fil_seguiment():
+            with output.claim('seguiment', PRIORITY_TRACKING, lease_s=None):
+                seguiment.set()
+                accio_feta.wait(2.0)
+                resultat['owns'] = output.owns('pan', 'tilt')
+                output.set_cam_pan_angle(-30)  # no s'escriu
+                acabar.wait(2.0)
+                resultat['owns_despres'] = output.owns('pan')
+                output.set_cam_pan_angle(output.angle('pan') + 5)
+
+        fil = threading.Thread(target=fil_seguiment)
+        fil.start()
+        seguiment.wait(2.0)
+        with output.claim('accions', PRIORITY_ACTION):
+            output.set_cam_pan_angle(40)
+            accio_feta.set()
+            threading.Event().wait(0.05)
+        acabar.set()
+        fil.join(timeout=2.0)
+        self.assertFalse(resultat['owns'])
+        self.assertTrue(resultat['owns_despres'])
+        # El seguiment continua des d'on l'ha deixat l'acció
+        self.assertEqual(self.car.set_cam_pan_angle.call_args_list, [call(40), call(45)])
+        self.assertEqual(output.stats['blocked'], 1)
+
+    def test_nomes_els_actuadors_reservats(self):
+        with self.output.claim('accions', PRIORITY_ACTION, actuators=('pan',)):
+            en_un_altre_fil(self.output.set_cam_pan_angle, 10)
+            en_un_altre_fil(self.output.set_cam_tilt_angle, 10)
+        self.car.set_cam_pan_angle.assert_not_called()
+        self.car.set_cam_tilt_angle.assert_called_once_with(10)
+
+    def test_la_reserva_caduca(self):
+        with patch('servo_output.time.monotonic', return_value=100.0):
+            self.output.acquire('accions', PRIORITY_ACTION)
+        with patch('servo_output.time.monotonic', return_value=100.0 + ARBITER_LEASE_S / 2):
+            en_un_altre_fil(self.output.set_cam_pan_angle, 10)
+        self.car.set_cam_pan_angle.assert_not_called()
+        with patch('servo_output.time.monotonic', return_value=100.0 + ARBITER_LEASE_S + 1):
+            en_un_altre_fil(self.output.set_cam_pan_angle, 10)
+        self.car.set_cam_pan_angle.assert_called_once_with(10)
+
+    def test_qui_engega_els_motors_els_pot_aturar(self):
+        output = self.output
+        engegat = threading.Event()
+        reservat = threading.Event()
+
+        def girar():
+            output.forward(30)
+            engegat.set()
+            reservat.wait(2.0)
+            output.set_dir_servo_angle(20)  # no s'escriu
+            output.stop()
+
+        fil = threading.Thread(target=girar)
+        fil.start()
+        engegat.wait(2.0)
+        with output.claim('accions', PRIORITY_ACTION, actuators=('steering', 'motors')):
+            reservat.set()
+            fil.join(timeout=2.0)
+        self.car.stop.assert_called_once_with()
+        self.car.set_dir_servo_angle.assert_not_called()
+
+    def test_reserves_niades(self):
+        output = self.output
+        with output.claim('accions', PRIORITY_ACTION):
+            with output.claim('accions', PRIORITY_TRACKING):
+                pass
+            en_un_altre_fil(output.set_cam_pan_angle, 10)
+        self.car.set_cam_pan_angle.assert_not_called()
+        self.assertTrue(output.owns('pan'))
+
+    def test_servo_claim_sense_servo_output(self):
+        car = Mock()
+        with servo_claim(car, 'accions', PRIORITY_ACTION):
+            car.stop()
+        car.stop.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
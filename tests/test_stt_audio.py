@@ -0,0 +1,117 @@
+"""
+Tests unitaris per a stt_audio.py
+"""
+import unittest
+from unittest.mock import Mock, patch
+import sys
+import os
+import subprocess
+
+# Afegir el directori pare al path per poder importar els mòduls
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+sys.modules.pop('stt_audio', None)
+
+from stt_audio import choose_stt_format, encode_flac, encode_opus, encode_stt_audio, format_stt_stats
+
+KB = 1024
+
+
+def fake_audio(wav_bytes):
+    audio = Mock()
+    audio.frame_data = b'\x00' * (wav_bytes * 3)
+    audio.get_wav_data.return_value = b'\x00' * wav_bytes
+    return audio
+
+
+class TestChooseSttFormat(unittest.TestCase):
+    """Tests per a choose_stt_format()"""
+
+    def test_segons_la_mida(self):
+        self.assertEqual(choose_stt_format(30 * KB), 'wav')
+        self.assertEqual(choose_stt_format(100 * KB), 'flac')
+        self.assertEqual(choose_stt_format(500 * KB), 'opus')
+        self.assertEqual(choose_stt_format(100 * KB, wav_max_bytes=200 * KB), 'wav')
+
+
+class TestEncoders(unittest.TestCase):
+    """Tests per a encode_flac() i encode_opus()"""
+
+    @patch('stt_audio.shutil.which', return_value='/usr/bin/flac')
+    @patch('stt_audio.subprocess.run')
+    def test_flac(self, mock_run, mock_which):
+        mock_run.return_value = Mock(stdout=b'fLaC')
+        self.assertEqual(encode_flac(b'wav'), b'fLaC')
+        cmd = mock_run.call_args[0][0]
+        self.assertEqual(cmd[0], '/usr/bin/flac')
+        self.assertIn('--stdout', cmd)
+        self.assertEqual(mock_run.call_args[1]['input'], b'wav')
+
+    @patch('stt_audio.shutil.which', side_effect=lambda name: '/usr/bin/ffmpeg' if name == 'ffmpeg' else None)
+    @patch('stt_audio.subprocess.run')
+    def test_opus_amb_ffmpeg(self, mock_run, mock_which):
+        mock_run.return_value = Mock(stdout=b'OggS')
+        self.assertEqual(encode_opus(b'wav'), b'OggS')
+        self.assertIn('libopus', mock_run.call_args[0][0])
+
+    @patch('stt_audio.shutil.which', return_value=None)
+    def test_sense_codificador(self, mock_which):
+        with self.assertRaises(FileNotFoundError):
+            encode_flac(b'wav')
+        with self.assertRaises(FileNotFoundError):
+            encode_opus(b'wav')
+
+    @patch('stt_audio.shutil.which', return_value='/usr/bin/flac')
+    @patch('stt_audio.subprocess.run', return_value=Mock(stdout=b''))
+    def test_sortida_buida(self, mock_run, mock_which):
+        with self.assertRaises(RuntimeError):
+            encode_flac(b'wav')
+
+
+class TestEncodeSttAudio(unittest.TestCase):
+    """Tests per a encode_stt_audio()"""
+
+    def test_frase_curta_sense_comprimir(self):
+        audio = fake_audio(20 * KB)
+        data, extension, stats = encode_stt_audio(audio)
+        audio.get_wav_data.assert_called_once_with(convert_rate=16000, convert_width=2)
+        self.assertEqual(extension, 'wav')
+        self.assertEqual(len(data), 20 * KB)
+        self.assertEqual(stats['format'], 'wav')
+        self.assertEqual(stats['native_bytes'], 60 * KB + 44)
+
+    @patch('stt_audio.encode_flac', return_value=b'fLaC')
+    def test_frase_mitjana_en_flac(self, mock_flac):
+        data, extension, stats = encode_stt_audio(fake_audio(100 * KB))
+        self.assertEqual((data, extension, stats['format']), (b'fLaC', 'flac', 'flac'))
+        self.assertEqual(stats['upload_bytes'], 4)
+        self.assertEqual(stats['wav_bytes'], 100 * KB)
+
+    @patch('stt_audio.encode_flac', return_value=b'fLaC')
+    @patch('stt_audio.encode_opus', side_effect=FileNotFoundError("opusenc"))
+    def test_opus_no_disponible_baixa_a_flac(self, mock_opus, mock_flac):
+        with patch('builtins.print'):
+            data, extension, stats = encode_stt_audio(fake_audio(500 * KB))
+        self.assertEqual((extension, stats['format']), ('flac', 'flac'))
+
+    @patch('stt_audio.encode_flac', side_effect=subprocess.TimeoutExpired('flac', 10))
+    def test_sense_codificadors_envia_wav(self, mock_flac):
+        with patch('builtins.print'):
+            data, extension, stats = encode_stt_audio(fake_audio(100 * KB))
+        self.assertEqual((extension, stats['format'], len(data)), ('wav', 'wav', 100 * KB))
+
+    def test_format_stats(self):
+        stats = {'format': 'flac', 'upload_bytes': 50 * KB, 'wav_bytes': 100 * KB,
+                 'native_bytes': 275 * KB, 'encode_s': 0.05, 'stt_s': 1.2}
+        line = format_stt_stats(stats)
+        self.assertIn('flac 50.0 KB', line)
+        self.assertIn('upload + stt 1.200 s', line)
+
+    def test_format_stats_motor_local(self):
+        stats = {'backend': 'local', 'failover': 'budget', 'attempts': {'cloud': 'timeout'}, 'stt_s': 4.5}
+        line = format_stt_stats(stats)
+        self.assertEqual(line, "stt backend local (failover per budget: {'cloud': 'timeout'}), stt 4.500 s")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,276 @@
+"""
+Tests unitaris per a stt_backends.py
+"""
+import unittest
+from unittest.mock import MagicMock, Mock, patch
+import sys
+import os
+import json
+import tempfile
+import threading
+import time
+
+# Afegir el directori pare al path per poder importar els mòduls
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Altres tests reemplacen utils per un mock: carregar els mòduls reals
+if not isinstance(getattr(sys.modules.get('utils'), '__file__', None), str):
+    sys.modules.pop('utils', None)
+sys.modules.pop('stt_backends', None)
+
+from stt_backends import CloudStt, FailoverStt, StreamingTranscriber, SttError, VoskStream, VoskStt
+
+
+class FakeBackend():
+    """Motor que respon text després de delay segons, o falla si error."""
+
+    def __init__(self, name, text='hola', delay=0.0, error=None, available=True):
+        self.name = name
+        self.text = text
+        self.delay = delay
+        self.error = error
+        self.available = available
+        self.calls = 0
+        self.release = threading.Event()
+
+    def transcribe(self, audio, language):
+        self.calls += 1
+        self.release.wait(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.text, {'from': self.name}
+
+
+class TestCloudStt(unittest.TestCase):
+    """Tests per a CloudStt"""
+
+    def test_retorna_text_i_stats(self):
+        helper = Mock()
+        helper.stt.return_value = 'bon dia'
+        helper.last_stt_stats = {'format': 'wav'}
+        self.assertEqual(CloudStt(helper).transcribe('audio', 'ca'), ('bon dia', {'format': 'wav'}))
+        helper.stt.assert_called_once_with('audio', language='ca')
+
+    def test_false_es_error(self):
+        helper = Mock()
+        helper.stt.return_value = False
+        with self.assertRaises(SttError):
+            CloudStt(helper).transcribe('audio', 'ca')
+
+
+class TestVoskStt(unittest.TestCase):
+    """Tests per a VoskStt amb el paquet vosk simulat"""
+
+    def setUp(self):
+        self.vosk = MagicMock()
+        self.vosk.KaldiRecognizer.return_value.FinalResult.return_value = json.dumps({'text': 'endavant'})
+        patcher = patch.dict(sys.modules, {'vosk': self.vosk})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.model_dir = tempfile.mkdtemp()
+
+    @patch('stt_backends.gray_print')
+    def test_carrega_una_vegada_i_transcriu(self, mock_gray):
+        stt = VoskStt(self.model_dir)
+        self.assertFalse(stt.available)
+        self.assertTrue(stt.warm_up())
+        self.assertTrue(stt.warm_up())
+        self.vosk.Model.assert_called_once_with(self.model_dir)
+
+        audio = Mock()
+        audio.get_raw_data.return_value = b'\x00\x00' * 16000
+        text, stats = stt.transcribe(audio, 'ca')
+        self.assertEqual(text, 'endavant')
+        self.assertEqual(stats['audio_s'], 1.0)
+        audio.get_raw_data.assert_called_once_with(convert_rate=16000, convert_width=2)
+
+    @patch('stt_backends.gray_print')
+    def test_stream_amb_gramatica(self, mock_gray):
+        stt = VoskStt(self.model_dir)
+        stt.warm_up()
+        recognizer = self.vosk.KaldiRecognizer.return_value
+        recognizer.AcceptWaveform.return_value = False
+        recognizer.FinalResult.return_value = json.dumps(
+            {'text': 'arnau', 'result': [{'word': 'arnau', 'conf': 0.87}]})
+        stream = stt.open_stream(44100, grammar=['arnau', '[unk]'])
+        self.vosk.KaldiRecognizer.assert_called_with(stt._model, 44100, '["arnau", "[unk]"]')
+        recognizer.SetWords.assert_called_once_with(True)
+        self.assertEqual(stream.final(), 'arnau')
+        self.assertEqual(stream.words, [('arnau', 0.87)])
+        self.vosk.Model.return_value.find_word.side_effect = lambda word: 7 if word == 'arnau' else -1
+        self.assertTrue(stt.has_word('arnau'))
+        self.assertFalse(stt.has_word('xyzzy'))
+
+    @patch('stt_backends.warn')
+    def test_sense_model_no_esta_disponible(self, mock_warn):
+        stt = VoskStt(os.path.join(self.model_dir, 'no-hi-es'))
+        self.assertFalse(stt.warm_up())
+        self.assertFalse(stt.available)
+        self.vosk.Model.assert_not_called()
+        with self.assertRaises(SttError):
+            stt.transcribe(Mock(), 'ca')
+
+
+class FakeSession():
+    """Sessió de streaming que acumula paraules (una per fragment)."""
+
+    def __init__(self, delay=0.0):
+        self.words = []
+        self.delay = delay
+
+    def accept(self, pcm):
+        time.sleep(self.delay)
+        self.words.append(pcm.decode())
+        return ' '.join(self.words)
+
+    def final(self):
+        return ' '.join(self.words) + '.'
+
+
+class TestStreamingTranscriber(unittest.TestCase):
+    """Tests per a StreamingTranscriber i VoskStream"""
+
+    def test_parcials_i_final(self):
+        partials = []
+        transcriber = StreamingTranscriber(FakeSession(), on_partial=partials.append)
+        for word in (b'gira', b'a', b'la', b'dreta'):
+            transcriber.feed(word)
+        self.assertEqual(transcriber.finish(), 'gira a la dreta.')
+        self.assertEqual(partials, ['gira', 'gira a', 'gira a la', 'gira a la dreta'])
+        self.assertEqual(transcriber.stats['chunks'], 4)
+        self.assertIsNotNone(transcriber.stats['final_wait_s'])
+
+    def test_cancel_no_transcriu(self):
+        session = FakeSession(delay=0.01)
+        transcriber = StreamingTranscriber(session)
+        transcriber.feed(b'soroll')
+        transcriber.cancel()
+        transcriber._done.wait(1)
+        self.assertIsNone(transcriber._text)
+
+    @patch('stt_backends.warn')
+    def test_timeout_final(self, mock_warn):
+        session = FakeSession(delay=0.5)
+        transcriber = StreamingTranscriber(session)
+        transcriber.feed(b'lent')
+        self.assertIsNone(transcriber.finish(timeout=0.01))
+
+    def test_vosk_stream_segments(self):
+        recognizer = Mock()
+        recognizer.AcceptWaveform.side_effect = [False, True, False]
+        recognizer.PartialResult.side_effect = [json.dumps({'partial': 'hola'}), json.dumps({'partial': 'com'})]
+        recognizer.Result.return_value = json.dumps({'text': 'hola robot'})
+        recognizer.FinalResult.return_value = json.dumps({'text': 'com estàs'})
+        stream = VoskStream(recognizer)
+        self.assertEqual(stream.accept(b'1'), 'hola')
+        self.assertEqual(stream.accept(b'2'), 'hola robot')
+        self.assertEqual(stream.accept(b'3'), 'hola robot com')
+        self.assertEqual(stream.final(), 'hola robot com estàs')
+
+
+class TestFailoverStt(unittest.TestCase):
+    """Tests per a FailoverStt"""
+
+    def test_preferit_respon(self):
+        cloud, local = FakeBackend('cloud', 'núvol'), FakeBackend('local', 'local')
+        stt = FailoverStt(cloud, local, budget_s=1.0)
+        self.assertEqual(stt.stt('audio', 'ca'), 'núvol')
+        self.assertEqual(local.calls, 0)
+        self.assertEqual(stt.last_stt_stats['backend'], 'cloud')
+        self.assertIsNone(stt.last_stt_stats['failover'])
+        self.assertEqual(stt.last_stt_stats['from'], 'cloud')
+
+    def test_error_passa_a_la_reserva_de_seguida(self):
+        cloud = FakeBackend('cloud', error=SttError('sense xarxa'))
+        local = FakeBackend('local', 'local')
+        stt = FailoverStt(cloud, local, budget_s=5.0)
+        st = time.time()
+        self.assertEqual(stt.stt('audio', 'ca'), 'local')
+        self.assertLess(time.time() - st, 1.0)
+        self.assertEqual(stt.last_stt_stats['failover'], 'error')
+        self.assertIn('error', stt.last_stt_stats['attempts']['cloud'])
+
+    def test_pressupost_llanca_la_reserva(self):
+        cloud = FakeBackend('cloud', 'núvol', delay=5.0)
+        local = FakeBackend('local', 'local', delay=0.01)
+        self.addCleanup(cloud.release.set)
+        stt = FailoverStt(cloud, local, budget_s=0.05)
+        st = time.time()
+        self.assertEqual(stt.stt('audio', 'ca'), 'local')
+        self.assertLess(time.time() - st, 1.0)
+        self.assertEqual(stt.last_stt_stats['failover'], 'budget')
+        self.assertEqual(stt.last_stt_stats['attempts']['cloud'], 'timeout')
+
+    def test_el_preferit_pot_guanyar_despres_del_pressupost(self):
+        cloud = FakeBackend('cloud', 'núvol', delay=0.1)
+        local = FakeBackend('local', 'local', delay=5.0)
+        self.addCleanup(local.release.set)
+        stt = FailoverStt(cloud, local, budget_s=0.02)
+        self.assertEqual(stt.stt('audio', 'ca'), 'núvol')
+        self.assertEqual(local.calls, 1)
+
+    def test_text_buit_no_guanya(self):
+        """Si el local no entén res, s'espera el núvol i cap dels dos passa a reserva"""
+        cloud = FakeBackend('cloud', 'obre la porta', delay=0.3)
+        local = FakeBackend('local', '', delay=0.01)
+        stt = FailoverStt(cloud, local, budget_s=0.1, cooldown_s=60)
+        self.assertEqual(stt.stt('audio', 'ca'), 'obre la porta')
+        self.assertEqual(stt.last_stt_stats['backend'], 'cloud')
+        self.assertEqual(stt.last_stt_stats['failover'], 'budget')
+
+        # El local preferit respon buit: es llança el núvol de seguida
+        cloud.delay = 0.01
+        local.text = ' '
+        stt = FailoverStt(local, cloud, budget_s=5.0, cooldown_s=60)
+        st = time.time()
+        self.assertEqual(stt.stt('audio', 'ca'), 'obre la porta')
+        self.assertLess(time.time() - st, 1.0)
+        self.assertEqual(stt.last_stt_stats['failover'], 'empty')
+        stt.stt('audio', 'ca')
+        self.assertEqual(local.calls, 3)
+
+    def test_tots_buits_retorna_buit(self):
+        cloud, local = FakeBackend('cloud', ''), FakeBackend('local', '')
+        stt = FailoverStt(cloud, local, cooldown_s=60)
+        self.assertEqual(stt.stt('audio', 'ca'), '')
+        self.assertEqual((cloud.calls, local.calls), (1, 1))
+        stt.stt('audio', 'ca')
+        # Cap dels dos ha fallat: el núvol continua sent el preferit
+        self.assertEqual(stt.last_stt_stats['backend'], 'cloud')
+        self.assertEqual(stt.last_stt_stats['failover'], 'empty')
+
+    def test_repos_del_motor_que_ha_fallat(self):
+        cloud = FakeBackend('cloud', error=SttError('sense xarxa'))
+        local = FakeBackend('local', 'local')
+        stt = FailoverStt(cloud, local, cooldown_s=60)
+        stt.stt('audio', 'ca')
+        stt.stt('audio', 'ca')
+        # El segon torn ja comença pel local
+        self.assertEqual(cloud.calls, 1)
+        self.assertIsNone(stt.last_stt_stats['failover'])
+
+    def test_reserva_no_disponible(self):
+        cloud = FakeBackend('cloud', error=SttError('sense xarxa'))
+        local = FakeBackend('local', available=False)
+        stt = FailoverStt(cloud, local)
+        with patch('builtins.print'):
+            self.assertFalse(stt.stt('audio', 'ca'))
+        self.assertEqual(local.calls, 0)
+        self.assertIsNone(stt.last_stt_stats)
+
+    def test_timeout_total(self):
+        cloud = FakeBackend('cloud', delay=5.0)
+        self.addCleanup(cloud.release.set)
+        stt = FailoverStt(cloud, None, timeout_s=0.05)
+        with patch('builtins.print'):
+            self.assertFalse(stt.stt('audio', 'ca'))
+
+    def test_warm_up(self):
+        local = FakeBackend('local')
+        local.warm_up = Mock()
+        FailoverStt(FakeBackend('cloud'), local).warm_up()
+        local.warm_up.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
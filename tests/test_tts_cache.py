@@ -0,0 +1,146 @@
+"""
+Tests unitaris per a tts_cache.py
+"""
+import unittest
+from unittest.mock import Mock, patch
+import sys
+import os
+import json
+import tempfile
+import wave
+
+# Afegir el directori pare al path per poder importar els mòduls
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Altres tests reemplacen utils per un mock: carregar els mòduls reals
+if not isinstance(getattr(sys.modules.get('utils'), '__file__', None), str):
+    sys.modules.pop('utils', None)
+sys.modules.pop('tts_stream', None)
+sys.modules.pop('tts_cache', None)
+
+from tts_cache import TtsCache, cache_key, INDEX_FILE
+
+
+class TestCacheKey(unittest.TestCase):
+    """Tests per a cache_key"""
+
+    def test_mateixos_parametres_mateixa_clau(self):
+        self.assertEqual(cache_key("Hola", "echo", "", 3, "m"), cache_key("Hola", "echo", "", 3, "m"))
+
+    def test_cada_parametre_canvia_la_clau(self):
+        base = cache_key("Hola", "echo", "", 3, "m")
+        self.assertNotEqual(base, cache_key("Adéu", "echo", "", 3, "m"))
+        self.assertNotEqual(base, cache_key("Hola", "alloy", "", 3, "m"))
+        self.assertNotEqual(base, cache_key("Hola", "echo", "content", 3, "m"))
+        self.assertNotEqual(base, cache_key("Hola", "echo", "", 4, "m"))
+        self.assertNotEqual(base, cache_key("Hola", "echo", "", 3, "altre"))
+
+    def test_instruccions_none_equival_a_buit(self):
+        self.assertEqual(cache_key("Hola", "echo", None, 3, "m"), cache_key("Hola", "echo", "", 3, "m"))
+
+
+class TestTtsCache(unittest.TestCase):
+    """Tests per a TtsCache"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = os.path.join(self.tmp.name, 'cache')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_miss_i_hit(self):
+        cache = TtsCache(self.dir)
+        self.assertIsNone(cache.get('k1'))
+        path = cache.put_pcm('k1', 'Hola', b'\x01\x00\x02\x00')
+        self.assertEqual(cache.get('k1'), path)
+        with wave.open(path, 'rb') as w:
+            self.assertEqual(w.getframerate(), 24000)
+            self.assertEqual(w.readframes(2), b'\x01\x00\x02\x00')
+        info = cache.info()
+        self.assertEqual((info['hits'], info['misses'], info['entries']), (1, 1, 1))
+        self.assertAlmostEqual(info['hit_rate'], 0.5)
+
+    def test_pcm_buit_no_es_desa(self):
+        cache = TtsCache(self.dir)
+        self.assertIsNone(cache.put_pcm('k1', 'Hola', b''))
+        self.assertEqual(cache.info()['entries'], 0)
+
+    def test_lru_per_nombre_d_entrades(self):
+        cache = TtsCache(self.dir, max_entries=2)
+        cache.put_pcm('a', 'A', b'\x00\x00')
+        cache.put_pcm('b', 'B', b'\x00\x00')
+        cache.get('a')  # 'a' passa a ser la més recent
+        cache.put_pcm('c', 'C', b'\x00\x00')
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+        self.assertFalse(os.path.exists(os.path.join(self.dir, 'b.wav')))
+        self.assertEqual(cache.info()['evictions'], 1)
+
+    def test_lru_per_bytes(self):
+        cache = TtsCache(self.dir, max_bytes=200)
+        cache.put_pcm('a', 'A', b'\x00' * 100)
+        cache.put_pcm('b', 'B', b'\x00' * 100)
+        self.assertNotIn('a', cache)
+        self.assertLessEqual(cache.info()['bytes'], 200)
+
+    def test_entrada_mes_gran_que_el_pressupost(self):
+        cache = TtsCache(self.dir, max_bytes=10)
+        self.assertIsNone(cache.put_pcm('a', 'A', b'\x00' * 100))
+
+    def test_persistencia_entre_instancies(self):
+        cache = TtsCache(self.dir)
+        cache.put_pcm('a', 'A', b'\x00\x00')
+        cache.put_pcm('b', 'B', b'\x00\x00')
+        cache.get('a')
+        cache.save()
+
+        reloaded = TtsCache(self.dir, max_entries=1)
+        # Es conserva l'ordre LRU: 'b' era la menys recent
+        self.assertIn('a', reloaded)
+        self.assertNotIn('b', reloaded)
+
+    def test_fitxers_orfes_s_esborren(self):
+        os.makedirs(self.dir)
+        orphan = os.path.join(self.dir, 'orfe.wav')
+        with open(orphan, 'wb') as f:
+            f.write(b'x')
+        with open(os.path.join(self.dir, INDEX_FILE), 'w') as f:
+            json.dump([{'key': 'desaparegut', 'text': 'x'}], f)
+        cache = TtsCache(self.dir)
+        self.assertFalse(os.path.exists(orphan))
+        self.assertEqual(cache.info()['entries'], 0)
+
+    def test_put_file(self):
+        src = os.path.join(self.tmp.name, 'src.wav')
+        with open(src, 'wb') as f:
+            f.write(b'RIFFfake')
+        cache = TtsCache(self.dir)
+        path = cache.put_file('a', 'A', src)
+        self.assertEqual(cache.get('a'), path)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'RIFFfake')
+
+    @patch('tts_cache.gray_print')
+    def test_warm_up_nomes_renderitza_les_que_falten(self, mock_gray):
+        cache = TtsCache(self.dir)
+        cache.put_pcm('hola', 'hola', b'\x00\x00')
+        render = Mock(return_value=b'\x01\x00')
+
+        rendered = cache.warm_up(['hola', 'adeu'], key_fn=lambda t: t, render=render)
+
+        self.assertEqual(rendered, 1)
+        render.assert_called_once_with('adeu')
+        self.assertIn('adeu', cache)
+
+    @patch('tts_cache.warn')
+    @patch('tts_cache.gray_print')
+    def test_warm_up_continua_si_una_frase_falla(self, mock_gray, mock_warn):
+        cache = TtsCache(self.dir)
+        render = Mock(side_effect=[Exception("xarxa"), b'\x01\x00'])
+        self.assertEqual(cache.warm_up(['a', 'b'], key_fn=lambda t: t, render=render), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+"""
+Tests unitaris per a tts_janitor.py
+"""
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import tempfile
+
+# Afegir el directori pare al path per poder importar els mòduls
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Altres tests reemplacen utils per un mock: carregar els mòduls reals
+if not isinstance(getattr(sys.modules.get('utils'), '__file__', None), str):
+    sys.modules.pop('utils', None)
+sys.modules.pop('tts_janitor', None)
+
+from tts_janitor import TtsJanitor
+
+NOW = 1_000_000.0
+
+
+class TestTtsJanitor(unittest.TestCase):
+    """Tests per a TtsJanitor"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        patcher = patch('tts_janitor.gray_print')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _file(self, name, age, size=100):
+        path = os.path.join(self.dir, name)
+        with open(path, 'wb') as f:
+            f.write(b'\x00' * size)
+        os.utime(path, (NOW - age, NOW - age))
+        return path
+
+    def _janitor(self, **kwargs):
+        params = {'max_bytes': 10_000, 'max_age': 3600, 'max_files': 100, 'grace': 60}
+        params.update(kwargs)
+        return TtsJanitor(self.dir, **params)
+
+    def test_esborra_fitxers_caducats(self):
+        old = self._file('vell.wav', age=7200)
+        new = self._file('nou.wav', age=600)
+        removed = self._janitor().sweep(now=NOW)
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(new))
+        self.assertEqual(removed, {'files': 1, 'bytes': 100})
+
+    def test_limit_de_fitxers_esborra_els_mes_antics(self):
+        paths = [self._file(f'{i}.wav', age=1000 - i * 100) for i in range(5)]
+        self._janitor(max_files=3).sweep(now=NOW)
+        self.assertEqual([os.path.exists(p) for p in paths], [False, False, True, True, True])
+
+    def test_limit_de_bytes(self):
+        paths = [self._file(f'{i}.wav', age=1000 - i * 100, size=400) for i in range(3)]
+        janitor = self._janitor(max_bytes=900)
+        janitor.sweep(now=NOW)
+        self.assertEqual([os.path.exists(p) for p in paths], [False, True, True])
+        self.assertEqual(janitor.info()['bytes_removed'], 400)
+
+    def test_fitxers_fixats_no_s_esborren(self):
+        playing = self._file('sonant.wav', age=7200)
+        janitor = self._janitor()
+        with janitor.pinned(playing):
+            janitor.sweep(now=NOW)
+            self.assertTrue(os.path.exists(playing))
+            self.assertEqual(janitor.info()['pinned'], 1)
+        janitor.sweep(now=NOW)
+        self.assertFalse(os.path.exists(playing))
+
+    def test_pin_compta_referencies(self):
+        janitor = self._janitor()
+        janitor.pin('a.wav')
+        janitor.pin('a.wav')
+        janitor.unpin('a.wav')
+        self.assertTrue(janitor.is_pinned('a.wav'))
+        janitor.unpin('a.wav')
+        self.assertFalse(janitor.is_pinned('a.wav'))
+
+    def test_fitxers_recents_es_respecten_encara_que_se_superi_el_limit(self):
+        """Un fitxer acabat d'escriure encara no ha tingut temps de ser fixat"""
+        fresh = self._file('nou.wav', age=5)
+        self._janitor(max_files=0).sweep(now=NOW)
+        self.assertTrue(os.path.exists(fresh))
+
+    def test_nomes_toca_wav(self):
+        other = self._file('notes.txt', age=7200)
+        self._janitor().sweep(now=NOW)
+        self.assertTrue(os.path.exists(other))
+
+    def test_fil_de_fons(self):
+        old = self._file('vell.wav', age=10 * 24 * 3600)
+        janitor = TtsJanitor(self.dir, max_age=3600, interval=60, grace=0)
+        janitor.start()
+        janitor.stop(timeout=1)
+        self.assertFalse(os.path.exists(old))
+        self.assertEqual(janitor.info()['sweeps'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
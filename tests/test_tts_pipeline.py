@@ -0,0 +1,194 @@
+"""
+Tests unitaris per a tts_pipeline.py
+"""
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import threading
+
+# Afegir el directori pare al path per poder importar els mòduls
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Altres tests reemplacen utils per un mock: carregar els mòduls reals
+if not isinstance(getattr(sys.modules.get('utils'), '__file__', None), str):
+    sys.modules.pop('utils', None)
+sys.modules.pop('tts_stream', None)
+sys.modules.pop('tts_pipeline', None)
+
+from tts_pipeline import SpeechPipeline, split_sentences
+
+
+class FakeSink():
+    """Altaveu fals que guarda el que s'hi escriu"""
+
+    def __init__(self, log):
+        self.log = log
+        self.aborted = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def write(self, data):
+        if self.aborted:
+            raise RuntimeError("AudioSink no està obert")
+        self.log.append(data)
+
+    def abort(self):
+        self.aborted = True
+
+
+class TestSplitSentences(unittest.TestCase):
+    """Tests per a split_sentences"""
+
+    def test_text_buit(self):
+        self.assertEqual(split_sentences(''), [])
+        self.assertEqual(split_sentences(None), [])
+
+    def test_divideix_per_puntuacio(self):
+        text = "Avui fa un dia molt bonic. Vols que anem a passejar? Doncs som-hi ara mateix!"
+        self.assertEqual(split_sentences(text), [
+            "Avui fa un dia molt bonic.",
+            "Vols que anem a passejar?",
+            "Doncs som-hi ara mateix!",
+        ])
+
+    def test_ajunta_frases_curtes(self):
+        text = "Hola! Sóc l'Arnau, el teu robot. Ok."
+        self.assertEqual(split_sentences(text), ["Hola! Sóc l'Arnau, el teu robot. Ok."])
+
+    def test_no_divideix_decimals(self):
+        text = "El valor és 3.5 metres de llargada total."
+        self.assertEqual(split_sentences(text), [text])
+
+
+class TestSpeechPipeline(unittest.TestCase):
+    """Tests per a SpeechPipeline"""
+
+    def _consume(self, pipeline, log):
+        return pipeline.play_next_turn(sink_factory=lambda: FakeSink(log), timeout=1)
+
+    def test_reprodueix_frases_en_ordre(self):
+        """Els fragments de cada frase sonen en ordre de frase i de fragment"""
+        def synthesize(sentence):
+            return [f'{sentence}-a'.encode(), f'{sentence}-b'.encode()]
+
+        pipeline = SpeechPipeline(synthesize, queue_size=2)
+        turn = pipeline.start_turn("Primera frase prou llarga. Segona frase prou llarga.")
+        log = []
+        self.assertTrue(self._consume(pipeline, log))
+
+        self.assertTrue(pipeline.wait_turn(turn, timeout=1))
+        self.assertEqual(log, [
+            b'Primera frase prou llarga.-a', b'Primera frase prou llarga.-b',
+            b'Segona frase prou llarga.-a', b'Segona frase prou llarga.-b',
+        ])
+        self.assertEqual(pipeline.stats['sentences'], 2)
+        self.assertIsNotNone(pipeline.stats['first_sound'])
+
+    def test_sintetitza_seguent_frase_mentre_sona(self):
+        """La frase 2 es demana abans que acabi de sonar la frase 1"""
+        requested = []
+        second_requested = threading.Event()
+
+        def synthesize(sentence):
+            requested.append(sentence)
+            if len(requested) == 2:
+                second_requested.set()
+            return [sentence.encode()]
+
+        pipeline = SpeechPipeline(synthesize)
+        writes = []
+
+        class SlowSink(FakeSink):
+            def write(self, data):
+                # Mentre sona la primera frase, la segona ja s'ha de sintetitzar
+                if not writes:
+                    second_requested.wait(1)
+                super().write(data)
+
+        turn = pipeline.start_turn("Primera frase prou llarga. Segona frase prou llarga.")
+        pipeline.play_next_turn(sink_factory=lambda: SlowSink(writes), timeout=1)
+        self.assertTrue(pipeline.wait_turn(turn, timeout=1))
+        self.assertTrue(second_requested.is_set())
+        self.assertEqual(len(writes), 2)
+
+    def test_cancel_talla_el_torn(self):
+        """cancel() marca el torn com acabat i descarta els fragments pendents"""
+        release = threading.Event()
+
+        def synthesize(sentence):
+            release.wait(1)
+            return [b'audio']
+
+        done = []
+        pipeline = SpeechPipeline(synthesize, on_turn_done=done.append)
+        turn = pipeline.start_turn("Una frase prou llarga per sonar.")
+        pipeline.cancel()
+        release.set()
+
+        self.assertTrue(pipeline.wait_turn(turn, timeout=1))
+        self.assertEqual(done, [turn])
+        self.assertEqual(pipeline.stats['cancelled'], 1)
+        log = []
+        # No hi ha res a reproduir del torn cancel·lat
+        pipeline.play_next_turn(sink_factory=lambda: FakeSink(log), timeout=0.2)
+        self.assertEqual(log, [])
+
+    def test_torn_nou_cancel_la_l_anterior(self):
+        """start_turn d'un torn nou invalida el torn anterior"""
+        pipeline = SpeechPipeline(lambda s: [s.encode()])
+        first = pipeline.start_turn("Primer torn prou llarg.")
+        second = pipeline.start_turn("Segon torn prou llarg.")
+        self.assertNotEqual(first, second)
+        self.assertTrue(pipeline.wait_turn(first, timeout=0))
+
+        log = []
+        while not pipeline.wait_turn(second, timeout=0):
+            self._consume(pipeline, log)
+        self.assertEqual(log, [b'Segon torn prou llarg.'])
+
+    @patch('tts_pipeline.warn')
+    def test_fallback_si_la_sintesi_falla(self, mock_warn):
+        """Si la síntesi en streaming falla, la frase es genera amb el fallback"""
+        def synthesize(sentence):
+            raise Exception("xarxa")
+
+        pipeline = SpeechPipeline(synthesize, fallback=lambda s: [b'fallback'])
+        turn = pipeline.start_turn("Una frase prou llarga per sonar.")
+        log = []
+        self._consume(pipeline, log)
+        self.assertTrue(pipeline.wait_turn(turn, timeout=1))
+        self.assertEqual(log, [b'fallback'])
+        self.assertEqual(pipeline.stats['failed_sentences'], 0)
+
+    @patch('tts_pipeline.warn')
+    def test_frase_sense_audio_es_compta_com_error(self, mock_warn):
+        def synthesize(sentence):
+            raise Exception("xarxa")
+
+        pipeline = SpeechPipeline(synthesize)
+        turn = pipeline.start_turn("Una frase prou llarga per sonar.")
+        self._consume(pipeline, [])
+        self.assertTrue(pipeline.wait_turn(turn, timeout=1))
+        self.assertEqual(pipeline.stats['failed_sentences'], 1)
+
+    def test_text_buit_no_comença_torn(self):
+        pipeline = SpeechPipeline(lambda s: [b'x'])
+        self.assertIsNone(pipeline.start_turn(''))
+
+    def test_wake_desperta_el_consumidor(self):
+        pipeline = SpeechPipeline(lambda s: [b'x'])
+        pipeline.wake()
+        self.assertFalse(pipeline.play_next_turn(sink_factory=lambda: FakeSink([]), timeout=5))
+
+    def test_cua_buida_retorna_false(self):
+        pipeline = SpeechPipeline(lambda s: [b'x'])
+        self.assertFalse(pipeline.play_next_turn(sink_factory=lambda: FakeSink([]), timeout=0.01))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+"""
+Tests unitaris per a tts_stream.py
+"""
+import unittest
+from unittest.mock import Mock, patch
+import sys
+import os
+
+import numpy as np
+
+# Afegir el directori pare al path per poder importar els mòduls
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Altres tests reemplacen utils per un mock: carregar els mòduls reals
+if not isinstance(getattr(sys.modules.get('utils'), '__file__', None), str):
+    sys.modules.pop('utils', None)
+sys.modules.pop('tts_stream', None)
+
+from tts_stream import AudioSink, PlaybackMeter, stream_tts, format_timings, new_timings
+
+
+class FakeSink():
+    """Altaveu fals que guarda el que s'hi escriu"""
+
+    def __init__(self):
+        self.writes = []
+        self.closed = False
+        self.aborted = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.closed = True
+        else:
+            self.aborted = True
+        return False
+
+    def write(self, data):
+        self.writes.append(data)
+
+
+def _pcm(values):
+    return np.array(values, dtype='<i2').tobytes()
+
+
+class TestStreamTts(unittest.TestCase):
+    """Tests per a stream_tts"""
+
+    def _helper(self, chunks):
+        helper = Mock()
+        helper.text_to_speech_stream.return_value = iter(chunks)
+        return helper
+
+    @patch('tts_stream.warn')
+    def test_reprodueix_fragments_amb_guany(self, mock_warn):
+        """Cada fragment s'amplifica i s'escriu a l'altaveu"""
+        sink = FakeSink()
+        helper = self._helper([_pcm([100, 200]), _pcm([-300])])
+
+        ok, timings = stream_tts("Hola", helper, 'echo', 2, sink_factory=lambda: sink)
+
+        self.assertTrue(ok)
+        self.assertTrue(sink.closed)
+        played = np.frombuffer(b''.join(sink.writes), dtype='<i2')
+        self.assertEqual(list(played), [200, 400, -600])
+        self.assertTrue(timings['audio_started'])
+        self.assertEqual(timings['bytes'], 6)
+        self.assertIsNotNone(timings['first_chunk'])
+        self.assertIsNotNone(timings['first_sound'])
+        self.assertIsNotNone(timings['total'])
+        kwargs = helper.text_to_speech_stream.call_args[1]
+        self.assertEqual(kwargs['response_format'], 'pcm')
+
+    def test_fragments_amb_mostres_partides(self):
+        """Una mostra de 16 bits tallada entre dos fragments es reconstrueix"""
+        sink = FakeSink()
+        data = _pcm([1000, -1000, 250])
+        helper = self._helper([data[:3], data[3:5], data[5:]])
+
+        ok, _ = stream_tts("Hola", helper, 'echo', 1, sink_factory=lambda: sink)
+
+        self.assertTrue(ok)
+        self.assertEqual(b''.join(sink.writes), data)
+        for write in sink.writes:
+            self.assertEqual(len(write) % 2, 0)
+
+    @patch('tts_stream.warn')
+    def test_error_abans_del_primer_fragment(self, mock_warn):
+        """Si falla abans de sonar res, el cridador pot fer fallback"""
+        sink = FakeSink()
+        helper = Mock()
+        helper.text_to_speech_stream.side_effect = Exception("xarxa")
+
+        ok, timings = stream_tts("Hola", helper, 'echo', 3, sink_factory=lambda: sink)
+
+        self.assertFalse(ok)
+        self.assertFalse(timings['audio_started'])
+        self.assertEqual(timings['error'], "xarxa")
+        self.assertEqual(sink.writes, [])
+
+    @patch('tts_stream.warn')
+    def test_error_a_mig_stream(self, mock_warn):
+        """Si falla després d'haver sonat, es marca audio_started i s'avorta l'altaveu"""
+        sink = FakeSink()
+
+        def chunks():
+            yield _pcm([1, 2])
+            raise Exception("tall")
+
+        helper = Mock()
+        helper.text_to_speech_stream.return_value = chunks()
+
+        ok, timings = stream_tts("Hola", helper, 'echo', 1, sink_factory=lambda: sink)
+
+        self.assertFalse(ok)
+        self.assertTrue(timings['audio_started'])
+        self.assertTrue(sink.aborted)
+
+
+class TestAudioSink(unittest.TestCase):
+    """Tests per a AudioSink"""
+
+    @patch('tts_stream.subprocess.Popen')
+    def test_escriu_i_tanca(self, mock_popen):
+        proc = Mock()
+        mock_popen.return_value = proc
+        with AudioSink(['player']) as sink:
+            sink.write(b'abcd')
+        proc.stdin.write.assert_called_once_with(b'abcd')
+        proc.stdin.close.assert_called_once()
+        proc.wait.assert_called_once()
+        self.assertEqual(mock_popen.call_args[0][0], ['player'])
+
+    @patch('tts_stream.subprocess.Popen')
+    def test_excepcio_avorta(self, mock_popen):
+        proc = Mock()
+        mock_popen.return_value = proc
+        with self.assertRaises(ValueError):
+            with AudioSink(['player']):
+                raise ValueError("error")
+        proc.kill.assert_called_once()
+
+    def test_write_sense_obrir(self):
+        with self.assertRaises(RuntimeError):
+            AudioSink(['player']).write(b'ab')
+
+    @patch('tts_stream.subprocess.Popen')
+    def test_anota_el_nivell_reproduit(self, mock_popen):
+        meter = PlaybackMeter()
+        with AudioSink(['player'], meter=meter) as sink:
+            sink.write(_pcm([1000, -1000]))
+        self.assertAlmostEqual(meter.level(), 1000)
+
+
+class TestPlaybackMeter(unittest.TestCase):
+    """Tests per a PlaybackMeter"""
+
+    def test_maxim_de_la_finestra(self):
+        meter = PlaybackMeter(window_s=2.0)
+        self.assertEqual(meter.level(now=0.0), 0.0)
+        meter.update(_pcm([300, -300]), now=10.0)
+        meter.update(_pcm([100, -100]), now=11.0)
+        self.assertAlmostEqual(meter.level(now=11.5), 300)
+        # El buffer del reproductor ja s'ha buidat
+        self.assertAlmostEqual(meter.level(now=12.5), 100)
+        self.assertEqual(meter.level(now=14.0), 0.0)
+
+
+class TestFormatTimings(unittest.TestCase):
+    """Tests per a format_timings"""
+
+    def test_valors_buits(self):
+        text = format_timings(new_timings())
+        self.assertIn('first sound - s', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
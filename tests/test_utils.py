@@ -2,7 +2,7 @@
 Tests unitaris per a utils.py
 """
 import unittest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import patch
 import sys
 import os
 import tempfile
@@ -10,11 +10,22 @@ import tempfile
 # Afegir el directori pare al path per poder importar els mòduls
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Altres tests reemplacen utils per un mock: carregar el mòdul real
+if not isinstance(getattr(sys.modules.get('utils'), '__file__', None), str):
+    sys.modules.pop('utils', None)
+
 from utils import (
     print_color, gray_print, warn, error,
     redirect_error_2_null, cancel_redirect_error,
-    run_command, sox_volume, speak_block
+    run_command, sox_volume, speak_block,
+    volume_gain, pcm_volume, wav_volume, wav_data_chunk,
+    notify_waiters, wait_until
 )
+import struct
+import threading
+import time
+import wave
+import numpy as np
 
 
 class TestPrintFunctions(unittest.TestCase):
@@ -41,5 +52,153 @@ class TestSpeakBlock(unittest.TestCase):
     """Tests per a speak_block"""
     pass
 
+
+class TestVolumeGain(unittest.TestCase):
+    """Tests per a volume_gain"""
+
+    def test_amplitude_es_factor_lineal(self):
+        """Per defecte el volum és un factor d'amplitud, com sox.Transformer.vol"""
+        self.assertEqual(volume_gain(3), 3.0)
+
+    def test_db(self):
+        """20 dB equivalen a un factor 10"""
+        self.assertAlmostEqual(volume_gain(20, 'db'), 10.0)
+
+    def test_power(self):
+        self.assertAlmostEqual(volume_gain(4, 'power'), 2.0)
+
+    def test_tipus_desconegut(self):
+        with self.assertRaises(ValueError):
+            volume_gain(3, 'altre')
+
+
+class TestPcmVolume(unittest.TestCase):
+    """Tests per a pcm_volume"""
+
+    def test_aplica_guany(self):
+        data = np.array([100, -200, 0], dtype='<i2').tobytes()
+        result = np.frombuffer(pcm_volume(data, 3), dtype='<i2')
+        self.assertEqual(list(result), [300, -600, 0])
+
+    def test_satura_sense_desbordar(self):
+        data = np.array([20000, -20000], dtype='<i2').tobytes()
+        result = np.frombuffer(pcm_volume(data, 3), dtype='<i2')
+        self.assertEqual(list(result), [32767, -32768])
+
+    def test_guany_unitari_retorna_les_mateixes_dades(self):
+        data = np.array([1, 2, 3], dtype='<i2').tobytes()
+        self.assertEqual(pcm_volume(data, 1), data)
+
+    def test_buffer_buit(self):
+        self.assertEqual(pcm_volume(b'', 3), b'')
+
+
+def _write_wav(path, samples, framerate=24000):
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(framerate)
+        w.writeframes(np.array(samples, dtype='<i2').tobytes())
+
+
+def _read_wav(path):
+    with wave.open(path, 'rb') as w:
+        return list(np.frombuffer(w.readframes(w.getnframes()), dtype='<i2')), w.getframerate()
+
+
+class TestWavVolume(unittest.TestCase):
+    """Tests per a wav_volume"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, 'in.wav')
+        self.dst = os.path.join(self.tmp.name, 'out.wav')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_a_un_altre_fitxer(self):
+        _write_wav(self.src, [100, -100, 20000])
+        self.assertTrue(wav_volume(self.src, self.dst, 3))
+        samples, rate = _read_wav(self.dst)
+        self.assertEqual(samples, [300, -300, 32767])
+        self.assertEqual(rate, 24000)
+        # L'original no es modifica
+        self.assertEqual(_read_wav(self.src)[0], [100, -100, 20000])
+
+    def test_in_situ(self):
+        _write_wav(self.src, [1, 2, 3])
+        self.assertTrue(wav_volume(self.src, self.src, 2))
+        self.assertEqual(_read_wav(self.src)[0], [2, 4, 6])
+
+    def test_capcalera_de_streaming_es_corregeix(self):
+        """Els WAV en streaming porten mides 0xFFFFFFFF a la capçalera"""
+        _write_wav(self.src, [10, 20])
+        with open(self.src, 'r+b') as f:
+            f.seek(4)
+            f.write(struct.pack('<I', 0xFFFFFFFF))
+            f.seek(40)
+            f.write(struct.pack('<I', 0xFFFFFFFF))
+        offset, size, width, channels, rate = wav_data_chunk(self.src)
+        self.assertEqual((offset, size, width, channels, rate), (44, 4, 2, 1, 24000))
+
+        self.assertTrue(wav_volume(self.src, self.src, 2))
+        self.assertEqual(_read_wav(self.src)[0], [20, 40])
+        self.assertEqual(wav_data_chunk(self.src)[1], 4)
+
+    @patch('builtins.print')
+    def test_fitxer_no_wav(self, mock_print):
+        with open(self.src, 'wb') as f:
+            f.write(b'no soc un wav')
+        self.assertFalse(wav_volume(self.src, self.dst, 3))
+
+    @patch('builtins.print')
+    def test_8_bits_no_suportat(self, mock_print):
+        with wave.open(self.src, 'wb') as w:
+            w.setnchannels(1)
+            w.setsampwidth(1)
+            w.setframerate(8000)
+            w.writeframes(b'\x80\x81')
+        self.assertFalse(wav_volume(self.src, self.dst, 3))
+
+
+class TestWaitUntil(unittest.TestCase):
+    """Tests per a wait_until i notify_waiters"""
+
+    def _set_later(self, lock, state, delay=0.05):
+        def setter():
+            time.sleep(delay)
+            with lock:
+                state['done'] = True
+                notify_waiters(lock)
+        thread = threading.Thread(target=setter)
+        thread.start()
+        return thread
+
+    def test_condition_es_desperta_amb_la_notificacio(self):
+        lock = threading.Condition()
+        state = {'done': False}
+        thread = self._set_later(lock, state)
+        self.assertTrue(wait_until(lock, lambda: state['done'], timeout=2))
+        thread.join()
+
+    def test_condition_timeout(self):
+        lock = threading.Condition()
+        self.assertFalse(wait_until(lock, lambda: False, timeout=0.01))
+
+    def test_lock_normal_fa_polling(self):
+        lock = threading.Lock()
+        state = {'done': False}
+        thread = self._set_later(lock, state)
+        self.assertTrue(wait_until(lock, lambda: state['done'], timeout=2))
+        thread.join()
+        self.assertFalse(wait_until(lock, lambda: False, timeout=0.02))
+
+    def test_notify_amb_lock_normal_no_falla(self):
+        lock = threading.Lock()
+        with lock:
+            notify_waiters(lock)
+
+
 if __name__ == '__main__':
     unittest.main()
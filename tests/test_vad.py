@@ -0,0 +1,171 @@
+"""
+Tests unitaris per a vad.py
+"""
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# Afegir el directori pare al path per poder importar els mòduls
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vad import BargeInDetector, VoiceActivityDetector, frame_energies
+
+RATE = 16000
+FRAME = 480  # 30 ms
+THRESHOLD = 300
+
+
+def tone(amplitude, seconds):
+    """PCM de 16 bits amb energia RMS = amplitude (ona quadrada)."""
+    data = np.full(int(RATE * seconds), amplitude, dtype='<i2')
+    data[1::2] = -amplitude
+    return data.tobytes()
+
+
+def feed_all(vad, data, chunk_bytes=2000):
+    """Passa l'àudio en fragments de mida arbitrària fins que acaba la frase."""
+    noise = []
+    for i in range(0, len(data), chunk_bytes):
+        noise.extend(vad.feed(data[i:i + chunk_bytes]))
+        if vad.done:
+            return i + chunk_bytes, noise
+    return None, noise
+
+
+class TestFrameEnergies(unittest.TestCase):
+    """Tests per a frame_energies()"""
+
+    def test_energia_per_trama(self):
+        samples = np.frombuffer(tone(100, 0.03) + tone(1000, 0.03) + b'\x00\x00' * 10, dtype='<i2')
+        energies = frame_energies(samples, FRAME)
+        self.assertEqual(len(energies), 2)
+        self.assertAlmostEqual(energies[0], 100)
+        self.assertAlmostEqual(energies[1], 1000)
+        self.assertEqual(len(frame_energies(samples[:100], FRAME)), 0)
+
+
+class TestVoiceActivityDetector(unittest.TestCase):
+    """Tests per a VoiceActivityDetector"""
+
+    def _vad(self, **kwargs):
+        return VoiceActivityDetector(RATE, lambda: THRESHOLD, **kwargs)
+
+    def test_cami_rapid_amb_silenci_clar(self):
+        vad = self._vad()
+        used, noise = feed_all(vad, tone(10, 0.6) + tone(2000, 0.6) + tone(10, 2.0))
+        self.assertTrue(vad.done)
+        self.assertTrue(vad.stats['fast_end'])
+        self.assertAlmostEqual(vad.trailing_silence_s, 0.24, places=2)
+        self.assertAlmostEqual(vad.speech_s, 0.6, places=2)
+        # No cal llegir els 2 s de silenci final
+        self.assertLess(used, len(tone(10, 0.6) + tone(2000, 0.6) + tone(10, 0.4)))
+        self.assertTrue(noise)
+
+    def test_pre_roll(self):
+        vad = self._vad(pre_roll_s=0.3)
+        feed_all(vad, tone(10, 0.6) + tone(2000, 0.6) + tone(10, 1.0))
+        first = np.frombuffer(vad.audio[:FRAME * 2], dtype='<i2')
+        # La frase comença amb 0,3 s de l'àudio anterior a la veu
+        self.assertEqual(abs(int(first[0])), 10)
+        speech_start = vad.audio.index(tone(2000, 0.03))
+        self.assertEqual(speech_start, 10 * FRAME * 2)
+
+    def test_audio_de_la_frase_a_trossos(self):
+        vad = self._vad(pre_roll_s=0.3)
+        vad.feed(tone(10, 0.6) + tone(2000, 0.3))
+        first, n = vad.phrase_audio(0)
+        vad.feed(tone(2000, 0.3) + tone(10, 1.0))
+        rest, total = vad.phrase_audio(n)
+        self.assertTrue(vad.done)
+        self.assertEqual(first + rest, vad.audio)
+        self.assertEqual(total * FRAME * 2, len(vad.audio))
+
+    def test_silenci_dubtos_espera_el_hangover(self):
+        """Un silenci proper al llindar no fa servir el camí ràpid"""
+        vad = self._vad(hangover_s=0.5)
+        feed_all(vad, tone(10, 0.3) + tone(2000, 0.6) + tone(200, 2.0))
+        self.assertTrue(vad.done)
+        self.assertFalse(vad.stats['fast_end'])
+        self.assertAlmostEqual(vad.trailing_silence_s, 0.51, places=2)
+
+    def test_descarta_cops_curts(self):
+        vad = self._vad(min_phrase_s=0.2)
+        feed_all(vad, tone(10, 0.3) + tone(2000, 0.12) + tone(10, 0.6) + tone(2000, 0.6) + tone(10, 1.0))
+        self.assertTrue(vad.done)
+        self.assertEqual(vad.stats['discarded'], 1)
+        self.assertAlmostEqual(vad.speech_s, 0.6, places=2)
+
+    def test_clics_no_comencen_frase(self):
+        vad = self._vad(start_s=0.09)
+        feed_all(vad, (tone(10, 0.09) + tone(2000, 0.03)) * 10)
+        self.assertFalse(vad.speaking)
+        self.assertFalse(vad.done)
+
+    def test_durada_maxima(self):
+        vad = self._vad(max_phrase_s=1.0)
+        feed_all(vad, tone(2000, 3.0))
+        self.assertTrue(vad.done)
+        self.assertAlmostEqual(len(vad.audio) / 2 / RATE, 1.0, delta=0.03)
+
+
+class TestBargeInDetector(unittest.TestCase):
+    """Tests per a BargeInDetector"""
+
+    def _detector(self, reference=0.0, **kwargs):
+        self.reference = {'level': reference}
+        return BargeInDetector(RATE, lambda: THRESHOLD, reference=lambda: self.reference['level'], **kwargs)
+
+    @staticmethod
+    def speech(amplitude, seconds):
+        """Síl·labes: l'energia puja i baixa cada 60 ms."""
+        return b''.join(tone(amplitude if i % 2 == 0 else amplitude // 3, 0.06)
+                        for i in range(int(round(seconds / 0.06))))
+
+    def test_veu_clara_interromp(self):
+        detector = self._detector()
+        self.assertFalse(detector.feed(tone(50, 0.5) + self.speech(2000, 0.24)))
+        self.assertTrue(detector.feed(self.speech(2000, 0.3)))
+        self.assertEqual(detector.stats['triggers'], 1)
+
+    def test_cops_curts_no_interrompen(self):
+        detector = self._detector()
+        detector.feed(tone(50, 0.5))
+        for _ in range(5):
+            self.assertFalse(detector.feed(tone(5000, 0.09) + tone(10, 0.6)))
+
+    def test_soroll_estacionari_no_interromp(self):
+        """Un motor que arrenca supera el llindar però no varia com la veu"""
+        detector = self._detector()
+        self.assertFalse(detector.feed(tone(50, 0.5) + tone(800, 2.0)))
+        self.assertAlmostEqual(detector.floor, 800)
+        # Amb el soroll après, cal parlar per sobre del doble
+        self.assertFalse(detector.feed(self.speech(1500, 1.0)))
+        self.assertTrue(detector.feed(self.speech(5000, 0.6)))
+        detector.reset()
+        self.assertIsNone(detector.floor)
+
+    def test_eco_del_robot_no_interromp(self):
+        """L'eco après (un percentil dels pics) puja el límit; cal parlar per sobre"""
+        detector = self._detector(reference=1000.0)
+        self.assertFalse(detector.feed(self.speech(1200, 2.0)))
+        self.assertAlmostEqual(detector.echo_gain, 1.2)
+        self.assertAlmostEqual(detector.limit(1000.0), 1200)
+        self.assertFalse(detector.feed(self.speech(1200, 2.0)))
+        self.assertTrue(detector.feed(self.speech(4000, 0.6)))
+
+    def test_eco_inicial_prudent_fins_que_l_apren(self):
+        detector = self._detector(reference=1000.0, initial_echo_gain=2.0)
+        self.assertAlmostEqual(detector.limit(1000.0), 2000)
+        # Menys d'un segon de veu del robot: encara no es fa servir l'eco après
+        detector.feed(self.speech(300, 0.6))
+        self.assertEqual(detector.echo_gain, 2.0)
+        detector.feed(self.speech(300, 0.6))
+        self.assertAlmostEqual(detector.echo_gain, 0.3)
+        # L'eco après es conserva entre torns
+        detector.reset()
+        self.assertAlmostEqual(detector.echo_gain, 0.3)
+
+if __name__ == '__main__':
+    unittest.main()
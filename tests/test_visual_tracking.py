@@ -2,11 +2,15 @@
 Tests unitaris per a visual_tracking.py
 """
 import unittest
-from unittest.mock import Mock, patch
+from unittest.mock import Mock, call, patch
 import sys
 import os
 import threading
 import importlib.util
+import math
+import random
+import time
+import types
 
 # Afegir el directori pare al path per poder importar els mòduls
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -38,7 +42,28 @@ from visual_tracking import (
     aplicar_angles_camera,
     processar_iteracio_tracking,
     girar_robot_cap_direccio,
+    DetectionSmoother,
+    SMOOTHING_WEIGHTS,
+    AlphaBetaTracker,
+    KalmanTracker,
+    crear_estimador_posicio,
+    direccio_persona_perduda,
+    TRACKING_LATENCY_S,
+    TRACKING_LOOP_DELAY,
+    PidController,
+    PidCameraController,
+    StepCameraController,
+    crear_controlador_camera,
+    CAMERA_FOV_H,
+    DetectionFeed,
+    crear_detector,
+    TrackingStats,
+    get_tracking_stats,
+    lock_on_speaker,
+    _tracking_ref,
 )
+from person_tracker import PersonTracker
+from servo_output import ServoOutput, PRIORITY_ACTION
 
 
 class TestClampNumber(unittest.TestCase):
@@ -51,6 +76,442 @@ class TestCalcularMitjanaPonderada(unittest.TestCase):
     pass
 
 
+class TestDetectionSmoother(unittest.TestCase):
+    """Tests per a DetectionSmoother"""
+
+    def _legacy(self, valors, size, pesos):
+        """Històric amb llistes i pop(0), com abans del buffer circular."""
+        xs, ys, out = [], [], []
+        for x, y in valors:
+            xs.append(x)
+            ys.append(y)
+            if len(xs) > size:
+                xs.pop(0)
+                ys.pop(0)
+            out.append((calcular_mitjana_ponderada(xs, pesos), calcular_mitjana_ponderada(ys, pesos)))
+        return out
+
+    def _valors(self, n=200):
+        return [((i * 37) % 640 + 0.5, (i * 53) % 480) for i in range(n)]
+
+    def _assert_igual(self, smoother, size, pesos):
+        valors = self._valors()
+        esperat = self._legacy(valors, size, pesos)
+        for (x, y), (ex, ey) in zip(valors, esperat):
+            sx, sy = smoother.add(x, y)
+            self.assertAlmostEqual(sx, ex, places=6)
+            self.assertAlmostEqual(sy, ey, places=6)
+
+    def test_igual_que_la_mitjana_ponderada(self):
+        self._assert_igual(DetectionSmoother(), 5, SMOOTHING_WEIGHTS)
+
+    def test_pesos_no_lineals(self):
+        pesos = [0.05, 0.1, 0.2, 0.4]
+        smoother = DetectionSmoother(4, pesos)
+        self.assertFalse(smoother._linear)
+        self._assert_igual(smoother, 4, pesos)
+
+    def test_finestra_mes_curta_que_els_pesos(self):
+        self._assert_igual(DetectionSmoother(3), 3, SMOOTHING_WEIGHTS[-3:])
+
+    def test_clear(self):
+        smoother = DetectionSmoother()
+        smoother.add(100, 100)
+        smoother.add(200, 200)
+        smoother.clear()
+        self.assertEqual(len(smoother), 0)
+        self.assertIsNone(smoother.mean())
+        self.assertEqual(smoother.add(300, 50), (300.0, 50.0))
+
+    def test_pesos_zero_retorna_ultima(self):
+        smoother = DetectionSmoother(3, [0, 0, 0])
+        smoother.add(1, 2)
+        self.assertEqual(smoother.add(3, 4), (3.0, 4.0))
+
+    def test_configuracio_invalida(self):
+        with self.assertRaises(ValueError):
+            DetectionSmoother(0)
+        with self.assertRaises(ValueError):
+            DetectionSmoother(6, SMOOTHING_WEIGHTS)
+        with self.assertRaises(ValueError):
+            create_visual_tracking_handler(Mock(), Mock(), True, 0, smoothing_size=10)
+
+
+def traca_persona(periode=6.0, segons=20.0, soroll=8.0, seed=0):
+    """
+    Traça de deteccions d'una persona que camina amunt i avall davant la
+    càmera: (instant, x detectada, y detectada, (x, y) reals a la propera
+    actualització dels servos). Cada detecció arriba amb TRACKING_LATENCY_S
+    de retard i soroll gaussià.
+    """
+    rng = random.Random(seed)
+
+    def real(t):
+        fase = (t % periode) / periode
+        return 120 + 400 * (2 * fase if fase < 0.5 else 2 - 2 * fase), 240 + 60 * math.sin(0.7 * t)
+
+    traca = []
+    for i in range(int(segons / TRACKING_LOOP_DELAY)):
+        t = i * TRACKING_LOOP_DELAY
+        x, y = real(t - TRACKING_LATENCY_S)
+        traca.append((t, x + rng.gauss(0, soroll), y + rng.gauss(0, soroll), real(t + TRACKING_LOOP_DELAY)))
+    return traca
+
+
+def error_seguiment(estimador, traca):
+    """Error mitjà (px) entre on apunta l'estimador i on és la persona quan es mou el servo."""
+    errors = []
+    for t, x, y, (real_x, real_y) in traca:
+        px, py = estimador.add(x, y, t)
+        errors.append(math.hypot(px - real_x, py - real_y))
+    errors = errors[20:]  # sense l'arrencada
+    return sum(errors) / len(errors)
+
+
+class TestEstimadorsVelocitat(unittest.TestCase):
+    """Tests per a AlphaBetaTracker, KalmanTracker i crear_estimador_posicio"""
+
+    def test_redueixen_l_error_de_seguiment(self):
+        for periode in (3.0, 6.0, 12.0):
+            traca = traca_persona(periode)
+            base = error_seguiment(DetectionSmoother(), traca)
+            for estimador in (AlphaBetaTracker(), KalmanTracker()):
+                with self.subTest(periode=periode, estimador=type(estimador).__name__):
+                    self.assertLess(error_seguiment(estimador, traca), 0.65 * base)
+
+    def test_estima_la_velocitat(self):
+        for estimador in (AlphaBetaTracker(), KalmanTracker()):
+            self.assertIsNone(estimador.velocity)
+            for i in range(40):
+                estimador.add(100 + 200 * i * 0.05, 240, i * 0.05)
+            vx, vy = estimador.velocity
+            self.assertAlmostEqual(vx, 200, delta=5)
+            self.assertAlmostEqual(vy, 0, delta=5)
+            # Apunta on serà la persona, no on era a la detecció
+            x, _ = estimador.predict(TRACKING_LATENCY_S + TRACKING_LOOP_DELAY)
+            self.assertAlmostEqual(x, 100 + 200 * (39 * 0.05 + TRACKING_LATENCY_S + TRACKING_LOOP_DELAY), delta=5)
+
+    def test_deteccio_repetida_no_canvia_l_estat(self):
+        estimador = KalmanTracker()
+        estimador.add(100, 100, 1.0)
+        estimador.add(110, 100, 1.1)
+        abans = (estimador.x, estimador.vx)
+        estimador.add(300, 100, 1.1)
+        self.assertEqual((estimador.x, estimador.vx), abans)
+
+    def test_prediccio_dins_la_imatge(self):
+        estimador = AlphaBetaTracker()
+        for i in range(20):
+            estimador.add(600 + 10 * i, 240, i * 0.05)
+        x, _ = estimador.add(639, 240, 1.0)
+        self.assertLessEqual(x, 640)
+
+    def test_clear(self):
+        estimador = KalmanTracker()
+        estimador.add(100, 100, 1.0)
+        estimador.add(150, 100, 1.1)
+        estimador.clear()
+        self.assertIsNone(estimador.velocity)
+        self.assertEqual(estimador.add(300, 200, 2.0), (300.0, 200.0))
+
+    def test_crear_estimador(self):
+        self.assertIsInstance(crear_estimador_posicio('smoothing'), DetectionSmoother)
+        self.assertIsInstance(crear_estimador_posicio('alpha_beta'), AlphaBetaTracker)
+        self.assertIsInstance(crear_estimador_posicio('kalman'), KalmanTracker)
+        with self.assertRaises(ValueError):
+            crear_estimador_posicio('lstm')
+        with self.assertRaises(ValueError):
+            create_visual_tracking_handler(Mock(), Mock(), True, 0, estimator='lstm')
+
+    def test_direccio_persona_perduda(self):
+        # Sense velocitat: segons l'última posició
+        self.assertEqual(direccio_persona_perduda(300), 'esquerra')
+        self.assertEqual(direccio_persona_perduda(300, None, 0.5), 'esquerra')
+        # Sortia cap a la dreta ràpidament: ara ja és a la dreta del centre
+        self.assertEqual(direccio_persona_perduda(300, 200.0, 0.5), 'dreta')
+        # L'extrapolació es limita a LOST_PREDICTION_HORIZON_S
+        self.assertEqual(direccio_persona_perduda(100, 100.0, 10.0), 'esquerra')
+
+
+class TestPidController(unittest.TestCase):
+    """Tests per a PidController, PidCameraController i crear_controlador_camera"""
+
+    def test_proporcional(self):
+        pid = PidController(kp=5, ki=0, kd=0)
+        self.assertAlmostEqual(pid.update(2.0, 10.0, 0.05), 10.5)
+        self.assertAlmostEqual(pid.update(-2.0, 10.0, 0.05), 9.5)
+
+    def test_zona_morta(self):
+        pid = PidController(kp=5, ki=5, kd=0, deadband=1.0)
+        self.assertEqual(pid.update(0.5, 10.0, 0.05), 10.0)
+        self.assertEqual(pid.integral, 0.0)
+
+    def test_limit_de_velocitat(self):
+        pid = PidController(kp=100, ki=0, kd=0, max_rate=100)
+        self.assertAlmostEqual(pid.update(30.0, 0.0, 0.05), 5.0)
+
+    def test_limit_d_angle(self):
+        pid = PidController(kp=100, ki=0, kd=0, max_rate=1000, angle_min=-35, angle_max=35)
+        self.assertEqual(pid.update(30.0, 34.0, 0.05), 35)
+
+    def test_anti_windup(self):
+        # Saturat al límit de l'angle: la integral no creix
+        pid = PidController(kp=1, ki=1, kd=0, angle_min=-35, angle_max=35)
+        for _ in range(50):
+            pid.update(10.0, 35.0, 0.05)
+        self.assertEqual(pid.integral, 0.0)
+        # Sense saturar creix, però fins a integral_limit
+        pid = PidController(kp=0, ki=1, kd=0, integral_limit=2.0)
+        for _ in range(100):
+            pid.update(1.0, 0.0, 0.05)
+        self.assertAlmostEqual(pid.integral, 2.0)
+
+    def test_reset_i_dt_zero(self):
+        pid = PidController(kp=1, ki=1, kd=1)
+        pid.update(5.0, 0.0, 0.05)
+        self.assertEqual(pid.update(5.0, 3.0, 0), 3.0)
+        pid.reset()
+        self.assertEqual(pid.integral, 0.0)
+
+    def test_mateixos_sentits_que_el_pas_fix(self):
+        pid, step = PidCameraController(), StepCameraController()
+        for x, y in ((500, 100), (100, 400)):
+            pan_pid, tilt_pid = pid.actualitzar(x, y, 0, 0, 1.0)
+            pan_step, tilt_step = step.actualitzar(x, y, 0, 0)
+            self.assertEqual((pan_pid > 0, tilt_pid > 0), (pan_step > 0, tilt_step > 0))
+            pid.reset()
+
+    def test_centra_abans_que_el_pas_fix(self):
+        """Esglaó de 25 graus amb la càmera simulada: el PID s'hi acosta en menys iteracions"""
+        def iteracions(controlador):
+            pan = 0.0
+            for i in range(100):
+                x = 320 + (25 - pan) * 640 / CAMERA_FOV_H
+                pan, _ = controlador.actualitzar(min(max(x, 0), 640), 240, pan, 0, i * TRACKING_LOOP_DELAY)
+                if abs(25 - pan) < 1.0:
+                    return i
+            return 100
+        self.assertLess(iteracions(PidCameraController()), iteracions(StepCameraController()))
+
+    def test_crear_controlador(self):
+        self.assertIsInstance(crear_controlador_camera('pid'), PidCameraController)
+        self.assertIsInstance(crear_controlador_camera('step'), StepCameraController)
+        with self.assertRaises(ValueError):
+            crear_controlador_camera('fuzzy')
+        with self.assertRaises(ValueError):
+            create_visual_tracking_handler(Mock(), Mock(), True, 0, controller='fuzzy')
+
+    def test_iteracio_amb_controlador(self):
+        mock_vilib = Mock()
+        mock_vilib.detect_obj_parameter = {'human_n': 1, 'human_x': 500, 'human_y': 240}
+        controlador = Mock()
+        controlador.actualitzar.return_value = (5, 20)
+        state = {'centered': False}
+        mock_car = Mock()
+        resultat = processar_iteracio_tracking(
+            mock_vilib, DetectionSmoother(), state, threading.Lock(), mock_car, 0, 20, controlador
+        )
+        self.assertEqual(resultat, (5, 20))
+        mock_car.set_cam_pan_angle.assert_called_once_with(5)
+        # Sense detecció es reinicia (la integral no arrossega la persona anterior)
+        mock_vilib.detect_obj_parameter = {'human_n': 0}
+        processar_iteracio_tracking(
+            mock_vilib, DetectionSmoother(), state, threading.Lock(), mock_car, 5, 20, controlador
+        )
+        controlador.reset.assert_called_once()
+
+
+class TestDetectionFeed(unittest.TestCase):
+    """Tests per a DetectionFeed i TrackingStats"""
+
+    def test_fotograma_nou(self):
+        vilib = types.SimpleNamespace(img=object(), detect_obj_parameter={'human_n': 1, 'human_x': 100})
+        feed = DetectionFeed(vilib, poll_s=0.001)
+        self.assertTrue(feed.wait(0, timeout=0.05))
+        self.assertEqual(feed.seq, 1)
+        self.assertEqual(feed.detect_obj_parameter['human_x'], 100)
+        # Mateix fotograma: cap detecció nova, encara que la detecció s'estigui escrivint
+        vilib.detect_obj_parameter['human_x'] = 200
+        self.assertFalse(feed.wait(1, timeout=0.02))
+        self.assertEqual(feed.detect_obj_parameter['human_x'], 100)
+        vilib.img = object()
+        self.assertTrue(feed.wait(1, timeout=0.05))
+        self.assertEqual((feed.seq, feed.detect_obj_parameter['human_x']), (2, 200))
+
+    def test_sense_imatge_compara_la_deteccio(self):
+        vilib = types.SimpleNamespace(detect_obj_parameter={'human_n': 0})
+        feed = DetectionFeed(vilib, poll_s=0.001)
+        self.assertTrue(feed.wait(0, timeout=0.05))
+        self.assertFalse(feed.wait(1, timeout=0.02))
+        vilib.detect_obj_parameter = {'human_n': 1, 'human_x': 10}
+        self.assertTrue(feed.wait(1, timeout=0.05))
+
+    def test_detector_propi(self):
+        """Amb detector, cada fotograma nou el detecta el detector i s'escriu a Vilib"""
+        vilib = types.SimpleNamespace(img=object(), detect_obj_parameter={'human_n': 0})
+        detector = Mock()
+        detector.detect.return_value = {'human_n': 1, 'human_x': 300, 'human_y': 200,
+                                        'human_w': 50, 'human_h': 50, 'people': [(300, 200, 50, 50)]}
+        feed = DetectionFeed(vilib, poll_s=0.001, detector=detector)
+        self.assertTrue(feed.wait(0, timeout=0.05))
+        self.assertFalse(feed.wait(1, timeout=0.02))
+        detector.detect.assert_called_once()
+        self.assertIs(detector.detect.call_args[0][0], vilib.img)
+        self.assertEqual(feed.detect_obj_parameter['people'], [(300, 200, 50, 50)])
+        self.assertEqual(vilib.detect_obj_parameter, {'human_n': 1, 'human_x': 300, 'human_y': 200,
+                                                      'human_w': 50, 'human_h': 50})
+
+    @patch('visual_tracking.PersonDetector')
+    def test_crear_detector(self, mock_detector):
+        vilib = Mock()
+        mock_detector.return_value.available = True
+        self.assertIs(crear_detector(vilib), mock_detector.return_value)
+        vilib.face_detect_switch.assert_called_once_with(False)
+        # Sense cascada es continua amb la detecció de Vilib
+        vilib = Mock()
+        mock_detector.return_value.available = False
+        self.assertIsNone(crear_detector(vilib))
+        vilib.face_detect_switch.assert_not_called()
+
+    def test_publish_desperta_sense_polling(self):
+        feed = DetectionFeed(poll_s=10.0)
+        resultat = {}
+
+        def esperar():
+            st = time.monotonic()
+            resultat['nova'] = feed.wait(0, timeout=5.0)
+            resultat['espera'] = time.monotonic() - st
+
+        fil = threading.Thread(target=esperar)
+        fil.start()
+        threading.Event().wait(0.02)
+        feed.publish({'human_n': 1, 'human_x': 50}, t=123.0)
+        fil.join(timeout=2.0)
+        self.assertTrue(resultat['nova'])
+        self.assertLess(resultat['espera'], 1.0)
+        self.assertEqual(feed.timestamp, 123.0)
+
+    def test_deteccio_repetida_no_es_torna_a_processar(self):
+        feed = DetectionFeed()
+        feed.publish({'human_n': 1, 'human_x': 500, 'human_y': 240})
+        estimador = KalmanTracker()
+        controlador = Mock()
+        controlador.actualitzar.return_value = (3, 20)
+        state = {'centered': False}
+        args = (feed, estimador, state, threading.Lock(), Mock(), 0, 20, controlador)
+        self.assertEqual(processar_iteracio_tracking(*args, deteccio_nova=True, t_deteccio=10.0), (3, 20))
+        self.assertEqual(processar_iteracio_tracking(*args, deteccio_nova=False, t_deteccio=10.0), (0, 20))
+        controlador.actualitzar.assert_called_once()
+        self.assertEqual(state['last_seen_time'], 10.0)
+
+    def test_stats(self):
+        stats = TrackingStats(window_s=1.0)
+        for i in range(10):
+            stats.record_detection()
+            stats.record_update(100.0 + i * 0.1, 100.0 + i * 0.1 + 0.002 * (i + 1))
+        stats.record_stale()
+        resum = stats.summary(now=100.95)
+        self.assertAlmostEqual(resum['control_hz'], 10.0)
+        self.assertAlmostEqual(resum['latency_ms_max'], 20.0)
+        self.assertAlmostEqual(resum['latency_ms_avg'], 11.0)
+        self.assertEqual((resum['detections'], resum['updates'], resum['stale']), (10, 10, 1))
+        self.assertIn('Hz', stats.report())
+        # Fora de la finestra
+        self.assertEqual(stats.summary(now=200.0)['control_hz'], 0)
+
+    @patch('visual_tracking.time.sleep')
+    def test_handler_un_moviment_per_deteccio(self, mock_sleep):
+        """El bucle processa cada fotograma una sola vegada i en mesura la latència"""
+        vilib = types.SimpleNamespace(img=None, detect_obj_parameter={'human_n': 0})
+        car = Mock()
+        handler, state, state_lock, _ = create_visual_tracking_handler(car, vilib, True, 20, multi_person=False, own_detector=False)
+
+        fil = threading.Thread(target=handler, daemon=True)
+        fil.start()
+        for i in range(8):
+            vilib.detect_obj_parameter = {'human_n': 1, 'human_x': 400 + i, 'human_y': 240}
+            vilib.img = object()
+            threading.Event().wait(0.03)  # time.sleep està mockejat
+        with state_lock:
+            state['stop_requested'] = True
+        fil.join(timeout=2.0)
+        self.assertFalse(fil.is_alive())
+        resum = get_tracking_stats()
+        self.assertEqual(resum['updates'], 8)
+        self.assertEqual(car.set_cam_pan_angle.call_count, 8)
+        self.assertLess(resum['latency_ms_max'], 100)
+
+    @patch('visual_tracking.time.sleep')
+    def test_handler_cedeix_la_camera_a_les_accions(self, mock_sleep):
+        """Mentre una acció té la càmera el seguiment no escriu; després continua des d'on ha quedat"""
+        vilib = types.SimpleNamespace(img=None, detect_obj_parameter={'human_n': 0})
+        car = Mock(spec=['set_cam_pan_angle', 'set_cam_tilt_angle', 'set_dir_servo_angle', 'forward', 'stop'])
+        output = ServoOutput(car)
+        handler, state, state_lock, _ = create_visual_tracking_handler(
+            output, vilib, True, 20, multi_person=False, own_detector=False
+        )
+
+        def fotogrames(n):
+            for i in range(n):
+                vilib.detect_obj_parameter = {'human_n': 1, 'human_x': 420, 'human_y': 240}
+                vilib.img = object()
+                threading.Event().wait(0.03)  # time.sleep està mockejat
+
+        fil = threading.Thread(target=handler, daemon=True)
+        fil.start()
+        with output.claim('accions', PRIORITY_ACTION):
+            output.set_cam_pan_angle(-40)
+            fotogrames(5)
+            self.assertEqual(car.set_cam_pan_angle.call_args_list, [call(-40)])
+        fotogrames(3)
+        with state_lock:
+            state['stop_requested'] = True
+        fil.join(timeout=2.0)
+        self.assertFalse(fil.is_alive())
+        pans = [c.args[0] for c in car.set_cam_pan_angle.call_args_list]
+        self.assertGreater(len(pans), 1)
+        self.assertLess(abs(pans[1] - (-40)), 10)
+        self.assertEqual(output.stats['blocked'], 0)
+
+
+class TestSeguimentDiversesPersones(unittest.TestCase):
+    """Tests del seguiment amb PersonTracker"""
+
+    def test_la_camera_no_salta_a_una_altra_persona(self):
+        feed = DetectionFeed()
+        tracker = PersonTracker()
+        controlador = Mock()
+        controlador.actualitzar.side_effect = lambda x, y, pan, tilt: (x, tilt)
+        state = {'centered': False}
+        pan = 0
+        for i in range(10):
+            x = 500 if i % 3 == 2 else 150  # Vilib dona la cara de l'altra persona un de cada tres
+            feed.publish({'human_n': 1, 'human_x': x, 'human_y': 240, 'human_w': 60, 'human_h': 60}, t=i * 0.1)
+            pan, _ = processar_iteracio_tracking(
+                feed, DetectionSmoother(), state, threading.Lock(), Mock(), pan, 20, controlador,
+                t_deteccio=feed.timestamp, tracker=tracker
+            )
+            self.assertNotEqual(pan, 500)
+        # No s'ha considerat la persona perduda
+        self.assertNotIn('search_start_time', state)
+
+    def test_lock_on_speaker(self):
+        tracker = Mock()
+        _tracking_ref['tracker'] = tracker
+        try:
+            lock_on_speaker()
+        finally:
+            _tracking_ref['tracker'] = None
+        tracker.lock_largest.assert_called_once_with()
+        lock_on_speaker()  # sense tracker no fa res
+
+    def test_handler_crea_el_tracker(self):
+        create_visual_tracking_handler(Mock(), Mock(), True, 20)
+        self.assertIsInstance(_tracking_ref['tracker'], PersonTracker)
+        create_visual_tracking_handler(Mock(), Mock(), True, 20, multi_person=False)
+        self.assertIsNone(_tracking_ref['tracker'])
+
+
 class TestCalcularCanviAngle(unittest.TestCase):
     """Tests per a calcular_canvi_angle"""
     pass
@@ -205,7 +666,7 @@ class TestProcessarDeteccioPersona(unittest.TestCase):
             'human_x': 100,
             'human_y': 240
         }
-        detection_history = {'x': [], 'y': []}
+        detection_history = DetectionSmoother()
         state = {
             'centered': False,
             'last_seen_x': None,
@@ -365,7 +826,7 @@ class TestProcessarIteracioTracking(unittest.TestCase):
         
         mock_vilib = Mock()
         mock_vilib.detect_obj_parameter = {'human_n': 0}
-        detection_history = {'x': [], 'y': []}
+        detection_history = DetectionSmoother()
         state = {
             'centered': False,
             'last_seen_x': 100,  # Esquerra del centre (320)
@@ -391,7 +852,7 @@ class TestProcessarIteracioTracking(unittest.TestCase):
         
         mock_vilib = Mock()
         mock_vilib.detect_obj_parameter = {'human_n': 0}
-        detection_history = {'x': [], 'y': []}
+        detection_history = DetectionSmoother()
         state = {
             'centered': False,
             'last_seen_x': 500,  # Dreta del centre
@@ -408,6 +869,50 @@ class TestProcessarIteracioTracking(unittest.TestCase):
         
         mock_girar.assert_called_once_with(mock_car, 'dreta')
     
+    @patch('visual_tracking.girar_robot_cap_direccio')
+    @patch('visual_tracking.time.time')
+    def test_persona_perduda_gira_segons_la_velocitat(self, mock_time, mock_girar):
+        """Test que el gir segueix la posició prevista amb la velocitat, no l'última vista"""
+        mock_time.return_value = 1000.6
+        mock_girar.return_value = True
+        
+        mock_vilib = Mock()
+        mock_vilib.detect_obj_parameter = {'human_n': 0}
+        state = {
+            'centered': False,
+            'last_seen_x': 280,  # Esquerra del centre, però sortint cap a la dreta
+            'last_seen_vx': 250.0,
+            'last_seen_time': 1000.0,
+            'person_lost_turn_done': False,
+        }
+        mock_car = Mock()
+        
+        processar_iteracio_tracking(
+            mock_vilib, KalmanTracker(), state, threading.Lock(),
+            mock_car, 0, 20
+        )
+        
+        mock_girar.assert_called_once_with(mock_car, 'dreta')
+        self.assertEqual(state['search_direction'], 'dreta')
+    
+    @patch('visual_tracking.time.time')
+    def test_deteccio_guarda_la_velocitat(self, mock_time):
+        """Test que amb un estimador de velocitat l'estat guarda last_seen_vx"""
+        mock_vilib = Mock()
+        state = {'centered': False}
+        estimador = AlphaBetaTracker()
+        for i in range(10):
+            mock_time.return_value = 1000.0 + i * 0.05
+            mock_vilib.detect_obj_parameter = {'human_n': 1, 'human_x': 200 + 10 * i, 'human_y': 240}
+            processar_iteracio_tracking(
+                mock_vilib, estimador, state, threading.Lock(),
+                Mock(), 0, 20
+            )
+        self.assertGreater(state['last_seen_vx'], 100)
+        # La mitjana ponderada no en sap la velocitat
+        processar_iteracio_tracking(mock_vilib, DetectionSmoother(), state, threading.Lock(), Mock(), 0, 20)
+        self.assertIsNone(state['last_seen_vx'])
+    
     @patch('visual_tracking.girar_robot_cap_direccio')
     @patch('visual_tracking.time.time')
     def test_no_gira_quan_mai_s_ha_vist_persona(self, mock_time, mock_girar):
@@ -416,7 +921,7 @@ class TestProcessarIteracioTracking(unittest.TestCase):
         
         mock_vilib = Mock()
         mock_vilib.detect_obj_parameter = {'human_n': 0}
-        detection_history = {'x': [], 'y': []}
+        detection_history = DetectionSmoother()
         state = {
             'centered': False,
             'last_seen_x': None,
@@ -441,7 +946,7 @@ class TestProcessarIteracioTracking(unittest.TestCase):
         
         mock_vilib = Mock()
         mock_vilib.detect_obj_parameter = {'human_n': 0}
-        detection_history = {'x': [], 'y': []}
+        detection_history = DetectionSmoother()
         state = {
             'centered': False,
             'last_seen_x': 100,
@@ -467,7 +972,7 @@ class TestProcessarIteracioTracking(unittest.TestCase):
         
         mock_vilib = Mock()
         mock_vilib.detect_obj_parameter = {'human_n': 0}
-        detection_history = {'x': [], 'y': []}
+        detection_history = DetectionSmoother()
         state = {
             'centered': False,
             'last_seen_x': 100,
@@ -503,7 +1008,7 @@ class TestEstratejiaRecercaFase22(unittest.TestCase):
 
         mock_vilib = Mock()
         mock_vilib.detect_obj_parameter = {'human_n': 0}
-        detection_history = {'x': [], 'y': []}
+        detection_history = DetectionSmoother()
         state = {
             'centered': False,
             'last_seen_x': 100,
@@ -536,7 +1041,7 @@ class TestEstratejiaRecercaFase22(unittest.TestCase):
 
         mock_vilib = Mock()
         mock_vilib.detect_obj_parameter = {'human_n': 0}
-        detection_history = {'x': [], 'y': []}
+        detection_history = DetectionSmoother()
         state = {
             'centered': False,
             'last_seen_x': 100,
@@ -568,7 +1073,7 @@ class TestEstratejiaRecercaFase22(unittest.TestCase):
 
         mock_vilib = Mock()
         mock_vilib.detect_obj_parameter = {'human_n': 0}
-        detection_history = {'x': [], 'y': []}
+        detection_history = DetectionSmoother()
         state = {
             'centered': False,
             'last_seen_x': 100,
@@ -601,7 +1106,7 @@ class TestEstratejiaRecercaFase22(unittest.TestCase):
 
         mock_vilib = Mock()
         mock_vilib.detect_obj_parameter = {'human_n': 0}
-        detection_history = {'x': [], 'y': []}
+        detection_history = DetectionSmoother()
         state = {
             'centered': False,
             'last_seen_x': 100,
@@ -638,7 +1143,7 @@ class TestEstratejiaRecercaFase22(unittest.TestCase):
             'human_x': 320,
             'human_y': 240
         }
-        detection_history = {'x': [], 'y': []}
+        detection_history = DetectionSmoother()
         state = {
             'centered': False,
             'last_seen_x': None,
@@ -0,0 +1,156 @@
+"""
+Tests unitaris per a wake_word.py
+"""
+import unittest
+from unittest.mock import Mock, patch
+import sys
+import os
+
+# Afegir el directori pare al path per poder importar els mòduls
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Altres tests reemplacen utils per un mock: carregar els mòduls reals
+if not isinstance(getattr(sys.modules.get('utils'), '__file__', None), str):
+    sys.modules.pop('utils', None)
+sys.modules.pop('stt_backends', None)
+sys.modules.pop('wake_word', None)
+
+from wake_word import WakeWordGate, find_keyword, normalize_words
+
+
+class FakeStream():
+    """Sessió de gramàtica: reconeix les paraules que se li passen amb la seva confiança."""
+
+    def __init__(self, words):
+        self.words = []
+        self._result = words
+
+    def accept(self, pcm):
+        return ''
+
+    def final(self):
+        self.words = list(self._result)
+        return ' '.join(word for word, _ in self._result)
+
+
+class FakeSpotter():
+    def __init__(self, words=(), vocabulary=('arnau', 'hola', 'robot'), available=True):
+        self.words = words
+        self.vocabulary = vocabulary
+        self.available = available
+        self.grammars = []
+
+    def has_word(self, word):
+        return word in self.vocabulary
+
+    def open_stream(self, sample_rate, grammar=None):
+        self.grammars.append(grammar)
+        return FakeStream(self.words)
+
+
+class FakeClock():
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestFindKeyword(unittest.TestCase):
+    """Tests per a find_keyword() i normalize_words()"""
+
+    def test_normalitza(self):
+        self.assertEqual(normalize_words("Hola, Arnau! L’home"), ['hola', 'arnau', "l'home"])
+
+    def test_frase_clau_seguida_i_amb_confianca(self):
+        keywords = [('hola', 'robot'), ('arnau',)]
+        self.assertEqual(find_keyword([('[unk]', 1.0), ('arnau', 0.9)], keywords, 0.5), 'arnau')
+        self.assertEqual(find_keyword([('hola', 0.8), ('robot', 0.7)], keywords, 0.5), 'hola robot')
+        self.assertIsNone(find_keyword([('hola', 0.8), ('[unk]', 1.0), ('robot', 0.7)], keywords, 0.5))
+        self.assertIsNone(find_keyword([('arnau', 0.3)], keywords, 0.5))
+
+
+@patch('wake_word.gray_print')
+class TestWakeWordGate(unittest.TestCase):
+    """Tests per a WakeWordGate"""
+
+    def _gate(self, spotter, **kwargs):
+        self.clock = FakeClock()
+        return WakeWordGate(spotter, keywords=('arnau', 'hola robot'), clock=self.clock, **kwargs)
+
+    def _phrase(self, gate):
+        session = gate.open(16000)
+        if session is not None:
+            session.feed(b'\x00\x00')
+        return gate.check(session)
+
+    def test_accepta_amb_paraula_clau(self, mock_gray):
+        spotter = FakeSpotter([('arnau', 0.95), ('[unk]', 1.0)])
+        gate = self._gate(spotter)
+        self.assertEqual(self._phrase(gate), (True, 'keyword'))
+        self.assertEqual(spotter.grammars, [['arnau', 'hola robot', '[unk]']])
+        self.assertEqual(gate.stats['accepted'], 1)
+
+    def test_rebutja_sense_paraula_clau(self, mock_gray):
+        gate = self._gate(FakeSpotter([('[unk]', 1.0)]))
+        self.assertEqual(self._phrase(gate), (False, 'rejected'))
+        self.assertEqual(gate.stats['rejected'], 1)
+
+    def test_sensibilitat(self, mock_gray):
+        words = [('arnau', 0.4)]
+        self.assertEqual(self._phrase(self._gate(FakeSpotter(words), sensitivity=0.5))[0], False)
+        self.assertEqual(self._phrase(self._gate(FakeSpotter(words), sensitivity=0.8))[0], True)
+
+    def test_finestra_de_continuacio(self, mock_gray):
+        spotter = FakeSpotter([('arnau', 0.9)])
+        gate = self._gate(spotter, follow_up_s=10.0)
+        self._phrase(gate)
+        gate.turn_done()
+        spotter.words = [('[unk]', 1.0)]
+        self.clock.now += 5
+        self.assertEqual(self._phrase(gate), (True, 'follow_up'))
+        # Dins la finestra ni tan sols s'obre el reconeixedor
+        self.assertEqual(len(spotter.grammars), 1)
+        gate.turn_done()
+        self.clock.now += 11
+        self.assertEqual(self._phrase(gate), (False, 'rejected'))
+        # Una frase rebutjada no obre la finestra
+        gate.turn_done()
+        self.assertFalse(gate.awake)
+
+    def test_sleep_tanca_la_finestra(self, mock_gray):
+        gate = self._gate(FakeSpotter([('arnau', 0.9)]))
+        self._phrase(gate)
+        gate.turn_done()
+        self.assertTrue(gate.awake)
+        gate.sleep()
+        self.assertFalse(gate.awake)
+
+    def test_sense_model_deixa_passar(self, mock_gray):
+        gate = self._gate(FakeSpotter(available=False))
+        self.assertEqual(self._phrase(gate), (True, 'bypassed'))
+        self.assertEqual(gate.stats['bypassed'], 1)
+
+    @patch('wake_word.warn')
+    def test_paraules_fora_del_vocabulari(self, mock_warn, mock_gray):
+        spotter = FakeSpotter([('[unk]', 1.0)], vocabulary=('hola', 'robot'))
+        gate = self._gate(spotter)
+        self.assertEqual(self._phrase(gate), (False, 'rejected'))
+        self.assertEqual(spotter.grammars, [['hola robot', '[unk]']])
+        mock_warn.assert_called_once()
+
+    @patch('wake_word.warn')
+    def test_cap_paraula_utilitzable_deixa_passar(self, mock_warn, mock_gray):
+        gate = self._gate(FakeSpotter(vocabulary=()))
+        self.assertEqual(self._phrase(gate), (True, 'bypassed'))
+
+    @patch('stt_backends.warn')
+    def test_error_del_reconeixedor_deixa_passar(self, mock_warn, mock_gray):
+        spotter = FakeSpotter()
+        spotter.open_stream = Mock(return_value=Mock(accept=Mock(side_effect=RuntimeError('kaldi'))))
+        gate = self._gate(spotter)
+        self.assertEqual(self._phrase(gate), (True, 'bypassed'))
+
+
+if __name__ == '__main__':
+    unittest.main()
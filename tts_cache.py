@@ -0,0 +1,237 @@
+"""
+Memòria cau persistent de TTS adreçada per contingut.
+
+Cada entrada és un WAV ja amb el guany aplicat, llest per reproduir, i es
+desa amb el hash de (text, veu, instruccions, volum, model). Així les frases
+que es repeteixen (salutacions, "no t'he entès", confirmacions d'accions) no
+tornen a passar per l'endpoint de veu. L'índex manté l'ordre LRU i el
+pressupost de bytes i d'entrades, de manera que la targeta SD no s'omple mai.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import wave
+from collections import OrderedDict
+
+from tts_stream import PCM_CHANNELS, PCM_SAMPLE_RATE, PCM_SAMPLE_WIDTH
+from utils import gray_print, warn
+
+
+CACHE_MAX_BYTES = 50 * 1024 * 1024  # 50 MB (~17 minuts d'àudio a 24 kHz)
+CACHE_MAX_ENTRIES = 500
+INDEX_FILE = 'index.json'
+INDEX_SAVE_EVERY_HITS = 20  # desar l'ordre LRU cada N encerts (estalvia escriptures a la SD)
+
+
+def cache_key(text, voice, instructions, volume, model):
+    """Calcula la clau de la memòria cau per a una combinació de paràmetres de TTS."""
+    payload = json.dumps([text, voice, instructions or '', volume, model], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class TtsCache():
+    """
+    Memòria cau LRU de WAV de TTS.
+
+    Args:
+        cache_dir: Directori on es desen els WAV i l'índex
+        max_bytes: Mida màxima total dels fitxers
+        max_entries: Nombre màxim d'entrades
+    """
+
+    def __init__(self, cache_dir, max_bytes=CACHE_MAX_BYTES, max_entries=CACHE_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # clau -> {'text', 'size'}; el final és el més recent
+        self._bytes = 0
+        self._dirty_hits = 0
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        os.makedirs(cache_dir, mode=0o755, exist_ok=True)
+        self._load_index()
+
+    # -- índex -----------------------------------------------------------------
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.wav')
+
+    def _load_index(self):
+        index_path = os.path.join(self.cache_dir, INDEX_FILE)
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = []
+        for item in data:
+            key = item.get('key')
+            path = self._path(key) if key else None
+            if path and os.path.isfile(path):
+                self._entries[key] = {'text': item.get('text', ''), 'size': os.path.getsize(path)}
+                self._bytes += self._entries[key]['size']
+        # Fitxers que no són a l'índex (p. ex. tall de corrent a mig desar): s'esborren
+        for name in os.listdir(self.cache_dir):
+            orphan = name.endswith('.wav') and name[:-4] not in self._entries
+            if orphan or name.endswith('.tmp'):
+                self._remove_file(os.path.join(self.cache_dir, name))
+        self._evict_locked()
+
+    def save(self):
+        """Desa l'índex (ordre LRU) de forma atòmica."""
+        with self._lock:
+            self._save_locked()
+
+    def _save_locked(self):
+        index_path = os.path.join(self.cache_dir, INDEX_FILE)
+        tmp_path = index_path + '.tmp'
+        data = [{'key': key, 'text': entry['text']} for key, entry in self._entries.items()]
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, index_path)
+            self._dirty_hits = 0
+        except OSError as e:
+            warn(f'tts cache: no s\'ha pogut desar l\'índex: {e}')
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict_locked(self):
+        evicted = False
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key, entry = self._entries.popitem(last=False)
+            self._bytes -= entry['size']
+            self._remove_file(self._path(key))
+            self.stats['evictions'] += 1
+            evicted = True
+        return evicted
+
+    # -- API -------------------------------------------------------------------
+
+    def get(self, key):
+        """
+        Retorna la ruta del WAV en memòria cau, o None si no hi és.
+
+        Compta encerts i errades i marca l'entrada com a usada recentment.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            path = self._path(key)
+            if entry is None or not os.path.isfile(path):
+                if entry is not None:
+                    self._bytes -= entry['size']
+                    del self._entries[key]
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            self._dirty_hits += 1
+            if self._dirty_hits >= INDEX_SAVE_EVERY_HITS:
+                self._save_locked()
+            return path
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def _store(self, key, text, write_fn):
+        path = self._path(key)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            write_fn(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            self._remove_file(tmp_path)
+            warn(f'tts cache: no s\'ha pogut desar "{text[:30]}": {e}')
+            return None
+        size = os.path.getsize(path)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old['size']
+            self._entries[key] = {'text': text, 'size': size}
+            self._bytes += size
+            self.stats['stores'] += 1
+            self._evict_locked()
+            self._save_locked()
+            return path if key in self._entries else None
+
+    def put_pcm(self, key, text, pcm):
+        """
+        Desa PCM (16 bits mono a 24 kHz, ja amb guany) com a WAV llest per reproduir.
+
+        Returns:
+            str: Ruta del WAV desat, o None si no s'ha pogut desar
+        """
+        if not pcm:
+            return None
+
+        def write(tmp_path):
+            with wave.open(tmp_path, 'wb') as w:
+                w.setnchannels(PCM_CHANNELS)
+                w.setsampwidth(PCM_SAMPLE_WIDTH)
+                w.setframerate(PCM_SAMPLE_RATE)
+                w.writeframes(pcm)
+        return self._store(key, text, write)
+
+    def put_file(self, key, text, wav_path):
+        """
+        Afegeix un WAV existent (ja amb guany) a la memòria cau.
+
+        Es fa un enllaç dur si és possible per no tornar a escriure l'àudio.
+
+        Returns:
+            str: Ruta del WAV desat, o None si no s'ha pogut desar
+        """
+        def write(tmp_path):
+            try:
+                os.link(wav_path, tmp_path)
+            except OSError:
+                shutil.copyfile(wav_path, tmp_path)
+        return self._store(key, text, write)
+
+    def warm_up(self, phrases, key_fn, render):
+        """
+        Pre-renderitza una llista de frases que encara no són a la memòria cau.
+
+        Args:
+            phrases: Iterable de textos
+            key_fn: Callable(text) que retorna la clau de la frase
+            render: Callable(text) que retorna el PCM (bytes, ja amb guany)
+
+        Returns:
+            int: Nombre de frases renderitzades
+        """
+        rendered = 0
+        st = time.time()
+        for text in phrases:
+            key = key_fn(text)
+            if key in self:
+                continue
+            try:
+                pcm = render(text)
+            except Exception as e:
+                warn(f'tts cache warm-up err ("{text[:30]}"): {e}')
+                continue
+            if self.put_pcm(key, text, pcm):
+                rendered += 1
+        gray_print(f'tts cache: warm-up {rendered} frases en {time.time() - st:.3f} s')
+        return rendered
+
+    def info(self):
+        """Retorna els comptadors i l'ocupació actual."""
+        with self._lock:
+            info = dict(self.stats)
+            info['entries'] = len(self._entries)
+            info['bytes'] = self._bytes
+        lookups = info['hits'] + info['misses']
+        info['hit_rate'] = info['hits'] / lookups if lookups else 0.0
+        return info
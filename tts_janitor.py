@@ -0,0 +1,204 @@
+"""
+Neteja en segon pla del directori tts/.
+
+generate_tts deixa un WAV (o dos, amb el fallback de sox) per torn a tts/ i
+res no els esborrava: un robot engegat tot el dia sota picarx.service
+acumulava milers de fitxers. El TtsJanitor aplica una retenció acotada
+(edat, bytes i nombre de fitxers) des d'un fil de baixa prioritat i no toca
+mai els fitxers que el camí de veu té fixats (en cua o sonant).
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from utils import gray_print, warn
+
+
+JANITOR_MAX_BYTES = 20 * 1024 * 1024  # 20 MB
+JANITOR_MAX_AGE = 24 * 3600  # segons
+JANITOR_MAX_FILES = 200
+JANITOR_INTERVAL = 300  # segons entre escombrades
+JANITOR_GRACE = 120  # segons: un fitxer acabat d'escriure encara no s'ha pogut fixar
+JANITOR_NICE = 10  # valor de nice del fil de neteja (baixa prioritat)
+JANITOR_SUFFIXES = ('.wav',)
+
+
+class TtsJanitor():
+    """
+    Retenció acotada d'un directori de fitxers de TTS.
+
+    Args:
+        directory: Directori a netejar
+        max_bytes: Mida màxima total dels fitxers
+        max_age: Edat màxima d'un fitxer (segons)
+        max_files: Nombre màxim de fitxers
+        interval: Segons entre escombrades del fil de fons
+        grace: Edat mínima (segons) perquè un fitxer es pugui esborrar
+    """
+
+    def __init__(self, directory, max_bytes=JANITOR_MAX_BYTES, max_age=JANITOR_MAX_AGE,
+                 max_files=JANITOR_MAX_FILES, interval=JANITOR_INTERVAL, grace=JANITOR_GRACE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.max_files = max_files
+        self.interval = interval
+        self.grace = grace
+        self._lock = threading.Lock()
+        self._pins = {}  # ruta absoluta -> comptador de referències
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {
+            'sweeps': 0,
+            'files_removed': 0,
+            'bytes_removed': 0,
+            'errors': 0,
+            'last_sweep_s': 0.0,
+        }
+
+    # -- fixació ---------------------------------------------------------------
+
+    def pin(self, path):
+        """Protegeix un fitxer (en cua o sonant) de la neteja."""
+        if not path:
+            return
+        path = os.path.abspath(path)
+        with self._lock:
+            self._pins[path] = self._pins.get(path, 0) + 1
+
+    def unpin(self, path):
+        """Allibera un fitxer fixat amb pin()."""
+        if not path:
+            return
+        path = os.path.abspath(path)
+        with self._lock:
+            count = self._pins.get(path, 0) - 1
+            if count > 0:
+                self._pins[path] = count
+            else:
+                self._pins.pop(path, None)
+
+    @contextmanager
+    def pinned(self, path):
+        """Context manager que manté un fitxer fixat mentre s'utilitza."""
+        self.pin(path)
+        try:
+            yield path
+        finally:
+            self.unpin(path)
+
+    def is_pinned(self, path):
+        with self._lock:
+            return os.path.abspath(path) in self._pins
+
+    # -- neteja ----------------------------------------------------------------
+
+    def _scan(self):
+        files = []
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(JANITOR_SUFFIXES):
+                        continue
+                    try:
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    files.append((st.st_mtime, st.st_size, os.path.abspath(entry.path)))
+        except OSError as e:
+            self.stats['errors'] += 1
+            warn(f'tts janitor: no s\'ha pogut llegir {self.directory}: {e}')
+        files.sort()  # els més antics primer
+        return files
+
+    def sweep(self, now=None):
+        """
+        Fa una escombrada: esborra els fitxers caducats i, si encara se superen
+        els límits de bytes o de fitxers, els més antics.
+
+        Args:
+            now: Temps de referència (per defecte time.time())
+
+        Returns:
+            dict: {'files': fitxers esborrats, 'bytes': bytes alliberats}
+        """
+        st = time.time()
+        now = st if now is None else now
+        files = self._scan()
+        total_bytes = sum(size for _, size, _ in files)
+        total_files = len(files)
+        removed = {'files': 0, 'bytes': 0}
+
+        for mtime, size, path in files:
+            age = now - mtime
+            over_budget = total_bytes > self.max_bytes or total_files > self.max_files
+            if age <= self.max_age and not over_budget:
+                # La llista està ordenada per edat: la resta tampoc s'ha d'esborrar
+                break
+            if age < self.grace or self.is_pinned(path):
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.stats['errors'] += 1
+                warn(f'tts janitor: no s\'ha pogut esborrar {path}: {e}')
+                continue
+            total_bytes -= size
+            total_files -= 1
+            removed['files'] += 1
+            removed['bytes'] += size
+
+        self.stats['sweeps'] += 1
+        self.stats['files_removed'] += removed['files']
+        self.stats['bytes_removed'] += removed['bytes']
+        self.stats['last_sweep_s'] = time.time() - st
+        if removed['files']:
+            gray_print(f"tts janitor: {removed['files']} fitxers, {removed['bytes'] / 1e6:.1f} MB alliberats "
+                       f"en {self.stats['last_sweep_s']:.3f} s")
+        return removed
+
+    # -- fil de fons -----------------------------------------------------------
+
+    def _run(self):
+        # Linux aplica nice per fil: la neteja no competeix amb la veu ni amb la càmera
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), JANITOR_NICE)
+        except (AttributeError, OSError):
+            pass
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                self.stats['errors'] += 1
+                warn(f'tts janitor err: {e}')
+            if self._stop.wait(self.interval):
+                break
+
+    def start(self):
+        """Engega el fil de neteja (la primera escombrada és immediata)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Atura el fil de neteja."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def info(self):
+        """Retorna els comptadors de neteja i el nombre de fitxers fixats."""
+        with self._lock:
+            info = dict(self.stats)
+            info['pinned'] = len(self._pins)
+        return info
@@ -0,0 +1,307 @@
+"""
+Pipeline de TTS per frases.
+
+La resposta es divideix en frases que es sintetitzen en un fil productor i
+s'encuen per fragments en una cua acotada que consumeix el fil de veu
+(speak_hanlder). Així la frase N+1 es sintetitza mentre sona la frase N i les
+respostes llargues comencen a sonar amb la latència de la primera frase.
+
+Garanties:
+- Ordre: un únic productor per torn encua les frases en ordre i el consumidor
+  descarta qualsevol fragment amb un índex de frase anterior al que ja ha sonat.
+- Cancel·lació: cada torn té un identificador; cancel() (o start_turn() d'un
+  torn nou) invalida el torn actual, buida la cua i talla la reproducció.
+"""
+
+import queue
+import re
+import threading
+import time
+from collections import namedtuple
+
+from tts_stream import AudioSink
+from utils import gray_print, warn
+
+
+PIPELINE_QUEUE_SIZE = 32  # fragments (~2,7 s d'àudio amb fragments de 4 KB a 24 kHz)
+QUEUE_POLL_TIMEOUT = 0.1  # segons entre comprovacions de cancel·lació
+SENTENCE_MIN_LENGTH = 20  # caràcters; frases més curtes s'ajunten amb la següent
+
+_SENTENCE_END = re.compile(r'(?<=[.!?…])\s+|\n+')
+
+# Element de la cua: fragment d'àudio d'una frase d'un torn
+SpeechChunk = namedtuple('SpeechChunk', ['turn_id', 'sentence_index', 'data', 'end_of_turn'])
+
+
+def split_sentences(text, min_length=SENTENCE_MIN_LENGTH):
+    """
+    Divideix un text en frases per sintetitzar-les per separat.
+
+    Les frases molt curtes (p. ex. "Hola!") s'ajunten amb la següent per
+    evitar peticions petites i talls de prosòdia.
+
+    Args:
+        text: Text de la resposta
+        min_length: Longitud mínima d'una frase
+
+    Returns:
+        list: Frases en ordre, sense espais sobrers
+    """
+    if not text:
+        return []
+    parts = [p.strip() for p in _SENTENCE_END.split(text) if p and p.strip()]
+    sentences = []
+    pending = ''
+    for part in parts:
+        pending = f'{pending} {part}' if pending else part
+        if len(pending) >= min_length:
+            sentences.append(pending)
+            pending = ''
+    if pending:
+        if sentences and len(pending) < min_length:
+            sentences[-1] = f'{sentences[-1]} {pending}'
+        else:
+            sentences.append(pending)
+    return sentences
+
+
+class SpeechPipeline():
+    """
+    Pipeline productor/consumidor de veu per frases.
+
+    Args:
+        synthesize: Callable(frase) que retorna un iterable de fragments PCM
+        fallback: Callable(frase) alternatiu si synthesize no produeix àudio (opcional)
+        on_turn_done: Callable(turn_id) cridat quan un torn acaba o es cancel·la (opcional)
+        queue_size: Mida màxima de la cua de fragments
+    """
+
+    def __init__(self, synthesize, fallback=None, on_turn_done=None, queue_size=PIPELINE_QUEUE_SIZE):
+        self._synthesize = synthesize
+        self._fallback = fallback
+        self._on_turn_done = on_turn_done
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._done_cond = threading.Condition(self._lock)
+        self._turn_id = 0
+        self._started_turn = None
+        self._turn_started = time.time()
+        self._last_done = 0
+        self._pending = None
+        self._active_sink = None
+        self.stats = {
+            'turns': 0,
+            'sentences': 0,
+            'cancelled': 0,
+            'failed_sentences': 0,
+            'dropped_chunks': 0,
+            'first_sound': None,
+        }
+
+    def current_turn(self):
+        with self._lock:
+            return self._turn_id
+
+    def is_current(self, turn_id):
+        with self._lock:
+            return turn_id == self._turn_id
+
+    @property
+    def playing(self):
+        """Cert mentre un torn sona per l'altaveu."""
+        with self._lock:
+            return self._active_sink is not None
+
+    def start_turn(self, text):
+        """
+        Cancel·la el torn anterior i comença a sintetitzar un text nou.
+
+        Returns:
+            int: Identificador del torn, o None si no hi ha res a dir
+        """
+        sentences = split_sentences(text)
+        self.cancel()
+        if not sentences:
+            return None
+        with self._lock:
+            turn_id = self._turn_id
+            self._started_turn = turn_id
+            self._turn_started = time.time()
+        self.stats['turns'] += 1
+        producer = threading.Thread(target=self._produce, args=(turn_id, sentences))
+        producer.daemon = True
+        producer.start()
+        return turn_id
+
+    def cancel(self):
+        """Invalida el torn actual, buida la cua i talla l'àudio que està sonant."""
+        with self._lock:
+            old_turn = self._turn_id
+            self._turn_id += 1
+            self._pending = None
+            sink = self._active_sink
+            cancelled = old_turn == self._started_turn and old_turn > self._last_done
+        self._drain()
+        if sink is not None:
+            sink.abort()
+        if cancelled:
+            self.stats['cancelled'] += 1
+        self._mark_done(old_turn)
+
+    def wake(self):
+        """Desperta el consumidor bloquejat a play_next_turn() sense encuar àudio."""
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass  # amb la cua plena el consumidor ja té feina
+
+    def _drain(self):
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def _mark_done(self, turn_id):
+        with self._lock:
+            if turn_id <= self._last_done:
+                return
+            self._last_done = turn_id
+            self._done_cond.notify_all()
+        if self._on_turn_done is not None:
+            self._on_turn_done(turn_id)
+
+    def wait_turn(self, turn_id, timeout=None):
+        """
+        Espera que un torn acabi de sonar o es cancel·li.
+
+        Returns:
+            bool: True si el torn ha acabat, False si ha vençut el timeout
+        """
+        with self._lock:
+            return self._done_cond.wait_for(lambda: self._last_done >= turn_id, timeout)
+
+    def _put(self, item):
+        while self.is_current(item.turn_id):
+            try:
+                self._queue.put(item, timeout=QUEUE_POLL_TIMEOUT)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _enqueue_sentence(self, turn_id, index, chunks):
+        """Encua els fragments d'una frase. Retorna (hi_ha_audio, continuar)."""
+        produced = False
+        for data in chunks:
+            if not data:
+                continue
+            if not self._put(SpeechChunk(turn_id, index, data, False)):
+                return produced, False
+            produced = True
+        return produced, True
+
+    def _produce(self, turn_id, sentences):
+        for index, sentence in enumerate(sentences):
+            if not self.is_current(turn_id):
+                return
+            produced = False
+            try:
+                produced, keep_going = self._enqueue_sentence(turn_id, index, self._synthesize(sentence))
+                if not keep_going:
+                    return
+            except Exception as e:
+                warn(f'tts pipeline err (frase {index}): {e}')
+            if not produced and self._fallback is not None:
+                try:
+                    produced, keep_going = self._enqueue_sentence(turn_id, index, self._fallback(sentence))
+                    if not keep_going:
+                        return
+                except Exception as e:
+                    warn(f'tts pipeline fallback err (frase {index}): {e}')
+            self.stats['sentences'] += 1
+            if not produced:
+                self.stats['failed_sentences'] += 1
+        self._put(SpeechChunk(turn_id, len(sentences), b'', True))
+
+    def _next(self, timeout):
+        with self._lock:
+            item, self._pending = self._pending, None
+        if item is not None:
+            return item
+        return self._queue.get(timeout=timeout)
+
+    def play_next_turn(self, sink_factory=AudioSink, timeout=None):
+        """
+        Reprodueix el següent torn de la cua (cridat des del fil de veu).
+
+        Args:
+            sink_factory: Callable que retorna un AudioSink
+            timeout: Segons màxims esperant el primer fragment
+
+        Returns:
+            bool: True si s'ha consumit algun element de la cua
+        """
+        try:
+            item = self._next(timeout)
+        except queue.Empty:
+            return False
+        if item is None:
+            return False
+
+        turn_id = item.turn_id
+        if not self.is_current(turn_id):
+            self.stats['dropped_chunks'] += 1
+            return True
+
+        expected_index = 0
+        first_sound = True
+        try:
+            with sink_factory() as sink:
+                with self._lock:
+                    self._active_sink = sink
+                while item is not None:
+                    if item.turn_id != turn_id:
+                        # Fragment d'un torn nou: es reprodueix a la crida següent
+                        with self._lock:
+                            self._pending = item
+                        break
+                    if item.end_of_turn or not self.is_current(turn_id):
+                        break
+                    if item.sentence_index < expected_index:
+                        self.stats['dropped_chunks'] += 1
+                    else:
+                        expected_index = item.sentence_index
+                        sink.write(item.data)
+                        if first_sound:
+                            first_sound = False
+                            self.stats['first_sound'] = time.time() - self._turn_started
+                    item = self._wait_item(turn_id)
+        except Exception as e:
+            # Una cancel·lació talla l'altaveu a mig write: no és un error
+            if self.is_current(turn_id):
+                warn(f'tts pipeline: error reproduint: {e}')
+        finally:
+            with self._lock:
+                self._active_sink = None
+        self._mark_done(turn_id)
+        return True
+
+    def _wait_item(self, turn_id):
+        """Espera el fragment següent mentre el torn continuï vigent."""
+        while self.is_current(turn_id):
+            try:
+                item = self._next(QUEUE_POLL_TIMEOUT)
+            except queue.Empty:
+                continue
+            if item is not None:
+                return item
+        return None
+
+    def log_stats(self):
+        first_sound = self.stats['first_sound']
+        first_sound = '-' if first_sound is None else f'{first_sound:.3f}'
+        gray_print(
+            f"tts pipeline: {self.stats['sentences']} frases, first sound {first_sound} s, "
+            f"{self.stats['cancelled']} cancel·lats, {self.stats['failed_sentences']} errors"
+        )
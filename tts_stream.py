@@ -0,0 +1,270 @@
+"""
+Reproducció de TTS en streaming.
+
+Els fragments PCM que arriben de l'endpoint de veu d'OpenAI s'ajusten de volum
+en memòria i s'envien directament a l'altaveu a mesura que arriben, de manera
+que el robot comença a parlar amb el primer fragment en lloc d'esperar la
+síntesi completa, el pas per sox i l'escriptura a disc.
+"""
+
+import collections
+import subprocess
+import threading
+import time
+import wave
+
+from utils import gray_print, pcm_volume, warn
+
+
+# Format PCM que retorna OpenAI amb response_format='pcm'
+PCM_SAMPLE_RATE = 24000
+PCM_SAMPLE_WIDTH = 2  # bytes (16 bits)
+PCM_CHANNELS = 1
+
+# Reproductor per defecte: aplay llegeix PCM cru de stdin (a Bookworm passa per PipeWire)
+PLAYER_COMMAND = [
+    'aplay', '-q', '-t', 'raw', '-f', 'S16_LE',
+    '-r', str(PCM_SAMPLE_RATE), '-c', str(PCM_CHANNELS),
+]
+PLAYER_CLOSE_TIMEOUT = 30  # segons màxims esperant que el reproductor buidi el buffer
+PLAYBACK_METER_WINDOW_S = 2.0  # el reproductor pot tenir ~1 s d'àudio al buffer de la pipe
+
+
+class PlaybackMeter():
+    """
+    Nivell recent de l'àudio enviat a l'altaveu.
+
+    És la referència d'eco del barge-in (vad.BargeInDetector): el que
+    s'escriu ara pot sonar fins a un segon més tard, de manera que es pren el
+    màxim de la finestra.
+    """
+
+    def __init__(self, window_s=PLAYBACK_METER_WINDOW_S):
+        self.window_s = window_s
+        self._levels = collections.deque()  # (instant, RMS)
+        self._lock = threading.Lock()
+
+    def update(self, data, now=None):
+        import numpy as np
+
+        samples = np.frombuffer(data, dtype='<i2', count=len(data) // PCM_SAMPLE_WIDTH)
+        if samples.size == 0:
+            return
+        level = float(np.sqrt(np.mean(np.square(samples, dtype=np.float64))))
+        now = time.time() if now is None else now
+        with self._lock:
+            self._levels.append((now, level))
+            self._prune(now)
+
+    def _prune(self, now):
+        while self._levels and self._levels[0][0] < now - self.window_s:
+            self._levels.popleft()
+
+    def level(self, now=None):
+        """RMS màxim reproduït dins la finestra (0 si l'altaveu calla)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._prune(now)
+            return max((level for _, level in self._levels), default=0.0)
+
+
+# Tots els AudioSink hi anoten el que reprodueixen
+playback_meter = PlaybackMeter()
+
+
+class AudioSink():
+    """
+    Sortida d'àudio que reprodueix PCM cru a través d'un procés reproductor.
+
+    S'utilitza com a context manager: en sortir tanca stdin i espera que el
+    reproductor acabi de sonar el que té al buffer.
+    """
+
+    def __init__(self, command=None, meter=None):
+        self.command = list(command) if command is not None else list(PLAYER_COMMAND)
+        self.meter = meter if meter is not None else playback_meter
+        self._proc = None
+
+    def open(self):
+        self._proc = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        return self
+
+    def write(self, data):
+        if self._proc is None:
+            raise RuntimeError("AudioSink no està obert")
+        self._proc.stdin.write(data)
+        self.meter.update(data)
+
+    def close(self):
+        """Tanca l'entrada i espera que acabi la reproducció."""
+        if self._proc is None:
+            return
+        try:
+            self._proc.stdin.close()
+            self._proc.wait(timeout=PLAYER_CLOSE_TIMEOUT)
+        except Exception:
+            self.abort()
+        finally:
+            self._proc = None
+
+    def abort(self):
+        """Atura la reproducció immediatament."""
+        if self._proc is None:
+            return
+        try:
+            self._proc.kill()
+        except Exception:
+            pass
+        self._proc = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def new_timings():
+    """
+    Crea el diccionari de temps per etapa d'una reproducció en streaming.
+
+    Claus (segons, relatius a l'inici de la petició excepte les acumulades):
+        first_chunk: arribada del primer fragment de la xarxa
+        first_sound: primer fragment lliurat a l'altaveu (time-to-first-sound)
+        gain: temps acumulat aplicant el guany
+        sink_write: temps acumulat escrivint a l'altaveu
+        drain: espera final fins que el reproductor acaba
+        total: durada total
+    """
+    return {
+        'first_chunk': None,
+        'first_sound': None,
+        'gain': 0.0,
+        'sink_write': 0.0,
+        'drain': 0.0,
+        'total': None,
+        'bytes': 0,
+        'audio_started': False,
+        'error': None,
+    }
+
+
+def iter_pcm_gain(chunks, volume, timings=None, start=None):
+    """
+    Aplica guany a una seqüència de fragments PCM 16 bits conservant l'alineació de mostres.
+
+    Els fragments de xarxa poden tallar una mostra per la meitat: el byte sobrant
+    es guarda i s'afegeix al fragment següent.
+
+    Args:
+        chunks: Iterable de bytes PCM
+        volume: Volum amb la mateixa semàntica que sox_volume
+        timings: Diccionari de new_timings() a actualitzar (opcional)
+        start: Instant d'inici per calcular timings['first_chunk']
+
+    Yields:
+        bytes: Fragments amb el guany aplicat i longitud parella
+    """
+    carry = b''
+    for chunk in chunks:
+        if timings is not None and start is not None and timings['first_chunk'] is None:
+            timings['first_chunk'] = time.time() - start
+        data = carry + chunk
+        usable = len(data) - (len(data) % PCM_SAMPLE_WIDTH)
+        data, carry = data[:usable], data[usable:]
+        if not data:
+            continue
+        t0 = time.time()
+        data = pcm_volume(data, volume)
+        if timings is not None:
+            timings['gain'] += time.time() - t0
+        yield data
+
+
+def wav_pcm_chunks(path, chunk_size=4096):
+    """
+    Llegeix un fitxer WAV i en retorna les mostres PCM per fragments.
+
+    Yields:
+        bytes: Fragments de frames PCM
+    """
+    with wave.open(path, 'rb') as wav:
+        frame_size = wav.getsampwidth() * wav.getnchannels()
+        frames_per_chunk = max(1, chunk_size // frame_size)
+        while True:
+            data = wav.readframes(frames_per_chunk)
+            if not data:
+                break
+            yield data
+
+
+def stream_tts(text, openai_helper_obj, voice, volume, instructions='', sink_factory=AudioSink):
+    """
+    Sintetitza i reprodueix text en streaming.
+
+    Args:
+        text: Text a dir
+        openai_helper_obj: Instància d'OpenAiHelper (ha de tenir text_to_speech_stream)
+        voice: Veu de TTS
+        volume: Volum amb la mateixa semàntica que sox_volume
+        instructions: Instruccions de veu
+        sink_factory: Callable que retorna un AudioSink (injectable per a tests)
+
+    Returns:
+        tuple: (ok, timings). Si ok és False i timings['audio_started'] és False,
+        no ha sonat res i el cridador pot fer fallback al camí per fitxer.
+    """
+    timings = new_timings()
+    st = time.time()
+    try:
+        chunks = openai_helper_obj.text_to_speech_stream(
+            text, voice, response_format='pcm', instructions=instructions
+        )
+        with sink_factory() as sink:
+            for data in iter_pcm_gain(chunks, volume, timings, st):
+                t1 = time.time()
+                sink.write(data)
+                t2 = time.time()
+
+                timings['sink_write'] += t2 - t1
+                timings['bytes'] += len(data)
+                if not timings['audio_started']:
+                    timings['audio_started'] = True
+                    timings['first_sound'] = t2 - st
+
+            t_drain = time.time()
+        timings['drain'] = time.time() - t_drain
+        timings['total'] = time.time() - st
+        return True, timings
+    except Exception as e:
+        timings['error'] = str(e)
+        timings['total'] = time.time() - st
+        warn(f'tts stream err: {e}')
+        return False, timings
+
+
+def format_timings(timings):
+    """Retorna un resum llegible dels temps per etapa."""
+    def _fmt(value):
+        return '-' if value is None else f'{value:.3f}'
+    return (
+        f"first chunk {_fmt(timings.get('first_chunk'))} s, "
+        f"first sound {_fmt(timings.get('first_sound'))} s, "
+        f"gain {_fmt(timings.get('gain'))} s, "
+        f"write {_fmt(timings.get('sink_write'))} s, "
+        f"drain {_fmt(timings.get('drain'))} s, "
+        f"total {_fmt(timings.get('total'))} s"
+    )
+
+
+def log_timings(timings):
+    gray_print(f'tts stream: {format_timings(timings)}')
@@ -1,5 +1,6 @@
 import os
 import sys
+import time
 
 GRAY = '1;30'
 RED = '0;31'
@@ -67,6 +68,208 @@ def sox_volume(input_file, output_file, volume):
         return False
 
 
+def volume_gain(volume, gain_type='amplitude'):
+    """
+    Converteix un valor de volum al factor lineal d'amplitud equivalent.
+
+    Segueix la semàntica de sox.Transformer.vol (la que fa servir sox_volume):
+    per defecte el valor és un factor d'amplitud; 'db' i 'power' també s'accepten.
+
+    :param volume: valor de volum
+    :param gain_type: 'amplitude', 'db' o 'power'
+    :return: factor multiplicatiu d'amplitud
+    :rtype: float
+    """
+    if gain_type == 'amplitude':
+        return float(volume)
+    if gain_type == 'db':
+        return 10 ** (float(volume) / 20)
+    if gain_type == 'power':
+        return float(volume) ** 0.5
+    raise ValueError(f"gain_type desconegut: {gain_type}")
+
+
+def pcm_volume(data, volume, gain_type='amplitude'):
+    """
+    Aplica guany a un buffer PCM 16 bits (little endian) en memòria, amb saturació.
+
+    :param data: bytes PCM amb un nombre parell de bytes
+    :param volume: volum amb la mateixa semàntica que sox_volume
+    :param gain_type: 'amplitude', 'db' o 'power'
+    :return: bytes PCM amb el guany aplicat
+    :rtype: bytes
+    """
+    import numpy as np
+
+    gain = volume_gain(volume, gain_type)
+    if gain == 1 or not data:
+        return bytes(data)
+    samples = np.frombuffer(data, dtype='<i2').astype(np.float32)
+    _apply_gain(samples, gain)
+    return samples.astype('<i2').tobytes()
+
+
+def _apply_gain(samples, gain):
+    """Multiplica i satura (in place) un array float32 de mostres 16 bits."""
+    import numpy as np
+
+    samples *= gain
+    np.rint(samples, out=samples)
+    np.clip(samples, -32768, 32767, out=samples)
+
+
+WAV_GAIN_BLOCK_SAMPLES = 1 << 16  # mostres processades per bloc (acota la memòria)
+
+
+def wav_data_chunk(path):
+    """
+    Localitza les mostres PCM d'un fitxer WAV.
+
+    Tolera les capçaleres dels WAV generats en streaming, on la mida del chunk
+    'data' és desconeguda (0xFFFFFFFF) o més gran que el fitxer.
+
+    :param path: ruta del fitxer WAV
+    :return: (offset, mida_en_bytes, sample_width, channels, framerate)
+    :rtype: tuple
+    """
+    import struct
+
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        riff, _, wave_id = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave_id != b'WAVE':
+            raise ValueError(f"{path} no és un fitxer WAV")
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"{path} no té chunk 'data'")
+            chunk_id, chunk_size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                fmt = struct.unpack('<HHIIHH', f.read(16))
+                f.seek(chunk_size - 16 + (chunk_size % 2), 1)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise ValueError(f"{path} no té chunk 'fmt '")
+                offset = f.tell()
+                size = min(chunk_size, file_size - offset)
+                audio_format, channels, framerate, _, _, bits = fmt
+                if audio_format != 1:
+                    raise ValueError(f"{path} no és PCM (format {audio_format})")
+                return offset, size, bits // 8, channels, framerate
+            else:
+                f.seek(chunk_size + (chunk_size % 2), 1)
+
+
+def _fix_wav_sizes(path, data_offset, data_size):
+    """Reescriu les mides RIFF i 'data' de la capçalera (els WAV en streaming no les porten)."""
+    import struct
+
+    with open(path, 'r+b') as f:
+        f.seek(4)
+        f.write(struct.pack('<I', data_offset + data_size - 8))
+        f.seek(data_offset - 4)
+        f.write(struct.pack('<I', data_size))
+
+
+def wav_volume(input_file, output_file, volume, gain_type='amplitude'):
+    """
+    Aplica guany a un WAV PCM 16 bits dins del procés (sense sox ni subprocessos).
+
+    Les mostres es llegeixen amb un memory-map i es processen per blocs amb
+    NumPy. Si input_file i output_file són el mateix fitxer, el guany s'aplica
+    in situ i no es fa cap escriptura addicional a disc.
+
+    :param input_file: WAV d'entrada
+    :param output_file: WAV de sortida (pot ser el mateix que l'entrada)
+    :param volume: volum amb la mateixa semàntica que sox_volume
+    :param gain_type: 'amplitude', 'db' o 'power'
+    :return: True si s'ha aplicat correctament, False altrament
+    :rtype: bool
+    """
+    import numpy as np
+    import wave
+
+    try:
+        offset, size, sample_width, channels, framerate = wav_data_chunk(input_file)
+        if sample_width != 2:
+            raise ValueError(f"només es suporta PCM 16 bits (sample width {sample_width})")
+        gain = volume_gain(volume, gain_type)
+        n_samples = size // 2
+        in_place = os.path.abspath(input_file) == os.path.abspath(output_file)
+
+        if n_samples == 0:
+            src = np.zeros(0, dtype='<i2')
+        else:
+            mode = 'r+' if in_place else 'r'
+            src = np.memmap(input_file, dtype='<i2', mode=mode, offset=offset, shape=(n_samples,))
+
+        if in_place:
+            for start in range(0, n_samples, WAV_GAIN_BLOCK_SAMPLES):
+                block = src[start:start + WAV_GAIN_BLOCK_SAMPLES].astype(np.float32)
+                _apply_gain(block, gain)
+                src[start:start + WAV_GAIN_BLOCK_SAMPLES] = block
+            if n_samples:
+                src.flush()
+            _fix_wav_sizes(input_file, offset, n_samples * 2)
+        else:
+            with wave.open(output_file, 'wb') as out:
+                out.setnchannels(channels)
+                out.setsampwidth(sample_width)
+                out.setframerate(framerate)
+                for start in range(0, n_samples, WAV_GAIN_BLOCK_SAMPLES):
+                    block = src[start:start + WAV_GAIN_BLOCK_SAMPLES].astype(np.float32)
+                    _apply_gain(block, gain)
+                    out.writeframes(block.astype('<i2').tobytes())
+        del src
+        return True
+    except Exception as e:
+        print(f"wav_volume err: {e}")
+        return False
+
+
+WAIT_POLL_INTERVAL = 0.01  # segons; només per a locks que no són threading.Condition
+
+def notify_waiters(lock):
+    """
+    Desperta els fils que esperen un canvi d'estat protegit per `lock`.
+
+    S'ha de cridar amb el lock adquirit, just després d'escriure l'estat.
+    Si `lock` és un Lock normal (sense Condition) no fa res.
+    """
+    notify_all = getattr(lock, 'notify_all', None)
+    if notify_all is not None:
+        notify_all()
+
+def wait_until(lock, predicate, timeout=None):
+    """
+    Espera que `predicate()` sigui cert, avaluat amb `lock` adquirit.
+
+    Amb una threading.Condition el fil dorm fins que un escriptor crida
+    notify_waiters() (sense consum de CPU ni latència de polling). Amb un
+    Lock normal es manté el polling de WAIT_POLL_INTERVAL.
+
+    Args:
+        lock: threading.Condition (recomanat) o threading.Lock
+        predicate: Callable sense arguments
+        timeout: Segons màxims d'espera (None = indefinit)
+
+    Returns:
+        bool: Valor final de predicate() (False si ha vençut el timeout)
+    """
+    if hasattr(lock, 'wait_for'):
+        with lock:
+            return lock.wait_for(predicate, timeout)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        with lock:
+            if predicate():
+                return True
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+        time.sleep(WAIT_POLL_INTERVAL)
+
+
 speak_first = False
 
 def speak_block(music, name, volume=100):
@@ -0,0 +1,307 @@
+"""
+Detecció local d'activitat de veu (VAD) per tancar les frases de l'usuari.
+
+recognizer.listen decideix el final de la frase per energia de fragments
+sencers (4096 mostres, ~93 ms) i espera pause_threshold (0,8 s) de silenci,
+amb un llindar que dynamic_energy_ratio = 1,6 fa oscil·lar: sovint la cua de
+silenci és molt més llarga. El VoiceActivityDetector treballa per trames de
+30 ms amb NumPy sobre el micròfon persistent:
+
+- un anell de trames guarda l'àudio d'abans que es detecti la veu (pre-roll),
+  perquè no es perdi l'inici de la primera paraula;
+- la frase comença amb unes quantes trames de veu seguides (descarta clics);
+- acaba quan hi ha VAD_HANGOVER_S de silenci, o només VAD_FAST_HANGOVER_S si
+  el silenci és clarament per sota del llindar (camí ràpid);
+- les frases massa curtes (cops, sorolls) es descarten i es continua escoltant.
+
+El BargeInDetector vigila el micròfon mentre el robot parla o actua per
+detectar que l'usuari l'interromp, tenint en compte l'eco de la seva pròpia veu.
+"""
+
+import collections
+
+
+VAD_FRAME_S = 0.03  # durada d'una trama
+VAD_START_S = 0.09  # veu seguida necessària per començar una frase
+VAD_PRE_ROLL_S = 0.3  # àudio d'abans de l'inici que s'afegeix a la frase
+VAD_HANGOVER_S = 0.5  # silenci que tanca la frase
+VAD_FAST_HANGOVER_S = 0.25  # silenci clar que tanca la frase (camí ràpid)
+VAD_CLEAR_SILENCE_RATIO = 0.5  # energia < llindar * això = silenci clar
+VAD_MIN_PHRASE_S = 0.2  # veu mínima perquè una frase compti
+VAD_MAX_PHRASE_S = 15.0  # límit de durada d'una frase
+BARGE_IN_MIN_SPEECH_S = 0.3  # veu de l'usuari necessària per interrompre el robot
+BARGE_IN_WINDOW_S = 0.6  # dins d'aquesta finestra (les síl·labes deixen pauses curtes)
+BARGE_IN_MODULATION = 2.0  # variació d'energia (max/min) de les trames de veu, típica de les síl·labes
+BARGE_IN_ECHO_MARGIN = 1.0  # la veu ha de superar en aquest factor l'eco esperat del robot
+BARGE_IN_ECHO_S = 10.0  # historial de veu del robot per aprendre l'eco
+BARGE_IN_ECHO_PERCENTILE = 70  # percentil de l'eco relatiu que es pren com a eco esperat
+BARGE_IN_ECHO_MIN_S = 1.0  # veu del robot necessària abans de fer servir l'eco après
+BARGE_IN_INITIAL_ECHO_GAIN = 2.0  # eco relatiu abans d'aprendre'l (prudent: pics de l'eco a prop de l'altaveu)
+BARGE_IN_MIN_REFERENCE = 50.0  # per sota d'aquest nivell de reproducció no s'aprèn l'eco
+BARGE_IN_FLOOR_MARGIN = 2.0  # i el soroll dels motors i servos mentre actua
+BARGE_IN_FLOOR_S = 2.0  # historial d'energia per estimar el soroll de fons
+BARGE_IN_FLOOR_PERCENTILE = 20  # percentil de l'historial que es pren com a soroll (les pauses entre síl·labes)
+
+
+def frame_energies(samples, frame_samples):
+    """
+    Energia RMS de cada trama completa d'un array de mostres.
+
+    Returns:
+        numpy.ndarray: Una energia per trama (les mostres sobrants no compten)
+    """
+    import numpy as np
+
+    n_frames = len(samples) // frame_samples
+    if n_frames == 0:
+        return np.zeros(0)
+    frames = samples[:n_frames * frame_samples].astype(np.float64).reshape(n_frames, frame_samples)
+    return np.sqrt(np.mean(np.square(frames), axis=1))
+
+
+class VoiceActivityDetector():
+    """
+    Segmentador d'una frase a partir de fragments PCM de 16 bits.
+
+    Args:
+        sample_rate: Freqüència de mostreig
+        threshold: Callable() -> llindar d'energia actual (p. ex. recognizer.energy_threshold)
+        frame_s, start_s, pre_roll_s, hangover_s, fast_hangover_s, clear_silence_ratio,
+        min_phrase_s, max_phrase_s: Vegeu les constants VAD_*
+    """
+
+    def __init__(self, sample_rate, threshold, frame_s=VAD_FRAME_S, start_s=VAD_START_S,
+                 pre_roll_s=VAD_PRE_ROLL_S, hangover_s=VAD_HANGOVER_S,
+                 fast_hangover_s=VAD_FAST_HANGOVER_S, clear_silence_ratio=VAD_CLEAR_SILENCE_RATIO,
+                 min_phrase_s=VAD_MIN_PHRASE_S, max_phrase_s=VAD_MAX_PHRASE_S):
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.frame_samples = max(1, int(sample_rate * frame_s))
+        self.frame_s = self.frame_samples / sample_rate
+        self.clear_silence_ratio = clear_silence_ratio
+        self._start_frames = self._frames(start_s)
+        self._pre_roll_frames = self._frames(pre_roll_s, minimum=0)
+        self._hangover_frames = self._frames(hangover_s)
+        self._fast_hangover_frames = min(self._frames(fast_hangover_s), self._hangover_frames)
+        self._min_speech_frames = self._frames(min_phrase_s)
+        self._max_frames = self._frames(max_phrase_s)
+        self._leftover = b''
+        self._ring = collections.deque(maxlen=self._pre_roll_frames + self._start_frames)
+        self.stats = {'discarded': 0, 'fast_end': False}
+        self.reset()
+
+    def _frames(self, seconds, minimum=1):
+        return max(minimum, int(round(seconds / self.frame_s)))
+
+    def reset(self):
+        """Torna a esperar l'inici d'una frase."""
+        self._ring.clear()
+        self._run = 0  # trames de veu seguides abans de començar
+        self._phrase = []
+        self._speech_frames = 0
+        self._silence = 0  # trames de silenci al final de la frase
+        self._clear_silence = 0  # d'aquestes, les de silenci clar seguides
+        self.speaking = False
+        self.done = False
+        self.stats['fast_end'] = False
+
+    @property
+    def audio(self):
+        """Àudio de la frase (pre-roll + veu + silenci final)."""
+        return b''.join(self._phrase)
+
+    def phrase_audio(self, start):
+        """
+        Àudio de la frase a partir de la trama start (per alimentar-la a trossos).
+
+        Returns:
+            tuple: (bytes, nombre de trames de la frase fins ara)
+        """
+        return b''.join(self._phrase[start:]), len(self._phrase)
+
+    @property
+    def speech_s(self):
+        return self._speech_frames * self.frame_s
+
+    @property
+    def trailing_silence_s(self):
+        """Silenci al final de la frase que s'ha esperat abans de tancar-la."""
+        return self._silence * self.frame_s
+
+    def feed(self, buffer):
+        """
+        Processa un fragment del micròfon.
+
+        Returns:
+            list: Energies de les trames d'aquest fragment que no formen part de
+                  cap frase (soroll de fons, útil per calibrar)
+
+        Quan la frase s'ha acabat, self.done passa a ser cert.
+        """
+        import numpy as np
+
+        data = self._leftover + buffer
+        frame_bytes = self.frame_samples * 2
+        n_frames = len(data) // frame_bytes
+        self._leftover = data[n_frames * frame_bytes:]
+        if n_frames == 0 or self.done:
+            return []
+        samples = np.frombuffer(data, dtype='<i2', count=n_frames * self.frame_samples)
+        energies = frame_energies(samples, self.frame_samples)
+        threshold = self.threshold()
+        noise = []
+        for i, energy in enumerate(energies):
+            frame = data[i * frame_bytes:(i + 1) * frame_bytes]
+            is_speech = energy > threshold
+            if not self.speaking:
+                self._wait_frame(frame, is_speech)
+                if not self.speaking and not is_speech:
+                    noise.append(float(energy))
+            else:
+                self._speech_frame(frame, is_speech, energy < threshold * self.clear_silence_ratio)
+            if self.done:
+                break
+        return noise
+
+    def _wait_frame(self, frame, is_speech):
+        self._ring.append(frame)
+        self._run = self._run + 1 if is_speech else 0
+        if self._run >= self._start_frames:
+            self.speaking = True
+            self._phrase = list(self._ring)
+            self._speech_frames = self._run
+            self._ring.clear()
+
+    def _speech_frame(self, frame, is_speech, is_clear_silence):
+        self._phrase.append(frame)
+        if is_speech:
+            self._speech_frames += 1
+            self._silence = 0
+            self._clear_silence = 0
+        else:
+            self._silence += 1
+            self._clear_silence = self._clear_silence + 1 if is_clear_silence else 0
+
+        fast_end = self._clear_silence >= self._fast_hangover_frames and self._clear_silence == self._silence
+        if self._silence >= self._hangover_frames or fast_end:
+            if self._speech_frames < self._min_speech_frames:
+                # Un cop o un clic: no és una frase
+                self.stats['discarded'] += 1
+                self.reset()
+                return
+            self.stats['fast_end'] = fast_end and self._silence < self._hangover_frames
+            self.done = True
+        elif len(self._phrase) >= self._max_frames:
+            self.done = True
+
+
+class BargeInDetector():
+    """
+    Detecta que l'usuari comença a parlar mentre el robot parla o actua.
+
+    El micròfon sent també la veu del robot (eco) i els motors. Sense
+    cancel·lació d'eco, la trama compta com a veu de l'usuari només si supera:
+
+    - el llindar d'energia calibrat;
+    - BARGE_IN_ECHO_MARGIN vegades l'eco esperat, echo_gain * reference(), on
+      reference() és el nivell de l'àudio que s'està reproduint i echo_gain el
+      percentil BARGE_IN_ECHO_PERCENTILE de l'energia relativa al micròfon
+      durant els últims BARGE_IN_ECHO_S segons de veu del robot (una
+      interrupció curta de l'usuari no el mou);
+    - BARGE_IN_FLOOR_MARGIN vegades el soroll de fons (motors, servos): el
+      percentil BARGE_IN_FLOOR_PERCENTILE de l'energia dels últims
+      BARGE_IN_FLOOR_S segons, que cau a les pauses encara que algú parli.
+
+    Interromp quan hi ha BARGE_IN_MIN_SPEECH_S segons de veu dins dels últims
+    BARGE_IN_WINDOW_S segons i la seva energia varia com la d'unes
+    síl·labes (BARGE_IN_MODULATION), cosa que no fa un soroll estacionari.
+
+    Args:
+        sample_rate: Freqüència de mostreig
+        threshold: Callable() -> llindar d'energia actual
+        reference: Callable() -> nivell RMS de l'àudio reproduït (None = sense eco)
+        frame_s, min_speech_s, window_s, modulation, echo_margin, echo_s,
+        initial_echo_gain, floor_margin, floor_s: Vegeu les constants VAD_* i BARGE_IN_*
+    """
+
+    def __init__(self, sample_rate, threshold, reference=None, frame_s=VAD_FRAME_S,
+                 min_speech_s=BARGE_IN_MIN_SPEECH_S, window_s=BARGE_IN_WINDOW_S,
+                 modulation=BARGE_IN_MODULATION, echo_margin=BARGE_IN_ECHO_MARGIN,
+                 echo_s=BARGE_IN_ECHO_S, initial_echo_gain=BARGE_IN_INITIAL_ECHO_GAIN,
+                 floor_margin=BARGE_IN_FLOOR_MARGIN, floor_s=BARGE_IN_FLOOR_S):
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.reference = reference
+        self.frame_samples = max(1, int(sample_rate * frame_s))
+        self.frame_s = self.frame_samples / sample_rate
+        self.modulation = modulation
+        self.echo_margin = echo_margin
+        self.floor_margin = floor_margin
+        self._min_speech_frames = max(1, int(round(min_speech_s / self.frame_s)))
+        self._window = collections.deque(maxlen=max(self._min_speech_frames, int(round(window_s / self.frame_s))))
+        self._leftover = b''
+        # Es conserva entre torns: depèn de l'altaveu i del volum, no de l'activitat
+        self._echo = collections.deque(maxlen=max(1, int(round(echo_s / self.frame_s))))
+        self._echo_min_frames = min(self._echo.maxlen, int(round(BARGE_IN_ECHO_MIN_S / self.frame_s)))
+        self._floor = collections.deque(maxlen=max(1, int(round(floor_s / self.frame_s))))
+        self.echo_gain = initial_echo_gain
+        self.floor = None
+        self.stats = {'triggers': 0}
+
+    def reset(self):
+        """Oblida la finestra de veu i el soroll de fons (el robot ha canviat d'activitat)."""
+        self._window.clear()
+        self._floor.clear()
+        self._leftover = b''
+        self.floor = None
+
+    def limit(self, reference_level):
+        """Energia que ha de superar una trama per comptar com a veu de l'usuari."""
+        limit = self.threshold()
+        if reference_level > 0:
+            limit = max(limit, self.echo_gain * reference_level * self.echo_margin)
+        if self.floor is not None:
+            limit = max(limit, self.floor * self.floor_margin)
+        return limit
+
+    def feed(self, buffer):
+        """
+        Processa un fragment del micròfon.
+
+        Returns:
+            bool: True si l'usuari ha començat a parlar (la finestra es buida)
+        """
+        import numpy as np
+
+        data = self._leftover + buffer
+        frame_bytes = self.frame_samples * 2
+        n_frames = len(data) // frame_bytes
+        self._leftover = data[n_frames * frame_bytes:]
+        if n_frames == 0:
+            return False
+        samples = np.frombuffer(data, dtype='<i2', count=n_frames * self.frame_samples)
+        reference_level = self.reference() if self.reference is not None else 0.0
+        limit = self.limit(reference_level)
+        for energy in frame_energies(samples, self.frame_samples):
+            energy = float(energy)
+            self._window.append(energy if energy > limit else None)
+            # Totes les trames: els motors poden superar el llindar calibrat amb el robot quiet
+            self._floor.append(energy)
+            if reference_level >= BARGE_IN_MIN_REFERENCE:
+                self._echo.append(energy / reference_level)
+            if self._is_talking():
+                self.stats['triggers'] += 1
+                self._window.clear()
+                return True
+        # Les estimacions s'actualitzen un cop per fragment: el percentil és el més car
+        self.floor = float(np.percentile(self._floor, BARGE_IN_FLOOR_PERCENTILE))
+        if len(self._echo) >= self._echo_min_frames:
+            self.echo_gain = float(np.percentile(self._echo, BARGE_IN_ECHO_PERCENTILE))
+        return False
+
+    def _is_talking(self):
+        speech = [energy for energy in self._window if energy is not None]
+        if len(speech) < self._min_speech_frames:
+            return False
+        # La veu puja i baixa amb les síl·labes; un soroll estacionari (un motor que arrenca) no
+        return max(speech) >= self.modulation * min(speech)
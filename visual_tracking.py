@@ -1,13 +1,22 @@
 """
 Mòdul de seguiment visual per al picar-x
-Implementa seguiment visual pur amb càmera (pan/tilt) amb filtre de suavització,
-detecció de persona centrada (FASE 1), moviment reactiu quan surt del camp de
-visió (FASE 2.1) i estratègia de recerca (FASE 2.2).
+Implementa seguiment visual pur amb càmera (pan/tilt) amb filtre de suavització
+o estimador de posició i velocitat (alpha-beta / Kalman) que anticipa on serà la
+persona, control dels servos amb PID o pas fix, bucle sincronitzat amb les
+deteccions noves, seguiment d'una sola persona entre diverses (person_tracker),
+detector propi amb cerca per regions (person_detector), detecció de persona
+centrada (FASE 1), moviment reactiu quan surt del camp de visió (FASE 2.1) i
+estratègia de recerca (FASE 2.2).
 """
 
+import collections
 import time
 import threading
 
+from person_detector import PersonDetector
+from person_tracker import PersonTracker, boxes_from_detection
+from servo_output import PRIORITY_TRACKING, ServoOutput
+
 
 # Constants de configuració
 CAMERA_WIDTH = 640
@@ -23,14 +32,43 @@ CAMERA_PAN_MAX_ANGLE = 35   # Angle màxim de pan de la càmera
 CAMERA_TILT_MIN_ANGLE = -35  # Angle mínim de tilt de la càmera
 CAMERA_TILT_MAX_ANGLE = 35   # Angle màxim de tilt de la càmera
 
+# Control dels servos de la càmera (vegeu crear_controlador_camera)
+TRACKING_CONTROLLER = 'pid'  # 'pid' o 'step' (pas fix de MAX_ANGLE_CHANGE_PER_ITERATION)
+CAMERA_FOV_H = 53.5  # Camp de visió horitzontal de la càmera (graus, OV5647)
+CAMERA_FOV_V = 41.4  # Camp de visió vertical de la càmera (graus, OV5647)
+PID_KP = 5.0  # Guany proporcional (graus/s per grau d'error)
+PID_KI = 3.0  # Guany integral (graus/s per grau·s d'error): corregeix el retard amb la persona en moviment
+PID_KD = 0.2  # Guany derivatiu (graus per grau/s d'error)
+PID_DEADBAND_PX = 12  # Píxels del centre dins dels quals el servo no es mou (evita tremolor)
+PID_MAX_RATE = 100.0  # Graus per segon màxims de cada servo
+PID_INTEGRAL_LIMIT = 10.0  # Límit de la integral de l'error (grau·s), anti-windup
+PID_MAX_DT = 0.25  # Segons màxims entre actualitzacions que es tenen en compte (després d'una pausa)
+
+TRACKING_MULTI_PERSON = True  # Pistes per persona: la càmera no salta d'una persona a una altra
+TRACKING_OWN_DETECTOR = True  # Detector propi (person_detector) en lloc del de Vilib a cada fotograma
+
 # Pesos per mitjana ponderada (més pes a deteccions recents)
 SMOOTHING_WEIGHTS = [0.1, 0.15, 0.2, 0.25, 0.3]
 
+# Estimador de la posició de la persona (vegeu crear_estimador_posicio)
+TRACKING_ESTIMATOR = 'kalman'  # 'smoothing' (mitjana ponderada), 'alpha_beta' o 'kalman'
+TRACKING_LATENCY_S = 0.1  # Segons estimats entre la captura del frame i la detecció que en surt
+ALPHA_BETA_ALPHA = 0.5  # Correcció de la posició per detecció (0-1)
+ALPHA_BETA_BETA = 0.1  # Correcció de la velocitat per detecció (0-1)
+KALMAN_PROCESS_NOISE = 20000.0  # Densitat d'acceleració aleatòria (px²/s³): més alt, reacciona abans
+KALMAN_MEASUREMENT_NOISE = 10.0  # Desviació de la posició detectada (px)
+KALMAN_INITIAL_SPEED = 300.0  # Desviació inicial de la velocitat (px/s)
+
 # Constants de temps
 VILIB_INIT_DELAY = 1.0  # Segons d'espera per assegurar que Vilib està inicialitzat
-TRACKING_LOOP_DELAY = 0.05  # Segons entre iteracions del seguiment
+TRACKING_LOOP_DELAY = 0.05  # Segons entre iteracions del seguiment (període nominal entre deteccions)
+DETECTION_POLL_S = 0.01  # Segons entre comprovacions de si Vilib ha produït una detecció nova
+DETECTION_WAIT_TIMEOUT = 0.2  # Segons màxims d'espera d'una detecció nova abans d'iterar igualment
+TRACKING_STATS_WINDOW_S = 5.0  # Finestra (s) per calcular la freqüència de control i la latència
+TRACKING_STATS_INTERVAL = 60.0  # Segons entre informes de rendiment del seguiment (None = cap)
 ERROR_RETRY_DELAY = 0.1  # Segons d'espera després d'un error
 PERSON_LOST_TIMEOUT = 0.5  # Segons sense detecció per considerar persona perduda (FASE 2.1)
+LOST_PREDICTION_HORIZON_S = 1.0  # Segons màxims d'extrapolació amb la velocitat per triar el gir
 
 # Constants per moviment reactiu (FASE 2.1)
 TURN_ANGLE_DEGREES = 30  # Graus de gir de les rodes cap a la direcció de la persona
@@ -86,6 +124,27 @@ def stop_visual_tracking():
         state['stop_requested'] = True
 
 
+def get_tracking_stats():
+    """
+    Rendiment del bucle de seguiment (vegeu TrackingStats.summary).
+
+    Returns:
+        dict, o None si el handler encara no s'ha creat
+    """
+    stats = _tracking_ref.get('stats')
+    return stats.summary() if stats is not None else None
+
+
+def lock_on_speaker():
+    """
+    Fixa el seguiment en qui acaba de parlar (la persona més propera, vegeu
+    PersonTracker.lock_largest). Sense seguiment de diverses persones no fa res.
+    """
+    tracker = _tracking_ref.get('tracker')
+    if tracker is not None:
+        tracker.lock_largest()
+
+
 def clamp_number(num, a, b):
     """
     Limita un número entre dos valors (inclusius).
@@ -128,6 +187,476 @@ def calcular_mitjana_ponderada(valors, pesos):
     return sum(v * p for v, p in zip(valors, pesos_actuals)) / suma_pesos
 
 
+class DetectionSmoother():
+    """
+    Mitjana ponderada de les últimes deteccions (x, y) en un buffer circular.
+
+    Substitueix les llistes amb pop(0) i el recàlcul complet de
+    calcular_mitjana_ponderada a cada detecció: x i y s'actualitzen junts i,
+    si els pesos creixen linealment (com SMOOTHING_WEIGHTS), en O(1) amb dues
+    sumes acumulades per eix (la suma simple i la ponderada per la posició dins
+    la finestra). Amb pesos arbitraris es recorre el buffer (finestra curta).
+    El resultat és el mateix que calcular_mitjana_ponderada sobre l'històric.
+
+    Args:
+        size: Nombre de deteccions de la finestra
+        weights: Pesos de la més antiga a la més recent; se'n fan servir els
+                 últims size (com calcular_mitjana_ponderada)
+
+    Raises:
+        ValueError: Si size no és positiu o hi ha menys pesos que size
+    """
+
+    __slots__ = ('size', 'weights', '_xs', '_ys', '_head', '_count', '_linear', '_a', '_b',
+                 '_tail_sums', '_sum_x', '_sum_y', '_idx_x', '_idx_y')
+
+    def __init__(self, size=DETECTION_HISTORY_SIZE, weights=SMOOTHING_WEIGHTS):
+        if not isinstance(size, int) or size <= 0:
+            raise ValueError(f"size ha de ser un enter positiu, rebut: {size}")
+        if len(weights) < size:
+            raise ValueError(f"calen almenys {size} pesos, rebuts: {len(weights)}")
+        self.size = size
+        self.weights = [float(w) for w in weights[-size:]]
+        self._xs = [0.0] * size
+        self._ys = [0.0] * size
+        steps = [b - a for a, b in zip(self.weights, self.weights[1:])]
+        self._linear = all(abs(step - steps[0]) < 1e-9 for step in steps) if steps else True
+        self._a = self.weights[0]
+        self._b = steps[0] if steps else 0.0
+        # Suma dels pesos que fa servir una finestra de m deteccions (els m últims)
+        self._tail_sums = [sum(self.weights[size - m:]) for m in range(size + 1)]
+        self.clear()
+
+    def __len__(self):
+        return self._count
+
+    def clear(self):
+        """Buida la finestra (la persona s'ha perdut)."""
+        self._head = 0  # posició de la detecció més antiga
+        self._count = 0
+        self._sum_x = self._sum_y = 0.0
+        self._idx_x = self._idx_y = 0.0  # sumes de k * valor, k = 0 la més antiga
+
+    velocity = None  # la mitjana ponderada no estima la velocitat
+
+    def add(self, x, y, t=None):
+        """
+        Afegeix una detecció.
+
+        Args:
+            x, y: Posició detectada
+            t: Instant de la detecció (no es fa servir; mateixa interfície que els estimadors)
+
+        Returns:
+            Tupla (x, y) suavitzada
+        """
+        size = self.size
+        if self._count == size:
+            # Surt la més antiga i la resta avança una posició (k -> k - 1)
+            old = self._head
+            self._sum_x -= self._xs[old]
+            self._sum_y -= self._ys[old]
+            self._idx_x -= self._sum_x
+            self._idx_y -= self._sum_y
+            self._head = (old + 1) % size
+            self._count -= 1
+        k = self._count
+        slot = (self._head + k) % size
+        self._xs[slot] = x
+        self._ys[slot] = y
+        self._sum_x += x
+        self._sum_y += y
+        self._idx_x += k * x
+        self._idx_y += k * y
+        self._count += 1
+        if self._head == 0 and self._count == size:
+            # Un cop per volta es recalculen les sumes per no acumular error de coma flotant
+            self._resum()
+        return self.mean()
+
+    def _resum(self):
+        self._sum_x = self._sum_y = self._idx_x = self._idx_y = 0.0
+        for k in range(self._count):
+            slot = (self._head + k) % self.size
+            self._sum_x += self._xs[slot]
+            self._sum_y += self._ys[slot]
+            self._idx_x += k * self._xs[slot]
+            self._idx_y += k * self._ys[slot]
+
+    def mean(self):
+        """
+        Returns:
+            Tupla (x, y) suavitzada, o None si la finestra és buida
+        """
+        count = self._count
+        if count == 0:
+            return None
+        last = (self._head + count - 1) % self.size
+        if count == 1:
+            return (float(self._xs[last]), float(self._ys[last]))
+        total = self._tail_sums[count]
+        if total == 0:
+            return (float(self._xs[last]), float(self._ys[last]))
+        if self._linear:
+            # Pesos a + b * (size - count + k) per a la posició k dins la finestra
+            base = self._a + self._b * (self.size - count)
+            return ((base * self._sum_x + self._b * self._idx_x) / total,
+                    (base * self._sum_y + self._b * self._idx_y) / total)
+        offset = self.size - count
+        sx = sy = 0.0
+        for k in range(count):
+            slot = (self._head + k) % self.size
+            weight = self.weights[offset + k]
+            sx += weight * self._xs[slot]
+            sy += weight * self._ys[slot]
+        return (sx / total, sy / total)
+
+
+class _VelocityTracker():
+    """
+    Base dels estimadors de velocitat constant (AlphaBetaTracker, KalmanTracker).
+
+    Filtra la posició i la velocitat de cada eix i, a cada detecció, retorna on
+    serà la persona quan el servo arribi a moure's: la detecció ja arriba amb
+    latency_s de retard i el servo no s'actualitza fins a horizon_s després.
+    Mateixa interfície que DetectionSmoother (add, clear, velocity).
+
+    Cada subclasse defineix _update(x, y, dt), que corregeix x, y, vx i vy
+    amb la detecció nova dt segons després de l'anterior.
+
+    Args:
+        latency_s: Retard entre la captura del frame i la detecció
+        horizon_s: Temps fins a la propera actualització dels servos
+    """
+
+    __slots__ = ('latency_s', 'horizon_s', '_t', 'x', 'y', 'vx', 'vy')
+
+    def __init__(self, latency_s=TRACKING_LATENCY_S, horizon_s=TRACKING_LOOP_DELAY):
+        self.latency_s = latency_s
+        self.horizon_s = horizon_s
+        self.clear()
+
+    def __len__(self):
+        return 0 if self._t is None else 1
+
+    def clear(self):
+        """Oblida la persona (s'ha perdut)."""
+        self._t = None
+        self.x = self.y = self.vx = self.vy = 0.0
+
+    @property
+    def velocity(self):
+        """Tupla (vx, vy) en píxels per segon, o None sense deteccions."""
+        return None if self._t is None else (self.vx, self.vy)
+
+    def add(self, x, y, t=None):
+        """
+        Afegeix una detecció.
+
+        Args:
+            x, y: Posició detectada
+            t: Instant de la detecció (None = ara)
+
+        Returns:
+            Tupla (x, y) prevista per a la propera actualització dels servos
+        """
+        t = time.time() if t is None else t
+        if self._t is None:
+            self._start(x, y)
+            self._t = t
+        elif t > self._t:
+            self._update(x, y, t - self._t)
+            self._t = t
+        return self.predict(self.latency_s + self.horizon_s)
+
+    def predict(self, dt):
+        """Posició (x, y) prevista dt segons després de l'última detecció, dins la imatge."""
+        return (clamp_number(self.x + self.vx * dt, 0, CAMERA_WIDTH),
+                clamp_number(self.y + self.vy * dt, 0, CAMERA_HEIGHT))
+
+    def _start(self, x, y):
+        self.x, self.y = float(x), float(y)
+        self.vx = self.vy = 0.0
+
+
+class AlphaBetaTracker(_VelocityTracker):
+    """
+    Estimador alpha-beta: corregeix la posició i la velocitat previstes amb
+    guanys fixos. Més senzill que el Kalman i sense matrius.
+
+    Args:
+        alpha: Correcció de la posició (0-1)
+        beta: Correcció de la velocitat (0-1)
+        latency_s, horizon_s: Vegeu _VelocityTracker
+    """
+
+    __slots__ = ('alpha', 'beta')
+
+    def __init__(self, alpha=ALPHA_BETA_ALPHA, beta=ALPHA_BETA_BETA, **kwargs):
+        self.alpha = alpha
+        self.beta = beta
+        super().__init__(**kwargs)
+
+    def _update(self, x, y, dt):
+        self.x, self.vx = self._axis(self.x, self.vx, x, dt)
+        self.y, self.vy = self._axis(self.y, self.vy, y, dt)
+
+    def _axis(self, pos, vel, z, dt):
+        predicted = pos + vel * dt
+        residual = z - predicted
+        return predicted + self.alpha * residual, vel + self.beta * residual / dt
+
+
+class KalmanTracker(_VelocityTracker):
+    """
+    Filtre de Kalman de velocitat constant, independent per a cada eix (estat
+    posició i velocitat, acceleració com a soroll blanc). Ajusta sol el guany
+    segons el temps entre deteccions: és el que es fa servir per defecte.
+
+    Args:
+        process_noise: Densitat d'acceleració aleatòria (px²/s³)
+        measurement_noise: Desviació de la posició detectada (px)
+        initial_speed: Desviació inicial de la velocitat (px/s)
+        latency_s, horizon_s: Vegeu _VelocityTracker
+    """
+
+    __slots__ = ('q', 'r', 'initial_speed', '_px', '_py')
+
+    def __init__(self, process_noise=KALMAN_PROCESS_NOISE, measurement_noise=KALMAN_MEASUREMENT_NOISE,
+                 initial_speed=KALMAN_INITIAL_SPEED, **kwargs):
+        self.q = process_noise
+        self.r = measurement_noise ** 2
+        self.initial_speed = initial_speed
+        super().__init__(**kwargs)
+
+    def _start(self, x, y):
+        super()._start(x, y)
+        # Covariància [var posició, covariància, var velocitat] de cada eix
+        self._px = [self.r, 0.0, self.initial_speed ** 2]
+        self._py = [self.r, 0.0, self.initial_speed ** 2]
+
+    def _update(self, x, y, dt):
+        self.x, self.vx = self._axis(self.x, self.vx, self._px, x, dt)
+        self.y, self.vy = self._axis(self.y, self.vy, self._py, y, dt)
+
+    def _axis(self, pos, vel, cov, z, dt):
+        p00, p01, p11 = cov
+        q = self.q
+        # Predicció
+        pos += vel * dt
+        p00 += dt * (2 * p01 + dt * p11) + q * dt ** 3 / 3
+        p01 += dt * p11 + q * dt ** 2 / 2
+        p11 += q * dt
+        # Correcció amb la detecció
+        s = p00 + self.r
+        k0, k1 = p00 / s, p01 / s
+        residual = z - pos
+        cov[0] = (1 - k0) * p00
+        cov[1] = (1 - k0) * p01
+        cov[2] = p11 - k1 * p01
+        return pos + k0 * residual, vel + k1 * residual
+
+
+def crear_estimador_posicio(estimador=TRACKING_ESTIMATOR, smoothing_size=DETECTION_HISTORY_SIZE,
+                            smoothing_weights=SMOOTHING_WEIGHTS):
+    """
+    Crea l'estimador de la posició de la persona per al loop de seguiment.
+
+    Args:
+        estimador: 'smoothing' (mitjana ponderada, sense velocitat),
+                   'alpha_beta' o 'kalman' (velocitat constant amb predicció)
+        smoothing_size: Deteccions de la finestra de suavització ('smoothing')
+        smoothing_weights: Pesos de la mitjana ponderada ('smoothing')
+
+    Returns:
+        Objecte amb add(x, y, t=None), clear() i velocity
+
+    Raises:
+        ValueError: Si l'estimador no existeix o la configuració no és vàlida
+    """
+    if estimador == 'smoothing':
+        return DetectionSmoother(smoothing_size, smoothing_weights)
+    if estimador == 'alpha_beta':
+        return AlphaBetaTracker()
+    if estimador == 'kalman':
+        return KalmanTracker()
+    raise ValueError(f"estimador desconegut: {estimador} (smoothing, alpha_beta o kalman)")
+
+
+def direccio_persona_perduda(last_seen_x, last_seen_vx=None, temps_perduda=0.0):
+    """
+    Direcció cap on girar quan la persona s'ha perdut (FASE 2.1).
+
+    Amb velocitat coneguda s'extrapola on deu ser ara la persona (fins a
+    LOST_PREDICTION_HORIZON_S): si sortia pel costat dret, s'ha de girar a
+    la dreta encara que l'última posició fos a l'esquerra del centre.
+
+    Args:
+        last_seen_x: Última posició x coneguda
+        last_seen_vx: Velocitat x a l'última detecció (px/s) o None
+        temps_perduda: Segons des de l'última detecció
+
+    Returns:
+        'esquerra' o 'dreta'
+    """
+    x = last_seen_x
+    if last_seen_vx is not None:
+        x += last_seen_vx * clamp_number(temps_perduda, 0, LOST_PREDICTION_HORIZON_S)
+    return 'esquerra' if x < CAMERA_CENTER_X else 'dreta'
+
+
+class DetectionFeed():
+    """
+    Seqüència de deteccions: avisa quan n'arriba una de nova.
+
+    Vilib no avisa quan acaba una detecció: substitueix Vilib.img per un
+    objecte nou a cada fotograma (després d'actualitzar detect_obj_parameter).
+    wait() comprova cada poll_s si Vilib.img és un altre objecte (o, sense
+    imatge, si la detecció ha canviat) i, si ho és, en guarda una còpia
+    amb número de seqüència i instant. Així el bucle de seguiment es desperta
+    poc després de cada detecció i no torna a processar la mateixa.
+
+    Amb detector (PersonDetector), la detecció de cada fotograma nou la fa
+    el detector en lloc de Vilib i s'escriu també a Vilib.detect_obj_parameter
+    (la resta del robot, com el retall de la imatge dels torns, la hi busca).
+    Un detector en un altre fil pot fer servir publish(): desperta el fil que
+    espera sense haver d'esperar el polling.
+
+    Té detect_obj_parameter com Vilib, de manera que es pot passar a
+    processar_iteracio_tracking en lloc del mòdul.
+
+    Args:
+        vilib: Mòdul Vilib (o None si les deteccions arriben per publish())
+        poll_s: Segons entre comprovacions
+        detector: Objecte amb detect(img, t) -> dict (None = la detecció de Vilib)
+    """
+
+    def __init__(self, vilib=None, poll_s=DETECTION_POLL_S, detector=None):
+        self.vilib = vilib
+        self.poll_s = poll_s
+        self.detector = detector
+        self.seq = 0
+        self.timestamp = None  # instant en què s'ha vist la detecció actual
+        self.detect_obj_parameter = {}
+        self._last_img = None  # referència (no id) perquè no es reutilitzi l'adreça
+        self._last_params = None
+        self._cond = threading.Condition()
+
+    def publish(self, params, t=None):
+        """Afegeix una detecció nova (human_n, human_x, human_y...) i desperta wait()."""
+        with self._cond:
+            self._set(dict(params), time.time() if t is None else t)
+            self._cond.notify_all()
+
+    def _set(self, params, t):
+        self.seq += 1
+        self.timestamp = t
+        self.detect_obj_parameter = params
+        self._last_params = params
+
+    def _poll(self):
+        if self.vilib is None:
+            return
+        params = getattr(self.vilib, 'detect_obj_parameter', None)
+        if not isinstance(params, dict):
+            return
+        img = getattr(self.vilib, 'img', None)
+        if img is not None:
+            # Fotograma nou: Vilib ja hi ha escrit la detecció (els canvis a mitja escriptura no compten)
+            if img is not self._last_img:
+                self._last_img = img
+                now = time.time()
+                if self.detector is not None:
+                    detection = self.detector.detect(img, now)
+                    params.update({k: v for k, v in detection.items() if k.startswith('human_')})
+                    self._set(detection, now)
+                else:
+                    self._set(dict(params), now)
+        elif params != self._last_params:
+            self._set(dict(params), time.time())
+
+    def wait(self, last_seq, timeout=DETECTION_WAIT_TIMEOUT):
+        """
+        Espera una detecció posterior a last_seq.
+
+        Args:
+            last_seq: Seqüència de l'última detecció processada
+            timeout: Segons màxims d'espera
+
+        Returns:
+            True si hi ha una detecció nova (self.seq), False si ha vençut el timeout
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                self._poll()
+                if self.seq != last_seq:
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(min(self.poll_s, remaining))
+
+
+class TrackingStats():
+    """
+    Freqüència de control efectiva i latència detecció→servo del seguiment.
+
+    Args:
+        window_s: Segons de la finestra mòbil
+    """
+
+    def __init__(self, window_s=TRACKING_STATS_WINDOW_S):
+        self.window_s = window_s
+        self._updates = collections.deque()  # (instant del servo, latència)
+        self._lock = threading.Lock()
+        self.totals = {'detections': 0, 'updates': 0, 'stale': 0}
+
+    def record_detection(self):
+        """Una detecció nova (amb persona o sense)."""
+        with self._lock:
+            self.totals['detections'] += 1
+
+    def record_stale(self):
+        """Timeout sense cap detecció nova (càmera aturada o lenta)."""
+        with self._lock:
+            self.totals['stale'] += 1
+
+    def record_update(self, detection_t, servo_t):
+        """Servos actualitzats a servo_t amb la detecció vista a detection_t."""
+        with self._lock:
+            self.totals['updates'] += 1
+            self._updates.append((servo_t, servo_t - detection_t))
+            self._trim(servo_t)
+
+    def _trim(self, now):
+        while self._updates and now - self._updates[0][0] > self.window_s:
+            self._updates.popleft()
+
+    def summary(self, now=None):
+        """
+        Returns:
+            dict: totals (detections, updates, stale) i, de la finestra,
+            control_hz, latency_ms_avg i latency_ms_max (None sense actualitzacions)
+        """
+        with self._lock:
+            self._trim(time.time() if now is None else now)
+            latencies = [latency for _, latency in self._updates]
+            summary = dict(self.totals)
+        summary['control_hz'] = len(latencies) / self.window_s
+        summary['latency_ms_avg'] = 1000 * sum(latencies) / len(latencies) if latencies else None
+        summary['latency_ms_max'] = 1000 * max(latencies) if latencies else None
+        return summary
+
+    def report(self):
+        """Línia de log amb el resum."""
+        s = self.summary()
+        latency = (f"latència detecció→servo {s['latency_ms_avg']:.1f} ms (màx {s['latency_ms_max']:.1f} ms)"
+                   if s['latency_ms_avg'] is not None else 'sense persona')
+        return (f"[Visual Tracking] control {s['control_hz']:.1f} Hz, {latency}, "
+                f"{s['detections']} deteccions, {s['stale']} esperes sense detecció")
+
+
 def calcular_canvi_angle(coordenada, dimensio_camera, invertir=False):
     """
     Calcula el canvi d'angle necessari per centrar la coordenada.
@@ -155,53 +684,48 @@ def calcular_canvi_angle(coordenada, dimensio_camera, invertir=False):
     return -canvi if invertir else canvi
 
 
-def processar_deteccio_persona(vilib, detection_history, state, state_lock):
+def processar_deteccio_persona(vilib, detection_history, state, state_lock, t_deteccio=None, tracker=None):
     """
     Processa una detecció de persona i actualitza l'estat.
     
     Args:
         vilib: Mòdul Vilib amb deteccions
-        detection_history: Diccionari amb històric de deteccions {'x': [], 'y': []}
+        detection_history: Estimador de posició (vegeu crear_estimador_posicio)
         state: Diccionari amb l'estat compartit
         state_lock: Lock per accedir a l'estat de forma thread-safe
+        t_deteccio: Instant de la detecció (None = ara)
+        tracker: PersonTracker (None = la detecció de Vilib tal qual)
     
     Returns:
         Tupla (posicio_suavitzada_x, posicio_suavitzada_y, esta_centrada) o None si no hi ha detecció vàlida
+        (amb tracker, també si la persona seguida no s'ha vist en aquest fotograma)
     """
     # Comprovar si hi ha una persona detectada
     if not hasattr(vilib, 'detect_obj_parameter') or not isinstance(vilib.detect_obj_parameter, dict):
         return None
     
-    num_persones = vilib.detect_obj_parameter.get('human_n', 0)
-    if num_persones == 0:
-        return None
-    
-    # Obtenir coordenades de la persona detectada
-    coordenada_x = vilib.detect_obj_parameter.get('human_x', CAMERA_CENTER_X)
-    coordenada_y = vilib.detect_obj_parameter.get('human_y', CAMERA_CENTER_Y)
+    if tracker is not None:
+        # Només la persona seguida, encara que Vilib n'hagi donat una altra
+        target = tracker.update(boxes_from_detection(vilib.detect_obj_parameter), t_deteccio)
+        if target is None or not target.visible:
+            return None
+        coordenada_x, coordenada_y = target.x, target.y
+    else:
+        num_persones = vilib.detect_obj_parameter.get('human_n', 0)
+        if num_persones == 0:
+            return None
+        
+        # Obtenir coordenades de la persona detectada
+        coordenada_x = vilib.detect_obj_parameter.get('human_x', CAMERA_CENTER_X)
+        coordenada_y = vilib.detect_obj_parameter.get('human_y', CAMERA_CENTER_Y)
     
     # Validar que les coordenades siguin vàlides (dins del rang de la càmera)
     coordenada_x = clamp_number(coordenada_x, 0, CAMERA_WIDTH)
     coordenada_y = clamp_number(coordenada_y, 0, CAMERA_HEIGHT)
     
-    # Afegir a l'històric de deteccions
-    detection_history['x'].append(coordenada_x)
-    detection_history['y'].append(coordenada_y)
-    
-    # Mantenir només últimes N deteccions
-    if len(detection_history['x']) > DETECTION_HISTORY_SIZE:
-        detection_history['x'].pop(0)
-        detection_history['y'].pop(0)
-    
-    # Calcular posició suavitzada mitjançant mitjana ponderada
-    posicio_suavitzada_x = calcular_mitjana_ponderada(
-        detection_history['x'],
-        SMOOTHING_WEIGHTS
-    )
-    posicio_suavitzada_y = calcular_mitjana_ponderada(
-        detection_history['y'],
-        SMOOTHING_WEIGHTS
-    )
+    # Afegir a l'estimador: posició suavitzada o prevista per a la propera actualització dels servos
+    posicio_suavitzada_x, posicio_suavitzada_y = detection_history.add(coordenada_x, coordenada_y, t_deteccio)
+    velocitat = detection_history.velocity
     
     # Calcular desplaçament respecte al centre de la imatge
     desplacament_x = posicio_suavitzada_x - CAMERA_CENTER_X
@@ -217,7 +741,8 @@ def processar_deteccio_persona(vilib, detection_history, state, state_lock):
     with state_lock:
         state['centered'] = esta_centrada
         state['last_seen_x'] = posicio_suavitzada_x
-        state['last_seen_time'] = time.time()
+        state['last_seen_vx'] = velocitat[0] if velocitat is not None else None
+        state['last_seen_time'] = time.time() if t_deteccio is None else t_deteccio
         state['person_lost_turn_done'] = False  # Reset quan tornem a detectar
     
     return (posicio_suavitzada_x, posicio_suavitzada_y, esta_centrada)
@@ -266,6 +791,9 @@ def aplicar_angles_camera(car, pan_angle, tilt_angle):
     """
     Aplica els angles de pan i tilt a la càmera amb validació.
     
+    S'escriuen a cada iteració; amb ServoOutput (servo_output), els que no
+    han canviat no arriben al bus I2C.
+    
     Args:
         car: Instància de Picarx
         pan_angle: Angle de pan
@@ -287,24 +815,38 @@ def aplicar_angles_camera(car, pan_angle, tilt_angle):
 
 
 def processar_iteracio_tracking(vilib, detection_history, state, state_lock, 
-                                 car, pan_angle, tilt_angle):
+                                 car, pan_angle, tilt_angle, controlador=None,
+                                 deteccio_nova=True, t_deteccio=None, tracker=None):
     """
     Processa una iteració del loop de seguiment visual.
     
     Args:
         vilib: Mòdul Vilib amb deteccions
-        detection_history: Diccionari amb històric de deteccions
+        detection_history: Estimador de posició (vegeu crear_estimador_posicio)
         state: Diccionari amb l'estat compartit
         state_lock: Lock per accedir a l'estat
         car: Instància de Picarx
         pan_angle: Angle actual de pan
         tilt_angle: Angle actual de tilt
+        controlador: Control dels servos (vegeu crear_controlador_camera);
+                     None = pas fix original
+        deteccio_nova: False si la detecció ja s'ha processat (cap de nova
+                       abans del timeout): amb persona no es torna a afegir a
+                       l'estimador ni es mouen els servos
+        t_deteccio: Instant de la detecció (None = ara)
+        tracker: PersonTracker per seguir una sola persona (None = detecció de Vilib)
     
     Returns:
         Tupla (nou_pan_angle, nou_tilt_angle) amb els nous angles
     """
+    if controlador is None:
+        controlador = StepCameraController()
+    params = getattr(vilib, 'detect_obj_parameter', None)
+    if not deteccio_nova and boxes_from_detection(params):
+        # Detecció repetida: no aporta res a l'estimador i inflaria l'històric
+        return (pan_angle, tilt_angle)
     # Processar detecció de persona
-    resultat = processar_deteccio_persona(vilib, detection_history, state, state_lock)
+    resultat = processar_deteccio_persona(vilib, detection_history, state, state_lock, t_deteccio, tracker)
     
     if resultat is not None:
         # Persona trobada: sortir del mode recerca si hi érem (FASE 2.2)
@@ -317,29 +859,29 @@ def processar_iteracio_tracking(vilib, detection_history, state, state_lock,
         
         posicio_suavitzada_x, posicio_suavitzada_y, _ = resultat
         
-        # Calcular i actualitzar angles de la càmera (elimina duplicació pan/tilt)
-        nou_pan_angle = calcular_i_actualitzar_angle(
-            posicio_suavitzada_x, CAMERA_WIDTH, pan_angle,
-            CAMERA_PAN_MIN_ANGLE, CAMERA_PAN_MAX_ANGLE, invertir=False
-        )
-        nou_tilt_angle = calcular_i_actualitzar_angle(
-            posicio_suavitzada_y, CAMERA_HEIGHT, tilt_angle,
-            CAMERA_TILT_MIN_ANGLE, CAMERA_TILT_MAX_ANGLE, invertir=True
+        # Calcular els nous angles de la càmera (PID o pas fix)
+        nou_pan_angle, nou_tilt_angle = controlador.actualitzar(
+            posicio_suavitzada_x, posicio_suavitzada_y, pan_angle, tilt_angle
         )
         
         # Aplicar els nous angles a la càmera amb validació
         aplicar_angles_camera(car, nou_pan_angle, nou_tilt_angle)
         
         return (nou_pan_angle, nou_tilt_angle)
+    elif tracker is not None and tracker.target is not None:
+        # La persona seguida no s'ha vist en aquest fotograma (Vilib n'ha donat una altra o
+        # l'ha perduda un moment): mantenir la càmera i l'estimador fins que torni o la pista caduqui
+        return (pan_angle, tilt_angle)
     else:
         # Si no hi ha detecció: buidar històric, actualitzar estat i recerca (FASE 2.1 + 2.2)
-        detection_history['x'].clear()
-        detection_history['y'].clear()
+        detection_history.clear()
+        controlador.reset()
         
         current_time = time.time()
         with state_lock:
             state['centered'] = False
             last_seen_x = state.get('last_seen_x')
+            last_seen_vx = state.get('last_seen_vx')
             last_seen_time = state.get('last_seen_time')
             turn_done = state.get('person_lost_turn_done', False)
             search_start = state.get('search_start_time')
@@ -388,9 +930,9 @@ def processar_iteracio_tracking(vilib, detection_history, state, state_lock,
         if (last_seen_time is not None and
                 not turn_done and
                 (current_time - last_seen_time) >= PERSON_LOST_TIMEOUT):
-            # Determinar direcció segons última posició (esquerra/dreta del centre)
+            # Determinar direcció segons la posició prevista (esquerra/dreta del centre)
             if last_seen_x is not None:
-                direccio = 'esquerra' if last_seen_x < CAMERA_CENTER_X else 'dreta'
+                direccio = direccio_persona_perduda(last_seen_x, last_seen_vx, current_time - last_seen_time)
                 if girar_robot_cap_direccio(car, direccio):
                     with state_lock:
                         state['person_lost_turn_done'] = True
@@ -453,7 +995,191 @@ def calcular_i_actualitzar_angle(posicio, dimensio_camera, angle_actual,
     return actualitzar_angle_camera(angle_actual, canvi_desitjat, angle_min, angle_max)
 
 
-def create_visual_tracking_handler(car, vilib, with_img, default_head_tilt):
+class PidController():
+    """
+    PID d'un eix de la càmera (pan o tilt).
+
+    L'error és l'angle (graus) entre on apunta la càmera i la persona, i la
+    sortida és la velocitat del servo (graus/s), que s'integra sobre l'angle
+    actual: la part proporcional tanca l'error en pocs passos sense el límit
+    fix de MAX_ANGLE_CHANGE_PER_ITERATION i la integral elimina el retard
+    amb la persona en moviment. Inclou:
+
+    - zona morta: dins de deadband graus el servo no es mou ni s'integra;
+    - límit de velocitat (max_rate) i de l'angle (angle_min / angle_max);
+    - anti-windup: no s'integra mentre la sortida està saturada en el sentit
+      de l'error, i la integral es limita a integral_limit.
+
+    Args:
+        kp, ki, kd: Guanys
+        angle_min, angle_max: Angles permesos del servo
+        deadband: Zona morta (graus)
+        max_rate: Velocitat màxima del servo (graus/s)
+        integral_limit: Valor absolut màxim de la integral (grau·s)
+    """
+
+    __slots__ = ('kp', 'ki', 'kd', 'angle_min', 'angle_max', 'deadband', 'max_rate',
+                 'integral_limit', 'integral', '_last_error')
+
+    def __init__(self, kp=PID_KP, ki=PID_KI, kd=PID_KD, angle_min=CAMERA_PAN_MIN_ANGLE,
+                 angle_max=CAMERA_PAN_MAX_ANGLE, deadband=0.0, max_rate=PID_MAX_RATE,
+                 integral_limit=PID_INTEGRAL_LIMIT):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.angle_min = angle_min
+        self.angle_max = angle_max
+        self.deadband = deadband
+        self.max_rate = max_rate
+        self.integral_limit = integral_limit
+        self.reset()
+
+    def reset(self):
+        """Oblida la integral i l'error anterior (la persona s'ha perdut)."""
+        self.integral = 0.0
+        self._last_error = None
+
+    def update(self, error, angle, dt):
+        """
+        Calcula el nou angle del servo.
+
+        Args:
+            error: Angle de la persona respecte on apunta la càmera (graus)
+            angle: Angle actual del servo
+            dt: Segons des de l'actualització anterior
+
+        Returns:
+            Nou angle del servo, dins de [angle_min, angle_max]
+        """
+        if dt <= 0:
+            return clamp_number(angle, self.angle_min, self.angle_max)
+        if abs(error) < self.deadband:
+            self._last_error = 0.0
+            return clamp_number(angle, self.angle_min, self.angle_max)
+        derivative = 0.0 if self._last_error is None else (error - self._last_error) / dt
+        self._last_error = error
+        integral = clamp_number(self.integral + error * dt, -self.integral_limit, self.integral_limit)
+        rate = self.kp * error + self.ki * integral + self.kd * derivative
+        limited = clamp_number(rate, -self.max_rate, self.max_rate)
+        nou_angle = clamp_number(angle + limited * dt, self.angle_min, self.angle_max)
+        # Anti-windup: només s'integra si la sortida no està saturada en el sentit de l'error
+        saturated = (limited != rate or
+                     (nou_angle >= self.angle_max and error > 0) or
+                     (nou_angle <= self.angle_min and error < 0))
+        if not saturated:
+            self.integral = integral
+        return nou_angle
+
+
+class PidCameraController():
+    """
+    Control de pan i tilt amb un PidController per eix.
+
+    Converteix la posició de la persona a la imatge en l'error angular de
+    cada eix amb el camp de visió de la càmera i mesura el temps entre
+    actualitzacions.
+
+    Args:
+        fov_h, fov_v: Camp de visió horitzontal i vertical (graus)
+        deadband_px: Zona morta (píxels del centre)
+        **pid_kwargs: Guanys i límits comuns dels dos PidController
+    """
+
+    def __init__(self, fov_h=CAMERA_FOV_H, fov_v=CAMERA_FOV_V, deadband_px=PID_DEADBAND_PX, **pid_kwargs):
+        self.deg_per_px_x = fov_h / CAMERA_WIDTH
+        self.deg_per_px_y = fov_v / CAMERA_HEIGHT
+        self.pan = PidController(angle_min=CAMERA_PAN_MIN_ANGLE, angle_max=CAMERA_PAN_MAX_ANGLE,
+                                 deadband=deadband_px * self.deg_per_px_x, **pid_kwargs)
+        self.tilt = PidController(angle_min=CAMERA_TILT_MIN_ANGLE, angle_max=CAMERA_TILT_MAX_ANGLE,
+                                  deadband=deadband_px * self.deg_per_px_y, **pid_kwargs)
+        self._last_time = None
+
+    def reset(self):
+        """Reinicia els dos eixos (la persona s'ha perdut)."""
+        self.pan.reset()
+        self.tilt.reset()
+        self._last_time = None
+
+    def actualitzar(self, posicio_x, posicio_y, pan_angle, tilt_angle, t=None):
+        """
+        Calcula els nous angles per centrar la persona.
+
+        Args:
+            posicio_x, posicio_y: Posició de la persona a la imatge (píxels)
+            pan_angle, tilt_angle: Angles actuals
+            t: Instant de l'actualització (None = ara)
+
+        Returns:
+            Tupla (nou_pan_angle, nou_tilt_angle)
+        """
+        t = time.time() if t is None else t
+        dt = TRACKING_LOOP_DELAY if self._last_time is None else clamp_number(t - self._last_time, 0, PID_MAX_DT)
+        self._last_time = t
+        # Mateixos sentits que calcular_canvi_angle: el tilt va invertit
+        error_pan = (posicio_x - CAMERA_CENTER_X) * self.deg_per_px_x
+        error_tilt = (CAMERA_CENTER_Y - posicio_y) * self.deg_per_px_y
+        return (self.pan.update(error_pan, pan_angle, dt),
+                self.tilt.update(error_tilt, tilt_angle, dt))
+
+
+class StepCameraController():
+    """Control original: canvi proporcional limitat a ±MAX_ANGLE_CHANGE_PER_ITERATION per iteració."""
+
+    def reset(self):
+        pass
+
+    def actualitzar(self, posicio_x, posicio_y, pan_angle, tilt_angle, t=None):
+        return (
+            calcular_i_actualitzar_angle(posicio_x, CAMERA_WIDTH, pan_angle,
+                                         CAMERA_PAN_MIN_ANGLE, CAMERA_PAN_MAX_ANGLE, invertir=False),
+            calcular_i_actualitzar_angle(posicio_y, CAMERA_HEIGHT, tilt_angle,
+                                         CAMERA_TILT_MIN_ANGLE, CAMERA_TILT_MAX_ANGLE, invertir=True),
+        )
+
+
+def crear_controlador_camera(controlador=TRACKING_CONTROLLER):
+    """
+    Crea el control dels servos de la càmera per al loop de seguiment.
+
+    Args:
+        controlador: 'pid' (PidCameraController) o 'step' (pas fix original)
+
+    Returns:
+        Objecte amb actualitzar(x, y, pan, tilt, t=None) i reset()
+
+    Raises:
+        ValueError: Si el controlador no existeix
+    """
+    if controlador == 'pid':
+        return PidCameraController()
+    if controlador == 'step':
+        return StepCameraController()
+    raise ValueError(f"controlador desconegut: {controlador} (pid o step)")
+
+
+def crear_detector(vilib):
+    """
+    Crea el detector propi i desactiva el de Vilib, que ja no cal a cada fotograma.
+
+    Args:
+        vilib: Mòdul Vilib
+
+    Returns:
+        PersonDetector, o None si OpenCV no té la cascada (es continua amb el de Vilib)
+    """
+    detector = PersonDetector()
+    if not detector.available:
+        print('[Visual Tracking] Sense cascada Haar d\'OpenCV: es fa servir la detecció de Vilib')
+        return None
+    if hasattr(vilib, 'face_detect_switch'):
+        vilib.face_detect_switch(False)
+    return detector
+
+
+def create_visual_tracking_handler(car, vilib, with_img, default_head_tilt,
+                                   smoothing_size=DETECTION_HISTORY_SIZE, smoothing_weights=SMOOTHING_WEIGHTS,
+                                   estimator=TRACKING_ESTIMATOR, controller=TRACKING_CONTROLLER,
+                                   multi_person=TRACKING_MULTI_PERSON, own_detector=TRACKING_OWN_DETECTOR):
     """
     Crea i retorna el handler de seguiment visual amb detecció de persona centrada
     
@@ -462,6 +1188,12 @@ def create_visual_tracking_handler(car, vilib, with_img, default_head_tilt):
         vilib: Mòdul Vilib (o None si no hi ha imatge)
         with_img: Boolean indicant si hi ha imatge disponible
         default_head_tilt: Angle per defecte del tilt de la càmera
+        smoothing_size: Deteccions de la finestra de suavització
+        smoothing_weights: Pesos de la mitjana ponderada (de la més antiga a la més recent)
+        estimator: Estimador de posició: 'smoothing', 'alpha_beta' o 'kalman'
+        controller: Control dels servos: 'pid' o 'step'
+        multi_person: Seguir una sola persona entre diverses (PersonTracker)
+        own_detector: Detectar amb PersonDetector en lloc de Vilib (si OpenCV té la cascada)
     
     Returns:
         Tupla (handler_function, state_dict, lock, is_person_centered_func) on:
@@ -484,6 +1216,11 @@ def create_visual_tracking_handler(car, vilib, with_img, default_head_tilt):
     if not isinstance(default_head_tilt, (int, float)):
         raise ValueError("default_head_tilt ha de ser un número")
     
+    # Validar l'estimador i la finestra de suavització abans d'arrencar el fil
+    DetectionSmoother(smoothing_size, smoothing_weights)
+    crear_estimador_posicio(estimator, smoothing_size, smoothing_weights)
+    crear_controlador_camera(controller)
+
     # Validar que default_head_tilt estigui dins del rang permès
     default_head_tilt = clamp_number(
         default_head_tilt,
@@ -496,6 +1233,7 @@ def create_visual_tracking_handler(car, vilib, with_img, default_head_tilt):
     state = {
         'centered': False,
         'last_seen_x': None,
+        'last_seen_vx': None,  # velocitat x (px/s) si l'estimador la coneix
         'last_seen_time': None,
         'person_lost_turn_done': False,
         # FASE 2.2: mode recerca
@@ -507,15 +1245,17 @@ def create_visual_tracking_handler(car, vilib, with_img, default_head_tilt):
         'stop_requested': False,
     }
     state_lock = threading.Lock()
+    stats = TrackingStats()
+    tracker = PersonTracker(CAMERA_WIDTH) if multi_person else None
     
     def visual_tracking_handler():
         """
         Fil que fa seguiment visual pur amb la càmera (pan/tilt) amb filtre de suavització.
         
         Aquest handler executa un loop continu que:
-        - Detecta persones utilitzant Vilib
-        - Aplica un filtre de suavització a les deteccions
-        - Calcula i aplica canvis d'angle de càmera per centrar la persona
+        - Espera cada detecció nova de Vilib (DetectionFeed) en lloc de dormir un temps fix
+        - Aplica un filtre de suavització o un estimador amb predicció a les deteccions
+        - Calcula i aplica canvis d'angle de càmera per centrar la persona (PID o pas fix)
         - Detecta quan la persona està centrada a la imatge
         """
         
@@ -525,30 +1265,77 @@ def create_visual_tracking_handler(car, vilib, with_img, default_head_tilt):
         # Esperar una mica per assegurar que Vilib està completament inicialitzat
         time.sleep(VILIB_INIT_DELAY)
         
-        # Històric de deteccions per mitjana mòbil
-        detection_history = {
-            'x': [],
-            'y': []
-        }
+        # Estimador de la posició (mitjana mòbil o velocitat constant amb predicció)
+        detection_history = crear_estimador_posicio(estimator, smoothing_size, smoothing_weights)
+        controlador = crear_controlador_camera(controller)
+        detector = crear_detector(vilib) if own_detector else None
+        feed = DetectionFeed(vilib, detector=detector)
+        last_seq = 0
+        last_report = time.time()
         
         # Angles actuals de la càmera
         pan_angle = 0
         tilt_angle = default_head_tilt
         
+        # Els servos són del seguiment mentre cap acció no els reservi amb més prioritat
+        arbitrated = isinstance(car, ServoOutput)
+        if arbitrated:
+            car.acquire('seguiment', PRIORITY_TRACKING, lease_s=None)
+        yielded = False
+        
         while True:
             with state_lock:
                 if state.get('stop_requested'):
                     break
             try:
+                # Despertar amb cada detecció nova; sense cap, iterar igualment (persona perduda, recerca)
+                nova = feed.wait(last_seq)
+                if nova:
+                    last_seq = feed.seq
+                    stats.record_detection()
+                else:
+                    stats.record_stale()
+                if arbitrated and not car.owns('pan', 'tilt'):
+                    # Una acció mou la càmera: no calcular ordres que no s'escriurien
+                    yielded = True
+                    continue
+                if yielded:
+                    # Continuar des d'on l'acció ha deixat la càmera, sense l'error acumulat d'abans
+                    yielded = False
+                    pan_angle = car.angle('pan', pan_angle)
+                    tilt_angle = car.angle('tilt', tilt_angle)
+                    controlador.reset()
+                    detection_history.clear()
+                    with state_lock:
+                        if state.get('last_seen_time') is not None:
+                            # On s'havia vist la persona era amb la càmera d'abans: no girar el robot cap allà
+                            state['last_seen_time'] = time.time()
                 pan_angle, tilt_angle = processar_iteracio_tracking(
-                    vilib, detection_history, state, state_lock,
-                    car, pan_angle, tilt_angle
+                    feed, detection_history, state, state_lock,
+                    car, pan_angle, tilt_angle, controlador,
+                    deteccio_nova=nova, t_deteccio=feed.timestamp, tracker=tracker
                 )
-                time.sleep(TRACKING_LOOP_DELAY)
+                now = time.time()
+                with state_lock:
+                    # La detecció s'ha fet servir per moure els servos (no és la d'una altra persona)
+                    used = nova and state.get('last_seen_time') == feed.timestamp
+                if used:
+                    stats.record_update(feed.timestamp, now)
+                if TRACKING_STATS_INTERVAL and now - last_report >= TRACKING_STATS_INTERVAL:
+                    print(stats.report())
+                    if isinstance(car, ServoOutput):
+                        print(car.report())
+                    last_report = now
                 
             except Exception as e:
                 print(f'[Visual Tracking] Error: {e}')
                 time.sleep(ERROR_RETRY_DELAY)
+        
+        if detector is not None and hasattr(vilib, 'face_detect_switch'):
+            # Sense seguiment, la resta del robot torna a dependre de la detecció de Vilib
+            vilib.face_detect_switch(True)
+        if arbitrated:
+            car.release()
     
     def is_person_centered():
         """
@@ -566,6 +1353,8 @@ def create_visual_tracking_handler(car, vilib, with_img, default_head_tilt):
     _tracking_ref['state'] = state
     _tracking_ref['lock'] = state_lock
     _tracking_ref['thread_ref'] = {'thread': None}
+    _tracking_ref['stats'] = stats
+    _tracking_ref['tracker'] = tracker
     
     return visual_tracking_handler, state, state_lock, is_person_centered
 
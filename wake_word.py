@@ -0,0 +1,172 @@
+"""
+Porta de paraula d'activació davant de l'STT.
+
+Sense porta, cada frase que el VAD tanca (xerrameca d'una classe, la tele) va
+a whisper-1 i al model: viatges de pagament i lents que bloquegen el bucle.
+WakeWordGate decideix al robot, abans de l'STT, si la frase s'adreça al robot:
+
+- mentre l'usuari parla, un reconeixedor local limitat a les paraules clau
+  (gramàtica de Vosk amb '[unk]' per a la resta, molt més lleuger que la
+  transcripció completa) escolta la frase al seu propi fil;
+- en acabar la frase, s'accepta si hi apareix alguna paraula clau amb prou
+  confiança (WAKE_SENSITIVITY) i, si no, es descarta i es continua escoltant;
+- després d'un torn acceptat, les frases dels WAKE_FOLLOW_UP_S segons
+  següents (la resposta de l'usuari al robot) no necessiten la paraula clau.
+
+Si el model local no està disponible o cap paraula clau és al seu vocabulari,
+la porta deixa passar totes les frases (millor gastar STT que quedar-se sord).
+"""
+
+import re
+import threading
+import time
+
+from stt_backends import StreamingTranscriber
+from utils import gray_print, warn
+
+
+WAKE_WORDS = ('arnau', 'hola robot')  # paraules o frases clau, en minúscules
+WAKE_SENSITIVITY = 0.5  # 0 = només paraules molt clares, 1 = qualsevol coincidència
+WAKE_FOLLOW_UP_S = 10.0  # segons després d'una resposta en què no cal la paraula clau
+WAKE_FINAL_TIMEOUT_S = 1.0  # espera màxima del reconeixedor de paraules clau en acabar la frase
+
+
+def normalize_words(text):
+    """Paraules en minúscules sense puntuació (es conserven els accents i la l·l)."""
+    return re.findall(r"[\w·']+", text.lower().replace('’', "'"))
+
+
+def find_keyword(words, keywords, min_conf):
+    """
+    Busca una paraula clau dins les paraules reconegudes.
+
+    Args:
+        words: Llista de (paraula, confiança)
+        keywords: Frases clau ja normalitzades (tuples de paraules)
+        min_conf: Confiança mínima de cada paraula de la frase clau
+
+    Returns:
+        str: La frase clau trobada, o None
+    """
+    heard = [word for word, _ in words]
+    for keyword in keywords:
+        n = len(keyword)
+        for i in range(len(heard) - n + 1):
+            if tuple(heard[i:i + n]) == keyword and all(conf >= min_conf for _, conf in words[i:i + n]):
+                return ' '.join(keyword)
+    return None
+
+
+class WakeWordGate():
+    """
+    Decideix si una frase s'adreça al robot (vegeu el docstring del mòdul).
+
+    MicStream en crida open() quan comença la veu, alimenta la sessió amb la
+    frase i en crida check() en acabar-la.
+
+    Args:
+        spotter: Motor local amb available, has_word(word) i
+                 open_stream(sample_rate, grammar) (stt_backends.VoskStt)
+        keywords: Paraules o frases clau
+        sensitivity: Entre 0 i 1; la confiança mínima és 1 - sensitivity
+        follow_up_s: Segons sense paraula clau després d'un torn acceptat
+        clock: Rellotge (injectable per als tests)
+    """
+
+    def __init__(self, spotter, keywords=WAKE_WORDS, sensitivity=WAKE_SENSITIVITY,
+                 follow_up_s=WAKE_FOLLOW_UP_S, clock=time.monotonic):
+        self.spotter = spotter
+        self.keywords = [tuple(normalize_words(keyword)) for keyword in keywords if normalize_words(keyword)]
+        self.min_conf = 1.0 - min(max(sensitivity, 0.0), 1.0)
+        self.follow_up_s = follow_up_s
+        self.clock = clock
+        self._grammar = None  # es construeix quan el model ja està carregat
+        self._awake_until = None
+        self._last_accepted = False
+        self._lock = threading.Lock()
+        self.stats = {'accepted': 0, 'rejected': 0, 'follow_up': 0, 'bypassed': 0}
+
+    @property
+    def awake(self):
+        """Cert dins la finestra de continuació d'una conversa."""
+        with self._lock:
+            return self._awake_until is not None and self.clock() < self._awake_until
+
+    def turn_done(self):
+        """El robot ha acabat de respondre: si la frase era per a ell, obre la finestra de continuació."""
+        with self._lock:
+            if self._last_accepted:
+                self._awake_until = self.clock() + self.follow_up_s
+
+    def sleep(self):
+        """Tanca la finestra de continuació (la frase següent necessita la paraula clau)."""
+        with self._lock:
+            self._awake_until = None
+            self._last_accepted = False
+
+    def _build_grammar(self):
+        known, unknown = [], []
+        for keyword in self.keywords:
+            (known if all(self.spotter.has_word(word) for word in keyword) else unknown).append(keyword)
+        if unknown:
+            warn(f"wake word: fora del vocabulari del model: {', '.join(' '.join(k) for k in unknown)}")
+        self.keywords = known
+        if not known:
+            warn('wake word: cap paraula clau utilitzable, la porta deixa passar totes les frases')
+        return [' '.join(keyword) for keyword in known] + ['[unk]']
+
+    def open(self, sample_rate):
+        """
+        Sessió per a la frase que comença.
+
+        Returns:
+            StreamingTranscriber, o None si no cal (finestra de continuació) o
+            no es pot escoltar localment (la frase passarà igualment)
+        """
+        if self.awake or not getattr(self.spotter, 'available', False):
+            return None
+        if self._grammar is None:
+            self._grammar = self._build_grammar()
+        if not self.keywords:
+            return None
+        try:
+            return StreamingTranscriber(self.spotter.open_stream(sample_rate, grammar=self._grammar))
+        except Exception as e:
+            warn(f'wake word: no es pot obrir el reconeixedor: {e}')
+            return None
+
+    def check(self, session):
+        """
+        Decideix si la frase s'adreça al robot.
+
+        Args:
+            session: El que ha retornat open() per a aquesta frase
+
+        Returns:
+            tuple: (acceptada: bool, motiu: 'keyword' | 'follow_up' | 'bypassed' | 'rejected')
+        """
+        if self.awake:
+            if session is not None:
+                session.cancel()
+            return self._decide(True, 'follow_up')
+        if session is None:
+            return self._decide(True, 'bypassed')
+        text = session.finish(timeout=WAKE_FINAL_TIMEOUT_S)
+        if text is None:
+            # El reconeixedor ha fallat: millor deixar passar la frase que perdre-la
+            return self._decide(True, 'bypassed')
+        keyword = find_keyword(session.session.words, self.keywords, self.min_conf)
+        if keyword is None:
+            gray_print(f"wake word: rejected ({text or 'no keyword'}); "
+                       f"{self.stats['rejected'] + 1} rejected, {self.stats['accepted']} accepted")
+            return self._decide(False, 'rejected')
+        gray_print(f'wake word: {keyword!r}')
+        return self._decide(True, 'keyword')
+
+    def _decide(self, accepted, reason):
+        with self._lock:
+            self.stats['accepted' if accepted else 'rejected'] += 1
+            if reason in ('follow_up', 'bypassed'):
+                self.stats[reason] += 1
+            self._last_accepted = accepted
+        return accepted, reason